@@ -8,7 +8,6 @@ from django_filters import rest_framework as filters
 
 from obs_run.models import DataFile
 from tags.models import Tag
-from utilities import annotate_effective_exposure_type
 
 
 class AdminDataFileFilter(filters.FilterSet):
@@ -90,5 +89,4 @@ class AdminDataFileFilter(filters.FilterSet):
         values = [v for v in values if v]
         if not values:
             return queryset
-        queryset = annotate_effective_exposure_type(queryset)
-        return queryset.filter(annotated_effective_exposure_type__in=values)
+        return queryset.filter(exposure_type_effective__in=values)
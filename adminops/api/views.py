@@ -5,7 +5,7 @@ from urllib.parse import urlparse
 
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Case, CharField, Count, F, Q, Value, When
+from django.db.models import Count, F, Q
 from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import serializers
 from rest_framework.decorators import api_view, permission_classes
@@ -48,7 +48,6 @@ from ostdata.services.health import gather_admin_health
 from utilities import (
     _query_object_variants,
     _query_region_safe,
-    annotate_effective_exposure_type,
     evaluate_data_file,
     reanalyse_object_from_simbad,
     update_object_photometry_spectroscopy,
@@ -1472,33 +1471,8 @@ def admin_get_unsolved_plate_files(request):
         spectroscopy=False  # Exclude files marked as spectroscopy
     ).select_related('observation_run')
     
-    # Annotate with effective_exposure_type and filter for Light frames only
-    # Use a different annotation name to avoid conflict with the property
-    queryset = queryset.annotate(
-        annotated_effective_exposure_type=Case(
-            # Priority 1: User-set type
-            When(
-                Q(exposure_type_user__isnull=False) & ~Q(exposure_type_user=''),
-                then='exposure_type_user'
-            ),
-            # Priority 2: ML type matches header type
-            When(
-                Q(exposure_type_ml__isnull=False) & 
-                ~Q(exposure_type_ml='') & 
-                Q(exposure_type_ml=F('exposure_type')),
-                then='exposure_type_ml'
-            ),
-            # Priority 3: ML type doesn't match header type -> Unknown
-            When(
-                Q(exposure_type_ml__isnull=False) & ~Q(exposure_type_ml=''),
-                then=Value('UK')
-            ),
-            # Priority 4: Header-based type
-            default='exposure_type',
-            output_field=CharField(max_length=2)
-        )
-    )
-    queryset = queryset.filter(annotated_effective_exposure_type='LI')
+    # Light frames only (stored effective exposure type)
+    queryset = queryset.filter(exposure_type_effective='LI')
     
     # Apply additional filters (after annotation so they work correctly)
     # Filter by observation_run (by ID or name)
@@ -1677,8 +1651,7 @@ def admin_plate_solve_stats(request):
             spectrograph='N',  # Exclude spectra
             spectroscopy=False  # Exclude files marked as spectroscopy
         )
-        queryset = annotate_effective_exposure_type(queryset)
-        queryset = queryset.filter(annotated_effective_exposure_type='LI')
+        queryset = queryset.filter(exposure_type_effective='LI')
         
         stats = queryset.aggregate(
             total_light=Count('pk'),
@@ -1773,44 +1746,32 @@ def _do_re_evaluate_datafiles(queryset):
     """
     Re-evaluate plate-solved DataFiles (WCS-based). Returns dict with evaluated, skipped, errors, total.
     """
-    import astropy.units as u
-    from astropy.coordinates import SkyCoord
+    from obs_run.plate_solving import select_re_evaluation_candidates
 
     threshold_arcmin = getattr(settings, 'PLATE_SOLVING_RE_EVAL_COORD_THRESHOLD_ARCMIN', 5.0)
     evaluated = 0
-    skipped = 0
     errors = 0
 
-    for datafile in queryset:
+    candidate_pks, skip_pks = select_re_evaluation_candidates(queryset, threshold_arcmin)
+    skipped = len(skip_pks)
+    if skip_pks:
+        DataFile.objects.filter(pk__in=skip_pks).update(re_evaluated_after_plate_solve=True)
+
+    for datafile in DataFile.objects.filter(pk__in=candidate_pks).select_related('observation_run'):
         try:
-            condition1 = (datafile.ra in (-1, None) or datafile.dec in (-1, None))
-            condition2 = False
-            if not condition1:
-                c_header = SkyCoord(ra=datafile.ra * u.deg, dec=datafile.dec * u.deg)
-                c_wcs = SkyCoord(ra=datafile.wcs_ra * u.deg, dec=datafile.wcs_dec * u.deg)
-                sep_arcmin = float(c_header.separation(c_wcs).arcmin)  # type: ignore[arg-type]
-                condition2 = sep_arcmin > float(threshold_arcmin)
-
-            if condition1 or condition2:
-                if datafile.observation_run and datafile.wcs_ra is not None and datafile.wcs_dec is not None:
-                    evaluate_data_file(
-                        datafile,
-                        datafile.observation_run,
-                        skip_if_object_has_overrides=True,
-                    )
-                    update_observation_run_photometry_spectroscopy(datafile.observation_run)
-                    for obj in datafile.object_set.all():
-                        update_object_photometry_spectroscopy(obj)
-                    evaluated += 1
-                else:
-                    skipped += 1
-            else:
-                skipped += 1
-            DataFile.objects.filter(pk=datafile.pk).update(re_evaluated_after_plate_solve=True)
+            evaluate_data_file(
+                datafile,
+                datafile.observation_run,
+                skip_if_object_has_overrides=True,
+            )
+            update_observation_run_photometry_spectroscopy(datafile.observation_run)
+            for obj in datafile.object_set.all():
+                update_object_photometry_spectroscopy(obj)
+            evaluated += 1
         except Exception as e:
             errors += 1
             logger.warning('Re-evaluation failed for datafile %s: %s', datafile.pk, e)
-            DataFile.objects.filter(pk=datafile.pk).update(re_evaluated_after_plate_solve=True)
+        DataFile.objects.filter(pk=datafile.pk).update(re_evaluated_after_plate_solve=True)
 
     total = evaluated + skipped + errors
     return {'evaluated': evaluated, 'skipped': skipped, 'errors': errors, 'total': total}
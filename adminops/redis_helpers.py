@@ -1,4 +1,7 @@
-"""Redis helpers for admin-overridable settings. Avoids circular imports with tasks."""
+"""Redis helpers for admin-overridable settings, slot leases and counters. Avoids circular imports with tasks."""
+import threading
+import uuid
+
 try:
     import redis as _redis
 except Exception:
@@ -7,6 +10,18 @@ except Exception:
 _PLATE_SOLVING_TASK_ENABLED_KEY = 'ostdata:admin:plate_solving_task_enabled'
 _AUX_OBJECTS_TASK_ENABLED_KEY = 'ostdata:admin:aux_objects_task_enabled'
 
+_SHARED_LOCK = threading.Lock()
+_shared_client = None
+_shared_broker = None
+
+# KEYS[1] = lease key, ARGV[1] = token; deletes the key only while it still holds the token
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 
 def get_redis_from_broker():
     try:
@@ -29,6 +44,109 @@ def _get_redis_from_broker():
     return get_redis_from_broker()
 
 
+def get_shared_redis():
+    """
+    Process-wide client for the broker's Redis, or None without a Redis broker.
+
+    redis-py pools connections per client, so hot paths (cache counters, progress)
+    reuse them instead of opening one per call. Rebuilt when CELERY_BROKER_URL changes.
+    """
+    global _shared_client, _shared_broker
+    try:
+        from django.conf import settings
+        broker = getattr(settings, 'CELERY_BROKER_URL', '') or ''
+    except Exception:
+        return None
+    if broker != _shared_broker:
+        with _SHARED_LOCK:
+            if broker != _shared_broker:
+                _shared_client = get_redis_from_broker()
+                _shared_broker = broker
+    return _shared_client
+
+
+class RedisHashCounters:
+    """
+    Integer counters in one Redis hash shared by all processes.
+
+    Without Redis (or when a call fails) they are counted in this process;
+    snapshot() reports which source it read.
+    """
+
+    def __init__(self, key: str, fields):
+        self.key = key
+        self.fields = tuple(fields)
+        self._lock = threading.Lock()
+        self._local = dict.fromkeys(self.fields, 0)
+
+    def incr(self, field: str, amount: int = 1) -> None:
+        client = get_shared_redis()
+        if client is not None:
+            try:
+                client.hincrby(self.key, field, amount)
+                return
+            except Exception:
+                pass
+        with self._lock:
+            self._local[field] = self._local.get(field, 0) + amount
+
+    def snapshot(self):
+        """Return ``(counters, source)`` with every field present; source is 'redis' or 'local'."""
+        counters = dict.fromkeys(self.fields, 0)
+        raw = None
+        client = get_shared_redis()
+        if client is not None:
+            try:
+                raw = client.hgetall(self.key)
+            except Exception:
+                raw = None
+        if raw is None:
+            with self._lock:
+                counters.update(self._local)
+            return counters, 'local'
+        for key, value in raw.items():
+            name = key.decode('utf-8') if isinstance(key, bytes) else str(key)
+            if name in counters:
+                counters[name] = int(value)
+        return counters, 'redis'
+
+    def reset(self) -> None:
+        client = get_shared_redis()
+        if client is not None:
+            try:
+                client.delete(self.key)
+            except Exception:
+                pass
+        with self._lock:
+            self._local = dict.fromkeys(self.fields, 0)
+
+
+def acquire_slot_lease(client, key_template: str, limit: int, ttl: int):
+    """
+    Lease one of ``limit`` slots (``key_template`` formatted with the slot number).
+
+    Each slot is a key set with NX and a TTL of ``ttl`` seconds, so a slot leaked
+    by a dead process expires on its own. Returns the lease ``(key, token)`` or
+    None when every slot is taken; Redis errors propagate to the caller.
+    """
+    token = uuid.uuid4().hex
+    for slot in range(limit):
+        key = key_template.format(slot)
+        if client.set(key, token, nx=True, ex=ttl):
+            return key, token
+    return None
+
+
+def release_slot_lease(client, lease) -> None:
+    """Free a lease from acquire_slot_lease() unless it expired and was taken over since."""
+    key, token = lease
+    try:
+        # Compare and delete in one step: after an expiry the slot may belong to another holder
+        client.eval(_RELEASE_LEASE_SCRIPT, 1, key, token)
+    except Exception:
+        pass
+
+
 def plate_solving_task_enabled_get():
     """Get plate solving task enabled from Redis. Returns None if not set (use settings default)."""
     client = _get_redis_from_broker()
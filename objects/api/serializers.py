@@ -136,9 +136,7 @@ class ObjectListSerializer(ModelSerializer):
             # DataFiles linked to this object within this run
             df_qs = obj.datafiles.filter(observation_run=run)
             # Use effective exposure type for filtering
-            from utilities import annotate_effective_exposure_type
-            df_qs = annotate_effective_exposure_type(df_qs)
-            df_science = df_qs.filter(annotated_effective_exposure_type='LI')
+            df_science = df_qs.filter(exposure_type_effective='LI')
             try:
                 n_total = df_qs.count()
             except Exception:
@@ -162,8 +160,8 @@ class ObjectListSerializer(ModelSerializer):
                     + df_qs.filter(file_type__exact='TIFF').count()
                 )
                 n_ser = df_qs.filter(file_type__exact='SER').count()
-                n_flat = df_qs.filter(annotated_effective_exposure_type='FL').count()
-                n_dark = df_qs.filter(annotated_effective_exposure_type='DA').count()
+                n_flat = df_qs.filter(exposure_type_effective='FL').count()
+                n_dark = df_qs.filter(exposure_type_effective='DA').count()
             except Exception:
                 n_fits = n_img = n_ser = n_flat = n_dark = 0
 
@@ -298,17 +296,15 @@ class ObjectListSerializer(ModelSerializer):
     @extend_schema_field(OpenApiTypes.INT)
     def get_n_light(self, obj) -> int:
         try:
-            from utilities import annotate_effective_exposure_type
-            return annotate_effective_exposure_type(obj.datafiles.all()).filter(annotated_effective_exposure_type='LI').count()
+            return obj.datafiles.filter(exposure_type_effective='LI').count()
         except Exception:
             return 0
 
     @extend_schema_field(OpenApiTypes.NUMBER)
     def get_light_expo_time(self, obj) -> float:
         try:
-            from utilities import annotate_effective_exposure_type
             total = 0.0
-            light_files = annotate_effective_exposure_type(obj.datafiles.all()).filter(annotated_effective_exposure_type='LI')
+            light_files = obj.datafiles.filter(exposure_type_effective='LI')
             for f in light_files.only('exptime'):
                 try:
                     if getattr(f, 'exptime', 0) and f.exptime > 0:
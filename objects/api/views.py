@@ -2,7 +2,7 @@ from typing import Any, cast
 
 from astropy.coordinates import SkyCoord
 from django.db import models
-from django.db.models import Count, Q, QuerySet, Sum
+from django.db.models import Count, Q, QuerySet
 from django.shortcuts import get_object_or_404
 from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
@@ -26,12 +26,12 @@ from objects.search import (
     normalize_search_term,
 )
 from obs_run.api.serializers import DataFileSerializer, RunSerializer
+from obs_run.change_counters import weak_etag
 from ostdata.custom_permissions import (
     get_allowed_run_objects_to_view_for_user,
     get_allowed_runs_to_view_for_user,
     get_object_for_user_or_404,
 )
-from utilities import get_effective_exposure_type_filter
 
 from .filter import ObjectFilter
 from .serializers import ObjectListSerializer
@@ -187,8 +187,7 @@ class ObjectViewSet(ObjectLookupMixin, viewsets.ModelViewSet):
             # Compute queryset and count for signature (after filters)
             queryset = self.filter_queryset(self.get_queryset())
             count = queryset.count()
-            sig = f"objects:{count}:{str(latest_hist)}:{hash(request.META.get('QUERY_STRING',''))}"
-            etag = f"W/\"{abs(hash(sig))}\""
+            etag = weak_etag('objects', count, latest_hist, request.META.get('QUERY_STRING', ''))
             if request.META.get('HTTP_IF_NONE_MATCH') == etag:
                 return Response(status=304)
         except Exception:
@@ -417,23 +416,8 @@ class getObjectRunViewSet(viewsets.ModelViewSet):
             obj = get_object_for_user_or_404(request.user, object_pk)
         except Exception:
             return Response({"detail": "Not found"}, status=404)
-        # Annotate counts and totals to match RunListSerializer fields
-        queryset = (
-            obj.observation_run.all()
-            .prefetch_related('tags')
-            .annotate(
-                n_fits=Count('datafile', filter=Q(datafile__file_type__exact='FITS')),
-                n_img=Count('datafile', filter=Q(datafile__file_type__exact='JPG'))
-                      + Count('datafile', filter=Q(datafile__file_type__exact='CR2'))
-                      + Count('datafile', filter=Q(datafile__file_type__exact='TIFF')),
-                n_ser=Count('datafile', filter=Q(datafile__file_type__exact='SER')),
-                n_light=Count('datafile', filter=get_effective_exposure_type_filter('LI', 'datafile__')),
-                n_flat=Count('datafile', filter=get_effective_exposure_type_filter('FL', 'datafile__')),
-                n_dark=Count('datafile', filter=get_effective_exposure_type_filter('DA', 'datafile__')),
-                expo_time=Sum('datafile__exptime', filter=Q(datafile__exptime__gt=0)),
-                n_datafiles=Count('datafile'),
-            )
-        )
+        # Counts and totals come from the materialized RunStats rows
+        queryset = obj.observation_run.all().select_related('stats').prefetch_related('tags')
         queryset = get_allowed_runs_to_view_for_user(queryset, request.user)
         serializer = RunSerializer(queryset, many=True)
         return Response(serializer.data)
@@ -590,7 +574,7 @@ class ObjectVuetifyViewSet(ObjectLookupMixin, viewsets.ModelViewSet):
         n_light_max = self.request.query_params.get('n_light_max', None)
         if n_light_min is not None or n_light_max is not None:
             queryset = queryset.annotate(
-                num_li=Count('datafiles', filter=get_effective_exposure_type_filter('LI', 'datafiles__'))
+                num_li=Count('datafiles', filter=Q(datafiles__exposure_type_effective='LI'))
             )
             try:
                 if n_light_min is not None and str(n_light_min).strip() != '':
@@ -693,8 +677,7 @@ class ObjectVuetifyViewSet(ObjectLookupMixin, viewsets.ModelViewSet):
             hist = instance.history.order_by('-history_date').values_list('history_date', flat=True).first()
         except Exception:
             hist = None
-        sig = f"object:{instance.pk}:{str(hist)}"
-        etag = f"W/\"{abs(hash(sig))}\""
+        etag = weak_etag('object', instance.pk, hist)
         if request.META.get('HTTP_IF_NONE_MATCH') == etag:
             return Response(status=304)
         response = super().retrieve(request, *args, **kwargs)
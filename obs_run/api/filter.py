@@ -1,7 +1,7 @@
 
 import re
 
-from django.db.models import Count, ExpressionWrapper, F, FloatField, Q
+from django.db.models import ExpressionWrapper, F, FloatField, Q
 from django_filters import rest_framework as filters
 from rest_framework.request import Request
 
@@ -12,7 +12,6 @@ from ostdata.custom_permissions import (
     get_allowed_run_objects_to_view_for_user,
 )
 from tags.models import Tag
-from utilities import annotate_effective_exposure_type
 
 # ===============================================================
 #   OBSERVATION RUNS
@@ -92,7 +91,7 @@ class RunFilter(filters.FilterSet):
             return queryset
         qs = queryset.filter(build_run_aux_objects_search_q(s))
         matching_pks = []
-        for run in qs.only('pk', 'aux_objects', 'aux_objects_status'):
+        for run in qs.select_related(None).only('pk', 'aux_objects', 'aux_objects_status'):
             if find_aux_object_search_match(run, s):
                 matching_pks.append(run.pk)
         if not matching_pks:
@@ -115,12 +114,10 @@ class RunFilter(filters.FilterSet):
     #     return qs
 
     def filter_files_gt(self, queryset, name, value):
-        return queryset.annotate(num_files=Count(name, distinct=True)). \
-            filter(num_files__gte=value)
+        return queryset.filter(stats__n_datafiles__gte=value)
 
     def filter_files_lt(self, queryset, name, value):
-        return queryset.annotate(num_files=Count(name, distinct=True)). \
-            filter(num_files__lte=value)
+        return queryset.filter(stats__n_datafiles__lte=value)
     #
     # def filter_exposure_time_gt(self, queryset, name, value):
     #     return queryset.annotate(expo_time=Count(name, distinct=True)). \
@@ -195,6 +192,48 @@ class DataFileFilter(filters.FilterSet):
         lookup_expr='lte',
     )
 
+    #   Pixel statistics ranges (QA: clouded lights, blown flats, mislabeled darks)
+    pixel_mean_min = filters.NumberFilter(
+        field_name="pixel_mean",
+        lookup_expr='gte',
+    )
+    pixel_mean_max = filters.NumberFilter(
+        field_name="pixel_mean",
+        lookup_expr='lte',
+    )
+    pixel_median_min = filters.NumberFilter(
+        field_name="pixel_median",
+        lookup_expr='gte',
+    )
+    pixel_median_max = filters.NumberFilter(
+        field_name="pixel_median",
+        lookup_expr='lte',
+    )
+    pixel_std_min = filters.NumberFilter(
+        field_name="pixel_std",
+        lookup_expr='gte',
+    )
+    pixel_std_max = filters.NumberFilter(
+        field_name="pixel_std",
+        lookup_expr='lte',
+    )
+    pixel_background_min = filters.NumberFilter(
+        field_name="pixel_background",
+        lookup_expr='gte',
+    )
+    pixel_background_max = filters.NumberFilter(
+        field_name="pixel_background",
+        lookup_expr='lte',
+    )
+    saturated_fraction_min = filters.NumberFilter(
+        field_name="saturated_fraction",
+        lookup_expr='gte',
+    )
+    saturated_fraction_max = filters.NumberFilter(
+        field_name="saturated_fraction",
+        lookup_expr='lte',
+    )
+
 
     #   Exposure time filter
     exposure_type = filters.MultipleChoiceFilter(
@@ -348,5 +387,4 @@ class DataFileFilter(filters.FilterSet):
         values = [v for v in values if v]
         if not values:
             return queryset
-        queryset = annotate_effective_exposure_type(queryset)
-        return queryset.filter(annotated_effective_exposure_type__in=values)
+        return queryset.filter(exposure_type_effective__in=values)
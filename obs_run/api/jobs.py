@@ -1,5 +1,4 @@
 import logging
-import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -16,20 +15,17 @@ from rest_framework.response import Response
 from rest_framework.throttling import ScopedRateThrottle
 
 from obs_run.models import DownloadJob
+from obs_run.services.archive_cache import release_job_archive
 from obs_run.services.downloads import (
     enqueue_download_job_bulk,
     enqueue_download_job_for_run,
     user_can_access_download_job,
 )
+from obs_run.services.job_progress import overlay_live_progress, read_live_progress, request_cancel
 from ostdata.custom_permissions import get_run_for_user_or_404
 from ostdata.openapi import JSON_OBJECT_RESPONSE, EmptyObjectSerializer
 from ostdata.permissions import HasPerm
 
-try:
-    import redis as _redis
-except Exception:
-    _redis = None
-
 logger = logging.getLogger(__name__)
 
 
@@ -47,6 +43,12 @@ class DownloadJobBulkRequestSerializer(serializers.Serializer):
         default=dict,
         help_text="Optional filter map (keys like file_type, main_target, instrument, etc.)",
     )
+    format = serializers.ChoiceField(
+        choices=DownloadJob.ARCHIVE_FORMAT_CHOICES,
+        required=False,
+        default='zip',
+        help_text="Archive format: zip (default) or tar (uncompressed, cheapest to build and serve)",
+    )
 
 
 class DownloadJobCreateResponseSerializer(serializers.Serializer):
@@ -69,6 +71,11 @@ class DownloadJobCreateResponseSerializer(serializers.Serializer):
             value={'filters': {'file_type': 'FITS', 'instrument': 'QHY'}},
             request_only=True,
         ),
+        OpenApiExample(
+            'Uncompressed tar',
+            value={'ids': [12, 45, 78], 'format': 'tar'},
+            request_only=True,
+        ),
         OpenApiExample(
             'Response',
             value={'job_id': 123, 'job_token': None},
@@ -90,6 +97,7 @@ def create_download_job_bulk(request):
             selected_ids=selected_ids,
             filters=filters,
             request=request,
+            archive_format=payload.get('format') or 'zip',
         )
     except ValidationError as e:
         return Response(getattr(e, 'detail', {'detail': str(e)}), status=400)
@@ -114,6 +122,7 @@ class RunDownloadJobRequestSerializer(serializers.Serializer):
         required=False,
         default=dict,
     )
+    format = serializers.ChoiceField(choices=DownloadJob.ARCHIVE_FORMAT_CHOICES, required=False, default='zip')
 
 
 @extend_schema(
@@ -140,6 +149,7 @@ def create_download_job(request, run_pk):
             selected_ids=selected_ids,
             filters=filters,
             request=request,
+            archive_format=payload.get('format') or 'zip',
         )
     except ValidationError as e:
         return Response(getattr(e, 'detail', {'detail': str(e)}), status=400)
@@ -162,14 +172,19 @@ def download_job_status(request, job_id):
         return Response({'detail': 'Not found'}, status=404)
     if not user_can_access_download_job(request, job):
         return Response({'detail': 'Not found'}, status=404)
-    return Response({
+    payload = {
         'status': job.status,
         'progress': job.progress,
         'bytes_total': job.bytes_total,
         'bytes_done': job.bytes_done,
         'url': (f"/api/runs/jobs/{job.pk}/download" if job.status == 'done' and job.file_path else None),
         'error': job.error or None,
-    })
+    }
+    # Running jobs only checkpoint progress to the row; live values are in Redis
+    if job.status in ('queued', 'running'):
+        live = read_live_progress([job.pk]).get(job.pk)
+        overlay_live_progress(job, payload, live)
+    return Response(payload)
 
 
 @extend_schema(
@@ -208,9 +223,11 @@ def list_download_jobs(request):
             qs = qs.filter(user_id=int(user_param))
         except Exception:
             pass
+    jobs = list(qs[:200])
+    live = read_live_progress(j.pk for j in jobs if j.status in ('queued', 'running'))
     items = []
-    for j in qs[:200]:
-        items.append({
+    for j in jobs:
+        items.append(overlay_live_progress(j, {
             'id': j.pk,
             'status': j.status,
             'progress': j.progress,
@@ -224,7 +241,7 @@ def list_download_jobs(request):
             'finished_at': j.finished_at,
             'expires_at': j.expires_at,
             'error': j.error or '',
-        })
+        }, live.get(j.pk)))
     return Response({'items': items, 'total': qs.count()})
 
 
@@ -273,19 +290,8 @@ def cancel_download_job(request, job_id):
         )
     except Exception:
         pass
-    try:
-        broker = getattr(settings, 'CELERY_BROKER_URL', '') or os.environ.get('CELERY_BROKER_URL', '')
-        if broker.startswith('redis') and _redis:
-            from urllib.parse import urlparse
-            u = urlparse(broker)
-            host = u.hostname or '127.0.0.1'
-            port = int(u.port or 6379)
-            db = int((u.path or '/0').lstrip('/') or 0)
-            password = u.password
-            client = _redis.Redis(host=host, port=port, db=db, password=password, socket_timeout=1.0)
-            client.setex(f'job_cancel:{job.pk}', 24 * 3600, '1')
-    except Exception as e:
-        logger.warning("Failed to set cancel flag for job %s: %s", job.pk, e)
+    # Running workers poll the Redis job hash; without Redis they see the row at their next checkpoint
+    request_cancel([job.pk])
     return Response({'status': job.status, 'error': job.error or ''})
 
 
@@ -342,25 +348,7 @@ def batch_cancel_download_jobs(request):
             )
         except Exception:
             pass
-    try:
-        broker = getattr(settings, 'CELERY_BROKER_URL', '') or os.environ.get('CELERY_BROKER_URL', '')
-        if broker.startswith('redis') and _redis:
-            from urllib.parse import urlparse
-            u = urlparse(broker)
-            host = u.hostname or '127.0.0.1'
-            port = int(u.port or 6379)
-            db = int((u.path or '/0').lstrip('/') or 0)
-            password = u.password
-            client = _redis.Redis(host=host, port=port, db=db, password=password, socket_timeout=1.0)
-            with client.pipeline() as pipe:
-                for j in jobs:
-                    try:
-                        pipe.setex(f'job_cancel:{j.pk}', 24 * 3600, '1')
-                    except Exception:
-                        continue
-                pipe.execute()
-    except Exception as e:
-        logger.warning("Failed to set batch cancel flags: %s", e)
+    request_cancel(j.pk for j in jobs if j.status == 'cancelled')
     return Response({'cancelled': cancelled, 'skipped': skipped}, status=200)
 
 
@@ -416,13 +404,8 @@ def batch_expire_jobs_now(request):
     expired = 0
     for job in DownloadJob.objects.filter(pk__in=ids):
         try:
-            if job.file_path:
-                p = Path(job.file_path)
-                try:
-                    if p.exists():
-                        p.unlink()
-                except Exception:
-                    pass
+            # Archives shared with other live jobs stay on disk
+            release_job_archive(job)
             job.file_path = ''
             job.expires_at = now
             job.finished_at = job.finished_at or now
@@ -435,8 +418,8 @@ def batch_expire_jobs_now(request):
 
 
 @extend_schema(
-    summary='Download ZIP file for a completed job',
-    responses={200: OpenApiTypes.BINARY},
+    summary='Download the archive (ZIP or tar) of a completed job',
+    responses={200: OpenApiTypes.BINARY, 206: OpenApiTypes.BINARY, 416: None},
     tags=['Jobs'],
 )
 @api_view(['GET'])
@@ -459,6 +442,8 @@ def download_job_download(request, job_id):
         return Response({'detail': 'File missing'}, status=404)
     if not path.exists():
         return Response({'detail': 'File missing'}, status=404)
-    from django.http import FileResponse
-    filename = path.name
-    return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
+    from obs_run.services.file_serving import serve_file
+    try:
+        return serve_file(request, path, filename=path.name)
+    except OSError:
+        return Response({'detail': 'File missing'}, status=404)
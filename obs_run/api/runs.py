@@ -9,7 +9,7 @@ import environ
 from astropy.io import fits
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Count, Max, Q, Sum
+from django.db.models import Count, Q
 from django.http import Http404
 from django.utils.http import http_date
 from django.utils.timezone import make_aware
@@ -26,6 +26,7 @@ from rest_framework.response import Response
 from rest_framework.throttling import ScopedRateThrottle
 
 from objects.models import Object
+from obs_run import change_counters
 from obs_run.models import DataFile, ObservationRun
 from obs_run.utils import (
     INSTRUMENT_ALIASES,
@@ -40,7 +41,6 @@ from ostdata.custom_permissions import (
     get_run_for_user_or_404,
 )
 from ostdata.openapi import JSON_OBJECT_RESPONSE
-from utilities import annotate_effective_exposure_type, get_effective_exposure_type_filter
 
 from ..auxil import get_size_dir
 from ..plotting import (
@@ -123,25 +123,8 @@ class RunViewSet(viewsets.ModelViewSet):
     request: Request
 
     def get_queryset(self):
-        # Prefetch tags and annotate light-weight aggregates for list views
-        qs = ObservationRun.objects.all().prefetch_related('tags').annotate(
-            n_fits=Count('datafile', filter=Q(datafile__file_type__exact='FITS')),
-            n_img=(
-                Count('datafile', filter=Q(datafile__file_type__exact='JPG')) +
-                Count('datafile', filter=Q(datafile__file_type__exact='CR2')) +
-                Count('datafile', filter=Q(datafile__file_type__exact='TIFF'))
-            ),
-            n_ser=Count('datafile', filter=Q(datafile__file_type__exact='SER')),
-            n_light=Count('datafile', filter=get_effective_exposure_type_filter('LI', 'datafile__')),
-            n_flat=Count('datafile', filter=get_effective_exposure_type_filter('FL', 'datafile__')),
-            n_dark=Count('datafile', filter=get_effective_exposure_type_filter('DA', 'datafile__')),
-            expo_time=Sum('datafile__exptime', filter=Q(datafile__exptime__gt=0)),
-            light_expo_time=Sum(
-                'datafile__exptime',
-                filter=Q(datafile__exptime__gt=0) & get_effective_exposure_type_filter('LI', 'datafile__')
-            ),
-            n_datafiles=Count('datafile'),
-        )
+        # File counts and exposure totals come from the materialized RunStats row
+        qs = ObservationRun.objects.all().select_related('stats').prefetch_related('tags')
         return get_allowed_runs_to_view_for_user(qs, self.request.user)
 
     def create(self, request, *args, **kwargs):
@@ -279,80 +262,52 @@ class RunViewSet(viewsets.ModelViewSet):
                 queryset = queryset.order_by(f"{'-' if desc else ''}{mapped}")
             elif field not in allowed:
                 queryset = queryset.order_by('mid_observation_jd')
-        try:
-            from obs_run.models import DataFile, ObservationRun  # local import safe
-            latest_run_hist = ObservationRun.history.aggregate(m=Max('history_date'))['m']
-            latest_df_hist = DataFile.history.aggregate(m=Max('history_date'))['m']
-            count = queryset.count()
-            # Include DataFile history in the signature so ETag changes when file counts change
-            sig = f"runs:{count}:{str(latest_run_hist)}:{str(latest_df_hist)}:{hash(request.META.get('QUERY_STRING',''))}"
-            etag = f"W/\"{abs(hash(sig))}\""
-            if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
-            if if_none_match and if_none_match == etag:
-                return Response(status=304)
-        except Exception:
-            etag = None
-            latest_hist = None
+        counters, last_changed = change_counters.read(
+            change_counters.RUNS, change_counters.TAGS, change_counters.OBJECTS, change_counters.ACL,
+        )
+        etag = change_counters.weak_etag(
+            'runs', *counters, request.user.pk or 'anon', request.META.get('QUERY_STRING', ''),
+        )
+        if change_counters.etag_matches(request, etag):
+            return self._not_modified(etag, request)
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
             resp = self.get_paginated_response(serializer.data)
-            try:
-                if etag:
-                    resp['ETag'] = etag
-                if latest_hist:
-                    resp['Last-Modified'] = http_date(int(latest_hist.timestamp()))
-                if request.user.is_anonymous:
-                    resp['Cache-Control'] = 'public, max-age=60'
-            except Exception:
-                pass
-            return resp
-        serializer = self.get_serializer(queryset, many=True)
-        resp = Response(serializer.data)
-        try:
-            if etag:
-                resp['ETag'] = etag
-            # Prefer the latest of run/file histories if available
-            try:
-                from obs_run.models import DataFile, ObservationRun
-                latest_run_hist = ObservationRun.history.aggregate(m=Max('history_date'))['m']
-                latest_df_hist = DataFile.history.aggregate(m=Max('history_date'))['m']
-                latest_hist_any = max([d for d in [latest_run_hist, latest_df_hist] if d is not None], default=None)
-            except Exception:
-                latest_hist_any = None
-            if latest_hist_any:
-                resp['Last-Modified'] = http_date(int(latest_hist_any.timestamp()))
-            if request.user.is_anonymous:
-                resp['Cache-Control'] = 'public, max-age=60'
-        except Exception:
-            pass
-        return resp
+        else:
+            serializer = self.get_serializer(queryset, many=True)
+            resp = Response(serializer.data)
+        return self._with_validators(resp, request, etag, last_changed)
 
     @extend_schema(summary='Retrieve observation run', description='Get an observation run by ID.')
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        try:
-            hist = instance.history.order_by('-history_date').values_list('history_date', flat=True).first()
-            # Also include latest change of any related DataFile to avoid stale detail responses
-            from obs_run.models import DataFile
-            df_hist = DataFile.history.filter(observation_run=instance).aggregate(m=Max('history_date'))['m']
-            latest_any = max([d for d in [hist, df_hist] if d is not None], default=None)
-        except Exception:
-            latest_any = None
-        sig = f"run:{instance.pk}:{str(latest_any)}"
-        etag = f"W/\"{abs(hash(sig))}\""
-        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
-        if if_none_match and if_none_match == etag:
-            return Response(status=304)
+        counters, last_changed = change_counters.read(
+            change_counters.run_scope(instance.pk),
+            change_counters.ALL_RUNS,
+            change_counters.TAGS,
+            change_counters.OBJECTS,
+            change_counters.ACL,
+        )
+        etag = change_counters.weak_etag('run', instance.pk, *counters, request.user.pk or 'anon')
+        if change_counters.etag_matches(request, etag):
+            return self._not_modified(etag, request)
         serializer = self.get_serializer(instance)
-        resp = Response(serializer.data)
-        try:
-            if etag:
-                resp['ETag'] = etag
-            if latest_any:
-                resp['Last-Modified'] = http_date(int(latest_any.timestamp()))
-        except Exception:
-            pass
+        return self._with_validators(Response(serializer.data), request, etag, last_changed)
+
+    def _not_modified(self, etag, request):
+        resp = Response(status=304)
+        resp['ETag'] = etag
+        if request.user.is_anonymous:
+            resp['Cache-Control'] = 'public, max-age=60'
+        return resp
+
+    def _with_validators(self, resp, request, etag, last_changed):
+        resp['ETag'] = etag
+        if last_changed:
+            resp['Last-Modified'] = http_date(int(last_changed.timestamp()))
+        if request.user.is_anonymous:
+            resp['Cache-Control'] = 'public, max-age=60'
         return resp
 
 
@@ -514,18 +469,16 @@ def getDashboardStats(request):
     public_runs = ObservationRun.objects.filter(is_public=True)
     
     # === FILES: Single aggregated query ===
-    # Annotate with effective_exposure_type for spectra counting
-    datafiles_annotated = annotate_effective_exposure_type(public_files)
-    file_stats = datafiles_annotated.aggregate(
+    file_stats = public_files.aggregate(
         total=Count('pk'),
         # Exposure types (using effective exposure type)
-        bias=Count('pk', filter=get_effective_exposure_type_filter('BI', '')),
-        darks=Count('pk', filter=get_effective_exposure_type_filter('DA', '')),
-        flats=Count('pk', filter=get_effective_exposure_type_filter('FL', '')),
-        lights=Count('pk', filter=get_effective_exposure_type_filter('LI', '')),
-        waves=Count('pk', filter=get_effective_exposure_type_filter('WA', '')),
+        bias=Count('pk', filter=Q(exposure_type_effective='BI')),
+        darks=Count('pk', filter=Q(exposure_type_effective='DA')),
+        flats=Count('pk', filter=Q(exposure_type_effective='FL')),
+        lights=Count('pk', filter=Q(exposure_type_effective='LI')),
+        waves=Count('pk', filter=Q(exposure_type_effective='WA')),
         # Spectra: Light frames with spectrograph != 'N' (NONE)
-        spectra=Count('pk', filter=Q(annotated_effective_exposure_type='LI') & ~Q(spectrograph='N')),
+        spectra=Count('pk', filter=Q(exposure_type_effective='LI') & ~Q(spectrograph='N')),
         # File types
         fits=Count('pk', filter=Q(file_type='FITS')),
         jpeg=Count('pk', filter=Q(file_type='JPG')),
@@ -699,9 +652,7 @@ def dark_finder_search(request):
         normalized_instrument = normalize_alias(instrument, INSTRUMENT_ALIASES)
         
         # Build query for dark frames (using effective exposure type)
-        queryset = annotate_effective_exposure_type(
-            DataFile.objects.filter(observation_run__is_public=True)
-        ).filter(annotated_effective_exposure_type='DA')
+        queryset = DataFile.objects.filter(observation_run__is_public=True, exposure_type_effective='DA')
         
         # Find all possible instrument variants
         possible_instruments = [normalized_instrument]
@@ -130,9 +130,16 @@ class RunSerializer(ModelSerializer):
     def get_reduction_status_display(self, obj) -> str:
         return obj.get_reduction_status_display()
 
+    def _run_stat(self, obj, name):
+        """Value from the run's materialized RunStats row, else a queryset annotation (None when neither)."""
+        stats = getattr(obj, 'stats', None)
+        if stats is not None:
+            return getattr(stats, name, None)
+        return getattr(obj, name, None)
+
     def _get_annotated_or(self, obj, name, fallback_callable):
         try:
-            v = getattr(obj, name, None)
+            v = self._run_stat(obj, name)
             if isinstance(v, (int, float)) and v >= 0:
                 return int(v)
         except Exception:
@@ -176,11 +183,14 @@ class RunSerializer(ModelSerializer):
 
     # Robust exposure-type counters (tolerant to variant values)
     def _count_exptype(self, obj, codes_or_prefixes):
+        stats = getattr(obj, 'stats', None)
+        if stats is not None:
+            return getattr(stats, codes_or_prefixes['ann'])
         try:
             # Prefer annotated value if present and positive (detail may also carry annotations)
             ann_key = codes_or_prefixes.get('ann')
             if ann_key:
-                v = getattr(obj, ann_key, None)
+                v = self._run_stat(obj, ann_key)
                 if isinstance(v, (int, float)) and v > 0:
                     return int(v)
         except Exception:
@@ -215,7 +225,7 @@ class RunSerializer(ModelSerializer):
     @extend_schema_field(OpenApiTypes.NUMBER)
     def get_expo_time(self, obj) -> float:
         try:
-            v = getattr(obj, 'expo_time', None)
+            v = self._run_stat(obj, 'expo_time')
             if isinstance(v, (int, float)) and v >= 0:
                 return float(v)
         except Exception:
@@ -232,17 +242,14 @@ class RunSerializer(ModelSerializer):
     def get_light_expo_time(self, obj) -> float:
         """Total exposure time of Light (LI) frames only."""
         try:
-            v = getattr(obj, 'light_expo_time', None)
+            v = self._run_stat(obj, 'light_expo_time')
             if isinstance(v, (int, float)) and v >= 0:
                 return float(v)
         except Exception:
             pass
         try:
-            from utilities import annotate_effective_exposure_type
             total = 0.0
-            light_files = annotate_effective_exposure_type(obj.datafile_set.all()).filter(
-                annotated_effective_exposure_type='LI'
-            )
+            light_files = obj.datafile_set.filter(exposure_type_effective='LI')
             for f in light_files.only('exptime'):
                 ex = getattr(f, 'exptime', 0) or 0
                 if ex > 0:
@@ -254,6 +261,9 @@ class RunSerializer(ModelSerializer):
     @extend_schema_field(OpenApiTypes.STR)
     def get_start_time(self, obj) -> str:
         # Return ISO-8601 timestamp
+        stats = getattr(obj, 'stats', None)
+        if stats is not None:
+            return stats.start_obs_date or '2000-01-01T00:00:00Z'
         data_files = obj.datafile_set.filter(hjd__gt=2451545).order_by('hjd')
         if data_files.exists():
             dt = data_files.first().obs_date
@@ -272,6 +282,9 @@ class RunSerializer(ModelSerializer):
     @extend_schema_field(OpenApiTypes.STR)
     def get_end_time(self, obj) -> str:
         # Return ISO-8601 timestamp
+        stats = getattr(obj, 'stats', None)
+        if stats is not None:
+            return stats.end_obs_date or '2000-01-01T00:00:00Z'
         data_files = obj.datafile_set.filter(hjd__gt=2451545).order_by('-hjd')
         if data_files.exists():
             dt = data_files.first().obs_date
@@ -439,6 +452,13 @@ class DataFileSerializer(ModelSerializer):
             'wcs_crpix2',
             'wcs_crval1',
             'wcs_crval2',
+            # Pixel statistics (computed at ingest)
+            'pixel_mean',
+            'pixel_median',
+            'pixel_std',
+            'pixel_background',
+            'saturated_fraction',
+            'pixel_stats_at',
         ]
         read_only_fields = (
             'pk',
@@ -485,6 +505,12 @@ class DataFileSerializer(ModelSerializer):
             'exposure_type_ml',
             'exposure_type_ml_confidence',
             'exposure_type_ml_abstained',
+            'pixel_mean',
+            'pixel_median',
+            'pixel_std',
+            'pixel_background',
+            'saturated_fraction',
+            'pixel_stats_at',
         )
     
     def __init__(self, *args, **kwargs):
@@ -34,6 +34,7 @@ from .views import (
     download_run_datafiles,
     get_datafile_header,
     get_datafile_thumbnail,
+    get_run_thumbnail_sheet,
 )
 
 app_name = 'runs-api'
@@ -61,6 +62,7 @@ urlpatterns = [
     path('datafiles/<int:pk>/header/', get_datafile_header, name='datafile_header'),
     path('datafiles/<int:pk>/download/', download_datafile, name='datafile_download'),
     path('runs/<int:run_pk>/download/', download_run_datafiles, name='run_datafiles_download'),
+    path('runs/<int:run_pk>/thumbnails/', get_run_thumbnail_sheet, name='run_thumbnail_sheet'),
     path('datafiles/download/', download_datafiles_bulk, name='datafiles_download_bulk'),
     path('datafiles/download-jobs/', create_download_job_bulk, name='download_job_create_bulk'),
     # Async download jobs
@@ -1,39 +1,46 @@
-from io import BytesIO
+import base64
+import logging
 from pathlib import Path
 
-import numpy as np
-from astropy.io import fits
-from astropy.visualization import AsinhStretch, ImageNormalize, ZScaleInterval
 from django.conf import settings as django_settings
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
 from django_filters.rest_framework import DjangoFilterBackend
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
 from rest_framework import viewsets
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.throttling import ScopedRateThrottle
 
+from obs_run.change_counters import etag_matches
 from obs_run.models import DataFile, ObservationRun
 from obs_run.ser_thumbnails import get_ser_thumbnail_png, is_ser_path
-from ostdata.custom_permissions import get_allowed_run_objects_to_view_for_user
+from obs_run.thumbnails import (
+    THUMBNAIL_FORMATS,
+    ThumbnailError,
+    build_contact_sheet,
+    contact_sheet_etag,
+    get_thumbnail,
+    get_thumbnail_png,
+    sheet_source_dim,
+    thumbnail_etag,
+    thumbnail_format,
+    thumbnail_needs_render,
+)
+from ostdata.custom_permissions import get_allowed_run_objects_to_view_for_user, user_can_view_run
+from ostdata.openapi import JSON_OBJECT_RESPONSE
 from ostdata.permissions import user_has_acl
 
 from .filter import DataFileFilter
 from .serializers import DataFileSerializer
 
-try:
-    from PIL import Image
-except Exception:
-    Image = None
-
-import logging
-
-from drf_spectacular.types import OpenApiTypes
-from drf_spectacular.utils import OpenApiParameter, extend_schema, extend_schema_view
-
-from ostdata.openapi import JSON_OBJECT_RESPONSE
-
 logger = logging.getLogger(__name__)
 #
 
@@ -73,21 +80,45 @@ def getRunDataFile(request, run_pk):
     return Response({"detail": "Not found"}, status=404)
 
 
+class _ImageClientNegotiation(DefaultContentNegotiation):
+    """Image-only Accept headers (e.g. image/webp) get JSON error bodies instead of a 406."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            return renderers[0], renderers[0].media_type
+
+
+def _thumbnail_cache_control(run) -> str:
+    """Public thumbnails may be cached by browsers and proxies; private ones are revalidated every time."""
+    if run is None or run.is_public:
+        max_age = int(getattr(django_settings, 'THUMBNAIL_HTTP_MAX_AGE', 7 * 24 * 3600))
+        return f'public, max-age={max_age}'
+    return 'private, no-cache'
+
+
 @extend_schema(
     summary='DataFile thumbnail',
     parameters=[
         OpenApiParameter('pk', int, OpenApiParameter.PATH),
         OpenApiParameter('w', int, OpenApiParameter.QUERY, description='Max width/height in pixels (default 512, max 2048)'),
+        OpenApiParameter(
+            'fmt', str, OpenApiParameter.QUERY, enum=['png', 'webp', 'jpeg'],
+            description='Image format (default: WebP when the Accept header allows it, else PNG)',
+        ),
     ],
     responses={200: OpenApiTypes.BINARY},
 )
 @api_view(['GET'])
 def get_datafile_thumbnail(request, pk):
     """
-    Return a PNG thumbnail for the given DataFile.
+    Return a thumbnail for the given DataFile (PNG, WebP or JPEG).
     FITS uses ZScale + asinh stretch; JPG/TIFF are thumbnailed directly.
-    SER extracts a representative frame (cached on disk). AVI/MOV are not supported.
-    Optional query params: w (int, default 512)
+    SER extracts a representative frame. AVI/MOV are not supported.
+    Rendered thumbnails are cached on disk (obs_run.thumbnail_cache).
+    Responses carry a strong ETag; a matching If-None-Match gets a 304.
+    Optional query params: w (int, default 512), fmt (png|webp|jpeg)
     """
     try:
         df = DataFile.objects.select_related('observation_run').get(pk=pk)
@@ -95,15 +126,9 @@ def get_datafile_thumbnail(request, pk):
         return Response({"detail": "Not found"}, status=404)
 
     run = df.observation_run
-    if request.user.is_anonymous:
-        if run and not run.is_public:
-            return Response({"detail": "Not found"}, status=404)
-    elif run and not run.is_public:
-        try:
-            if not request.user.can_read(run):
-                return Response({"detail": "Not found"}, status=404)
-        except Exception:
-            return Response({"detail": "Not found"}, status=404)
+    # Same run ACL as the contact sheet; files without a run stay visible
+    if run is not None and not user_can_view_run(request.user, run):
+        return Response({"detail": "Not found"}, status=404)
 
     max_dim = 512
     try:
@@ -115,6 +140,11 @@ def get_datafile_thumbnail(request, pk):
     except Exception:
         w = max_dim
 
+    try:
+        fmt = thumbnail_format(request.query_params.get('fmt'), request.META.get('HTTP_ACCEPT'))
+    except ThumbnailError as e:
+        return Response({"detail": e.detail}, status=e.status)
+
     try:
         from obs_run.services.datafile_paths import PathOutsideDataRoot, safe_datafile_path
         file_path = safe_datafile_path(df.datafile, must_exist=True)
@@ -124,82 +154,45 @@ def get_datafile_thumbnail(request, pk):
         return Response({"detail": "File not found"}, status=404)
 
     try:
+        source_stat = file_path.stat()
         max_source = int(getattr(django_settings, 'THUMBNAIL_MAX_SOURCE_BYTES', 500 * 1024 * 1024))
-        if file_path.stat().st_size > max_source:
+        if source_stat.st_size > max_source:
             return Response({"detail": "Source file too large for thumbnail"}, status=400)
-    except Exception:
-        pass
+    except OSError:
+        source_stat = None
 
-    file_type = (df.file_type or '').upper()
+    try:
+        etag = thumbnail_etag(df, file_path, w, fmt, source_stat)
+    except OSError:
+        return Response({"detail": "File not found"}, status=404)
 
-    # Determine FITS by type or extension (fallback)
-    is_fits = (file_type == 'FITS') or (file_path.suffix.lower() in ['.fits', '.fit', '.fts'])
-    is_ser = is_ser_path(file_type, file_path)
-    is_other_video = (file_type in ('AVI', 'MOV')) or (file_path.suffix.lower() in ['.avi', '.mov'])
+    def with_cache_headers(response):
+        response['ETag'] = etag
+        response['Cache-Control'] = _thumbnail_cache_control(run)
+        if not request.query_params.get('fmt'):
+            # The format came from Accept; DRF only adds Vary with several renderer classes
+            patch_vary_headers(response, ['Accept'])
+        return response
+
+    if etag_matches(request, etag):
+        return with_cache_headers(HttpResponseNotModified())
 
     try:
-        if is_ser:
-            png = get_ser_thumbnail_png(
-                datafile_id=df.pk,
-                content_hash=df.content_hash or '',
-                file_path=file_path,
-                max_dim=w,
-            )
-            return HttpResponse(png, content_type='image/png')
-        # FITS handling with zscale
-        if is_fits:
-            # Some FITS with BZERO/BSCALE/BLANK cannot be memory-mapped; disable memmap
-            with fits.open(str(file_path), memmap=False) as hdul:
-                data = None
-                # Prefer first image-like HDU with 2D data
-                for hdu in hdul:
-                    hdu_data = getattr(hdu, 'data', None)
-                    if hdu_data is not None:
-                        arr = np.asarray(hdu_data)
-                        if arr.ndim >= 2:
-                            data = arr
-                            break
-                if data is None:
-                    return Response({"detail": "No image data"}, status=400)
-                if data.ndim > 2:
-                    data = data[0]
-                max_pixels = int(getattr(django_settings, 'THUMBNAIL_MAX_PIXELS', 50_000_000))
-                if int(np.prod(data.shape)) > max_pixels:
-                    return Response({"detail": "Image too large for thumbnail"}, status=400)
-                # Replace non-finite
-                data = np.asarray(data, dtype=float)
-                finite = np.isfinite(data)
-                if not finite.any():
-                    return Response({"detail": "Invalid image data"}, status=400)
-                zscale = ZScaleInterval()
-                vmin, vmax = zscale.get_limits(data[finite])
-                norm = ImageNormalize(vmin=vmin, vmax=vmax, stretch=AsinhStretch())
-                scaled = norm(data)
-                scaled = np.clip(scaled, 0.0, 1.0)
-                img8 = (scaled * 255.0).astype(np.uint8)
-                # Create image
-                if Image is None:
-                    # Minimal fallback using numpy tobytes and raw PNG via PIL unavailable
-                    # Without PIL, cannot encode PNG easily; return error
-                    return Response({"detail": "PIL not available"}, status=500)
-                img = Image.fromarray(img8, mode='L')
-                img.thumbnail((w, w))
-                buf = BytesIO()
-                img.save(buf, format='PNG')
-                buf.seek(0)
-                return HttpResponse(buf.getvalue(), content_type='image/png')
-        elif is_other_video:
-            return Response({"detail": "Preview not supported for video files"}, status=400)
+        if is_ser_path(df.file_type, file_path):
+            def render_png():
+                return get_ser_thumbnail_png(
+                    datafile_id=df.pk,
+                    content_hash=df.content_hash or '',
+                    file_path=file_path,
+                    max_dim=w,
+                )
         else:
-            # Non-FITS: try PIL thumbnail
-            if Image is None:
-                return Response({"detail": "Preview not supported"}, status=400)
-            img = Image.open(str(file_path))
-            img.thumbnail((w, w))
-            buf = BytesIO()
-            img.save(buf, format='PNG')
-            buf.seek(0)
-            return HttpResponse(buf.getvalue(), content_type='image/png')
+            def render_png():
+                return get_thumbnail_png(df, file_path, max_dim=w)
+        data = get_thumbnail(df, file_path, max_dim=w, fmt=fmt, render_png=render_png)
+        return with_cache_headers(HttpResponse(data, content_type=THUMBNAIL_FORMATS[fmt]))
+    except ThumbnailError as e:
+        return Response({"detail": e.detail}, status=e.status)
     except Exception as e:
         logger.exception("thumbnail generation failed for datafile %s: %s", pk, e)
         return Response({"detail": "Thumbnail generation failed"}, status=400)
@@ -207,6 +200,152 @@ def get_datafile_thumbnail(request, pk):
 
 get_datafile_thumbnail.throttle_classes = [ScopedRateThrottle]
 get_datafile_thumbnail.throttle_scope = 'thumbnails'
+get_datafile_thumbnail.cls.content_negotiation_class = _ImageClientNegotiation
+
+
+@extend_schema(
+    summary='Run thumbnail contact sheet',
+    parameters=[
+        OpenApiParameter('run_pk', int, OpenApiParameter.PATH),
+        OpenApiParameter('ids', str, OpenApiParameter.QUERY, description='Comma-separated DataFile IDs of this run, in display order'),
+        OpenApiParameter('w', int, OpenApiParameter.QUERY, description='Tile size in pixels (default 256, max 512)'),
+        OpenApiParameter('cols', int, OpenApiParameter.QUERY, description='Tiles per row (default 10)'),
+        OpenApiParameter('fmt', str, OpenApiParameter.QUERY, enum=['png', 'webp', 'jpeg'], description='Sheet image format (default webp)'),
+    ],
+    responses=JSON_OBJECT_RESPONSE,
+)
+@api_view(['GET'])
+def get_run_thumbnail_sheet(request, run_pk):
+    """
+    Thumbnails of a page of DataFiles of one run as a single contact-sheet image.
+
+    Returns JSON with the sheet as a data URI (``image``), its ``width``/``height``,
+    and a ``tiles`` map (DataFile ``id`` -> ``x``, ``y``, ``width``, ``height``
+    in the sheet). IDs without a thumbnail are listed in ``missing`` with the
+    reason. Access is checked once for the run; tiles come from the thumbnail
+    cache. At most THUMBNAIL_SHEET_MAX_RENDERS uncached tiles are rendered per
+    request; the others are reported as not rendered yet and queued for
+    pre-rendering. Strong ETag / If-None-Match like the single-thumbnail endpoint.
+    """
+    from django.http import Http404
+
+    from ostdata.custom_permissions import get_run_for_user_or_404
+
+    try:
+        run = get_run_for_user_or_404(request.user, run_pk)
+    except Http404:
+        return Response({"detail": "Not found"}, status=404)
+
+    try:
+        ids = [int(value) for value in _download_ids_from_query(request.query_params)]
+    except ValueError:
+        return Response({"detail": "ids must be comma-separated integers"}, status=400)
+    if not ids:
+        return Response({"detail": "ids is required"}, status=400)
+    ids = list(dict.fromkeys(ids))
+    max_tiles = int(getattr(django_settings, 'THUMBNAIL_SHEET_MAX_TILES', 100))
+    if len(ids) > max_tiles:
+        return Response({"detail": f"At most {max_tiles} ids per sheet"}, status=400)
+    try:
+        tile_size = min(max(16, int(request.query_params.get('w', 256))), 512)
+        columns = min(max(1, int(request.query_params.get('cols', 10))), 50)
+    except (TypeError, ValueError):
+        return Response({"detail": "w and cols must be integers"}, status=400)
+    try:
+        fmt = thumbnail_format(request.query_params.get('fmt') or 'webp')
+    except ThumbnailError as e:
+        return Response({"detail": e.detail}, status=e.status)
+
+    from obs_run.services.datafile_paths import PathOutsideDataRoot, safe_datafile_path
+
+    source_dim = sheet_source_dim(tile_size)
+    max_source = int(getattr(django_settings, 'THUMBNAIL_MAX_SOURCE_BYTES', 500 * 1024 * 1024))
+    by_id = {
+        df.pk: df
+        for df in DataFile.objects.filter(observation_run=run, pk__in=ids).only(
+            'pk', 'datafile', 'file_type', 'content_hash', 'observation_run_id',
+        )
+    }
+    sources, missing = [], []
+    for pk in ids:
+        df = by_id.get(pk)
+        if df is None:
+            missing.append({'id': pk, 'detail': 'Not found'})
+            continue
+        try:
+            file_path = safe_datafile_path(df.datafile, must_exist=True)
+            source_stat = file_path.stat()
+        except (PathOutsideDataRoot, FileNotFoundError, OSError):
+            missing.append({'id': pk, 'detail': 'File not found'})
+            continue
+        if source_stat.st_size > max_source:
+            missing.append({'id': pk, 'detail': 'Source file too large for thumbnail'})
+            continue
+        sources.append((df, file_path, source_stat))
+
+    # Cold tiles beyond the per-request budget are left to the pre-render queue
+    render_budget = int(getattr(django_settings, 'THUMBNAIL_SHEET_MAX_RENDERS', 10))
+    ready, pending = [], []
+    for source in sources:
+        df, file_path, source_stat = source
+        if thumbnail_needs_render(df, file_path, source_dim, source_stat.st_mtime):
+            if render_budget <= 0:
+                pending.append(df)
+                continue
+            render_budget -= 1
+        ready.append(source)
+
+    etag = contact_sheet_etag(
+        [thumbnail_etag(df, path, source_dim, 'png', st) for df, path, st in ready],
+        tile_size=tile_size,
+        columns=columns,
+        fmt=fmt,
+        missing_ids=[m['id'] for m in missing],
+        pending_ids=[df.pk for df in pending],
+    )
+
+    def with_cache_headers(response):
+        response['ETag'] = etag
+        response['Cache-Control'] = _thumbnail_cache_control(run)
+        return response
+
+    if etag_matches(request, etag):
+        return with_cache_headers(HttpResponseNotModified())
+
+    if pending:
+        from obs_run.tasks import enqueue_thumbnail_prerender
+
+        for df in pending:
+            # Galleries poll until their tiles appear; queue each file only once meanwhile
+            enqueue_thumbnail_prerender(df.pk, df.file_type, dedupe=True)
+            missing.append({'id': df.pk, 'detail': 'Thumbnail not rendered yet'})
+
+    thumbnails = []
+    for df, file_path, _st in ready:
+        try:
+            thumbnails.append((df.pk, get_thumbnail_png(df, file_path, max_dim=source_dim)))
+        except ThumbnailError as e:
+            missing.append({'id': df.pk, 'detail': e.detail})
+        except Exception as e:
+            logger.warning("thumbnail generation failed for datafile %s: %s", df.pk, e)
+            missing.append({'id': df.pk, 'detail': 'Thumbnail generation failed'})
+    try:
+        data, layout = build_contact_sheet(thumbnails, tile_size, columns, fmt)
+    except ThumbnailError as e:
+        return Response({"detail": e.detail}, status=e.status)
+    payload = {
+        'run': run.pk,
+        'format': fmt,
+        'tile_size': tile_size,
+        **layout,
+        'image': f'data:{THUMBNAIL_FORMATS[fmt]};base64,{base64.b64encode(data).decode("ascii")}',
+        'missing': missing,
+    }
+    return with_cache_headers(Response(payload))
+
+
+get_run_thumbnail_sheet.cls.throttle_classes = [ScopedRateThrottle]
+get_run_thumbnail_sheet.cls.throttle_scope = 'thumbnails'
 
 
 @extend_schema(
@@ -257,12 +396,15 @@ def get_datafile_header(request, pk):
     summary='Download raw datafile',
     operation_id='runs_datafile_download',
     parameters=[OpenApiParameter('pk', int, OpenApiParameter.PATH)],
-    responses={200: OpenApiTypes.BINARY},
+    responses={200: OpenApiTypes.BINARY, 206: OpenApiTypes.BINARY, 416: None},
 )
 @api_view(['GET'])
 def download_datafile(request, pk):
     """
     Send the raw data file as an attachment if the user has access to the run.
+
+    The transfer is offloaded to the web server or streamed with Range support
+    (see obs_run.services.file_serving).
     """
     try:
         df = DataFile.objects.select_related('observation_run').get(pk=pk)
@@ -288,46 +430,177 @@ def download_datafile(request, pk):
         return Response({"detail": "File not found"}, status=404)
 
     try:
-        from django.http import FileResponse
-        resp = FileResponse(open(file_path, 'rb'), as_attachment=True, filename=file_path.name)
-        return resp
+        from obs_run.services.file_serving import serve_file
+        return serve_file(request, file_path, filename=file_path.name)
     except Exception as e:
         logger.exception("download failed for datafile %s: %s", pk, e)
         return Response({"detail": "Download failed"}, status=400)
 
 
+def _download_filters_from_query(params):
+    """Filter map for resolve_visible_datafiles from download URL query params (known keys only)."""
+    from obs_run.datafile_filters import DATAFILE_FILTER_KEYS
+
+    filters = {}
+    for key in DATAFILE_FILTER_KEYS:
+        values = [v for v in params.getlist(key) if v != '']
+        if values:
+            filters[key] = values if len(values) > 1 or key == 'exposure_type' else values[0]
+    return filters
+
+
+def _download_ids_from_query(params):
+    ids = []
+    for raw in params.getlist('ids'):
+        ids.extend(part.strip() for part in str(raw).split(',') if part.strip())
+    return ids
+
+
+class _ZipFormatRenderer(JSONRenderer):
+    """Lets ?format=zip through DRF's format override; error bodies stay JSON."""
+    format = 'zip'
+
+
+class _TarFormatRenderer(JSONRenderer):
+    """Lets ?format=tar through DRF's format override; error bodies stay JSON."""
+    format = 'tar'
+
+
+ARCHIVE_RENDERER_CLASSES = [*api_settings.DEFAULT_RENDERER_CLASSES, _ZipFormatRenderer, _TarFormatRenderer]
+
+
+def _stream_gone_response(gone_detail):
+    """410 Gone while DOWNLOAD_STREAM_ENABLED is off, else None."""
+    if not getattr(django_settings, 'DOWNLOAD_STREAM_ENABLED', True):
+        return Response({'detail': gone_detail, 'code': 'sync_zip_gone'}, status=410)
+    return None
+
+
+def _streamed_zip_response(request, *, run, archive_name, gone_detail):
+    """
+    Stream a ZIP (or with ?format=tar an uncompressed tar) of the visible selection
+    (?ids=1,2&filters...) when it is small enough.
+
+    Larger selections get 413 with code 'use_download_job' (use the async
+    download-jobs API), and a client already holding its concurrent streams
+    gets 429; with DOWNLOAD_STREAM_ENABLED off the route is 410 Gone.
+    """
+    from django.http import StreamingHttpResponse
+    from rest_framework.exceptions import ValidationError
+
+    from obs_run.services.downloads import (
+        DownloadQuotaExceeded,
+        archive_format_from,
+        hold_stream_slot,
+        resolve_visible_datafiles,
+    )
+    from obs_run.services.tar_stream import iter_tar_stream, tar_size
+    from obs_run.services.zip_stream import collect_zip_members, iter_zip_stream, stream_limits
+
+    gone = _stream_gone_response(gone_detail)
+    if gone is not None:
+        return gone
+
+    try:
+        archive_format = archive_format_from(request.query_params.get('format'))
+        qs = resolve_visible_datafiles(
+            request.user,
+            run=run,
+            selected_ids=_download_ids_from_query(request.query_params),
+            filters=_download_filters_from_query(request.query_params),
+        )
+    except ValidationError as e:
+        return Response(getattr(e, 'detail', {'detail': str(e)}), status=400)
+
+    max_files, max_bytes = stream_limits()
+    files = list(qs.order_by('pk')[:max_files + 1])
+    if len(files) > max_files:
+        return Response(
+            {'detail': f'Too many files to stream (max {max_files}); use a download job', 'code': 'use_download_job'},
+            status=413,
+        )
+    members = collect_zip_members(files)
+    if not members:
+        return Response({'detail': 'No files to include'}, status=404)
+    if sum(m.size for m in members) > max_bytes:
+        return Response(
+            {'detail': f'Selection too large to stream (max {max_bytes} bytes); use a download job', 'code': 'use_download_job'},
+            status=413,
+        )
+
+    chunks = iter_tar_stream(members) if archive_format == 'tar' else iter_zip_stream(members)
+    try:
+        chunks = hold_stream_slot(request.user, request, chunks)
+    except DownloadQuotaExceeded as e:
+        return Response(e.detail, status=429)
+    if archive_format == 'tar':
+        # Headers come from the member sizes, so the length is known before streaming
+        response = StreamingHttpResponse(chunks, content_type='application/x-tar')
+        response['Content-Length'] = str(tar_size(members))
+    else:
+        response = StreamingHttpResponse(chunks, content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{archive_name}.{archive_format}"'
+    # Do not let a reverse proxy buffer the whole archive before sending it on
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @extend_schema(
-    summary='Download run datafiles (retired sync ZIP)',
-    responses={410: OpenApiTypes.OBJECT},
+    summary='Download run datafiles as a streamed ZIP or tar',
+    parameters=[
+        OpenApiParameter('ids', str, OpenApiParameter.QUERY, description='Comma-separated DataFile IDs (default: all visible files of the run)'),
+        OpenApiParameter('format', str, OpenApiParameter.QUERY, enum=['zip', 'tar'], description='Archive format (default zip; tar is uncompressed)'),
+    ],
+    responses={200: OpenApiTypes.BINARY, 410: OpenApiTypes.OBJECT, 413: OpenApiTypes.OBJECT, 429: OpenApiTypes.OBJECT},
 )
 @api_view(['GET'])
 def download_run_datafiles(request, run_pk):
-    """Synchronous ZIP downloads are retired; use async download-jobs API."""
-    return Response(
-        {
-            'detail': 'Synchronous ZIP downloads are gone. Use POST /api/runs/runs/{id}/download-jobs/.',
-            'code': 'sync_zip_gone',
-        },
-        status=410,
+    """Stream a ZIP/tar of (selected/filtered) run datafiles; large selections use download jobs."""
+    from django.http import Http404
+
+    from ostdata.custom_permissions import get_run_for_user_or_404
+
+    gone_detail = 'Synchronous ZIP downloads are gone. Use POST /api/runs/runs/{id}/download-jobs/.'
+    # Checked before the run lookup: the retired route answers 410 for every run
+    gone = _stream_gone_response(gone_detail)
+    if gone is not None:
+        return gone
+    try:
+        run = get_run_for_user_or_404(request.user, run_pk)
+    except Http404:
+        return Response({'detail': 'Not found'}, status=404)
+    return _streamed_zip_response(
+        request, run=run, archive_name=f'run_{run.pk}_datafiles', gone_detail=gone_detail,
     )
 
+download_run_datafiles.cls.throttle_classes = [ScopedRateThrottle]
+download_run_datafiles.cls.throttle_scope = 'jobs'
+download_run_datafiles.cls.renderer_classes = ARCHIVE_RENDERER_CLASSES
+
 
 @extend_schema(
-    summary='Download datafiles bulk (retired sync ZIP)',
+    summary='Download datafiles (across runs) as a streamed ZIP or tar',
     operation_id='runs_datafiles_download_bulk',
-    responses={410: OpenApiTypes.OBJECT},
+    parameters=[
+        OpenApiParameter('ids', str, OpenApiParameter.QUERY, description='Comma-separated DataFile IDs (ids or filters required)'),
+        OpenApiParameter('format', str, OpenApiParameter.QUERY, enum=['zip', 'tar'], description='Archive format (default zip; tar is uncompressed)'),
+    ],
+    responses={200: OpenApiTypes.BINARY, 410: OpenApiTypes.OBJECT, 413: OpenApiTypes.OBJECT, 429: OpenApiTypes.OBJECT},
 )
 @api_view(['GET'])
 def download_datafiles_bulk(request):
-    """Synchronous bulk ZIP downloads are retired; use async download-jobs API."""
-    return Response(
-        {
-            'detail': 'Synchronous ZIP downloads are gone. Use POST /api/runs/datafiles/download-jobs/.',
-            'code': 'sync_zip_gone',
-        },
-        status=410,
+    """Stream a ZIP/tar of selected/filtered datafiles across runs; large selections use download jobs."""
+    return _streamed_zip_response(
+        request,
+        run=None,
+        archive_name='datafiles',
+        gone_detail='Synchronous ZIP downloads are gone. Use POST /api/runs/datafiles/download-jobs/.',
     )
 
+download_datafiles_bulk.cls.throttle_classes = [ScopedRateThrottle]
+download_datafiles_bulk.cls.throttle_scope = 'jobs'
+download_datafiles_bulk.cls.renderer_classes = ARCHIVE_RENDERER_CLASSES
+
 
 #
 # Plotting endpoints moved to .runs
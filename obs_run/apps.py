@@ -85,3 +85,12 @@ class RunConfig(AppConfig):
         # Register signals
         post_delete.connect(handle_datafile_deleted, sender=DataFile)
         m2m_changed.connect(handle_object_datafiles_changed, sender=Object.datafiles.through)
+
+        # Materialized per-run aggregates read by RunSerializer; connected first so
+        # their on-commit refresh runs before the counter bumps
+        from . import run_stats
+        run_stats.connect_signals()
+
+        # Change counters behind the run endpoint ETags
+        from .change_counters import connect_signals
+        connect_signals()
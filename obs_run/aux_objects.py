@@ -13,16 +13,19 @@ from astropy.coordinates.angles import Angle
 from django.conf import settings
 from django.db.models import F, Q
 from django.utils import timezone
+from scipy.spatial import cKDTree
 
 from objects.models import Object
 from obs_run.models import DataFile, ObservationRun
+from obs_run.simbad_cache import lookup_containing_cone
 from obs_run.simbad_rate_limit import wait_for_aux_simbad_query_slot
+from obs_run.simbad_tap import SimbadCone, query_cones_batched
 from obs_run.wcs_utils import build_wcs_from_datafile, filter_table_to_footprint
 from utilities import (
+    _REGION_QUERY_FIELDS,
     _query_region_safe,
     _radius_str_from_arcmin,
     detect_object_type_from_simbad_types,
-    get_effective_exposure_type_filter,
 )
 
 logger = logging.getLogger(__name__)
@@ -54,8 +57,17 @@ def _cluster_min_separation_deg() -> float:
     return arcmin / 60.0
 
 
+def _batch_enabled() -> bool:
+    """Resolve cluster cones with batched multi-cone TAP queries (per-cone fallback)."""
+    return bool(getattr(settings, 'AUX_OBJECTS_SIMBAD_BATCH', True))
+
+
+def _batch_max_cones() -> int:
+    return max(1, int(getattr(settings, 'AUX_OBJECTS_SIMBAD_BATCH_MAX_CONES', 50)))
+
+
 def _light_fits_filter_q(*, require_plate_solved: bool):
-    q = Q(datafile__file_type='FITS') & get_effective_exposure_type_filter('LI', 'datafile__')
+    q = Q(datafile__file_type='FITS') & Q(datafile__exposure_type_effective='LI')
     if require_plate_solved:
         return q & Q(
             datafile__plate_solved=True,
@@ -126,7 +138,7 @@ def _light_fits_queryset(run: ObservationRun):
     return DataFile.objects.filter(
         observation_run=run,
         file_type='FITS',
-    ).filter(get_effective_exposure_type_filter('LI'))
+    ).filter(exposure_type_effective='LI')
 
 
 def get_file_center(data_file: DataFile) -> tuple[float, float]:
@@ -250,10 +262,41 @@ def _pair_cluster_threshold_deg(file_a: DataFile, file_b: DataFile) -> float:
     return _cluster_separation_deg()
 
 
+def _pair_cluster_thresholds_deg(diam_a: np.ndarray, diam_b: np.ndarray) -> np.ndarray:
+    """Vectorized _pair_cluster_threshold_deg over field diameters (NaN = unknown)."""
+    min_sep = _cluster_min_separation_deg()
+    fraction = _cluster_fov_fraction()
+    known_a = np.isfinite(diam_a)
+    known_b = np.isfinite(diam_b)
+    thresholds = np.full(np.broadcast(diam_a, diam_b).shape, _cluster_separation_deg(), dtype=float)
+    both = known_a & known_b
+    one = known_a ^ known_b
+    thresholds[both] = np.maximum(min_sep, fraction * np.fmin(diam_a, diam_b)[both])
+    thresholds[one] = np.maximum(min_sep, fraction * np.fmax(diam_a, diam_b)[one])
+    return thresholds
+
+
+def _unit_vectors(ra_deg: np.ndarray, dec_deg: np.ndarray) -> np.ndarray:
+    ra = np.radians(ra_deg)
+    dec = np.radians(dec_deg)
+    cos_dec = np.cos(dec)
+    return np.column_stack((cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)))
+
+
+def _chord_from_deg(angle_deg: np.ndarray) -> np.ndarray:
+    return 2.0 * np.sin(np.radians(np.clip(angle_deg, 0.0, 180.0)) / 2.0)
+
+
 def cluster_light_fits_by_pointing(files: list[DataFile]) -> list[list[DataFile]]:
     """
     Group LIGHT FITS files into pointing clusters by center coordinate proximity.
     Single-linkage: frames chain into one cluster when each step is within threshold.
+
+    Centers are placed on the unit sphere and neighbours found with a KD-tree
+    (radius = largest threshold a file can have with any partner); candidate
+    pairs are then checked against their exact pair threshold. The tree is
+    rebuilt over the unassigned files once many have been assigned, so dense
+    clusters of thousands of frames stay cheap.
     """
     indexed: list[tuple[DataFile, float, float]] = []
     for data_file in files:
@@ -266,30 +309,59 @@ def cluster_light_fits_by_pointing(files: list[DataFile]) -> list[list[DataFile]
     if not indexed:
         return []
 
-    assigned = [False] * len(indexed)
+    n = len(indexed)
+    xyz = _unit_vectors(
+        np.array([item[1] for item in indexed], dtype=float),
+        np.array([item[2] for item in indexed], dtype=float),
+    )
+    # None (unknown field size) becomes NaN.
+    diameters = np.array([_field_diameter_deg(item[0]) for item in indexed], dtype=float)
+    known = np.isfinite(diameters)
+    # Upper bound of the pair threshold for each file (see _pair_cluster_threshold_deg).
+    bound_deg = np.maximum(_cluster_min_separation_deg(), _cluster_fov_fraction() * diameters)
+    if known.any():
+        unknown_bound = max(_cluster_separation_deg(), float(bound_deg[known].max()))
+    else:
+        unknown_bound = _cluster_separation_deg()
+    bound_deg[~known] = unknown_bound
+    bound_chord = _chord_from_deg(bound_deg)
+
+    assigned = np.zeros(n, dtype=bool)
+    tree = None
+    tree_index = np.empty(0, dtype=np.intp)
+    assigned_since_build = 0
     clusters: list[list[DataFile]] = []
 
-    for i in range(len(indexed)):
-        if assigned[i]:
+    for seed in range(n):
+        if assigned[seed]:
             continue
-        cluster_indices = [i]
-        assigned[i] = True
-        queue = [i]
-        while queue:
-            ci = queue.pop()
-            file_a, ra_a, dec_a = indexed[ci]
-            coord_a = SkyCoord(ra_a * u.deg, dec_a * u.deg, frame='icrs')
-            for j in range(len(indexed)):
-                if assigned[j]:
-                    continue
-                file_b, ra_b, dec_b = indexed[j]
-                coord_b = SkyCoord(ra_b * u.deg, dec_b * u.deg, frame='icrs')
-                separation_deg = float(coord_a.separation(coord_b).degree)
-                if separation_deg <= _pair_cluster_threshold_deg(file_a, file_b):
-                    assigned[j] = True
-                    cluster_indices.append(j)
-                    queue.append(j)
-        clusters.append([indexed[k][0] for k in cluster_indices])
+        assigned[seed] = True
+        assigned_since_build += 1
+        members = [seed]
+        frontier = np.array([seed], dtype=np.intp)
+        while frontier.size:
+            if tree is None or assigned_since_build > max(64, tree_index.size // 4):
+                tree_index = np.flatnonzero(~assigned)
+                if not tree_index.size:
+                    break
+                tree = cKDTree(xyz[tree_index])
+                assigned_since_build = 0
+            hits = tree.query_ball_point(xyz[frontier], r=bound_chord[frontier])
+            lengths = np.fromiter((len(h) for h in hits), dtype=np.intp, count=len(hits))
+            if not lengths.sum():
+                break
+            src = np.repeat(frontier, lengths)
+            dst = tree_index[np.concatenate([np.asarray(h, dtype=np.intp) for h in hits if h])]
+            open_pairs = ~assigned[dst]
+            src, dst = src[open_pairs], dst[open_pairs]
+            chord = np.linalg.norm(xyz[src] - xyz[dst], axis=1)
+            separation_deg = np.degrees(2.0 * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0)))
+            linked = separation_deg <= _pair_cluster_thresholds_deg(diameters[src], diameters[dst])
+            frontier = np.unique(dst[linked])
+            assigned[frontier] = True
+            assigned_since_build += frontier.size
+            members.extend(frontier.tolist())
+        clusters.append([indexed[k][0] for k in sorted(members)])
 
     clusters.sort(key=lambda cluster: get_file_center(cluster[0])[1])
     return clusters
@@ -497,22 +569,13 @@ def normalize_simbad_objects(
     return normalized
 
 
-def compute_aux_objects(run: ObservationRun) -> dict[str, Any]:
-    """
-    Query SIMBAD for objects in the FOV of each pointing cluster in the run.
-    Returns merged objects list and metadata; does not persist to the run.
-    """
-    if not run.photometry:
-        raise ValueError('Auxiliary SIMBAD lookup is only available for photometry runs')
-
+def _plan_cluster_lookups(run: ObservationRun) -> list[dict[str, Any]]:
+    """Pick a representative file and SIMBAD cone for each pointing cluster of a run."""
     clusters = iter_pointing_clusters(run)
     if not clusters:
         raise ValueError('No LIGHT FITS file with coordinates found for this run')
 
-    main_names, main_coords = _main_target_names_and_coords(run)
-    all_objects: list[dict[str, Any]] = []
-    fields_meta: list[dict[str, Any]] = []
-
+    plans: list[dict[str, Any]] = []
     for cluster_id, cluster_files in enumerate(clusters):
         pks = [df.pk for df in cluster_files]
         rep = _pick_representative_from_queryset(
@@ -522,22 +585,105 @@ def compute_aux_objects(run: ObservationRun) -> dict[str, Any]:
             continue
 
         center_ra, center_dec, fov_x, fov_y, radius_deg = get_lookup_center_and_fov(rep)
-        simbad_radius_str = _radius_str_from_arcmin(radius_deg * 60.0)
+        plans.append({
+            'key': (run.pk, cluster_id),
+            'cluster_id': cluster_id,
+            'files': cluster_files,
+            'rep': rep,
+            'center_ra': center_ra,
+            'center_dec': center_dec,
+            'fov_x': fov_x,
+            'fov_y': fov_y,
+            'radius_deg': radius_deg,
+            'simbad_radius': _radius_str_from_arcmin(radius_deg * 60.0),
+        })
+    return plans
+
+
+def _lookup_cluster_tables(plans: list[dict[str, Any]]) -> dict[Any, tuple[Any, Any]]:
+    """
+    Fetch SIMBAD rows for every planned cluster cone.
+
+    Cones inside a larger cached cone are answered from its rows without a
+    network call (the footprint filter is applied afterwards as usual). With
+    AUX_OBJECTS_SIMBAD_BATCH, up to AUX_OBJECTS_SIMBAD_BATCH_MAX_CONES remaining
+    cones share one TAP query; clusters the batch could not answer fall back to
+    one cone search each. Returns plan key -> (table, query id).
+    """
+    row_limit = _row_limit()
+    tables: dict[Any, tuple[Any, Any]] = {}
+    for plan in plans:
+        hit, table = lookup_containing_cone(
+            plan['center_ra'],
+            plan['center_dec'],
+            plan['radius_deg'],
+            row_limit=row_limit,
+            fields=_REGION_QUERY_FIELDS,
+        )
+        if hit:
+            tables[plan['key']] = (table, ('field', plan['key']))
+
+    remaining = [plan for plan in plans if plan['key'] not in tables]
+    if _batch_enabled() and remaining:
+        chunk_size = _batch_max_cones()
+        for start in range(0, len(remaining), chunk_size):
+            chunk = remaining[start:start + chunk_size]
+            cones = [
+                SimbadCone(
+                    key=plan['key'],
+                    ra=plan['center_ra'],
+                    dec=plan['center_dec'],
+                    radius_deg=plan['radius_deg'],
+                    radius_str=plan['simbad_radius'],
+                )
+                for plan in chunk
+            ]
+            answered = query_cones_batched(
+                cones,
+                row_limit=row_limit,
+                before_query=wait_for_aux_simbad_query_slot,
+            )
+            for key, table in answered.items():
+                tables[key] = (table, ('batch', start))
+
+    for plan in remaining:
+        if plan['key'] in tables:
+            continue
         wait_for_aux_simbad_query_slot()
         result_table = _query_region_safe(
-            center_ra,
-            center_dec,
-            simbad_radius_str,
-            row_limit=_row_limit(),
+            plan['center_ra'],
+            plan['center_dec'],
+            plan['simbad_radius'],
+            row_limit=row_limit,
         )
+        tables[plan['key']] = (result_table, ('cone', plan['key']))
+    return tables
+
+
+def _assemble_aux_objects(
+    run: ObservationRun,
+    plans: list[dict[str, Any]],
+    tables: dict[Any, tuple[Any, Any]],
+) -> dict[str, Any]:
+    main_names, main_coords = _main_target_names_and_coords(run)
+    all_objects: list[dict[str, Any]] = []
+    fields_meta: list[dict[str, Any]] = []
+    query_ids = set()
+
+    for plan in plans:
+        rep = plan['rep']
+        cluster_id = plan['cluster_id']
+        result_table, query_id = tables.get(plan['key'], (None, None))
+        if query_id is not None and query_id[0] != 'field':
+            query_ids.add(query_id)
         simbad_raw_count = len(result_table) if result_table is not None else 0
         result_table = filter_table_to_footprint(result_table, rep)
         fov_filtered_count = len(result_table) if result_table is not None else 0
 
         cluster_objects = normalize_simbad_objects(
             result_table,
-            center_ra=center_ra,
-            center_dec=center_dec,
+            center_ra=plan['center_ra'],
+            center_dec=plan['center_dec'],
             main_names=main_names,
             main_coords=main_coords,
             cluster_id=cluster_id,
@@ -550,16 +696,17 @@ def compute_aux_objects(run: ObservationRun) -> dict[str, Any]:
             'cluster_id': cluster_id,
             'source_datafile_id': rep.pk,
             'source_file_name': Path(rep.datafile).name if rep.datafile else '',
-            'center_ra': center_ra,
-            'center_dec': center_dec,
-            'fov_x': fov_x,
-            'fov_y': fov_y,
-            'search_radius_deg': radius_deg,
-            'simbad_radius': simbad_radius_str,
+            'center_ra': plan['center_ra'],
+            'center_dec': plan['center_dec'],
+            'fov_x': plan['fov_x'],
+            'fov_y': plan['fov_y'],
+            'search_radius_deg': plan['radius_deg'],
+            'simbad_radius': plan['simbad_radius'],
+            'simbad_lookup': query_id[0] if query_id else None,
             'simbad_match_count': simbad_raw_count,
             'fov_filtered_count': fov_filtered_count,
             'wcs_footprint_applied': build_wcs_from_datafile(rep) is not None,
-            'light_file_count': len(cluster_files),
+            'light_file_count': len(plan['files']),
         })
 
     objects = _dedupe_aux_objects(all_objects)
@@ -567,7 +714,7 @@ def compute_aux_objects(run: ObservationRun) -> dict[str, Any]:
     meta: dict[str, Any] = {
         'cluster_count': len(fields_meta),
         'fields': fields_meta,
-        'simbad_query_count': len(fields_meta),
+        'simbad_query_count': len(query_ids),
         'object_count': len(objects),
     }
     # Legacy single-field keys for clients that expect one representative file.
@@ -577,6 +724,41 @@ def compute_aux_objects(run: ObservationRun) -> dict[str, Any]:
     return {'objects': objects, 'meta': meta}
 
 
+def compute_aux_objects_many(runs: list[ObservationRun]) -> dict[int, dict[str, Any] | Exception]:
+    """
+    Compute auxiliary objects for several runs, sharing batched SIMBAD queries.
+
+    Returns run pk -> result dict (as compute_aux_objects) or the ValueError
+    explaining why the run cannot be processed.
+    """
+    results: dict[int, dict[str, Any] | Exception] = {}
+    planned: list[tuple[ObservationRun, list[dict[str, Any]]]] = []
+    for run in runs:
+        if not run.photometry:
+            results[run.pk] = ValueError('Auxiliary SIMBAD lookup is only available for photometry runs')
+            continue
+        try:
+            planned.append((run, _plan_cluster_lookups(run)))
+        except ValueError as exc:
+            results[run.pk] = exc
+
+    tables = _lookup_cluster_tables([plan for _, plans in planned for plan in plans])
+    for run, plans in planned:
+        results[run.pk] = _assemble_aux_objects(run, plans, tables)
+    return results
+
+
+def compute_aux_objects(run: ObservationRun) -> dict[str, Any]:
+    """
+    Query SIMBAD for objects in the FOV of each pointing cluster in the run.
+    Returns merged objects list and metadata; does not persist to the run.
+    """
+    result = compute_aux_objects_many([run])[run.pk]
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
 def build_aux_objects_payload(run: ObservationRun) -> dict[str, Any]:
     status = run.aux_objects_status or None
     return {
@@ -0,0 +1,196 @@
+"""Change counters for stable, cheap ETags of the run endpoints.
+
+Signals collect the changed scopes and bump each per-scope counter
+(obs_run.models.ChangeCounter) once, in a short transaction of its own after
+the change has committed. The counter rows are therefore not locked for the
+length of an ingest batch or a web edit, at the price of a window of a few
+milliseconds in which a changed response may still carry the old ETag. The
+list and detail views validate
+conditional GETs with one indexed lookup, not with aggregates over the
+history tables. Their ETags are SHA-1 digests, so every worker derives the
+same tag for the same state (Python's ``hash()`` of a string is randomized
+per process).
+
+Scopes:
+- 'runs': any run or DataFile change (list contents, counts, totals)
+- 'run:<pk>': changes of that run and its DataFiles
+- 'run:*': changes whose run is unknown (reverse many-to-many clears)
+- 'tags', 'objects': tags and objects shown inside run responses
+- 'acl': users, groups and permissions (which runs a user may see)
+
+Queryset ``update()`` and ``bulk_update()`` bypass signals; callers that use
+them on fields shown by the run endpoints must call ``bump_on_commit()``
+themselves.
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.http import parse_etags
+
+logger = logging.getLogger(__name__)
+
+RUNS = 'runs'
+ALL_RUNS = 'run:*'
+TAGS = 'tags'
+OBJECTS = 'objects'
+ACL = 'acl'
+
+# Scopes changed in the current thread's transaction, bumped on commit
+_pending = threading.local()
+
+
+def run_scope(run_id) -> str:
+    return f'run:{run_id}'
+
+
+def bump(*scopes: str) -> None:
+    """Increment the counters of ``scopes`` (created on first use)."""
+    from obs_run.models import ChangeCounter
+
+    names = sorted({s for s in scopes if s})
+    if not names:
+        return
+    now = timezone.now()
+    updated = ChangeCounter.objects.filter(name__in=names).update(value=F('value') + 1, changed_at=now)
+    if updated < len(names):
+        existing = set(ChangeCounter.objects.filter(name__in=names).values_list('name', flat=True))
+        missing = [name for name in names if name not in existing]
+        # A concurrent bump may create the same row; the second insert is skipped
+        ChangeCounter.objects.bulk_create(
+            [ChangeCounter(name=name) for name in missing], ignore_conflicts=True,
+        )
+        ChangeCounter.objects.filter(name__in=missing).update(value=F('value') + 1, changed_at=now)
+
+
+def read(*scopes: str) -> tuple[list[int], datetime | None]:
+    """Counter values in the order of ``scopes`` (0 for unused scopes) and the latest change time."""
+    from obs_run.models import ChangeCounter
+
+    rows = {
+        name: (value, changed_at)
+        for name, value, changed_at in ChangeCounter.objects.filter(name__in=scopes).values_list(
+            'name', 'value', 'changed_at',
+        )
+    }
+    values = [rows.get(scope, (0, None))[0] for scope in scopes]
+    latest = max((changed for _, changed in rows.values() if changed is not None), default=None)
+    return values, latest
+
+
+def weak_etag(*parts) -> str:
+    """Weak ETag from a SHA-1 digest of ``parts``, identical in every process."""
+    digest = hashlib.sha1(':'.join(map(str, parts)).encode('utf-8')).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request, etag: str) -> bool:
+    """If-None-Match comparison (weak, as RFC 9110 requires for this header)."""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    opaque = etag.removeprefix('W/')
+    tags = parse_etags(header)
+    return '*' in tags or any(tag.removeprefix('W/') == opaque for tag in tags)
+
+
+def _bump_pending() -> None:
+    scopes = getattr(_pending, 'scopes', None)
+    if not scopes:
+        return
+    _pending.scopes = set()
+    # A failed counter write must not fail the change itself (only costs a stale 304 window)
+    try:
+        with transaction.atomic():
+            bump(*scopes)
+    except Exception:
+        logger.warning('Could not bump change counters %s', sorted(scopes), exc_info=True)
+
+
+def bump_on_commit(*scopes: str) -> None:
+    """Bump ``scopes`` once the current transaction commits (right away outside one)."""
+    scopes = {s for s in scopes if s}
+    if not scopes:
+        return
+    if getattr(_pending, 'scopes', None) is None:
+        _pending.scopes = set()
+    _pending.scopes.update(scopes)
+    # Only the first callback of a transaction finds scopes left to bump; scopes of a
+    # rolled-back transaction are bumped with the next commit
+    transaction.on_commit(_bump_pending)
+
+
+def _datafile_changed(sender, instance, **kwargs):
+    bump_on_commit(RUNS, run_scope(instance.observation_run_id) if instance.observation_run_id else '')
+
+
+def _run_changed(sender, instance, **kwargs):
+    bump_on_commit(RUNS, run_scope(instance.pk))
+
+
+def _run_m2m_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    from obs_run.models import ObservationRun
+
+    if isinstance(instance, ObservationRun):
+        bump_on_commit(RUNS, run_scope(instance.pk))
+    elif pk_set:
+        bump_on_commit(RUNS, *(run_scope(pk) for pk in pk_set))
+    else:
+        bump_on_commit(RUNS, ALL_RUNS)
+
+
+def _tag_changed(sender, **kwargs):
+    bump_on_commit(TAGS)
+
+
+def _object_changed(sender, **kwargs):
+    action = kwargs.get('action')
+    if action is None or action.startswith('post_'):
+        bump_on_commit(OBJECTS)
+
+
+def _acl_changed(sender, **kwargs):
+    action = kwargs.get('action')
+    if action is not None and not action.startswith('post_'):
+        return
+    # Logins only touch last_login
+    if set(kwargs.get('update_fields') or ()) == {'last_login'}:
+        return
+    bump_on_commit(ACL)
+
+
+def connect_signals() -> None:
+    """Connect the counter handlers (called from RunConfig.ready)."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import Group
+    from django.db.models.signals import m2m_changed, post_delete, post_save
+
+    from objects.models import Object
+    from obs_run.models import DataFile, ObservationRun
+    from tags.models import Tag
+
+    for signal in (post_save, post_delete):
+        signal.connect(_datafile_changed, sender=DataFile, dispatch_uid='change_counters_datafile')
+        signal.connect(_run_changed, sender=ObservationRun, dispatch_uid='change_counters_run')
+        signal.connect(_tag_changed, sender=Tag, dispatch_uid='change_counters_tag')
+        signal.connect(_object_changed, sender=Object, dispatch_uid='change_counters_object')
+        signal.connect(_acl_changed, sender=get_user_model(), dispatch_uid='change_counters_user')
+    for through in (
+        ObservationRun.tags.through,
+        ObservationRun.readonly_users.through,
+        ObservationRun.readwrite_users.through,
+        ObservationRun.managers.through,
+    ):
+        m2m_changed.connect(_run_m2m_changed, sender=through, dispatch_uid=f'change_counters_{through.__name__}')
+    m2m_changed.connect(_object_changed, sender=Object.observation_run.through, dispatch_uid='change_counters_object_runs')
+    User = get_user_model()
+    for through in (User.groups.through, User.user_permissions.through, Group.permissions.through):
+        m2m_changed.connect(_acl_changed, sender=through, dispatch_uid=f'change_counters_{through.__name__}')
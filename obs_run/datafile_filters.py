@@ -3,7 +3,21 @@ Shared DataFile queryset filters for list/download endpoints and Celery ZIP task
 """
 from django.db.models import ExpressionWrapper, F, FloatField, Q
 
-from utilities import annotate_effective_exposure_type
+# Keys understood by apply_datafile_filters (query params of download URLs are limited to these)
+DATAFILE_FILTER_KEYS = (
+    'file_type',
+    'main_target',
+    'exposure_type',
+    'spectroscopy',
+    'exptime_min',
+    'exptime_max',
+    'file_name',
+    'instrument',
+    'obs_date_contains',
+    'plate_solved',
+    'pixel_count_min',
+    'pixel_count_max',
+)
 
 
 def _param_get(params, key, default=None):
@@ -59,8 +73,7 @@ def apply_datafile_filters(qs, params):
 
     exposure_types = _param_getlist(params, 'exposure_type')
     if exposure_types:
-        qs = annotate_effective_exposure_type(qs)
-        qs = qs.filter(annotated_effective_exposure_type__in=exposure_types)
+        qs = qs.filter(exposure_type_effective__in=exposure_types)
 
     spectroscopy = _param_get(params, 'spectroscopy')
     parsed_spec = _parse_bool(spectroscopy)
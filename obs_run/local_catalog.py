@@ -0,0 +1,227 @@
+"""Offline catalog of common targets, consulted before SIMBAD.
+
+The catalog (LocalCatalogObject + normalized LocalCatalogAlias rows) holds
+Messier/NGC/IC objects, bright stars, variables or any other targets an admin
+loads from a CSV file (``python manage.py local_catalog load``). Answers are
+returned as astropy Tables with the same columns as the SIMBAD queries in
+utilities, so callers treat a local hit exactly like a SIMBAD answer.
+
+CSV columns: main_id, ra, dec (degrees), otype, alltypes, ids ('|'-separated,
+as in SIMBAD) and optionally V.
+"""
+from __future__ import annotations
+
+import csv
+import logging
+import math
+import re
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+from astropy.table import MaskedColumn, Table
+from django.conf import settings
+from django.db import transaction
+
+from obs_run.models import LocalCatalogAlias, LocalCatalogObject
+from obs_run.wcs_utils import angular_separation_deg
+
+logger = logging.getLogger(__name__)
+
+CSV_COLUMNS = ('main_id', 'ra', 'dec', 'otype', 'alltypes', 'ids', 'V')
+
+_CATALOG_NUMBER_RE = re.compile(r'^(MESSIER|M|NGC|IC|UGC|PGC|HD|HR|HIP)\s*0*([0-9]+)([A-Z]?)$')
+
+# Identifier prefixes (SIMBAD pads numbers with spaces, e.g. 'M  31', 'NGC   224')
+# fetched by ``local_catalog fetch`` unless other catalogs are given
+DEFAULT_FETCH_CATALOGS = ('M', 'NGC', 'IC')
+
+
+def local_catalog_enabled() -> bool:
+    return bool(getattr(settings, 'LOCAL_CATALOG_ENABLED', True))
+
+
+def local_region_authoritative() -> bool:
+    """Treat a local miss in star verification as final (catalog covers all NGC/M/ACO objects)."""
+    return bool(getattr(settings, 'LOCAL_CATALOG_REGION_AUTHORITATIVE', False))
+
+
+def normalize_catalog_name(name: str) -> str:
+    """
+    Normalize an object name for alias lookups.
+
+    Upper case, single spaces, and catalog numbers without padding:
+    'm31', 'M  31' and 'Messier 031' all become 'M 31'; 'ngc0224' becomes 'NGC 224'.
+    """
+    base = ' '.join(str(name).strip().split()).upper()
+    m = _CATALOG_NUMBER_RE.match(base)
+    if m:
+        prefix = 'M' if m.group(1) == 'MESSIER' else m.group(1)
+        return f'{prefix} {int(m.group(2))}{m.group(3)}'
+    return base
+
+
+def _to_table(entries: list[LocalCatalogObject]) -> Table:
+    return Table({
+        'main_id': np.array([e.main_id for e in entries], dtype=object),
+        'ra': np.array([e.ra for e in entries], dtype=float),
+        'dec': np.array([e.dec for e in entries], dtype=float),
+        'otype': np.array([e.otype for e in entries], dtype=object),
+        'alltypes.otypes': np.array([e.alltypes for e in entries], dtype=object),
+        'ids': np.array([e.ids for e in entries], dtype=object),
+        'V': MaskedColumn(
+            [e.v_mag if e.v_mag is not None else np.nan for e in entries],
+            mask=[e.v_mag is None for e in entries],
+            dtype=float,
+        ),
+    })
+
+
+def resolve_local_name(name: str) -> Table | None:
+    """One-row table for ``name`` (main ID or alias) from the local catalog, or None."""
+    if not local_catalog_enabled() or not name or not str(name).strip():
+        return None
+    try:
+        alias = (
+            LocalCatalogAlias.objects.select_related('catalog_object')
+            .filter(name=normalize_catalog_name(name))
+            .first()
+        )
+    except Exception as exc:
+        logger.debug('Local catalog lookup failed: %s', exc)
+        return None
+    if alias is None:
+        return None
+    return _to_table([alias.catalog_object])
+
+
+def query_local_region(ra: float, dec: float, radius_deg: float) -> Table | None:
+    """Local catalog entries within ``radius_deg`` of (ra, dec), nearest first, or None."""
+    if not local_catalog_enabled():
+        return None
+    try:
+        entries = list(
+            LocalCatalogObject.objects.filter(
+                dec__gte=dec - radius_deg,
+                dec__lte=dec + radius_deg,
+            )
+        )
+    except Exception as exc:
+        logger.debug('Local catalog region lookup failed: %s', exc)
+        return None
+    if not entries:
+        return None
+    sep = angular_separation_deg(ra, dec, [e.ra for e in entries], [e.dec for e in entries])
+    order = [int(i) for i in np.argsort(sep, kind='stable') if sep[i] <= radius_deg]
+    if not order:
+        return None
+    return _to_table([entries[i] for i in order])
+
+
+def _parse_float(value) -> float | None:
+    if value is None:
+        return None
+    text = str(value).strip()
+    if not text or text in ('--', 'nan', 'NaN'):
+        return None
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return None if math.isnan(number) else number
+
+
+def _entry_aliases(main_id: str, ids: str) -> set[str]:
+    names = {normalize_catalog_name(main_id)}
+    for alias in str(ids or '').split('|'):
+        if alias.strip():
+            names.add(normalize_catalog_name(alias))
+    return names
+
+
+def load_local_catalog_rows(rows: Iterable[dict], *, source: str = '', replace: bool = False) -> int:
+    """
+    Insert or update catalog entries from dict rows (CSV_COLUMNS keys).
+
+    With ``replace`` all entries are deleted first. An alias already used by
+    another entry keeps pointing to the first one. Returns the number of entries loaded.
+    """
+    loaded = 0
+    with transaction.atomic():
+        if replace:
+            LocalCatalogObject.objects.all().delete()
+        for row in rows:
+            main_id = ' '.join(str(row.get('main_id') or '').split())
+            ra = _parse_float(row.get('ra'))
+            dec = _parse_float(row.get('dec'))
+            if not main_id or ra is None or dec is None:
+                continue
+            ids = str(row.get('ids') or '')
+            entry, _ = LocalCatalogObject.objects.update_or_create(
+                main_id=main_id,
+                defaults={
+                    'ra': ra,
+                    'dec': dec,
+                    'otype': str(row.get('otype') or '').strip(),
+                    'alltypes': str(row.get('alltypes') or row.get('alltypes.otypes') or '').strip(),
+                    'ids': ids,
+                    'v_mag': _parse_float(row.get('V')),
+                    'source': source,
+                },
+            )
+            LocalCatalogAlias.objects.bulk_create(
+                [LocalCatalogAlias(name=name, catalog_object=entry) for name in _entry_aliases(main_id, ids)],
+                ignore_conflicts=True,
+            )
+            loaded += 1
+    return loaded
+
+
+def load_local_catalog_file(path: str | Path, *, replace: bool = False) -> int:
+    """Load a catalog CSV file (see module docstring); returns the number of entries loaded."""
+    path = Path(path)
+    with open(path, newline='', encoding='utf-8') as handle:
+        return load_local_catalog_rows(csv.DictReader(handle), source=path.name, replace=replace)
+
+
+def build_catalog_fetch_adql(catalogs: Iterable[str]) -> str:
+    """ADQL selecting all SIMBAD objects with an identifier in ``catalogs`` (e.g. 'M', 'NGC')."""
+    criteria = ' OR '.join(f"ident.id LIKE '{c.strip().upper()} %'" for c in catalogs if c.strip())
+    return (
+        'SELECT DISTINCT basic.main_id, basic.ra, basic.dec, basic.otype, '
+        'alltypes.otypes AS "alltypes.otypes", ids.ids, allfluxes.V FROM basic '
+        'JOIN ident ON basic.oid = ident.oidref '
+        'LEFT JOIN alltypes ON basic.oid = alltypes.oidref '
+        'LEFT JOIN ids ON basic.oid = ids.oidref '
+        'LEFT JOIN allfluxes ON basic.oid = allfluxes.oidref '
+        f'WHERE {criteria}'
+    )
+
+
+def _cell(value) -> str:
+    return '' if value is None or np.ma.is_masked(value) else str(value)
+
+
+def write_catalog_csv(table: Table, path: str | Path) -> int:
+    """Write a SIMBAD result table as a catalog CSV (one row per main_id); returns the row count."""
+    seen = set()
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.DictWriter(handle, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        for row in table:
+            main_id = ' '.join(_cell(row['main_id']).split())
+            if not main_id or main_id in seen:
+                continue
+            seen.add(main_id)
+            writer.writerow({
+                'main_id': main_id,
+                'ra': _cell(row['ra']),
+                'dec': _cell(row['dec']),
+                'otype': _cell(row['otype']),
+                'alltypes': _cell(row['alltypes.otypes']),
+                'ids': _cell(row['ids']),
+                'V': _cell(row['V']) if 'V' in table.colnames else '',
+            })
+            written += 1
+    return written
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+
+from obs_run.models import DataFile
+from obs_run.pixel_stats import update_pixel_stats
+
+
+class Command(BaseCommand):
+    help = 'Compute pixel statistics (mean, median, std, background, saturation) for existing FITS DataFiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--run',
+            type=int,
+            action='append',
+            dest='runs',
+            help='Only DataFiles of this ObservationRun id (repeatable)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Recompute files that already have statistics',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Process only N DataFiles (newest first)',
+        )
+
+    def handle(self, *args, **options):
+        qs = DataFile.objects.filter(file_type='FITS').order_by('-pk')
+        if options.get('runs'):
+            qs = qs.filter(observation_run_id__in=options['runs'])
+        if not options['force']:
+            qs = qs.filter(pixel_stats_at__isnull=True)
+        if options.get('limit'):
+            qs = qs[:options['limit']]
+
+        totals = {'files': 0, 'computed': 0, 'skipped': 0, 'failed': 0}
+        for df in qs.only('pk', 'datafile', 'file_type', 'content_hash').iterator():
+            totals['files'] += 1
+            try:
+                stats = update_pixel_stats(df)
+            except Exception as exc:
+                totals['failed'] += 1
+                self.stderr.write(f'DataFile {df.pk}: {exc}')
+                continue
+            totals['computed' if stats else 'skipped'] += 1
+            if totals['files'] % 100 == 0:
+                self.stdout.write(f"{totals['files']} files, {totals['computed']} computed")
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['files']} files: {totals['computed']} computed, "
+            f"{totals['skipped']} skipped, {totals['failed']} failed"
+        ))
@@ -0,0 +1,93 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+
+from obs_run.local_catalog import (
+    DEFAULT_FETCH_CATALOGS,
+    build_catalog_fetch_adql,
+    load_local_catalog_file,
+    normalize_catalog_name,
+    resolve_local_name,
+    write_catalog_csv,
+)
+from obs_run.models import LocalCatalogAlias, LocalCatalogObject
+from obs_run.simbad_rate_limit import acquire_simbad_slot
+from obs_run.simbad_tap import run_tap_query
+
+
+class Command(BaseCommand):
+    help = 'Load, build or inspect the offline catalog consulted before SIMBAD'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action',
+            choices=['load', 'fetch', 'stats', 'lookup'],
+            help=(
+                'load: import a catalog CSV; fetch: build a catalog CSV from SIMBAD TAP; '
+                'stats: show entry counts; lookup: resolve a name offline'
+            ),
+        )
+        parser.add_argument(
+            'name',
+            nargs='?',
+            help='lookup: object name to resolve',
+        )
+        parser.add_argument(
+            '--file',
+            type=str,
+            help='load: CSV file to import; fetch: CSV file to write (default: LOCAL_CATALOG_FILE)',
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='load: delete all entries before importing',
+        )
+        parser.add_argument(
+            '--catalogs',
+            nargs='+',
+            default=list(DEFAULT_FETCH_CATALOGS),
+            help='fetch: identifier prefixes to include (default: M NGC IC)',
+        )
+        parser.add_argument(
+            '--max-rows',
+            type=int,
+            default=50000,
+            help='fetch: maximum number of rows (default: 50000)',
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+        path = Path(options.get('file') or settings.LOCAL_CATALOG_FILE)
+        if action == 'load':
+            if not path.is_file():
+                raise CommandError(f'Catalog file not found: {path}')
+            loaded = load_local_catalog_file(path, replace=options['replace'])
+            self.stdout.write(self.style.SUCCESS(f'Loaded {loaded} catalog entries from {path}'))
+        elif action == 'fetch':
+            adql = build_catalog_fetch_adql(options['catalogs'])
+            acquire_simbad_slot()
+            table = run_tap_query(adql, maxrec=options['max_rows'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            written = write_catalog_csv(table, path)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} entries to {path}'))
+            if len(table) >= options['max_rows']:
+                self.stdout.write(self.style.WARNING('Row limit reached - the catalog may be incomplete'))
+        elif action == 'stats':
+            self.stdout.write(f'Entries: {LocalCatalogObject.objects.count()}')
+            self.stdout.write(f'Aliases: {LocalCatalogAlias.objects.count()}')
+            for row in LocalCatalogObject.objects.values('source').annotate(n=Count('pk')).order_by('source'):
+                self.stdout.write(f'  {row["source"] or "(unknown)"}: {row["n"]}')
+        elif action == 'lookup':
+            if not options.get('name'):
+                raise CommandError('lookup needs an object name')
+            table = resolve_local_name(options['name'])
+            if table is None:
+                self.stdout.write(f'{normalize_catalog_name(options["name"])}: not in the local catalog')
+                return
+            row = table[0]
+            self.stdout.write(
+                f'{row["main_id"]}: ra={row["ra"]:.6f} dec={row["dec"]:.6f} '
+                f'otype={row["otype"]} types={row["alltypes.otypes"]}'
+            )
@@ -14,7 +14,6 @@ from django.db.models import Q
 
 from obs_run.models import DataFile
 from obs_run.plate_solving import PlateSolvingService, solve_and_update_datafile
-from utilities import annotate_effective_exposure_type
 
 logger = logging.getLogger(__name__)
 
@@ -77,8 +76,7 @@ class Command(BaseCommand):
             )
         
         # Annotate with effective_exposure_type and filter for Light frames
-        queryset = annotate_effective_exposure_type(queryset)
-        queryset = queryset.filter(annotated_effective_exposure_type='LI')
+        queryset = queryset.filter(exposure_type_effective='LI')
         
         if limit:
             queryset = queryset[:limit]
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from obs_run.models import DataFile
+from obs_run.thumbnails import PRERENDER_FILE_TYPES, prerender_sizes, prerender_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Pre-render cached thumbnails for existing DataFiles (backfill for the ingest-time pre-rendering)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--run',
+            type=int,
+            action='append',
+            dest='runs',
+            help='Only DataFiles of this ObservationRun id (repeatable)',
+        )
+        parser.add_argument(
+            '--file-type',
+            type=str,
+            choices=PRERENDER_FILE_TYPES,
+            help='Only this file type',
+        )
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            help='Thumbnail widths to render (default: THUMBNAIL_PRERENDER_SIZES)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Process only N DataFiles (newest first)',
+        )
+        parser.add_argument(
+            '--enqueue',
+            action='store_true',
+            help='Queue low-priority Celery tasks instead of rendering in this process',
+        )
+
+    def handle(self, *args, **options):
+        qs = DataFile.objects.filter(file_type__in=PRERENDER_FILE_TYPES).order_by('-pk')
+        if options.get('runs'):
+            qs = qs.filter(observation_run_id__in=options['runs'])
+        if options.get('file_type'):
+            qs = qs.filter(file_type=options['file_type'])
+        if options.get('limit'):
+            qs = qs[:options['limit']]
+
+        if options['enqueue']:
+            if options.get('sizes'):
+                raise CommandError('--sizes cannot be combined with --enqueue (tasks use THUMBNAIL_PRERENDER_SIZES)')
+            from obs_run.tasks import enqueue_thumbnail_prerender
+
+            queued = sum(1 for pk in qs.values_list('pk', flat=True).iterator() if enqueue_thumbnail_prerender(pk))
+            self.stdout.write(self.style.SUCCESS(f'Queued {queued} DataFiles'))
+            return
+
+        sizes = options.get('sizes') or prerender_sizes()
+        totals = {'files': 0, 'rendered': 0, 'cached': 0, 'skipped': 0, 'failed': 0}
+        for df in qs.only('pk', 'datafile', 'file_type', 'content_hash').iterator():
+            totals['files'] += 1
+            try:
+                result = prerender_thumbnails(df, sizes)
+            except Exception as exc:
+                totals['failed'] += 1
+                self.stderr.write(f'DataFile {df.pk}: {exc}')
+                continue
+            totals['rendered'] += result['rendered']
+            totals['cached'] += result['cached']
+            if result['skipped']:
+                totals['skipped'] += 1
+            if totals['files'] % 100 == 0:
+                self.stdout.write(f"{totals['files']} files, {totals['rendered']} thumbnails rendered")
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['files']} files (sizes {', '.join(map(str, sizes))}): {totals['rendered']} rendered, "
+            f"{totals['cached']} already cached, {totals['skipped']} skipped, {totals['failed']} failed"
+        ))
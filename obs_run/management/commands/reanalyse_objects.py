@@ -0,0 +1,160 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from objects.models import Object
+from obs_run.simbad_pipeline import PipelineCheckpoint, run_simbad_pipeline
+from utilities import fetch_reanalyse_tables, reanalyse_object_from_simbad
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-analyse objects from SIMBAD coordinate queries (name, type, identifiers, star verification), '
+        'with several queries in flight and checkpoint/resume'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--object-type',
+            type=str,
+            help='Only objects of this type (e.g. ST, GA, UK)',
+        )
+        parser.add_argument(
+            '--name-filter',
+            type=str,
+            help='Filter objects by name pattern',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Process only N objects (for testing)',
+        )
+        parser.add_argument(
+            '--radius',
+            type=float,
+            default=10.0,
+            help='Search radius in arcmin (default: 10.0)',
+        )
+        parser.add_argument(
+            '--bypass-override-flags',
+            action='store_true',
+            help='Apply updates even to fields protected by override flags',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be changed without making changes',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Concurrent SIMBAD queries (default: SIMBAD_PIPELINE_WORKERS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Objects per transaction / checkpoint (default: SIMBAD_PIPELINE_BATCH_SIZE)',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue an interrupted pass after its last checkpoint',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        radius = options['radius']
+        bypass = options['bypass_override_flags']
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be saved'))
+
+        stats = {'processed': 0, 'updated': 0, 'failed': 0}
+
+        queryset = Object.objects.order_by('pk')
+        if options.get('object_type'):
+            queryset = queryset.filter(object_type=options['object_type'])
+        if options.get('name_filter'):
+            queryset = queryset.filter(name__icontains=options['name_filter'])
+
+        checkpoint = None if dry_run else PipelineCheckpoint('reanalyse_objects')
+        pass_options = {
+            'object_type': options.get('object_type'),
+            'name_filter': options.get('name_filter'),
+            'radius': radius,
+            'bypass_override_flags': bypass,
+        }
+        if options.get('resume'):
+            if checkpoint is None:
+                raise CommandError('--resume cannot be combined with --dry-run')
+            state = checkpoint.load()
+            if state is None:
+                self.stdout.write(self.style.WARNING('No checkpoint found - starting from the beginning'))
+            else:
+                if state.get('options') != pass_options:
+                    raise CommandError(
+                        f'Checkpoint {checkpoint.path} was written with different options: {state.get("options")}'
+                    )
+                queryset = queryset.filter(pk__gt=state['last_pk'])
+                stats.update(state.get('stats', {}))
+                self.stdout.write(f'Resuming after object #{state["last_pk"]}')
+
+        if options.get('limit'):
+            queryset = queryset[:options['limit']]
+
+        total_count = queryset.count()
+        self.stdout.write(f'Found {total_count} object(s) to process')
+        if total_count == 0:
+            return
+
+        def fetch(obj):
+            if obj.ra in (-1, None, 0) or obj.dec in (-1, None, 0):
+                return None
+            return fetch_reanalyse_tables(obj.ra, obj.dec, obj.object_type, fixed_radius_arcmin=radius)
+
+        def apply(obj, tables):
+            stats['processed'] += 1
+            if isinstance(tables, Exception):
+                result = {'success': False, 'error': str(tables)}
+            else:
+                result = reanalyse_object_from_simbad(
+                    obj,
+                    fixed_radius_arcmin=radius,
+                    dry_run=dry_run,
+                    bypass_override_flags=bypass,
+                    simbad_tables=tables,
+                )
+            if not result.get('success'):
+                stats['failed'] += 1
+                self.stdout.write(self.style.WARNING(f'#{obj.pk} {obj.name}: {result.get("error")}'))
+                return
+            changed = result.get('updated_fields') or result.get('star_verification_updated')
+            if changed:
+                stats['updated'] += 1
+                fields = ', '.join(result.get('updated_fields') or ['star verification'])
+                self.stdout.write(self.style.SUCCESS(f'#{obj.pk} {obj.name}: updated {fields}'))
+            else:
+                self.stdout.write(f'#{obj.pk} {obj.name}: no updates needed')
+
+        def on_batch_committed(obj, _pipeline_stats):
+            if checkpoint is not None:
+                checkpoint.save({'last_pk': obj.pk, 'options': pass_options, 'stats': stats})
+
+        run_simbad_pipeline(
+            queryset.iterator(),
+            fetch,
+            apply,
+            workers=options.get('workers'),
+            batch_size=options.get('batch_size'),
+            on_batch_committed=on_batch_committed,
+        )
+        if checkpoint is not None:
+            checkpoint.clear()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Processed: {stats["processed"]}, updated: {stats["updated"]}, failed: {stats["failed"]}'
+            )
+        )
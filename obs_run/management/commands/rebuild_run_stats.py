@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from obs_run.run_stats import rebuild_run_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized per-run statistics (RunStats) from the DataFiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--run',
+            type=int,
+            action='append',
+            dest='runs',
+            help='Only this ObservationRun id (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_run_stats(options.get('runs'))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics of {count} runs'))
@@ -0,0 +1,143 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from objects.models import Object
+from obs_run.models import SimbadQueryCache
+from obs_run.simbad_cache import get_cache_stats, purge_cache, reset_cache_stats
+from obs_run.simbad_rate_limit import get_rate_limit_stats, reset_rate_limit_stats
+from utilities import _query_object_variants, _query_region_safe, _radius_str_from_arcmin
+
+
+class Command(BaseCommand):
+    help = 'Inspect, warm or purge the shared SIMBAD response cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action',
+            choices=['stats', 'purge', 'warm'],
+            help='stats: show counters and entry counts; purge: delete entries; warm: pre-fill the cache',
+        )
+        parser.add_argument(
+            '--kind',
+            choices=[SimbadQueryCache.KIND_OBJECT, SimbadQueryCache.KIND_REGION],
+            help='purge: restrict to object-name or cone-search entries',
+        )
+        parser.add_argument(
+            '--expired',
+            action='store_true',
+            help='purge: delete only expired entries',
+        )
+        parser.add_argument(
+            '--negative',
+            action='store_true',
+            help='purge: delete only negative (not found) entries',
+        )
+        parser.add_argument(
+            '--reset-stats',
+            action='store_true',
+            help='stats/purge: reset hit/miss counters and rate-limit metrics',
+        )
+        parser.add_argument(
+            '--names-file',
+            type=str,
+            help='warm: file with one object name per line (default: names of resolved main Objects)',
+        )
+        parser.add_argument(
+            '--regions',
+            action='store_true',
+            help='warm: also run cone searches around Objects with coordinates',
+        )
+        parser.add_argument(
+            '--radius-arcmin',
+            type=float,
+            default=5.0,
+            help='warm: cone radius in arcmin for --regions (default: 5.0)',
+        )
+        parser.add_argument(
+            '--row-limit',
+            type=int,
+            default=10,
+            help='warm: row limit for --regions (default: 10)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='warm: process only N names / objects',
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+        if action == 'stats':
+            self._stats()
+            if options['reset_stats']:
+                reset_cache_stats()
+                reset_rate_limit_stats()
+                self.stdout.write('Counters reset.')
+        elif action == 'purge':
+            deleted = purge_cache(
+                kind=options.get('kind'),
+                expired_only=options['expired'],
+                negative_only=options['negative'],
+            )
+            if options['reset_stats']:
+                reset_cache_stats()
+                reset_rate_limit_stats()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} cache entries'))
+        else:
+            self._warm(options)
+
+    def _stats(self):
+        stats = get_cache_stats()
+        qs = SimbadQueryCache.objects.all()
+        self.stdout.write(f"Entries: {qs.count()} (negative: {qs.filter(is_negative=True).count()})")
+        for kind, label in SimbadQueryCache.KIND_CHOICES:
+            self.stdout.write(f"  {label}: {qs.filter(kind=kind).count()}")
+        self.stdout.write(f"Counters ({stats['source']}):")
+        for name in ('hits', 'negative_hits', 'field_hits', 'misses', 'stores', 'negative_stores', 'lookups'):
+            self.stdout.write(f"  {name}: {stats[name]}")
+        self.stdout.write(f"  hit_rate: {stats['hit_rate'] * 100:.1f}%")
+        for bucket, limit in get_rate_limit_stats().items():
+            self.stdout.write(
+                f"Rate limit '{bucket}' ({limit['source']}): {limit['rate_per_second']:.3g}/s, "
+                f"burst {limit['burst']:g}; acquired {limit['acquired']}, waited {limit['waited']}, "
+                f"avg wait {limit['wait_seconds_avg']:.3f}s, max wait {limit['wait_seconds_max']:.3f}s"
+            )
+
+    def _warm(self, options):
+        limit = options.get('limit')
+        names_file = options.get('names_file')
+        if names_file:
+            path = Path(names_file)
+            if not path.is_file():
+                raise CommandError(f'Names file not found: {names_file}')
+            names = [line.strip() for line in path.read_text().splitlines()]
+            names = [n for n in names if n and not n.startswith('#')]
+        else:
+            names = list(
+                Object.objects.filter(is_main=True, simbad_resolved=True)
+                .order_by('name')
+                .values_list('name', flat=True)
+                .distinct()
+            )
+        if limit:
+            names = names[:limit]
+
+        found = 0
+        for i, name in enumerate(names, start=1):
+            if _query_object_variants(name) is not None:
+                found += 1
+            if i % 50 == 0:
+                self.stdout.write(f'  {i}/{len(names)} names processed')
+        self.stdout.write(self.style.SUCCESS(f'Warmed {len(names)} object names ({found} resolved)'))
+
+        if options['regions']:
+            radius_str = _radius_str_from_arcmin(options['radius_arcmin'])
+            objects = Object.objects.exclude(ra=-1).exclude(dec=-1).order_by('pk').only('ra', 'dec')
+            if limit:
+                objects = objects[:limit]
+            count = 0
+            for obj in objects:
+                _query_region_safe(obj.ra, obj.dec, radius_str, row_limit=options['row_limit'])
+                count += 1
+            self.stdout.write(self.style.SUCCESS(f'Warmed {count} cone searches ({radius_str})'))
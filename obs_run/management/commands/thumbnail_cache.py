@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+
+from obs_run.thumbnail_cache import (
+    cache_dir,
+    cache_usage,
+    get_cache_stats,
+    max_cache_bytes,
+    prune_cache,
+    purge_cache,
+    reset_cache_stats,
+)
+
+
+class Command(BaseCommand):
+    help = 'Inspect, prune or purge the on-disk thumbnail cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'action',
+            choices=['stats', 'prune', 'purge'],
+            help='stats: show counters and disk usage; prune: evict LRU entries above the size cap; purge: delete entries',
+        )
+        parser.add_argument(
+            '--max-bytes',
+            type=int,
+            help='prune: size cap to prune to (default: THUMBNAIL_CACHE_MAX_BYTES)',
+        )
+        parser.add_argument(
+            '--datafile',
+            type=int,
+            help='purge: delete only the entries of this DataFile id',
+        )
+        parser.add_argument(
+            '--reset-stats',
+            action='store_true',
+            help='stats/purge: reset hit/miss counters',
+        )
+
+    def handle(self, *args, **options):
+        action = options['action']
+        if action == 'stats':
+            self._stats()
+            if options['reset_stats']:
+                reset_cache_stats()
+                self.stdout.write('Counters reset.')
+        elif action == 'prune':
+            deleted, freed = prune_cache(options.get('max_bytes'))
+            self.stdout.write(self.style.SUCCESS(f'Evicted {deleted} entries ({freed} bytes)'))
+        else:
+            deleted = purge_cache(options.get('datafile'))
+            if options['reset_stats']:
+                reset_cache_stats()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} cache entries'))
+
+    def _stats(self):
+        entries, size = cache_usage()
+        self.stdout.write(f'Directory: {cache_dir()}')
+        self.stdout.write(f'Entries: {entries} ({size} bytes of {max_cache_bytes()} max)')
+        stats = get_cache_stats()
+        self.stdout.write(f"Counters ({stats['source']}):")
+        for name in ('hits', 'misses', 'stale', 'stores', 'evictions', 'lookups'):
+            self.stdout.write(f'  {name}: {stats[name]}')
+        self.stdout.write(f"  hit_rate: {stats['hit_rate'] * 100:.1f}%")
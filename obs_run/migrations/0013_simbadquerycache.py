@@ -0,0 +1,32 @@
+# Generated by Django 6.0.8 on 2026-10-18 23:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obs_run', '0012_expire_anonymous_download_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimbadQueryCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('kind', models.CharField(choices=[('object', 'Object name'), ('region', 'Cone search')], max_length=16)),
+                ('query', models.JSONField(blank=True, default=dict)),
+                ('is_negative', models.BooleanField(default=False)),
+                ('payload', models.TextField(blank=True, default='')),
+                ('row_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField()),
+                ('expires_at', models.DateTimeField()),
+                ('hit_count', models.IntegerField(default=0)),
+                ('last_hit_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='simbad_cache_expires_idx'), models.Index(fields=['kind', 'is_negative'], name='simbad_cache_kind_neg_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 6.0.8 on 2026-10-18 23:49
+
+from astropy.coordinates import Angle
+from django.db import migrations, models
+
+
+def fill_cone_geometry(apps, schema_editor):
+    SimbadQueryCache = apps.get_model('obs_run', 'SimbadQueryCache')
+    for entry in SimbadQueryCache.objects.filter(kind='region').iterator():
+        query = entry.query or {}
+        try:
+            entry.cone_ra = float(query['ra'])
+            entry.cone_dec = float(query['dec'])
+            entry.cone_radius_deg = float(Angle(query['radius']).deg)
+        except Exception:
+            continue
+        entry.save(update_fields=['cone_ra', 'cone_dec', 'cone_radius_deg'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obs_run', '0013_simbadquerycache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='simbadquerycache',
+            name='cone_dec',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='simbadquerycache',
+            name='cone_ra',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='simbadquerycache',
+            name='cone_radius_deg',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='simbadquerycache',
+            index=models.Index(fields=['kind', 'cone_dec'], name='simbad_cache_cone_dec_idx'),
+        ),
+        migrations.RunPython(fill_cone_geometry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.8 on 2026-10-19 00:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obs_run', '0014_simbadquerycache_cone_geometry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocalCatalogObject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('main_id', models.CharField(max_length=128, unique=True)),
+                ('ra', models.FloatField()),
+                ('dec', models.FloatField()),
+                ('otype', models.CharField(blank=True, default='', max_length=32)),
+                ('alltypes', models.CharField(blank=True, default='', max_length=512)),
+                ('ids', models.TextField(blank=True, default='')),
+                ('v_mag', models.FloatField(blank=True, null=True)),
+                ('source', models.CharField(blank=True, default='', max_length=128)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dec'], name='local_catalog_dec_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LocalCatalogAlias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128, unique=True)),
+                ('catalog_object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='obs_run.localcatalogobject')),
+            ],
+        ),
+    ]
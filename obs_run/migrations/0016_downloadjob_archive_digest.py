@@ -0,0 +1,24 @@
+# Generated by Django 6.0.8 on 2026-10-19 00:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obs_run', '0015_localcatalog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='downloadjob',
+            name='archive_digest',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='downloadjob',
+            index=models.Index(fields=['archive_digest', 'status'], name='dljob_archive_digest_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.8 on 2026-10-19 00:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obs_run', '0016_downloadjob_archive_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='downloadjob',
+            name='archive_format',
+            field=models.CharField(choices=[('zip', 'ZIP'), ('tar', 'TAR (uncompressed)')], default='zip', max_length=8),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 6.0.8 on 2026-10-19 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obs_run', '0017_downloadjob_archive_format'),
+        ('tags', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datafile',
+            name='pixel_background',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='pixel_mean',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='pixel_median',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='pixel_stats_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='pixel_std',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='datafile',
+            name='saturated_fraction',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicaldatafile',
+            name='pixel_background',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicaldatafile',
+            name='pixel_mean',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicaldatafile',
+            name='pixel_median',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicaldatafile',
+            name='pixel_stats_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicaldatafile',
+            name='pixel_std',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='historicaldatafile',
+            name='saturated_fraction',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='datafile',
+            index=models.Index(fields=['pixel_mean'], name='df_pix_mean_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='datafile',
+            index=models.Index(fields=['pixel_median'], name='df_pix_median_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='datafile',
+            index=models.Index(fields=['pixel_std'], name='df_pix_std_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='datafile',
+            index=models.Index(fields=['pixel_background'], name='df_pix_background_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='datafile',
+            index=models.Index(fields=['saturated_fraction'], name='df_saturated_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 6.0.8 on 2026-10-19 01:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+
+def _effective_type(code):
+    # utilities.get_effective_exposure_type_filter as of this migration
+    user_unset = Q(exposure_type_user__isnull=True) | Q(exposure_type_user='')
+    ml_set = Q(exposure_type_ml__isnull=False) & ~Q(exposure_type_ml='')
+    return (
+        (Q(exposure_type_user=code) & ~user_unset)
+        | (Q(exposure_type_ml=code) & ml_set & Q(exposure_type_ml=F('exposure_type')))
+        | (Q(exposure_type=code) & user_unset & (~ml_set | Q(exposure_type_ml=F('exposure_type'))))
+    )
+
+
+def fill_run_stats(apps, schema_editor):
+    ObservationRun = apps.get_model('obs_run', 'ObservationRun')
+    DataFile = apps.get_model('obs_run', 'DataFile')
+    RunStats = apps.get_model('obs_run', 'RunStats')
+    light = _effective_type('LI')
+    exposed = Q(exptime__gt=0)
+    valid_hjd = Q(hjd__gt=2451545)
+    for run_id in ObservationRun.objects.values_list('pk', flat=True).iterator():
+        files = DataFile.objects.filter(observation_run_id=run_id)
+        values = files.aggregate(
+            n_datafiles=Count('pk'),
+            n_fits=Count('pk', filter=Q(file_type='FITS')),
+            n_img=Count('pk', filter=Q(file_type__in=('JPG', 'CR2', 'TIFF'))),
+            n_ser=Count('pk', filter=Q(file_type='SER')),
+            n_light=Count('pk', filter=light),
+            n_flat=Count('pk', filter=_effective_type('FL')),
+            n_dark=Count('pk', filter=_effective_type('DA')),
+            expo_time=Sum('exptime', filter=exposed),
+            light_expo_time=Sum('exptime', filter=exposed & light),
+            start_hjd=Min('hjd', filter=valid_hjd),
+            end_hjd=Max('hjd', filter=valid_hjd),
+        )
+        values['expo_time'] = values['expo_time'] or 0.0
+        values['light_expo_time'] = values['light_expo_time'] or 0.0
+        timed = files.filter(valid_hjd)
+        values['start_obs_date'] = timed.order_by('hjd').values_list('obs_date', flat=True).first() or ''
+        values['end_obs_date'] = timed.order_by('-hjd').values_list('obs_date', flat=True).first() or ''
+        RunStats.objects.update_or_create(run_id=run_id, defaults=values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obs_run', '0019_changecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RunStats',
+            fields=[
+                ('run', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='obs_run.observationrun')),
+                ('n_datafiles', models.PositiveIntegerField(default=0)),
+                ('n_fits', models.PositiveIntegerField(default=0)),
+                ('n_img', models.PositiveIntegerField(default=0)),
+                ('n_ser', models.PositiveIntegerField(default=0)),
+                ('n_light', models.PositiveIntegerField(default=0)),
+                ('n_flat', models.PositiveIntegerField(default=0)),
+                ('n_dark', models.PositiveIntegerField(default=0)),
+                ('expo_time', models.FloatField(default=0)),
+                ('light_expo_time', models.FloatField(default=0)),
+                ('start_hjd', models.FloatField(blank=True, null=True)),
+                ('end_hjd', models.FloatField(blank=True, null=True)),
+                ('start_obs_date', models.CharField(blank=True, default='', max_length=50)),
+                ('end_obs_date', models.CharField(blank=True, default='', max_length=50)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_run_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.8 on 2026-10-19 01:58
+
+import django.db.models.functions.text
+import django.db.models.lookups
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('obs_run', '0020_runstats'),
+        ('tags', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='datafile',
+            name='exposure_type_effective',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(django.db.models.lookups.GreaterThan(django.db.models.functions.text.Length(django.db.models.functions.text.Trim('exposure_type_user')), 0), then=models.F('exposure_type_user')), models.When(models.Q(django.db.models.lookups.GreaterThan(django.db.models.functions.text.Length(django.db.models.functions.text.Trim('exposure_type_ml')), 0), ('exposure_type_ml', models.F('exposure_type'))), then=models.F('exposure_type_ml')), models.When(django.db.models.lookups.GreaterThan(django.db.models.functions.text.Length(django.db.models.functions.text.Trim('exposure_type_ml')), 0), then=models.Value('UK')), default=models.F('exposure_type')), output_field=models.CharField(choices=[('BI', 'Bias'), ('DA', 'Dark'), ('FL', 'Flat'), ('LI', 'Light'), ('WA', 'Wave'), ('UK', 'Unknown')], max_length=2)),
+        ),
+        migrations.AddField(
+            model_name='historicaldatafile',
+            name='exposure_type_effective',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(django.db.models.lookups.GreaterThan(django.db.models.functions.text.Length(django.db.models.functions.text.Trim('exposure_type_user')), 0), then=models.F('exposure_type_user')), models.When(models.Q(django.db.models.lookups.GreaterThan(django.db.models.functions.text.Length(django.db.models.functions.text.Trim('exposure_type_ml')), 0), ('exposure_type_ml', models.F('exposure_type'))), then=models.F('exposure_type_ml')), models.When(django.db.models.lookups.GreaterThan(django.db.models.functions.text.Length(django.db.models.functions.text.Trim('exposure_type_ml')), 0), then=models.Value('UK')), default=models.F('exposure_type')), output_field=models.CharField(choices=[('BI', 'Bias'), ('DA', 'Dark'), ('FL', 'Flat'), ('LI', 'Light'), ('WA', 'Wave'), ('UK', 'Unknown')], max_length=2)),
+        ),
+        migrations.AddIndex(
+            model_name='datafile',
+            index=models.Index(fields=['exposure_type_effective'], name='df_expo_type_eff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='datafile',
+            index=models.Index(fields=['observation_run', 'exposure_type_effective'], name='df_run_expo_type_eff_idx'),
+        ),
+    ]
@@ -6,6 +6,9 @@ from astropy.coordinates.angles import Angle
 from astropy.io import fits
 from django.conf import settings
 from django.db import models
+from django.db.models import F, Q
+from django.db.models.functions import Length, Trim
+from django.db.models.lookups import GreaterThan
 from simple_history.models import HistoricalRecords
 
 # from users.models import get_sentinel_user
@@ -133,6 +136,11 @@ class ObservationRun(models.Model):
         ]
 
 
+def _is_set(field_name):
+    # Not NULL and not blank, like the truthiness and strip() checks in DataFile.effective_exposure_type
+    return GreaterThan(Length(Trim(field_name)), 0)
+
+
 class DataFile(models.Model):
     """
     Super class for any file that contains data.
@@ -211,6 +219,23 @@ class DataFile(models.Model):
         help_text='Override flag to prevent automatic updates to user-set exposure type',
     )
 
+    #   Effective exposure type, stored and indexed (see effective_exposure_type
+    #   for the priority logic); computed by the database, so saves, bulk and
+    #   queryset updates all keep it in sync
+    exposure_type_effective = models.GeneratedField(
+        expression=models.Case(
+            models.When(_is_set('exposure_type_user'), then=F('exposure_type_user')),
+            models.When(
+                Q(_is_set('exposure_type_ml')) & Q(exposure_type_ml=F('exposure_type')),
+                then=F('exposure_type_ml'),
+            ),
+            models.When(_is_set('exposure_type_ml'), then=models.Value(UNKNOWN)),
+            default=F('exposure_type'),
+        ),
+        output_field=models.CharField(max_length=2, choices=EXPOSURE_TYPE_POSSIBILITIES),
+        db_persist=True,
+    )
+
     #   Spectroscopy?
     spectroscopy = models.BooleanField(default=False)
     spectrograph_possibilities = (
@@ -275,6 +300,16 @@ class DataFile(models.Model):
     #   Wind direction in deg
     wind_direction = models.FloatField(default=-1)
 
+    #   Pixel statistics of the decimated image (FITS, computed at ingest; see obs_run.pixel_stats)
+    pixel_mean = models.FloatField(null=True, blank=True)
+    pixel_median = models.FloatField(null=True, blank=True)
+    pixel_std = models.FloatField(null=True, blank=True)
+    #   Sky/background level (mode estimate of the sigma-clipped pixels)
+    pixel_background = models.FloatField(null=True, blank=True)
+    #   Fraction (0-1) of pixels at or above the saturation level
+    saturated_fraction = models.FloatField(null=True, blank=True)
+    pixel_stats_at = models.DateTimeField(null=True, blank=True)
+
     #   Tags
     # tags = models.ManyToManyField(Tag, related_name='datafile', blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
@@ -462,6 +497,8 @@ class DataFile(models.Model):
             models.Index(fields=['exposure_type'], name='df_expo_type_idx'),
             models.Index(fields=['exposure_type_ml'], name='df_expo_type_ml_idx'),
             models.Index(fields=['exposure_type_user'], name='df_expo_type_user_idx'),
+            models.Index(fields=['exposure_type_effective'], name='df_expo_type_eff_idx'),
+            models.Index(fields=['observation_run', 'exposure_type_effective'], name='df_run_expo_type_eff_idx'),
             models.Index(fields=['exptime'], name='df_exptime_idx'),
             models.Index(fields=['hjd'], name='df_hjd_idx'),
             models.Index(fields=['instrument'], name='df_instrument_idx'),
@@ -471,11 +508,54 @@ class DataFile(models.Model):
             models.Index(fields=['gain'], name='df_gain_idx'),
             models.Index(fields=['egain'], name='df_egain_idx'),
             models.Index(fields=['binning_x', 'binning_y'], name='df_binning_idx'),
+            models.Index(fields=['pixel_mean'], name='df_pix_mean_idx'),
+            models.Index(fields=['pixel_median'], name='df_pix_median_idx'),
+            models.Index(fields=['pixel_std'], name='df_pix_std_idx'),
+            models.Index(fields=['pixel_background'], name='df_pix_background_idx'),
+            models.Index(fields=['saturated_fraction'], name='df_saturated_idx'),
         ]
 
 
+class RunStats(models.Model):
+    """DataFile aggregates of an ObservationRun as shown in run lists.
+
+    Maintained by DataFile signals (see obs_run.run_stats), so listing runs
+    does not join and group their DataFiles.
+    """
+    run = models.OneToOneField(
+        ObservationRun,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    n_datafiles = models.PositiveIntegerField(default=0)
+    n_fits = models.PositiveIntegerField(default=0)
+    #   JPG, CR2 and TIFF files
+    n_img = models.PositiveIntegerField(default=0)
+    n_ser = models.PositiveIntegerField(default=0)
+    #   Effective exposure type counts
+    n_light = models.PositiveIntegerField(default=0)
+    n_flat = models.PositiveIntegerField(default=0)
+    n_dark = models.PositiveIntegerField(default=0)
+    #   Total exposure time in s (all files / Light frames)
+    expo_time = models.FloatField(default=0)
+    light_expo_time = models.FloatField(default=0)
+    #   First and last file with a valid HJD
+    start_hjd = models.FloatField(null=True, blank=True)
+    end_hjd = models.FloatField(null=True, blank=True)
+    start_obs_date = models.CharField(max_length=50, blank=True, default='')
+    end_obs_date = models.CharField(max_length=50, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    if TYPE_CHECKING:
+        run_id: int
+
+    def __str__(self):
+        return f"RunStats #{self.run_id}"
+
+
 class DownloadJob(models.Model):
-    """Background job to prepare ZIP archives of data files.
+    """Background job to prepare ZIP (or uncompressed tar) archives of data files.
     Stores minimal state for polling and retrieval.
     """
     STATUS_CHOICES = (
@@ -486,6 +566,10 @@ class DownloadJob(models.Model):
         ('cancelled', 'Cancelled'),
         ('expired', 'Expired'),
     )
+    ARCHIVE_FORMAT_CHOICES = (
+        ('zip', 'ZIP'),
+        ('tar', 'TAR (uncompressed)'),
+    )
 
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -515,6 +599,10 @@ class DownloadJob(models.Model):
     expires_at = models.DateTimeField(null=True, blank=True)
     # SHA-256 hex digest of one-time access token for anonymous jobs (plaintext never stored)
     access_token_hash = models.CharField(max_length=64, blank=True, default='')
+    # Digest of the archived (DataFile pk, content_hash) list and compression policy;
+    # done jobs with the same digest share one ZIP file (see services.archive_cache)
+    archive_digest = models.CharField(max_length=64, blank=True, default='')
+    archive_format = models.CharField(max_length=8, choices=ARCHIVE_FORMAT_CHOICES, default='zip')
 
     if TYPE_CHECKING:
         # FK pk accessors (django-stubs mypy plugin; basedpyright needs these declared)
@@ -526,7 +614,103 @@ class DownloadJob(models.Model):
             models.Index(fields=['status', 'created_at'], name='dljob_status_created_idx'),
             models.Index(fields=['user', 'status'], name='dljob_user_status_idx'),
             models.Index(fields=['access_token_hash'], name='dljob_token_hash_idx'),
+            models.Index(fields=['archive_digest', 'status'], name='dljob_archive_digest_idx'),
         ]
 
     def __str__(self):
         return f"DownloadJob #{self.pk} ({self.status})"
+
+
+class SimbadQueryCache(models.Model):
+    """Persistent SIMBAD response cache shared by web, Celery and watchdog processes.
+
+    One row per normalized query (object name or cone). Negative entries record
+    that SIMBAD returned no rows and expire sooner than positive ones.
+    """
+    KIND_OBJECT = 'object'
+    KIND_REGION = 'region'
+    KIND_CHOICES = (
+        (KIND_OBJECT, 'Object name'),
+        (KIND_REGION, 'Cone search'),
+    )
+
+    # SHA-256 hex digest of the normalized query parameters
+    key = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES)
+    query = models.JSONField(default=dict, blank=True)
+    is_negative = models.BooleanField(default=False)
+    # ECSV-serialized astropy Table (empty for negative entries)
+    payload = models.TextField(blank=True, default='')
+    row_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField()
+    expires_at = models.DateTimeField()
+    hit_count = models.IntegerField(default=0)
+    last_hit_at = models.DateTimeField(null=True, blank=True)
+    # Cone geometry (deg) of region entries, so contained cones can be answered locally
+    cone_ra = models.FloatField(null=True, blank=True)
+    cone_dec = models.FloatField(null=True, blank=True)
+    cone_radius_deg = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='simbad_cache_expires_idx'),
+            models.Index(fields=['kind', 'is_negative'], name='simbad_cache_kind_neg_idx'),
+            models.Index(fields=['kind', 'cone_dec'], name='simbad_cache_cone_dec_idx'),
+        ]
+
+    def __str__(self):
+        return f"SimbadQueryCache {self.kind} {self.key[:12]}"
+
+
+class LocalCatalogObject(models.Model):
+    """Offline catalog entry (Messier/NGC/IC objects, bright stars, variables).
+
+    Consulted before SIMBAD for name resolution and star verification; fields
+    mirror the SIMBAD columns used by utilities (see obs_run.local_catalog).
+    """
+    main_id = models.CharField(max_length=128, unique=True)
+    ra = models.FloatField()
+    dec = models.FloatField()
+    otype = models.CharField(max_length=32, blank=True, default='')
+    # SIMBAD 'alltypes.otypes' and 'ids' ('|'-separated)
+    alltypes = models.CharField(max_length=512, blank=True, default='')
+    ids = models.TextField(blank=True, default='')
+    v_mag = models.FloatField(null=True, blank=True)
+    # File or catalog the entry was loaded from
+    source = models.CharField(max_length=128, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dec'], name='local_catalog_dec_idx'),
+        ]
+
+    def __str__(self):
+        return f"LocalCatalogObject {self.main_id}"
+
+
+class LocalCatalogAlias(models.Model):
+    """Normalized name (main ID or alias) of a LocalCatalogObject."""
+    name = models.CharField(max_length=128, unique=True)
+    catalog_object = models.ForeignKey(
+        LocalCatalogObject,
+        on_delete=models.CASCADE,
+        related_name='aliases',
+    )
+
+    def __str__(self):
+        return f"{self.name} -> {self.catalog_object_id}"
+
+
+class ChangeCounter(models.Model):
+    """Monotonic counter bumped whenever data behind an API scope changes.
+
+    Feeds cheap, process-independent ETags for the run endpoints (see
+    obs_run.change_counters). Scopes are names like 'runs' or 'run:<pk>'.
+    """
+    name = models.CharField(max_length=64, unique=True)
+    value = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"ChangeCounter {self.name}={self.value}"
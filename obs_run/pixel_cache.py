@@ -0,0 +1,169 @@
+"""Reduced FITS pixel data, decoded once per file change and shared by its consumers.
+
+A pixel product is the first image plane of a FITS file reduced to a fixed
+size (PIXEL_CACHE_SIZES, long side at least that many pixels) as float32 with
+BZERO/BSCALE/BLANK applied. Products are stored as ``.npy`` next to the
+thumbnails (obs_run.thumbnail_cache: same key scheme with content_hash, same
+LRU budget, same purge) and opened memory-mapped, so every thumbnail size of
+a file is rendered from a single read of the raw pixels.
+"""
+from __future__ import annotations
+
+import logging
+import warnings
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from astropy.io import fits
+from django.conf import settings
+
+from obs_run.thumbnail_cache import cache_enabled, cache_path, is_fresh, touch_cached, write_cached
+
+logger = logging.getLogger(__name__)
+
+# Whole-file compression astropy decompresses on open (no memory map)
+COMPRESSED_STREAM_SUFFIXES = ('.gz', '.bz2', '.zip')
+# Pixels per section read when block-reducing (bounds the band buffer)
+_SECTION_PIXELS = 4_000_000
+
+
+class PixelDataError(ValueError):
+    """The file has no usable image data."""
+
+
+def product_sizes() -> list[int]:
+    sizes = getattr(settings, 'PIXEL_CACHE_SIZES', None) or [1024]
+    return sorted({max(1, int(size)) for size in sizes})
+
+
+def product_size_for(min_dim: int) -> int | None:
+    """Smallest product with at least ``min_dim`` pixels on the long side, None when all are smaller."""
+    return min((size for size in product_sizes() if size >= min_dim), default=None)
+
+
+def _fits_image_hdu(hdul):
+    """First HDU with 2D (or higher) image data, found from the headers without reading pixels."""
+    for hdu in hdul:
+        if not getattr(hdu, 'is_image', False):
+            continue
+        shape = hdu.shape
+        if len(shape) >= 2 and all(shape[-2:]):
+            return hdu
+    return None
+
+
+def _scale_raw(raw: np.ndarray, header) -> np.ndarray:
+    """Physical values (float32) of raw pixels: BLANK becomes NaN, then BSCALE/BZERO apply."""
+    data = raw.astype(np.float32)
+    blank = header.get('BLANK')
+    if blank is not None and raw.dtype.kind in 'iu':
+        data[raw == blank] = np.nan
+    bscale = float(header.get('BSCALE', 1.0))
+    bzero = float(header.get('BZERO', 0.0))
+    if bscale != 1.0:
+        data *= bscale
+    if bzero:
+        data += bzero
+    return data
+
+
+def _strided_pixels(hdu, step: int) -> np.ndarray:
+    """Every ``step``-th pixel of the first plane, read through the memory map."""
+    raw = hdu.data
+    while raw.ndim > 2:
+        raw = raw[0]
+    # Only the sampled rows are paged in; the copy is at the reduced resolution
+    return _scale_raw(np.array(raw[::step, ::step]), hdu.header)
+
+
+def _block_reduced_pixels(hdu, step: int) -> np.ndarray:
+    """Mean of ``step`` x ``step`` blocks of the first plane, streamed through ``hdu.section`` in row bands."""
+    shape = hdu.shape
+    ny, nx = shape[-2:]
+    lead = (0,) * (len(shape) - 2)
+    sy, sx = min(step, ny), min(step, nx)
+    out_y, out_x = ny // sy, nx // sx
+    rows_per_band = max(1, _SECTION_PIXELS // (sy * nx))
+    out = np.empty((out_y, out_x), dtype=np.float32)
+    for y0 in range(0, out_y, rows_per_band):
+        y1 = min(out_y, y0 + rows_per_band)
+        raw = np.asarray(hdu.section[lead + (slice(y0 * sy, y1 * sy), slice(0, out_x * sx))])
+        band = _scale_raw(raw, hdu.header).reshape(y1 - y0, sy, out_x, sx)
+        with warnings.catch_warnings():
+            # All-NaN (BLANK) blocks stay NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            out[y0:y1] = np.nanmean(band, axis=(1, 3))
+    return out
+
+
+def reduce_hdu(hdu, file_path: Path, min_dim: int) -> np.ndarray:
+    """
+    First image plane of ``hdu`` reduced by an integer factor to at least ``min_dim`` pixels on the long side.
+
+    Plain files are decimated through the memory map; tile-compressed HDUs and
+    gzip/bzip2 files cannot be mapped and are block-reduced section by section.
+    Either way memory stays at the reduced resolution instead of the full frame.
+    """
+    ny, nx = hdu.shape[-2:]
+    step = max(1, max(ny, nx) // max(1, min_dim))
+    if not isinstance(hdu, fits.CompImageHDU) and file_path.suffix.lower() not in COMPRESSED_STREAM_SUFFIXES:
+        try:
+            return _strided_pixels(hdu, step)
+        except (OSError, ValueError):
+            logger.debug('Memory-mapped read of %s failed, reading sections', file_path, exc_info=True)
+    return _block_reduced_pixels(hdu, step)
+
+
+def image_header(file_path: Path):
+    """Header of the first 2D image HDU (the one products are made of), None when there is none."""
+    with fits.open(str(file_path), memmap=True, do_not_scale_image_data=True) as hdul:
+        hdu = _fits_image_hdu(hdul)
+        return hdu.header.copy() if hdu is not None else None
+
+
+def read_reduced_fits(file_path: Path, min_dim: int) -> np.ndarray:
+    """
+    Reduced float32 pixels of the first 2D image HDU of a FITS file (see reduce_hdu).
+
+    Raises PixelDataError when there is no image or it exceeds THUMBNAIL_MAX_PIXELS.
+    """
+    # Raw pixels are read and scaled here: astropy cannot memory-map or slice scaled (BZERO/BSCALE/BLANK) data
+    with fits.open(str(file_path), memmap=True, do_not_scale_image_data=True) as hdul:
+        hdu = _fits_image_hdu(hdul)
+        if hdu is None:
+            raise PixelDataError('No image data')
+        max_pixels = int(getattr(settings, 'THUMBNAIL_MAX_PIXELS', 50_000_000))
+        if int(np.prod(hdu.shape[-2:])) > max_pixels:
+            raise PixelDataError('Image too large for thumbnail')
+        return reduce_hdu(hdu, file_path, min_dim)
+
+
+def get_fits_pixels(*, datafile_id: int, content_hash: str, file_path: Path, min_dim: int) -> np.ndarray:
+    """
+    Reduced pixels of a FITS DataFile with at least ``min_dim`` pixels on the long side.
+
+    Served from the smallest cached product that is large enough (read-only
+    memory map); on a miss the product is computed once and stored. Requests
+    larger than every product read the file directly.
+    """
+    size = product_size_for(min_dim)
+    if size is None or not cache_enabled():
+        return read_reduced_fits(file_path, min_dim)
+    try:
+        source_mtime = Path(file_path).stat().st_mtime
+    except OSError as exc:
+        raise FileNotFoundError(str(file_path)) from exc
+    path = cache_path(datafile_id=datafile_id, content_hash=content_hash, max_dim=size, kind='pixels', fmt='npy')
+    if is_fresh(path, source_mtime):
+        try:
+            data = np.load(path, mmap_mode='r', allow_pickle=False)
+            touch_cached(path)
+            return data
+        except (OSError, ValueError):
+            logger.warning('Unreadable pixel cache entry %s', path, exc_info=True)
+    data = read_reduced_fits(file_path, size)
+    buf = BytesIO()
+    np.save(buf, data, allow_pickle=False)
+    write_cached(path, buf.getvalue(), stats=False)
+    return data
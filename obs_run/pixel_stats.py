@@ -0,0 +1,101 @@
+"""Per-frame pixel statistics for filtering and QA (clouded lights, blown flats, mislabeled darks).
+
+Statistics are computed once per file from the decimated pixel product
+(obs_run.pixel_cache, the same read the thumbnails use) and stored on DataFile,
+so QA queries run against the database instead of the files.
+"""
+from __future__ import annotations
+
+import logging
+
+import numpy as np
+from astropy.stats import sigma_clipped_stats
+from django.utils import timezone
+
+from obs_run.pixel_cache import PixelDataError, get_fits_pixels, image_header, product_sizes
+
+logger = logging.getLogger(__name__)
+
+PIXEL_STAT_FIELDS = ('pixel_mean', 'pixel_median', 'pixel_std', 'pixel_background', 'saturated_fraction')
+
+
+def saturation_level(header) -> float | None:
+    """
+    Physical value at which pixels saturate: SATURATE/SATLEVEL when given, else the
+    largest value the integer BITPIX can store (scaled); None for float data.
+    """
+    for key in ('SATURATE', 'SATLEVEL'):
+        value = header.get(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+            return float(value)
+    bitpix = header.get('BITPIX')
+    if bitpix not in (8, 16, 32, 64):
+        return None
+    raw_max = 255 if bitpix == 8 else 2 ** (bitpix - 1) - 1
+    return raw_max * float(header.get('BSCALE', 1.0)) + float(header.get('BZERO', 0.0))
+
+
+def compute_pixel_stats(pixels: np.ndarray, saturation: float | None = None) -> dict | None:
+    """
+    Mean, median, standard deviation, background and saturated fraction of the finite pixels.
+
+    The background is the mode estimate 2.5 * median - 1.5 * mean of the 3-sigma
+    clipped pixels (the clipped median when the distribution is too skewed).
+    Returns None when no pixel is finite.
+    """
+    values = np.asarray(pixels)[np.isfinite(pixels)]
+    if not values.size:
+        return None
+    clipped_mean, clipped_median, clipped_std = sigma_clipped_stats(values, sigma=3.0, maxiters=5)
+    if clipped_std > 0 and (clipped_mean - clipped_median) / clipped_std < 0.3:
+        background = 2.5 * clipped_median - 1.5 * clipped_mean
+    else:
+        background = clipped_median
+    saturated = None
+    if saturation is not None:
+        saturated = float(np.count_nonzero(values >= saturation)) / values.size
+    return {
+        'pixel_mean': float(values.mean(dtype=np.float64)),
+        'pixel_median': float(np.median(values)),
+        'pixel_std': float(values.std(dtype=np.float64)),
+        'pixel_background': float(background),
+        'saturated_fraction': saturated,
+    }
+
+
+def update_pixel_stats(df) -> dict | None:
+    """
+    Compute and store the pixel statistics of FITS DataFile ``df``.
+
+    Uses the largest pixel product. Tile-compressed files are block-averaged
+    there, which underestimates isolated saturated pixels. Returns the stored
+    values, or None when the file is not FITS, missing or has no image data.
+    """
+    from obs_run.models import DataFile
+    from obs_run.services.datafile_paths import PathOutsideDataRoot, safe_datafile_path
+
+    if (df.file_type or '').upper() != 'FITS':
+        return None
+    try:
+        file_path = safe_datafile_path(df.datafile, must_exist=True)
+        header = image_header(file_path)
+        if header is None:
+            return None
+        pixels = get_fits_pixels(
+            datafile_id=df.pk,
+            content_hash=df.content_hash or '',
+            file_path=file_path,
+            min_dim=max(product_sizes()),
+        )
+    except (PathOutsideDataRoot, FileNotFoundError, PixelDataError, OSError) as e:
+        logger.debug('No pixel statistics for DataFile %s: %s', df.pk, e)
+        return None
+    stats = compute_pixel_stats(pixels, saturation_level(header))
+    if stats is None:
+        return None
+    stats['pixel_stats_at'] = timezone.now()
+    # Derived values: no history record, no save signals
+    DataFile.objects.filter(pk=df.pk).update(**stats)
+    for name, value in stats.items():
+        setattr(df, name, value)
+    return stats
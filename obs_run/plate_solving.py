@@ -483,6 +483,41 @@ class PlateSolvingService:
         return min_radius, max_radius
 
 
+def select_re_evaluation_candidates(queryset, threshold_arcmin: float) -> tuple[List[int], List[int]]:
+    """
+    Split plate-solved DataFiles into those that need evaluate_data_file and the rest.
+
+    A file is a candidate when it has a run and WCS center and either
+    1. has no header coordinates (ra/dec missing or -1), or
+    2. its WCS center differs from the header position by more than threshold_arcmin.
+
+    Only pk/ra/dec/wcs_ra/wcs_dec/run id are fetched; separations are computed
+    in one vectorized pass. Returns (candidate_pks, skip_pks) in queryset order.
+    """
+    import numpy as np
+
+    from obs_run.wcs_utils import angular_separation_deg
+
+    rows = list(queryset.values_list('pk', 'ra', 'dec', 'wcs_ra', 'wcs_dec', 'observation_run_id'))
+    if not rows:
+        return [], []
+
+    pks = np.array([row[0] for row in rows], dtype=np.int64)
+    # None -> NaN with a float dtype
+    coords = np.array([row[1:5] for row in rows], dtype=float)
+    ra, dec, wcs_ra, wcs_dec = coords.T
+    has_run = np.array([row[5] is not None for row in rows], dtype=bool)
+
+    no_header = ~np.isfinite(ra) | ~np.isfinite(dec) | (ra == -1) | (dec == -1)
+    has_wcs = np.isfinite(wcs_ra) & np.isfinite(wcs_dec)
+    with np.errstate(invalid='ignore'):
+        sep_arcmin = angular_separation_deg(ra, dec, wcs_ra, wcs_dec) * 60.0
+        moved = ~no_header & has_wcs & (sep_arcmin > float(threshold_arcmin))
+
+    needs_eval = (no_header | moved) & has_wcs & has_run
+    return pks[needs_eval].tolist(), pks[~needs_eval].tolist()
+
+
 def _maybe_enqueue_aux_objects_after_wcs(datafile) -> None:
     """Schedule aux-object SIMBAD lookup when a new plate solution was saved."""
     if not getattr(settings, 'AUX_OBJECTS_AUTO_ON_WCS', True):
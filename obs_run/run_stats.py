@@ -0,0 +1,171 @@
+"""Materialized per-run DataFile aggregates (obs_run.models.RunStats).
+
+RunSerializer reads file counts, exposure times and the start/end of a run
+from its RunStats row, so run lists no longer group the DataFile table.
+DataFile saves and deletes only mark their run (and the run a file was moved
+away from) as dirty. Each dirty run is recomputed once when the transaction
+commits, with one aggregate over that run's files (``observation_run`` is
+indexed), so ingest code that saves a file several times stays linear.
+Refreshed runs bump their change counters afterwards (obs_run.change_counters),
+so the ETag a change ends with always covers the refreshed statistics.
+``python manage.py rebuild_run_stats`` recomputes all rows, e.g. after
+queryset ``update()`` calls, which bypass the signals.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+
+logger = logging.getLogger(__name__)
+
+# DataFiles with an HJD below J2000 have no valid observation time
+VALID_HJD_MIN = 2451545
+IMAGE_FILE_TYPES = ('JPG', 'CR2', 'TIFF')
+
+# Run ids changed in the current thread's transaction, refreshed on commit
+_dirty = threading.local()
+
+
+def run_stats_values(datafiles) -> dict:
+    """RunStats field values for a queryset of one run's DataFiles."""
+    light = Q(exposure_type_effective='LI')
+    exposed = Q(exptime__gt=0)
+    valid_hjd = Q(hjd__gt=VALID_HJD_MIN)
+    values = datafiles.aggregate(
+        n_datafiles=Count('pk'),
+        n_fits=Count('pk', filter=Q(file_type='FITS')),
+        n_img=Count('pk', filter=Q(file_type__in=IMAGE_FILE_TYPES)),
+        n_ser=Count('pk', filter=Q(file_type='SER')),
+        n_light=Count('pk', filter=light),
+        n_flat=Count('pk', filter=Q(exposure_type_effective='FL')),
+        n_dark=Count('pk', filter=Q(exposure_type_effective='DA')),
+        expo_time=Sum('exptime', filter=exposed),
+        light_expo_time=Sum('exptime', filter=exposed & light),
+        start_hjd=Min('hjd', filter=valid_hjd),
+        end_hjd=Max('hjd', filter=valid_hjd),
+    )
+    values['expo_time'] = values['expo_time'] or 0.0
+    values['light_expo_time'] = values['light_expo_time'] or 0.0
+    timed = datafiles.filter(valid_hjd)
+    values['start_obs_date'] = timed.order_by('hjd').values_list('obs_date', flat=True).first() or ''
+    values['end_obs_date'] = timed.order_by('-hjd').values_list('obs_date', flat=True).first() or ''
+    return values
+
+
+def _bump_counters(run_ids=None) -> None:
+    from obs_run import change_counters
+
+    # After the rows are written: a new ETag must never go out with old statistics
+    scopes = [change_counters.run_scope(run_id) for run_id in run_ids] if run_ids else [change_counters.ALL_RUNS]
+    try:
+        change_counters.bump(change_counters.RUNS, *scopes)
+    except Exception:
+        logger.warning('Could not bump change counters after RunStats refresh', exc_info=True)
+
+
+def refresh_run_stats(run_id: int, *, bump_counters: bool = True):
+    """Recompute and store the RunStats row of run ``run_id``, then bump its change counters."""
+    from obs_run.models import DataFile, RunStats
+
+    stats, _ = RunStats.objects.update_or_create(
+        run_id=run_id,
+        defaults=run_stats_values(DataFile.objects.filter(observation_run_id=run_id)),
+    )
+    if bump_counters:
+        _bump_counters([run_id])
+    return stats
+
+
+def rebuild_run_stats(run_ids=None) -> int:
+    """Recompute the RunStats rows of ``run_ids`` (default: all runs); returns the number of runs."""
+    from obs_run.models import ObservationRun
+
+    qs = ObservationRun.objects.order_by('pk')
+    if run_ids:
+        qs = qs.filter(pk__in=run_ids)
+    count = 0
+    for run_id in qs.values_list('pk', flat=True).iterator():
+        refresh_run_stats(run_id, bump_counters=False)
+        count += 1
+    if count:
+        _bump_counters(run_ids)
+    return count
+
+
+def _is_run_deletion(origin) -> bool:
+    from obs_run.models import ObservationRun
+
+    # origin is the deleted instance or queryset that started a cascade
+    return getattr(origin, 'model', type(origin)) is ObservationRun
+
+
+def _refresh_dirty_runs() -> None:
+    from obs_run.models import ObservationRun
+
+    run_ids = getattr(_dirty, 'run_ids', None)
+    if not run_ids:
+        return
+    _dirty.run_ids = set()
+    # Runs deleted meanwhile have no RunStats row to refresh
+    refreshed = []
+    for run_id in ObservationRun.objects.filter(pk__in=run_ids).values_list('pk', flat=True):
+        try:
+            refresh_run_stats(run_id, bump_counters=False)
+            refreshed.append(run_id)
+        except Exception:
+            logger.warning('Could not refresh RunStats of run %s', run_id, exc_info=True)
+    if refreshed:
+        _bump_counters(refreshed)
+
+
+def mark_runs_dirty(*run_ids) -> None:
+    """Refresh the RunStats rows of ``run_ids`` once the current transaction commits."""
+    run_ids = {run_id for run_id in run_ids if run_id}
+    if not run_ids:
+        return
+    if getattr(_dirty, 'run_ids', None) is None:
+        _dirty.run_ids = set()
+    _dirty.run_ids.update(run_ids)
+    # Only the first callback of a transaction finds ids left to refresh; ids of a
+    # rolled-back transaction are picked up by the next commit
+    transaction.on_commit(_refresh_dirty_runs)
+
+
+def _datafile_loaded(sender, instance, **kwargs):
+    # Run at load time, to also refresh the old run when a file is moved. Deferred
+    # fields are not in __dict__ and are not fetched here
+    instance._run_stats_run_id = instance.__dict__.get('observation_run_id')
+
+
+def _datafile_saved(sender, instance, **kwargs):
+    mark_runs_dirty(getattr(instance, '_run_stats_run_id', None), instance.observation_run_id)
+    instance._run_stats_run_id = instance.observation_run_id
+
+
+def _datafile_deleted(sender, instance, origin=None, **kwargs):
+    # Files deleted along with their run: the RunStats row goes with the run
+    if _is_run_deletion(origin):
+        return
+    mark_runs_dirty(instance.observation_run_id)
+
+
+def _run_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        from obs_run.models import RunStats
+
+        RunStats.objects.get_or_create(run=instance)
+
+
+def connect_signals() -> None:
+    """Connect the RunStats handlers (called from RunConfig.ready)."""
+    from django.db.models.signals import post_delete, post_init, post_save
+
+    from obs_run.models import DataFile, ObservationRun
+
+    post_init.connect(_datafile_loaded, sender=DataFile, dispatch_uid='run_stats_datafile_loaded')
+    post_save.connect(_datafile_saved, sender=DataFile, dispatch_uid='run_stats_datafile_saved')
+    post_delete.connect(_datafile_deleted, sender=DataFile, dispatch_uid='run_stats_datafile_deleted')
+    post_save.connect(_run_created, sender=ObservationRun, dispatch_uid='run_stats_run_created')
@@ -1,4 +1,4 @@
-"""SER (.ser) video frame extraction and cached PNG thumbnails."""
+"""SER (.ser) video frame extraction and cached PNG thumbnails (see obs_run.thumbnail_cache)."""
 from __future__ import annotations
 
 import logging
@@ -6,7 +6,6 @@ from io import BytesIO
 from pathlib import Path
 
 import numpy as np
-from django.conf import settings
 
 try:
     from PIL import Image
@@ -21,18 +20,6 @@ def is_ser_path(file_type: str | None, file_path: Path) -> bool:
     return ft == 'SER' or file_path.suffix.lower() == '.ser'
 
 
-def _cache_dir() -> Path:
-    base = getattr(settings, 'SER_THUMBNAIL_CACHE_DIR', None)
-    if base:
-        return Path(base)
-    return Path(settings.BASE_DIR) / 'data' / 'ser_thumbnails'
-
-
-def _cache_path(datafile_id: int, content_hash: str, max_dim: int) -> Path:
-    digest = (content_hash or 'nohash').strip() or 'nohash'
-    return _cache_dir() / f'df{datafile_id}_{digest}_w{max_dim}.png'
-
-
 def _frame_to_uint8(arr: np.ndarray) -> np.ndarray:
     data = np.asarray(arr, dtype=np.float64)
     if data.ndim == 3 and data.shape[2] == 3:
@@ -89,24 +76,13 @@ def get_ser_thumbnail_png(
     Return cached PNG thumbnail for a SER file, generating on cache miss.
     Cache invalidates when the source file is newer than the cached PNG.
     """
-    cache_path = _cache_path(datafile_id, content_hash, max_dim)
-    cache_path.parent.mkdir(parents=True, exist_ok=True)
-
-    try:
-        src_mtime = file_path.stat().st_mtime
-    except OSError as exc:
-        raise FileNotFoundError(str(file_path)) from exc
-
-    if cache_path.is_file():
-        try:
-            if cache_path.stat().st_mtime >= src_mtime:
-                return cache_path.read_bytes()
-        except OSError:
-            pass
-
-    png = render_ser_frame_png(file_path, max_dim=max_dim)
-    try:
-        cache_path.write_bytes(png)
-    except OSError:
-        logger.warning('Could not write SER thumbnail cache %s', cache_path, exc_info=True)
-    return png
+    from obs_run.thumbnail_cache import get_or_render
+
+    return get_or_render(
+        datafile_id=datafile_id,
+        content_hash=content_hash,
+        source_path=file_path,
+        max_dim=max_dim,
+        kind='ser',
+        render=lambda: render_ser_frame_png(file_path, max_dim=max_dim),
+    )
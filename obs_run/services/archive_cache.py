@@ -0,0 +1,157 @@
+"""Reuse of identical download archives between jobs.
+
+A finished job records a digest of its archived (DataFile pk, content_hash) list
+plus the archive format and, for ZIPs, the compression policy. A new job with the same digest is completed
+immediately by pointing its ``file_path`` at the existing ZIP. Several jobs
+then share one file. A file is only deleted when no other done job that has
+not expired still references it (release_job_archive).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from pathlib import Path
+from typing import Iterable
+
+from django.conf import settings
+from django.utils import timezone
+
+from obs_run.models import DataFile, DownloadJob
+
+logger = logging.getLogger(__name__)
+
+# Bump when the archive layout (member names, order) changes
+_ARCHIVE_FORMAT = 1
+
+
+def reuse_enabled() -> bool:
+    return bool(getattr(settings, 'DOWNLOAD_ARCHIVE_REUSE_ENABLED', True))
+
+
+def _min_remaining() -> timedelta:
+    """A donor archive must stay alive at least this long to be reused."""
+    return timedelta(seconds=int(getattr(settings, 'DOWNLOAD_ARCHIVE_REUSE_MIN_REMAINING_SECONDS', 600)))
+
+
+def _ttl() -> timedelta:
+    try:
+        return timedelta(hours=int(getattr(settings, 'DOWNLOAD_JOB_TTL_HOURS', 72)))
+    except Exception:
+        return timedelta(hours=72)
+
+
+def archive_digest(entries: Iterable[tuple[int, str]], archive_format: str = 'zip') -> str:
+    """
+    Digest of (DataFile pk, content_hash) pairs, the archive format and the ZIP compression policy.
+
+    Returns '' (not reusable) for an empty list or when a file has no content hash,
+    since its bytes could change without the digest changing.
+    """
+    from obs_run.services.zip_compression import policy_fingerprint
+
+    pairs = sorted((int(pk), str(content_hash or '')) for pk, content_hash in entries)
+    if not pairs or any(not h for _pk, h in pairs):
+        return ''
+    payload = {'format': _ARCHIVE_FORMAT, 'files': pairs}
+    if archive_format == 'zip':
+        payload['policy'] = policy_fingerprint()
+    else:
+        payload['archive'] = archive_format
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def archive_digest_for_files(files: Iterable, archive_format: str = 'zip') -> str:
+    return archive_digest(((df.pk, df.content_hash) for df in files), archive_format)
+
+
+def archive_digest_for_pks(pks: Iterable[int], archive_format: str = 'zip') -> str:
+    return archive_digest(
+        DataFile.objects.filter(pk__in=list(pks)).values_list('pk', 'content_hash'), archive_format,
+    )
+
+
+def _live_archive_qs(now=None):
+    now = now or timezone.now()
+    return DownloadJob.objects.filter(status='done').exclude(file_path='').exclude(expires_at__lte=now)
+
+
+def find_reusable_archive(digest: str, *, exclude_pk: int | None = None) -> DownloadJob | None:
+    """A done job with ``digest`` whose archive exists and outlives the reuse margin, or None."""
+    if not digest or not reuse_enabled():
+        return None
+    now = timezone.now()
+    qs = (
+        _live_archive_qs(now)
+        .filter(archive_digest=digest)
+        .exclude(expires_at__lt=now + _min_remaining())
+        .order_by('-expires_at')
+    )
+    if exclude_pk is not None:
+        qs = qs.exclude(pk=exclude_pk)
+    for donor in qs[:5]:
+        try:
+            if Path(donor.file_path).is_file():
+                return donor
+        except OSError:
+            continue
+    return None
+
+
+def complete_job_from_archive(job: DownloadJob, donor: DownloadJob) -> DownloadJob:
+    """Mark ``job`` done, referencing ``donor``'s archive (no ZIP is built)."""
+    now = timezone.now()
+    job.status = 'done'
+    job.progress = 100
+    job.file_path = donor.file_path
+    job.archive_digest = donor.archive_digest
+    job.archive_format = donor.archive_format
+    job.bytes_total = donor.bytes_total
+    job.bytes_done = donor.bytes_done
+    job.error = ''
+    job.started_at = job.started_at or now
+    job.finished_at = now
+    job.expires_at = now + _ttl()
+    if job.pk:
+        job.save(update_fields=[
+            'status', 'progress', 'file_path', 'archive_digest', 'archive_format', 'bytes_total', 'bytes_done',
+            'error', 'started_at', 'finished_at', 'expires_at',
+        ])
+    else:
+        job.save()
+    logger.info('Download job #%s reuses the archive of job #%s', job.pk, donor.pk)
+    return job
+
+
+def archive_in_use(file_path: str, *, exclude_pk: int | None = None) -> bool:
+    """True when another done, unexpired job references ``file_path``."""
+    if not file_path:
+        return False
+    qs = _live_archive_qs().filter(file_path=file_path)
+    if exclude_pk is not None:
+        qs = qs.exclude(pk=exclude_pk)
+    return qs.exists()
+
+
+def release_job_archive(job: DownloadJob) -> int:
+    """
+    Delete ``job``'s archive unless another live job still references it.
+
+    Does not modify ``job``. Returns the number of bytes freed.
+    """
+    if not job.file_path or archive_in_use(job.file_path, exclude_pk=job.pk):
+        return 0
+    p = Path(job.file_path)
+    freed = 0
+    try:
+        if p.exists():
+            try:
+                freed = p.stat().st_size
+            except OSError:
+                pass
+            p.unlink()
+    except Exception as e:
+        logger.warning('Failed to delete %s for job #%s: %s', job.file_path, job.pk, e)
+        return 0
+    return freed
@@ -5,7 +5,7 @@ import hashlib
 import hmac
 import secrets
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 from urllib.parse import urlparse
 
 from django.conf import settings
@@ -15,6 +15,7 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
 
 from obs_run.datafile_filters import apply_datafile_filters
 from obs_run.models import DataFile, DownloadJob, ObservationRun
+from obs_run.services.archive_cache import archive_digest_for_pks, complete_job_from_archive, find_reusable_archive
 from obs_run.tasks import build_zip_task
 from ostdata.custom_permissions import get_allowed_run_objects_to_view_for_user
 
@@ -103,6 +104,16 @@ def resolve_visible_datafiles(
     return qs
 
 
+def archive_format_from(value: Any) -> str:
+    """Validated archive format of a download request ('zip' when not given)."""
+    from obs_run.services.tar_stream import ARCHIVE_FORMATS
+
+    fmt = str(value or 'zip').strip().lower()
+    if fmt not in ARCHIVE_FORMATS:
+        raise ValidationError({'format': f"Unsupported archive format (use {' or '.join(ARCHIVE_FORMATS)})"})
+    return fmt
+
+
 def enforce_download_quotas(user, request, qs) -> List[int]:
     """Validate file count/bytes and concurrent job limits. Returns materialized PKs."""
     from django.contrib.auth.models import AnonymousUser
@@ -173,13 +184,75 @@ def enforce_download_quotas(user, request, qs) -> List[int]:
     return pks
 
 
+_STREAM_SLOT_KEY = 'dl_stream:{scope}:{{}}'
+# A stream whose response was never closed (killed worker) frees its slot after this long
+_STREAM_SLOT_TTL = 3600
+
+
+class _StreamSlotIterator:
+    """Archive chunks that free the stream slot when the response is closed."""
+
+    def __init__(self, chunks: Iterable[bytes], release: Callable[[], None]):
+        self._chunks = iter(chunks)
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> bytes:
+        return next(self._chunks)
+
+    def close(self) -> None:
+        # Django closes the response even when streaming never started
+        try:
+            close = getattr(self._chunks, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+def hold_stream_slot(user, request, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Lease a concurrent-stream slot for the client and return ``chunks`` holding it.
+
+    Users get DOWNLOAD_STREAM_MAX_CONCURRENT_USER slots, anonymous clients (per
+    IP bucket) DOWNLOAD_STREAM_MAX_CONCURRENT_ANON, so one client cannot tie up
+    every web worker with synchronous archives. The slot is freed when the
+    response closes. Raises DownloadQuotaExceeded when all slots are taken;
+    without Redis streams are not bounded here.
+    """
+    from adminops.redis_helpers import acquire_slot_lease, release_slot_lease
+
+    if user is not None and getattr(user, 'is_authenticated', False):
+        scope = f'user:{user.pk}'
+        limit = int(getattr(settings, 'DOWNLOAD_STREAM_MAX_CONCURRENT_USER', 2))
+    else:
+        scope = f'ip:{_client_ip_bucket(request)}'
+        limit = int(getattr(settings, 'DOWNLOAD_STREAM_MAX_CONCURRENT_ANON', 1))
+    client = _redis_client()
+    if client is None or limit <= 0:
+        return iter(chunks)
+    try:
+        lease = acquire_slot_lease(client, _STREAM_SLOT_KEY.format(scope=scope), limit, _STREAM_SLOT_TTL)
+    except Exception:
+        return iter(chunks)
+    if lease is None:
+        raise DownloadQuotaExceeded({'detail': 'Too many concurrent streamed downloads', 'code': 'stream_limit'})
+    return _StreamSlotIterator(chunks, lambda: release_slot_lease(client, lease))
+
+
 def enqueue_download_job_for_run(
     run: ObservationRun,
     user,
     selected_ids: Optional[Iterable[int]] = None,
     filters: Optional[Dict[str, Any]] = None,
     request=None,
+    archive_format: str = 'zip',
 ) -> EnqueuedJob:
+    archive_format = archive_format_from(archive_format)
     qs = resolve_visible_datafiles(
         user,
         run=run,
@@ -187,7 +260,10 @@ def enqueue_download_job_for_run(
         filters=filters,
     )
     pks = enforce_download_quotas(user, request, qs)
-    return _create_job(user=user, run=run, selected_ids=pks, filters=filters or {}, reason='api:download_job_create')
+    return _create_job(
+        user=user, run=run, selected_ids=pks, filters=filters or {}, archive_format=archive_format,
+        reason='api:download_job_create',
+    )
 
 
 def enqueue_download_job_bulk(
@@ -195,7 +271,9 @@ def enqueue_download_job_bulk(
     selected_ids: Optional[Iterable[int]] = None,
     filters: Optional[Dict[str, Any]] = None,
     request=None,
+    archive_format: str = 'zip',
 ) -> EnqueuedJob:
+    archive_format = archive_format_from(archive_format)
     qs = resolve_visible_datafiles(
         user,
         run=None,
@@ -203,10 +281,13 @@ def enqueue_download_job_bulk(
         filters=filters,
     )
     pks = enforce_download_quotas(user, request, qs)
-    return _create_job(user=user, run=None, selected_ids=pks, filters=filters or {}, reason='api:download_job_create_bulk')
+    return _create_job(
+        user=user, run=None, selected_ids=pks, filters=filters or {}, archive_format=archive_format,
+        reason='api:download_job_create_bulk',
+    )
 
 
-def _create_job(*, user, run, selected_ids, filters, reason) -> EnqueuedJob:
+def _create_job(*, user, run, selected_ids, filters, reason, archive_format='zip') -> EnqueuedJob:
     authed = bool(user and getattr(user, 'is_authenticated', False))
     token = None
     token_hash = ''
@@ -214,16 +295,24 @@ def _create_job(*, user, run, selected_ids, filters, reason) -> EnqueuedJob:
         token = secrets.token_urlsafe(32)
         token_hash = hash_download_token(token)
 
+    # Same files, same content, same format/compression as a live archive: complete by reference
+    donor = find_reusable_archive(archive_digest_for_pks(selected_ids, archive_format))
     with transaction.atomic():
-        job = DownloadJob.objects.create(
+        job = DownloadJob(
             user=user if authed else None,
             run=run,
             selected_ids=list(selected_ids),
             filters=dict(filters or {}),
             status='queued',
             access_token_hash=token_hash,
+            archive_format=archive_format,
         )
-    build_zip_task.delay(job.pk)
+        if donor is not None:
+            complete_job_from_archive(job, donor)
+        else:
+            job.save()
+    if donor is None:
+        build_zip_task.delay(job.pk)
     try:
         from adminops.audit_events import log_download_job_event
         log_download_job_event(
@@ -231,7 +320,10 @@ def _create_job(*, user, run, selected_ids, filters, reason) -> EnqueuedJob:
             action='created',
             change_reason=reason,
             user=user if authed else None,
-            summary=f'Download job queued ({len(selected_ids)} file id(s))',
+            summary=(
+                f'Download job completed from archive of job #{donor.pk} ({len(selected_ids)} file id(s))'
+                if donor is not None else f'Download job queued ({len(selected_ids)} file id(s))'
+            ),
         )
     except Exception:
         pass
@@ -0,0 +1,177 @@
+"""Send files to clients, offloading the transfer to the web server when configured.
+
+FILE_SERVING_BACKEND selects how a response for an already authorized file is built:
+
+- ``django`` (default): Django streams the file itself; single ``Range`` requests
+  are answered with 206 so interrupted downloads can resume.
+- ``x-sendfile``: an empty response with ``X-Sendfile: <absolute path>`` (Apache
+  mod_xsendfile, lighttpd); the web server sends the file and handles ranges.
+- ``x-accel``: an empty response with ``X-Accel-Redirect: <internal URI>`` (nginx).
+  FILE_SERVING_ACCEL_LOCATIONS maps filesystem roots to ``internal`` locations;
+  files outside every mapped root fall back to Django streaming.
+"""
+from __future__ import annotations
+
+import logging
+import mimetypes
+import os
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header, http_date
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ('django', 'x-sendfile', 'x-accel')
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_CHUNK_BYTES = 1024 * 1024
+
+
+def serving_backend() -> str:
+    backend = str(getattr(settings, 'FILE_SERVING_BACKEND', 'django') or 'django').strip().lower()
+    if backend not in BACKENDS:
+        logger.warning('Unknown FILE_SERVING_BACKEND %r; using django', backend)
+        return 'django'
+    return backend
+
+
+def accel_uri(path: Path) -> str | None:
+    """Internal nginx URI for ``path`` from FILE_SERVING_ACCEL_LOCATIONS, or None when unmapped."""
+    locations = getattr(settings, 'FILE_SERVING_ACCEL_LOCATIONS', None) or {}
+    resolved = Path(path).resolve()
+    # Longest root first, so nested mappings win
+    for root, prefix in sorted(locations.items(), key=lambda item: len(str(item[0])), reverse=True):
+        try:
+            rel = resolved.relative_to(Path(root).resolve())
+        except ValueError:
+            continue
+        return str(prefix).rstrip('/') + '/' + quote(rel.as_posix())
+    return None
+
+
+def _content_type(filename: str) -> str:
+    content_type, encoding = mimetypes.guess_type(filename)
+    if encoding or not content_type:
+        return 'application/octet-stream'
+    return content_type
+
+
+def _etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_size:x}-{int(stat.st_mtime):x}"'
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None | bool:
+    """
+    (start, end) inclusive for a single-range ``Range`` header.
+
+    None when the header is absent, malformed or asks for several ranges (serve
+    the whole file); False when the range cannot be satisfied (416).
+    """
+    if not header:
+        return None
+    m = _RANGE_RE.match(header.strip())
+    if not m:
+        return None
+    first, last = m.groups()
+    if first == '' and last == '':
+        return None
+    if first == '':
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = size - 1 if last == '' else min(int(last), size - 1)
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+class _RangeFile:
+    """Read-only view of ``length`` bytes of an open file starting at ``start``."""
+
+    def __init__(self, fh, start: int, length: int):
+        self._fh = fh
+        self._remaining = length
+        fh.seek(start)
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fh.read(min(size, _CHUNK_BYTES))
+        self._remaining -= len(data)
+        return data
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+def _disposition(response, filename: str, as_attachment: bool) -> None:
+    header = content_disposition_header(as_attachment, filename)
+    if header:
+        response['Content-Disposition'] = header
+
+
+def _offloaded_response(header: str, value: str, filename: str, content_type: str, as_attachment: bool) -> HttpResponse:
+    # The web server replaces the (empty) body and sets Content-Length and ranges itself
+    response = HttpResponse(content_type=content_type)
+    response[header] = value
+    _disposition(response, filename, as_attachment)
+    return response
+
+
+def serve_file(request, path, *, filename: str | None = None, as_attachment: bool = True):
+    """
+    Response sending ``path`` (already authorized by the caller) with the configured backend.
+
+    Raises FileNotFoundError/OSError when the file cannot be opened in Django mode.
+    """
+    path = Path(path)
+    filename = filename or path.name
+    content_type = _content_type(filename)
+    backend = serving_backend()
+    if backend == 'x-sendfile':
+        return _offloaded_response('X-Sendfile', str(path.resolve()), filename, content_type, as_attachment)
+    if backend == 'x-accel':
+        uri = accel_uri(path)
+        if uri is not None:
+            return _offloaded_response('X-Accel-Redirect', uri, filename, content_type, as_attachment)
+        logger.warning('No FILE_SERVING_ACCEL_LOCATIONS entry for %s; streaming through Django', path)
+
+    fh = open(path, 'rb')
+    try:
+        stat = os.fstat(fh.fileno())
+        size = stat.st_size
+        etag = _etag(stat)
+        last_modified = http_date(stat.st_mtime)
+        byte_range = parse_range(request.META.get('HTTP_RANGE', ''), size)
+        if_range = request.META.get('HTTP_IF_RANGE', '').strip()
+        if byte_range is not None and if_range and if_range not in (etag, last_modified):
+            # The client's partial copy is stale: send the whole file
+            byte_range = None
+        if byte_range is False:
+            fh.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range is None:
+            response = FileResponse(fh, as_attachment=as_attachment, filename=filename, content_type=content_type)
+        else:
+            start, end = byte_range
+            length = end - start + 1
+            response = FileResponse(_RangeFile(fh, start, length), status=206, content_type=content_type)
+            response['Content-Length'] = str(length)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            _disposition(response, filename, as_attachment)
+    except BaseException:
+        fh.close()
+        raise
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    return response
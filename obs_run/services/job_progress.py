@@ -0,0 +1,155 @@
+"""Live progress and cancel state of download jobs, kept in Redis.
+
+While a ZIP is being built, progress (bytes, percent) and the cancel request
+live in one Redis hash per job (``download_job:<id>``). The worker writes it every
+few MiB and the status endpoint reads it. The DownloadJob row is only written on
+state transitions and at a low-frequency checkpoint
+(DOWNLOAD_JOB_DB_CHECKPOINT_SECONDS), so concurrent jobs do not keep updating a
+hot table. Without Redis every call is a no-op and callers fall back to the row.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from typing import Iterable
+
+from django.conf import settings
+
+from adminops.redis_helpers import get_shared_redis
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = 'download_job:'
+_INT_FIELDS = ('progress', 'bytes_done', 'bytes_total')
+
+
+def job_key(job_id: int) -> str:
+    return f'{_KEY_PREFIX}{job_id}'
+
+
+def _ttl_seconds() -> int:
+    return int(getattr(settings, 'DOWNLOAD_JOB_PROGRESS_TTL_SECONDS', 24 * 3600))
+
+
+def checkpoint_seconds() -> float:
+    """Minimum interval between progress writes to the DownloadJob row."""
+    return float(getattr(settings, 'DOWNLOAD_JOB_DB_CHECKPOINT_SECONDS', 30))
+
+
+def _decode(raw: dict) -> dict:
+    data = {}
+    for key, value in raw.items():
+        name = key.decode('utf-8') if isinstance(key, bytes) else str(key)
+        text = value.decode('utf-8') if isinstance(value, bytes) else str(value)
+        if name in _INT_FIELDS:
+            try:
+                data[name] = int(text)
+            except ValueError:
+                continue
+        else:
+            data[name] = text
+    return data
+
+
+class JobProgressPublisher:
+    """
+    Worker-side handle for one job: publish progress, poll for cancellation.
+
+    ``available`` is False when Redis is unavailable (or failed once for this job);
+    publish() then returns None and the caller must check the DownloadJob row instead.
+    """
+
+    def __init__(self, job_id: int, client=None):
+        self.job_id = job_id
+        self.key = job_key(job_id)
+        self.client = client if client is not None else get_shared_redis()
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def publish(self, *, bytes_done: int, bytes_total: int, progress: int, status: str = 'running') -> bool | None:
+        """Store progress and return whether cancellation was requested (None without Redis)."""
+        if self.client is None:
+            return None
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.hset(self.key, mapping={
+                    'status': status,
+                    'progress': int(progress),
+                    'bytes_done': int(bytes_done),
+                    'bytes_total': int(bytes_total),
+                    'updated_at': f'{time.time():.3f}',
+                })
+                pipe.expire(self.key, _ttl_seconds())
+                pipe.hget(self.key, 'cancel')
+                cancel = pipe.execute()[-1]
+            return cancel is not None and cancel not in (b'', '', b'0', '0')
+        except Exception as exc:
+            # Do not retry an unreachable Redis every few MiB; use the row for the rest of the job
+            logger.debug('Job progress publish failed for %s: %s', self.job_id, exc)
+            self.client = None
+            return None
+
+    def cancel_requested(self) -> bool | None:
+        if self.client is None:
+            return None
+        try:
+            cancel = self.client.hget(self.key, 'cancel')
+        except Exception:
+            self.client = None
+            return None
+        return cancel is not None and cancel not in (b'', '', b'0', '0')
+
+    def clear(self) -> None:
+        """Drop the live state once the job reached a terminal status (the row is authoritative)."""
+        if self.client is None:
+            return
+        try:
+            self.client.delete(self.key)
+        except Exception:
+            pass
+
+
+def request_cancel(job_ids: Iterable[int]) -> bool:
+    """Flag jobs as cancelled for running workers; returns False when Redis is unavailable."""
+    client = get_shared_redis()
+    if client is None:
+        return False
+    try:
+        with client.pipeline() as pipe:
+            for job_id in job_ids:
+                pipe.hset(job_key(job_id), 'cancel', '1')
+                pipe.expire(job_key(job_id), _ttl_seconds())
+            pipe.execute()
+        return True
+    except Exception as exc:
+        logger.warning('Failed to set cancel flags for jobs: %s', exc)
+        return False
+
+
+def read_live_progress(job_ids: Iterable[int]) -> dict[int, dict]:
+    """Live progress per job id (only jobs with a Redis hash); empty without Redis."""
+    ids = [int(i) for i in job_ids]
+    client = get_shared_redis()
+    if client is None or not ids:
+        return {}
+    try:
+        with client.pipeline() as pipe:
+            for job_id in ids:
+                pipe.hgetall(job_key(job_id))
+            rows = pipe.execute()
+    except Exception as exc:
+        logger.debug('Job progress read failed: %s', exc)
+        return {}
+    return {job_id: _decode(raw) for job_id, raw in zip(ids, rows) if raw}
+
+
+def overlay_live_progress(job, payload: dict, live: dict | None) -> dict:
+    """Replace row progress fields in ``payload`` with live values while ``job`` is queued/running."""
+    if not live or job.status not in ('queued', 'running'):
+        return payload
+    for field in _INT_FIELDS:
+        if field in live:
+            payload[field] = live[field]
+    return payload
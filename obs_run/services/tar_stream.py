@@ -0,0 +1,134 @@
+"""Uncompressed POSIX tar archives of DataFiles (format=tar downloads).
+
+A tar member needs no compression, CRC or central directory: its header is built
+from the member size and the body is the file verbatim, padded to 512 bytes.
+Headers use the pax format, so long names and sizes beyond 8 GiB are fine, and
+the total archive size is known before any content is read. Download jobs copy
+bodies with zero-copy os.sendfile into the archive file, which the web server
+can then send with sendfile as well (see obs_run.services.file_serving).
+"""
+from __future__ import annotations
+
+import errno
+import logging
+import os
+import tarfile
+from typing import Iterable, Iterator
+
+from obs_run.services.zip_compression import ProgressCallback
+from obs_run.services.zip_stream import STREAM_CHUNK_BYTES, ZipMember
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ('zip', 'tar')
+_END_OF_ARCHIVE = b'\0' * (2 * tarfile.BLOCKSIZE)
+# sendfile() into a regular file is not supported everywhere; fall back to read/write
+_SENDFILE_UNSUPPORTED = {errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSOCK}
+
+
+def tar_header(member: ZipMember) -> bytes:
+    """pax header block(s) for ``member``; needs only its name, size and mtime."""
+    info = tarfile.TarInfo(member.arcname)
+    info.size = member.size
+    info.mtime = int(member.mtime)
+    info.mode = 0o644
+    return info.tobuf(format=tarfile.PAX_FORMAT, encoding='utf-8', errors='surrogateescape')
+
+
+def _padding(size: int) -> bytes:
+    return b'\0' * (-size % tarfile.BLOCKSIZE)
+
+
+def tar_size(members: Iterable[ZipMember]) -> int:
+    """Exact byte size of the tar archive of ``members``."""
+    total = len(_END_OF_ARCHIVE)
+    for member in members:
+        total += len(tar_header(member)) + member.size + len(_padding(member.size))
+    return total
+
+
+def iter_tar_stream(members: Iterable[ZipMember], *, chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    Yield a tar archive of ``members`` (exactly tar_size() bytes).
+
+    The response length is promised up front, so a member that cannot be read or
+    changed size is raised rather than skipped (the client sees a truncated download).
+    """
+    for member in members:
+        with member.path.open('rb') as src:
+            yield tar_header(member)
+            remaining = member.size
+            while remaining > 0:
+                buf = src.read(min(chunk_size, remaining))
+                if not buf:
+                    raise OSError(f'{member.path} shrank while streaming')
+                remaining -= len(buf)
+                yield buf
+        pad = _padding(member.size)
+        if pad:
+            yield pad
+    yield _END_OF_ARCHIVE
+
+
+def _write_all(dst, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[dst.write(view):]
+
+
+def _copy_body(src, dst, size: int, chunk_size: int, progress: ProgressCallback | None) -> bool:
+    """Copy ``size`` bytes of ``src`` to ``dst`` with sendfile when possible; False when cancelled."""
+    use_sendfile = hasattr(os, 'sendfile')
+    offset = 0
+    while offset < size:
+        count = min(chunk_size, size - offset)
+        sent = 0
+        if use_sendfile:
+            try:
+                sent = os.sendfile(dst.fileno(), src.fileno(), offset, count)
+            except OSError as exc:
+                if exc.errno not in _SENDFILE_UNSUPPORTED:
+                    raise
+                use_sendfile = False
+        if not use_sendfile:
+            src.seek(offset)
+            buf = src.read(count)
+            _write_all(dst, buf)
+            sent = len(buf)
+        if sent == 0:
+            raise OSError(f'{src.name} shrank while archiving')
+        offset += sent
+        if progress is not None and not progress(sent):
+            return False
+    return True
+
+
+def write_tar_members(
+    dst,
+    members: Iterable[ZipMember],
+    *,
+    progress: ProgressCallback | None = None,
+    chunk_size: int = STREAM_CHUNK_BYTES,
+) -> int | None:
+    """
+    Write a tar archive of ``members`` to ``dst``, an unbuffered binary file.
+
+    Members that cannot be opened are skipped. ``progress`` gets the body bytes
+    copied per chunk. Returns the number of members written, or None when
+    ``progress`` cancelled the archive.
+    """
+    written = 0
+    for member in members:
+        try:
+            src = member.path.open('rb')
+        except OSError as exc:
+            logger.warning('Skipping %s in tar: %s', member.path, exc)
+            continue
+        with src:
+            _write_all(dst, tar_header(member))
+            if not _copy_body(src, dst, member.size, chunk_size, progress):
+                return None
+        _write_all(dst, _padding(member.size))
+        written += 1
+    _write_all(dst, _END_OF_ARCHIVE)
+    return written
@@ -0,0 +1,259 @@
+"""Per-file-type compression policy and parallel deflate for ZIP archives.
+
+Camera raws, JPEGs, SER videos and already-compressed FITS barely shrink, so
+they are STORED; raw FITS is deflated at DOWNLOAD_ZIP_FITS_LEVEL (low by
+default: most of the gain for a fraction of the CPU time) and everything else at
+DOWNLOAD_ZIP_DEFAULT_LEVEL.
+
+write_zip_members() writes members in order. With more than one worker, deflated
+members are compressed ahead in a thread pool (zlib releases the GIL) into
+spooled temporary files, and obs_run.services.zip_writer copies the raw deflate
+data into the archive (zipfile cannot take pre-compressed data through its
+public API), so a large job uses several cores instead of one.
+"""
+from __future__ import annotations
+
+import logging
+import tempfile
+import threading
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable
+
+from django.conf import settings
+
+from obs_run.services.zip_writer import ZipWriter
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 1024 * 1024  # 1 MiB
+# Compressed output kept in memory per pending member before spilling to disk
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+DEFAULT_STORED_EXTENSIONS = (
+    '.cr2', '.cr3', '.nef', '.arw', '.dng', '.orf', '.raf', '.rw2',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp',
+    '.ser', '.avi', '.mp4', '.mov', '.mkv',
+    '.fz', '.gz', '.bz2', '.xz', '.zip', '.7z',
+)
+FITS_EXTENSIONS = ('.fits', '.fit', '.fts')
+
+# Tile-compressed FITS (fpack) keeps a FITS suffix; its compressed HDU header has ZIMAGE = T
+_FITS_SNIFF_BYTES = 6 * 2880
+_ZIMAGE_CARD = b'ZIMAGE  =                    T'
+
+# progress callback: called with the number of input bytes just archived; return False to cancel
+ProgressCallback = Callable[[int], bool]
+
+
+@dataclass(frozen=True)
+class ZipCompression:
+    compress_type: int
+    compresslevel: int | None = None
+
+
+STORED = ZipCompression(zipfile.ZIP_STORED)
+
+
+def _setting_level(name: str, default: int | None) -> int | None:
+    value = getattr(settings, name, default)
+    if value is None or value == '':
+        return None
+    return max(0, min(9, int(value)))
+
+
+def stored_extensions() -> tuple[str, ...]:
+    exts = getattr(settings, 'DOWNLOAD_ZIP_STORED_EXTENSIONS', None)
+    if exts is None:
+        return DEFAULT_STORED_EXTENSIONS
+    return tuple(e.lower() if e.startswith('.') else f'.{e.lower()}' for e in exts if e)
+
+
+def policy_fingerprint() -> dict:
+    """Settings that change archive bytes; part of the archive reuse digest."""
+    return {
+        'stored': sorted(stored_extensions()),
+        'fits_level': _setting_level('DOWNLOAD_ZIP_FITS_LEVEL', 1),
+        'default_level': _setting_level('DOWNLOAD_ZIP_DEFAULT_LEVEL', 6),
+    }
+
+
+def zip_workers() -> int:
+    return max(1, int(getattr(settings, 'DOWNLOAD_ZIP_WORKERS', 4)))
+
+
+def parallel_min_bytes() -> int:
+    """Archives below this input size are deflated in the calling thread."""
+    return int(getattr(settings, 'DOWNLOAD_ZIP_PARALLEL_MIN_BYTES', 256 * 1024 ** 2))
+
+
+def is_tile_compressed_fits(path: Path) -> bool:
+    try:
+        with Path(path).open('rb') as fh:
+            head = fh.read(_FITS_SNIFF_BYTES)
+    except OSError:
+        return False
+    return _ZIMAGE_CARD in head
+
+
+def compression_for_path(path: Path) -> ZipCompression:
+    """Compression (type, level) for a file based on its suffix (and FITS tile compression)."""
+    suffix = Path(path).suffix.lower()
+    if suffix in stored_extensions():
+        return STORED
+    if suffix in FITS_EXTENSIONS:
+        if is_tile_compressed_fits(path):
+            return STORED
+        level = _setting_level('DOWNLOAD_ZIP_FITS_LEVEL', 1)
+    else:
+        level = _setting_level('DOWNLOAD_ZIP_DEFAULT_LEVEL', 6)
+    if level == 0:
+        return STORED
+    return ZipCompression(zipfile.ZIP_DEFLATED, level)
+
+
+def open_member(zf: zipfile.ZipFile, arcname: str, compression: ZipCompression, *, force_zip64: bool = False):
+    """Write handle for ``arcname`` using ``compression`` (per member, not the archive default)."""
+    zf.compression = compression.compress_type
+    zf.compresslevel = compression.compresslevel
+    return zf.open(arcname, 'w', force_zip64=force_zip64)
+
+
+def _copy_member(zf, member, compression, chunk_size, progress) -> bool:
+    force_zip64 = member.size * 1.05 >= zipfile.ZIP64_LIMIT
+    with member.path.open('rb') as src, open_member(zf, member.arcname, compression, force_zip64=force_zip64) as dst:
+        while True:
+            buf = src.read(chunk_size)
+            if not buf:
+                break
+            dst.write(buf)
+            if progress is not None and progress(len(buf)) is False:
+                return False
+    return True
+
+
+@dataclass
+class _Deflated:
+    crc: int
+    file_size: int
+    compress_size: int
+    spool: tempfile.SpooledTemporaryFile
+
+
+def _deflate_to_spool(path: Path, level: int | None, chunk_size: int, spool_dir, cancelled: threading.Event):
+    """Raw-deflate ``path`` into a spooled temp file (runs in a worker thread)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, dir=spool_dir)
+    try:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION if level is None else level, zlib.DEFLATED, -15)
+        crc = 0
+        size = 0
+        with path.open('rb') as src:
+            while not cancelled.is_set():
+                buf = src.read(chunk_size)
+                if not buf:
+                    break
+                crc = zlib.crc32(buf, crc)
+                size += len(buf)
+                spool.write(compressor.compress(buf))
+        spool.write(compressor.flush())
+        return _Deflated(crc=crc, file_size=size, compress_size=spool.tell(), spool=spool)
+    except BaseException:
+        spool.close()
+        raise
+
+
+def write_zip_members(
+    fh,
+    members: Iterable,
+    *,
+    workers: int = 1,
+    progress: ProgressCallback | None = None,
+    chunk_size: int = CHUNK_BYTES,
+    spool_dir=None,
+) -> int | None:
+    """
+    Write a ZIP archive of ``members`` (objects with path, arcname, size) to ``fh`` in order.
+
+    ``fh`` is a seekable binary file. Each member uses compression_for_path().
+    With ``workers`` > 1 deflated members are compressed in a thread pool ahead
+    of the writer, and the archive is written by ZipWriter. Unreadable members
+    are skipped. ``progress`` gets the input bytes archived (per chunk, or per
+    member for pool-compressed members). Returns the number of members written,
+    or None when ``progress`` cancelled the archive.
+    """
+    members = list(members)
+    plans = [(m, compression_for_path(m.path)) for m in members]
+    if workers <= 1:
+        with zipfile.ZipFile(fh, 'w') as zf:
+            for member, compression in plans:
+                try:
+                    if not _copy_member(zf, member, compression, chunk_size, progress):
+                        return None
+                except OSError as exc:
+                    logger.warning('Skipping %s in ZIP: %s', member.path, exc)
+            return len(zf.filelist)
+
+    writer = ZipWriter(fh)
+    cancelled = threading.Event()
+    window = 2 * workers
+    pending: deque = deque()
+    plan_iter = iter(plans)
+
+    def submit_next(pool) -> bool:
+        item = next(plan_iter, None)
+        if item is None:
+            return False
+        member, compression = item
+        future = None
+        if compression.compress_type == zipfile.ZIP_DEFLATED:
+            future = pool.submit(
+                _deflate_to_spool, member.path, compression.compresslevel, chunk_size, spool_dir, cancelled,
+            )
+        pending.append((member, future))
+        return True
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='zip-deflate') as pool:
+        try:
+            while len(pending) < window and submit_next(pool):
+                pass
+            while pending:
+                member, future = pending.popleft()
+                submit_next(pool)
+                if future is None:
+                    try:
+                        src = member.path.open('rb')
+                    except OSError as exc:
+                        logger.warning('Skipping %s in ZIP: %s', member.path, exc)
+                        continue
+                    with src:
+                        if not writer.write_stored(member.arcname, src, chunk_size=chunk_size, progress=progress):
+                            return None
+                    continue
+                try:
+                    deflated = future.result()
+                except OSError as exc:
+                    logger.warning('Skipping %s in ZIP: %s', member.path, exc)
+                    continue
+                with deflated.spool:
+                    deflated.spool.seek(0)
+                    writer.write_compressed(
+                        member.arcname, deflated.spool, crc=deflated.crc, file_size=deflated.file_size,
+                        compress_size=deflated.compress_size, chunk_size=chunk_size,
+                    )
+                if progress is not None and progress(deflated.file_size) is False:
+                    return None
+            writer.close()
+            return len(writer.entries)
+        finally:
+            cancelled.set()
+            for _member, future in pending:
+                if future is None or future.cancel():
+                    continue
+                try:
+                    future.result().spool.close()
+                except Exception:
+                    pass
@@ -0,0 +1,132 @@
+"""On-the-fly ZIP archives for streaming download responses.
+
+The archive is written through zipfile into a non-seekable sink, so every member
+gets a data descriptor (sizes and CRC after the data) and nothing is buffered
+beyond one read chunk. Members that may exceed 4 GiB are written with ZIP64;
+per-member compression follows obs_run.services.zip_compression.
+"""
+from __future__ import annotations
+
+import logging
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from django.conf import settings
+
+from obs_run.services.datafile_paths import PathOutsideDataRoot, safe_datafile_path
+from obs_run.services.zip_compression import compression_for_path, open_member
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_BYTES = 1024 * 1024  # 1 MiB
+
+
+@dataclass(frozen=True)
+class ZipMember:
+    datafile_id: int
+    path: Path
+    arcname: str
+    size: int
+    mtime: float = 0.0
+
+
+def zip_arcname(datafile_id: int, path: Path) -> str:
+    """Archive member name; the DataFile pk keeps names unique across runs."""
+    return f"{datafile_id}_{path.name}"
+
+
+def collect_zip_members(files: Iterable) -> list[ZipMember]:
+    """Existing files (inside DATA_DIRECTORY) of ``files`` with their sizes, in input order."""
+    members: list[ZipMember] = []
+    for df in files:
+        try:
+            p = safe_datafile_path(df.datafile, must_exist=True)
+            if not p.is_file():
+                continue
+            st = p.stat()
+        except (PathOutsideDataRoot, FileNotFoundError, OSError):
+            continue
+        members.append(ZipMember(
+            datafile_id=df.pk, path=p, arcname=zip_arcname(df.pk, p), size=st.st_size, mtime=st.st_mtime,
+        ))
+    return members
+
+
+def stream_limits() -> tuple[int, int]:
+    """(max files, max bytes) a selection may have to be streamed instead of queued as a job."""
+    max_files = int(getattr(settings, 'DOWNLOAD_STREAM_MAX_FILES', 100))
+    max_bytes = int(getattr(settings, 'DOWNLOAD_STREAM_MAX_BYTES', 512 * 1024 ** 2))
+    return max_files, max_bytes
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object collecting ZIP output between yields."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._buffered = 0
+        self._pos = 0
+
+    def write(self, data) -> int:
+        n = len(data)
+        if n:
+            self._chunks.append(bytes(data))
+            self._buffered += n
+            self._pos += n
+        return n
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    @property
+    def buffered(self) -> int:
+        return self._buffered
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self._buffered = 0
+        return data
+
+
+def iter_zip_stream(
+    members: Iterable[ZipMember],
+    *,
+    chunk_size: int = STREAM_CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of ``members`` in chunks of roughly ``chunk_size`` bytes.
+
+    A member that cannot be opened is skipped; a read error after its data has
+    started is raised (the response is then truncated and the client sees a
+    broken download rather than a silently incomplete archive).
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', allowZip64=True) as zf:
+        for member in members:
+            try:
+                src = member.path.open('rb')
+            except OSError as exc:
+                logger.warning('Skipping %s in streamed ZIP: %s', member.path, exc)
+                continue
+            # Sizes are only known after the data (data descriptor); decide ZIP64 up front
+            force_zip64 = member.size * 1.05 >= zipfile.ZIP64_LIMIT
+            compression = compression_for_path(member.path)
+            with src, open_member(zf, member.arcname, compression, force_zip64=force_zip64) as dst:
+                while True:
+                    buf = src.read(chunk_size)
+                    if not buf:
+                        break
+                    dst.write(buf)
+                    if sink.buffered >= chunk_size:
+                        yield sink.drain()
+            if sink.buffered >= chunk_size:
+                yield sink.drain()
+    tail = sink.drain()
+    if tail:
+        yield tail
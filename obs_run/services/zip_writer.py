@@ -0,0 +1,174 @@
+"""Minimal ZIP writer for members whose data is produced outside zipfile.
+
+zipfile only accepts uncompressed data, so members deflated ahead of time in a
+thread pool (obs_run.services.zip_compression) cannot be added through its
+public API. ZipWriter writes the local headers, member data and central
+directory itself (PKWARE APPNOTE 6.3, the same layout zipfile reads back), with
+ZIP64 records for members or archives beyond 4 GiB. The output must be
+seekable: STORED members get their CRC patched into the local header after the
+copy, so every header carries the final sizes and no data descriptors are used.
+"""
+from __future__ import annotations
+
+import os
+import struct
+import time
+import zipfile
+import zlib
+from dataclasses import dataclass
+from typing import BinaryIO, Callable
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+_END_RECORD = struct.Struct('<IHHHHIIH')
+_ZIP64_END_RECORD = struct.Struct('<IQHHIIQQQQ')
+_ZIP64_LOCATOR = struct.Struct('<IIQI')
+
+_LOCAL_SIG = 0x04034B50
+_CENTRAL_SIG = 0x02014B50
+_END_SIG = 0x06054B50
+_ZIP64_END_SIG = 0x06064B50
+_ZIP64_LOCATOR_SIG = 0x07064B50
+_ZIP64_EXTRA_ID = 0x0001
+
+_UTF8_FLAG = 0x800
+_MADE_BY_UNIX = 3 << 8
+_U16_MAX = 0xFFFF
+_U32_MAX = 0xFFFFFFFF
+_FILE_MODE = 0o600 << 16
+
+
+def _dos_datetime(timestamp: float) -> tuple[int, int]:
+    t = time.localtime(timestamp)
+    year = max(1980, min(2107, t.tm_year))
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+@dataclass
+class _Entry:
+    name: bytes
+    flags: int
+    compress_type: int
+    dos_time: int
+    dos_date: int
+    header_offset: int
+    zip64: bool
+    crc: int = 0
+    file_size: int = 0
+    compress_size: int = 0
+
+    @property
+    def version(self) -> int:
+        if self.zip64:
+            return 45
+        return 20 if self.compress_type == zipfile.ZIP_DEFLATED else 10
+
+    def local_header(self) -> bytes:
+        extra = b''
+        file_size, compress_size = self.file_size, self.compress_size
+        if self.zip64:
+            extra = struct.pack('<HHQQ', _ZIP64_EXTRA_ID, 16, file_size, compress_size)
+            file_size = compress_size = _U32_MAX
+        return _LOCAL_HEADER.pack(
+            _LOCAL_SIG, self.version, self.flags, self.compress_type, self.dos_time, self.dos_date,
+            self.crc, compress_size, file_size, len(self.name), len(extra),
+        ) + self.name + extra
+
+    def central_header(self) -> bytes:
+        fields = []
+        file_size, compress_size, offset = self.file_size, self.compress_size, self.header_offset
+        # zipfile reads the ZIP64 fields in this order, for the header values set to 0xFFFFFFFF
+        if self.zip64:
+            fields += [file_size, compress_size]
+            file_size = compress_size = _U32_MAX
+        if offset >= _U32_MAX:
+            fields.append(offset)
+            offset = _U32_MAX
+        extra = struct.pack(f'<HH{len(fields)}Q', _ZIP64_EXTRA_ID, 8 * len(fields), *fields) if fields else b''
+        return _CENTRAL_HEADER.pack(
+            _CENTRAL_SIG, _MADE_BY_UNIX | self.version, self.version, self.flags, self.compress_type,
+            self.dos_time, self.dos_date, self.crc, compress_size, file_size,
+            len(self.name), len(extra), 0, 0, 0, _FILE_MODE, offset,
+        ) + self.name + extra
+
+
+class ZipWriter:
+    """Append members to a new ZIP archive on the seekable binary file ``fh``."""
+
+    def __init__(self, fh: BinaryIO):
+        self.fh = fh
+        self.entries: list[_Entry] = []
+
+    def _start(self, arcname: str, compress_type: int, zip64: bool, **sizes) -> _Entry:
+        try:
+            name, flags = arcname.encode('ascii'), 0
+        except UnicodeEncodeError:
+            name, flags = arcname.encode('utf-8'), _UTF8_FLAG
+        dos_time, dos_date = _dos_datetime(time.time())
+        entry = _Entry(
+            name=name, flags=flags, compress_type=compress_type, dos_time=dos_time, dos_date=dos_date,
+            header_offset=self.fh.tell(), zip64=zip64, **sizes,
+        )
+        self.fh.write(entry.local_header())
+        return entry
+
+    def write_compressed(self, arcname: str, src: BinaryIO, *, crc: int, file_size: int, compress_size: int,
+                         chunk_size: int) -> None:
+        """Add a member from raw deflate data in ``src`` whose CRC and sizes are known."""
+        zip64 = max(file_size, compress_size) >= zipfile.ZIP64_LIMIT
+        entry = self._start(
+            arcname, zipfile.ZIP_DEFLATED, zip64, crc=crc, file_size=file_size, compress_size=compress_size,
+        )
+        while True:
+            buf = src.read(chunk_size)
+            if not buf:
+                break
+            self.fh.write(buf)
+        self.entries.append(entry)
+
+    def write_stored(self, arcname: str, src: BinaryIO, *, chunk_size: int,
+                     progress: Callable[[int], bool] | None = None) -> bool:
+        """
+        Add a STORED member copied from the open file ``src``.
+
+        At most the size ``src`` had when the copy started is archived. Returns
+        False (leaving the archive unfinished) when ``progress`` cancelled it.
+        """
+        remaining = os.fstat(src.fileno()).st_size
+        entry = self._start(arcname, zipfile.ZIP_STORED, remaining >= zipfile.ZIP64_LIMIT)
+        crc = 0
+        size = 0
+        while remaining > 0:
+            buf = src.read(min(chunk_size, remaining))
+            if not buf:
+                break
+            self.fh.write(buf)
+            crc = zlib.crc32(buf, crc)
+            size += len(buf)
+            remaining -= len(buf)
+            if progress is not None and progress(len(buf)) is False:
+                return False
+        end = self.fh.tell()
+        entry.crc, entry.file_size, entry.compress_size = crc, size, size
+        self.fh.seek(entry.header_offset)
+        self.fh.write(entry.local_header())
+        self.fh.seek(end)
+        self.entries.append(entry)
+        return True
+
+    def close(self) -> None:
+        """Write the central directory (with ZIP64 end records when needed)."""
+        cd_offset = self.fh.tell()
+        for entry in self.entries:
+            self.fh.write(entry.central_header())
+        cd_size = self.fh.tell() - cd_offset
+        count = len(self.entries)
+        if count >= _U16_MAX or cd_offset >= _U32_MAX or cd_size >= _U32_MAX:
+            zip64_offset = self.fh.tell()
+            self.fh.write(_ZIP64_END_RECORD.pack(
+                _ZIP64_END_SIG, _ZIP64_END_RECORD.size - 12, _MADE_BY_UNIX | 45, 45, 0, 0,
+                count, count, cd_size, cd_offset,
+            ))
+            self.fh.write(_ZIP64_LOCATOR.pack(_ZIP64_LOCATOR_SIG, 0, zip64_offset, 1))
+            count, cd_size, cd_offset = min(count, _U16_MAX), min(cd_size, _U32_MAX), min(cd_offset, _U32_MAX)
+        self.fh.write(_END_RECORD.pack(_END_SIG, 0, 0, count, count, cd_size, cd_offset, 0))
@@ -0,0 +1,292 @@
+"""Persistent SIMBAD response cache shared across processes (see SimbadQueryCache)."""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+from datetime import timedelta
+from typing import Any
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from adminops.redis_helpers import RedisHashCounters
+from obs_run.models import SimbadQueryCache
+
+logger = logging.getLogger(__name__)
+
+_STATS_KEY = 'ostdata:simbad:cache:stats'
+_STAT_FIELDS = ('hits', 'negative_hits', 'field_hits', 'misses', 'stores', 'negative_stores')
+_STATS = RedisHashCounters(_STATS_KEY, _STAT_FIELDS)
+
+
+def _enabled() -> bool:
+    return bool(getattr(settings, 'SIMBAD_CACHE_ENABLED', True))
+
+
+def _ttl_seconds() -> int:
+    return int(getattr(settings, 'SIMBAD_CACHE_TTL_SECONDS', 30 * 24 * 3600))
+
+
+def _negative_ttl_seconds() -> int:
+    return int(getattr(settings, 'SIMBAD_CACHE_NEGATIVE_TTL_SECONDS', 24 * 3600))
+
+
+def _grid_deg() -> float:
+    """Grid (deg) that cone centers are rounded to when building cache keys."""
+    return float(getattr(settings, 'SIMBAD_CACHE_GRID_ARCSEC', 2.0)) / 3600.0
+
+
+def _count(field: str) -> None:
+    _STATS.incr(field)
+
+
+def get_cache_stats() -> dict[str, Any]:
+    """Return hit/miss counters (Redis when available, else this process) and hit rate."""
+    stats, source = _STATS.snapshot()
+    lookups = stats['hits'] + stats['negative_hits'] + stats['misses']
+    stats['lookups'] = lookups
+    stats['hit_rate'] = round((stats['hits'] + stats['negative_hits']) / lookups, 4) if lookups else 0.0
+    stats['source'] = source
+    return stats
+
+
+def reset_cache_stats() -> None:
+    _STATS.reset()
+
+
+def _digest(query: dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(query, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def normalize_object_name(name: str) -> str:
+    return ' '.join(str(name or '').strip().split()).lower()
+
+
+def object_query_key(name: str, *, row_limit: int, fields: tuple[str, ...]) -> tuple[str, dict[str, Any]]:
+    """Cache key and normalized parameters for an object-name lookup."""
+    query = {
+        'kind': SimbadQueryCache.KIND_OBJECT,
+        'name': normalize_object_name(name),
+        'row_limit': int(row_limit),
+        'fields': sorted(fields),
+    }
+    return _digest(query), query
+
+
+def region_query_key(
+    ra_deg: float,
+    dec_deg: float,
+    radius_str: str,
+    *,
+    row_limit: int,
+    fields: tuple[str, ...],
+) -> tuple[str, dict[str, Any]]:
+    """Cache key and normalized parameters for a cone search (center rounded to the grid)."""
+    grid = _grid_deg()
+    ra = float(ra_deg) % 360.0
+    dec = float(dec_deg)
+    if grid > 0:
+        ra = round(ra / grid) * grid % 360.0
+        dec = round(dec / grid) * grid
+    query = {
+        'kind': SimbadQueryCache.KIND_REGION,
+        'ra': round(ra, 6),
+        'dec': round(dec, 6),
+        'radius': str(radius_str).strip().lower(),
+        'row_limit': int(row_limit),
+        'fields': sorted(fields),
+    }
+    return _digest(query), query
+
+
+def _serialize_table(table) -> str:
+    out = table.copy(copy_data=False)
+    out.meta.clear()
+    buf = io.StringIO()
+    out.write(buf, format='ascii.ecsv')
+    return buf.getvalue()
+
+
+def _deserialize_table(payload: str):
+    from astropy.table import Table
+    return Table.read(payload, format='ascii.ecsv')
+
+
+def cache_lookup(key: str) -> tuple[bool, Any]:
+    """
+    Look up a cached SIMBAD answer.
+
+    Returns (hit, table). A hit with table None is a cached negative answer.
+    """
+    if not _enabled():
+        return False, None
+    now = timezone.now()
+    try:
+        entry = (
+            SimbadQueryCache.objects.filter(key=key, expires_at__gt=now)
+            .only('pk', 'is_negative', 'payload')
+            .first()
+        )
+    except Exception as exc:
+        logger.debug('SIMBAD cache lookup failed: %s', exc)
+        return False, None
+    if entry is None:
+        _count('misses')
+        return False, None
+
+    table = None
+    if not entry.is_negative:
+        try:
+            table = _deserialize_table(entry.payload)
+        except Exception as exc:
+            logger.warning('Discarding unreadable SIMBAD cache entry %s: %s', key[:12], exc)
+            SimbadQueryCache.objects.filter(pk=entry.pk).delete()
+            _count('misses')
+            return False, None
+    try:
+        SimbadQueryCache.objects.filter(pk=entry.pk).update(hit_count=F('hit_count') + 1, last_hit_at=now)
+    except Exception:
+        pass
+    _count('negative_hits' if entry.is_negative else 'hits')
+    return True, table
+
+
+def _cone_geometry(query: dict[str, Any]) -> dict[str, float | None]:
+    if query.get('kind') != SimbadQueryCache.KIND_REGION:
+        return {'cone_ra': None, 'cone_dec': None, 'cone_radius_deg': None}
+    from astropy.coordinates import Angle
+    try:
+        radius_deg = float(Angle(query['radius']).deg)
+    except Exception:
+        radius_deg = None
+    return {'cone_ra': query.get('ra'), 'cone_dec': query.get('dec'), 'cone_radius_deg': radius_deg}
+
+
+def cache_store(key: str, query: dict[str, Any], table) -> None:
+    """Store a SIMBAD answer; None or an empty table is stored as a negative entry."""
+    if not _enabled():
+        return
+    negative = table is None or len(table) == 0
+    payload = ''
+    if not negative:
+        try:
+            payload = _serialize_table(table)
+        except Exception as exc:
+            logger.debug('SIMBAD result not cacheable (%s)', exc)
+            return
+    now = timezone.now()
+    ttl = _negative_ttl_seconds() if negative else _ttl_seconds()
+    if ttl <= 0:
+        return
+    try:
+        SimbadQueryCache.objects.update_or_create(
+            key=key,
+            defaults={
+                'kind': query.get('kind', ''),
+                'query': query,
+                'is_negative': negative,
+                'payload': payload,
+                'row_count': 0 if negative else len(table),
+                'created_at': now,
+                'expires_at': now + timedelta(seconds=ttl),
+                **_cone_geometry(query),
+            },
+        )
+    except Exception as exc:
+        logger.debug('SIMBAD cache store failed: %s', exc)
+        return
+    _count('negative_stores' if negative else 'stores')
+
+
+def _field_reuse_ttl_seconds() -> int:
+    return int(getattr(settings, 'SIMBAD_CACHE_FIELD_REUSE_TTL_SECONDS', 7 * 24 * 3600))
+
+
+def lookup_containing_cone(
+    ra_deg: float,
+    dec_deg: float,
+    radius_deg: float,
+    *,
+    row_limit: int,
+    fields: tuple[str, ...],
+) -> tuple[bool, Any]:
+    """
+    Answer a cone search from a cached, larger cone that fully contains it.
+
+    Only complete cached answers qualify (fewer rows than their row limit, so
+    nothing was cut off) that are younger than SIMBAD_CACHE_FIELD_REUSE_TTL_SECONDS.
+    Returns (hit, table) like cache_lookup; the table holds the cached rows
+    inside the requested cone, nearest first, capped at ``row_limit``.
+    """
+    ttl = _field_reuse_ttl_seconds()
+    if not _enabled() or ttl <= 0:
+        return False, None
+    from obs_run.wcs_utils import angular_separation_deg
+
+    now = timezone.now()
+    radius_deg = float(radius_deg)
+    # Stored centers are rounded to the key grid; shrink cached cones accordingly.
+    slack = _grid_deg()
+    try:
+        candidates = list(
+            SimbadQueryCache.objects.filter(
+                kind=SimbadQueryCache.KIND_REGION,
+                expires_at__gt=now,
+                created_at__gte=now - timedelta(seconds=ttl),
+                cone_radius_deg__gte=radius_deg + slack,
+                cone_dec__gte=float(dec_deg) - F('cone_radius_deg') + radius_deg + slack,
+                cone_dec__lte=float(dec_deg) + F('cone_radius_deg') - radius_deg - slack,
+            )
+            .order_by('cone_radius_deg')
+            .only('pk', 'query', 'is_negative', 'payload', 'row_count', 'cone_ra', 'cone_dec', 'cone_radius_deg')
+        )
+    except Exception as exc:
+        logger.debug('SIMBAD field lookup failed: %s', exc)
+        return False, None
+
+    wanted_fields = sorted(fields)
+    for entry in candidates:
+        query = entry.query or {}
+        if query.get('fields') != wanted_fields:
+            continue
+        if entry.row_count >= int(query.get('row_limit') or 0):
+            continue
+        separation = float(angular_separation_deg(entry.cone_ra, entry.cone_dec, ra_deg, dec_deg))
+        if separation + radius_deg + slack > entry.cone_radius_deg:
+            continue
+        if entry.is_negative:
+            table = None
+        else:
+            try:
+                table = _deserialize_table(entry.payload)
+            except Exception:
+                continue
+            sep = angular_separation_deg(
+                np.asarray(table['ra'], dtype=float), np.asarray(table['dec'], dtype=float), ra_deg, dec_deg,
+            )
+            inside = np.flatnonzero(sep <= radius_deg)
+            table = table[inside[np.argsort(sep[inside], kind='stable')][:int(row_limit)]]
+        try:
+            SimbadQueryCache.objects.filter(pk=entry.pk).update(hit_count=F('hit_count') + 1, last_hit_at=now)
+        except Exception:
+            pass
+        _count('field_hits')
+        return True, table
+    return False, None
+
+
+def purge_cache(*, kind: str | None = None, expired_only: bool = False, negative_only: bool = False) -> int:
+    """Delete cache entries; returns the number of rows removed."""
+    qs = SimbadQueryCache.objects.all()
+    if kind:
+        qs = qs.filter(kind=kind)
+    if expired_only:
+        qs = qs.filter(expires_at__lte=timezone.now())
+    if negative_only:
+        qs = qs.filter(is_negative=True)
+    deleted, _ = qs.delete()
+    return int(deleted)
@@ -0,0 +1,147 @@
+"""Concurrent SIMBAD driver for bulk object re-checks (reevaluate_stars, reanalyse_objects).
+
+Jobs are prepared in the calling thread, their SIMBAD queries run in a small
+thread pool (every query still passes the shared rate limiter, so the pool only
+keeps requests in flight within the global budget), and results are applied
+back in the calling thread in input order, in batched transactions. After each
+committed batch the key of its last job is written to a checkpoint file so an
+interrupted pass can resume after it.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def pipeline_workers() -> int:
+    return max(1, int(getattr(settings, 'SIMBAD_PIPELINE_WORKERS', 4)))
+
+
+def pipeline_batch_size() -> int:
+    return max(1, int(getattr(settings, 'SIMBAD_PIPELINE_BATCH_SIZE', 50)))
+
+
+class PipelineCheckpoint:
+    """JSON checkpoint file holding the last committed job key and the pass options."""
+
+    def __init__(self, name: str, directory: str | Path | None = None):
+        if directory is None:
+            directory = getattr(
+                settings, 'SIMBAD_PIPELINE_CHECKPOINT_DIR', Path(settings.BASE_DIR) / 'data' / 'simbad_checkpoints',
+            )
+        self.path = Path(directory) / f'{name}.json'
+
+    def load(self) -> dict[str, Any] | None:
+        try:
+            with open(self.path, encoding='utf-8') as handle:
+                return json.load(handle)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            logger.warning('Ignoring unreadable SIMBAD pipeline checkpoint %s: %s', self.path, exc)
+            return None
+
+    def save(self, state: dict[str, Any]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as handle:
+            json.dump({**state, 'updated_at': timezone.now().isoformat()}, handle)
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _fetch_in_worker(fetch: Callable[[Any], Any], job: Any) -> Any:
+    try:
+        return fetch(job)
+    finally:
+        # Worker threads may touch the database (SIMBAD cache); do not leak their connections
+        connections.close_all()
+
+
+def run_simbad_pipeline(
+    jobs: Iterable[Any],
+    fetch: Callable[[Any], Any],
+    apply: Callable[[Any, Any], Any],
+    *,
+    workers: int | None = None,
+    batch_size: int | None = None,
+    on_batch_committed: Callable[[Any, dict[str, int]], None] | None = None,
+) -> dict[str, int]:
+    """
+    Run ``fetch(job)`` concurrently and ``apply(job, result)`` in order, in batched transactions.
+
+    ``jobs`` is consumed lazily in the calling thread (prepare DB-dependent inputs
+    there); ``fetch`` runs in worker threads and should only talk to SIMBAD.
+    A failing fetch is passed to ``apply`` as the exception instance. Each apply
+    runs in its own savepoint, so one failing object does not roll back its batch.
+    ``on_batch_committed(last_job, stats)`` is called after every commit.
+
+    Returns counters: submitted, applied, errors, batches.
+    """
+    workers = workers or pipeline_workers()
+    batch_size = batch_size or pipeline_batch_size()
+    stats = {'submitted': 0, 'applied': 0, 'errors': 0, 'batches': 0}
+    window = workers * 2
+    pending: deque = deque()
+    batch: list[tuple[Any, Any]] = []
+
+    def commit_batch():
+        if not batch:
+            return
+        with transaction.atomic():
+            for job, result in batch:
+                try:
+                    with transaction.atomic():
+                        apply(job, result)
+                    stats['applied'] += 1
+                except Exception as exc:
+                    logger.exception('SIMBAD pipeline apply failed for %r: %s', job, exc)
+                    stats['errors'] += 1
+        stats['batches'] += 1
+        last_job = batch[-1][0]
+        batch.clear()
+        if on_batch_committed is not None:
+            on_batch_committed(last_job, stats)
+
+    def drain_one():
+        job, future = pending.popleft()
+        try:
+            result = future.result()
+        except Exception as exc:
+            result = exc
+        batch.append((job, result))
+        if len(batch) >= batch_size:
+            commit_batch()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='simbad-pipeline') as executor:
+        try:
+            for job in jobs:
+                pending.append((job, executor.submit(_fetch_in_worker, fetch, job)))
+                stats['submitted'] += 1
+                while len(pending) >= window:
+                    drain_one()
+            while pending:
+                drain_one()
+            commit_batch()
+        except BaseException:
+            # Interrupted: drop queued fetches; committed batches stay checkpointed
+            for _, future in pending:
+                future.cancel()
+            raise
+    return stats
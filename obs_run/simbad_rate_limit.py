@@ -1,72 +1,186 @@
-"""Distributed SIMBAD query rate limiting (shared across Celery workers)."""
+"""Distributed SIMBAD rate limiting (token bucket shared across all processes).
+
+Every SIMBAD request goes through acquire_simbad_slot(). Buckets are
+implemented as GCRA (a token bucket expressed as a "theoretical arrival
+time"): each caller atomically reserves the next free slot in Redis and then
+sleeps until it, so short bursts pass immediately, the sustained rate is
+global, and waiters are served in arrival order without holding a lock.
+Without Redis the same algorithm runs per process.
+
+Buckets:
+- 'simbad': all SIMBAD network queries (SIMBAD_RATE_LIMIT_PER_SECOND / _BURST)
+- 'aux': additional, slower bucket for auxiliary-object cone lookups
+  (AUX_OBJECTS_SIMBAD_MIN_INTERVAL_SECONDS / AUX_OBJECTS_SIMBAD_BURST)
+"""
 from __future__ import annotations
 
 import logging
 import threading
 import time
+from typing import Any
 
 from django.conf import settings
 
+from adminops.redis_helpers import get_shared_redis
+
 logger = logging.getLogger(__name__)
 
+BUCKET_SIMBAD = 'simbad'
+BUCKET_AUX = 'aux'
+BUCKETS = (BUCKET_SIMBAD, BUCKET_AUX)
+
+_REDIS_TAT_KEY = 'ostdata:simbad:ratelimit:{bucket}:tat'
+_REDIS_STATS_KEY = 'ostdata:simbad:ratelimit:{bucket}:stats'
+
 _LOCAL_LOCK = threading.Lock()
-_LOCAL_LAST_QUERY_TS = 0.0
-_REDIS_KEY = 'ostdata:simbad:last_query_ts'
-_REDIS_LOCK_KEY = 'ostdata:simbad:query_lock'
+_LOCAL_TAT: dict[str, float] = {}
+_LOCAL_STATS: dict[str, dict[str, float]] = {}
 
+# KEYS[1] = TAT key, KEYS[2] = stats hash; ARGV[1] = emission interval (s), ARGV[2] = burst.
+# Returns the wait (s) before the reserved slot, as a string (Lua numbers are truncated).
+_GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local emission = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tat < now then tat = now end
+local new_tat = tat + emission
+local wait = new_tat - burst * emission - now
+if wait < 0.000001 then wait = 0 end
+redis.call('SET', KEYS[1], string.format('%.6f', new_tat), 'PX', math.ceil((new_tat - now) * 1000) + 1000)
+redis.call('HINCRBY', KEYS[2], 'acquired', 1)
+if wait > 0 then
+  redis.call('HINCRBY', KEYS[2], 'waited', 1)
+  redis.call('HINCRBYFLOAT', KEYS[2], 'wait_seconds_total', wait)
+  local max = tonumber(redis.call('HGET', KEYS[2], 'wait_seconds_max') or '0')
+  if wait > max then redis.call('HSET', KEYS[2], 'wait_seconds_max', string.format('%.6f', wait)) end
+end
+return string.format('%.6f', wait)
+"""
 
-def _min_interval_seconds() -> float:
-    return float(getattr(settings, 'AUX_OBJECTS_SIMBAD_MIN_INTERVAL_SECONDS', 10.0))
 
+def _bucket_config(bucket: str) -> tuple[float, float]:
+    """Return (rate per second, burst) for a bucket; rate <= 0 disables limiting."""
+    if bucket == BUCKET_AUX:
+        interval = float(getattr(settings, 'AUX_OBJECTS_SIMBAD_MIN_INTERVAL_SECONDS', 10.0))
+        rate = 1.0 / interval if interval > 0 else 0.0
+        burst = float(getattr(settings, 'AUX_OBJECTS_SIMBAD_BURST', 1))
+    else:
+        rate = float(getattr(settings, 'SIMBAD_RATE_LIMIT_PER_SECOND', 3.0))
+        burst = float(getattr(settings, 'SIMBAD_RATE_LIMIT_BURST', 5))
+    return rate, max(1.0, burst)
 
-def _get_redis_client():
-    try:
-        from adminops.redis_helpers import get_redis_from_broker
-        return get_redis_from_broker()
-    except Exception:
-        return None
 
+def _record_local(bucket: str, wait: float) -> None:
+    stats = _LOCAL_STATS.setdefault(bucket, {})
+    stats['acquired'] = stats.get('acquired', 0) + 1
+    if wait > 0:
+        stats['waited'] = stats.get('waited', 0) + 1
+        stats['wait_seconds_total'] = stats.get('wait_seconds_total', 0.0) + wait
+        stats['wait_seconds_max'] = max(stats.get('wait_seconds_max', 0.0), wait)
 
-def _local_wait(interval: float) -> None:
-    global _LOCAL_LAST_QUERY_TS
+
+def _reserve_local(bucket: str, emission: float, burst: float) -> float:
     with _LOCAL_LOCK:
-        now = time.time()
-        wait = interval - (now - _LOCAL_LAST_QUERY_TS)
-        if wait > 0:
-            time.sleep(wait)
-            now = time.time()
-        _LOCAL_LAST_QUERY_TS = now
+        now = time.monotonic()
+        tat = max(_LOCAL_TAT.get(bucket, 0.0), now)
+        new_tat = tat + emission
+        _LOCAL_TAT[bucket] = new_tat
+        wait = new_tat - burst * emission - now
+        # Ignore float noise from accumulating emission intervals
+        wait = wait if wait >= 1e-6 else 0.0
+        _record_local(bucket, wait)
+        return wait
+
 
+def _reserve_redis(client, bucket: str, emission: float, burst: float) -> float:
+    raw = client.eval(
+        _GCRA_SCRIPT,
+        2,
+        _REDIS_TAT_KEY.format(bucket=bucket),
+        _REDIS_STATS_KEY.format(bucket=bucket),
+        repr(emission),
+        repr(burst),
+    )
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8')
+    return max(0.0, float(raw))
 
-def wait_for_aux_simbad_query_slot() -> None:
+
+def acquire_simbad_slot(bucket: str = BUCKET_SIMBAD) -> float:
     """
-    Block until at least AUX_OBJECTS_SIMBAD_MIN_INTERVAL_SECONDS have elapsed
-    since the last SIMBAD query (cluster lookup) across all workers.
+    Reserve the next slot in ``bucket`` and sleep until it is due.
+
+    Returns the time waited in seconds.
     """
-    interval = _min_interval_seconds()
-    client = _get_redis_client()
-    if client is None:
-        _local_wait(interval)
-        return
-
-    try:
-        lock = client.lock(_REDIS_LOCK_KEY, timeout=120, blocking_timeout=120)
-        if not lock.acquire(blocking=True):
-            logger.warning('SIMBAD rate limit lock timeout; proceeding with local wait')
-            _local_wait(interval)
-            return
+    rate, burst = _bucket_config(bucket)
+    if rate <= 0:
+        return 0.0
+    emission = 1.0 / rate
+    wait = None
+    client = get_shared_redis()
+    if client is not None:
         try:
-            while True:
-                now = time.time()
-                last_raw = client.get(_REDIS_KEY)
-                last = float(last_raw) if last_raw else 0.0
-                wait = interval - (now - last)
-                if wait <= 0:
-                    client.set(_REDIS_KEY, str(now))
-                    return
-                time.sleep(min(wait, 1.0))
-        finally:
-            lock.release()
-    except Exception as exc:
-        logger.warning('Redis SIMBAD rate limit failed (%s); using local fallback', exc)
-        _local_wait(interval)
+            wait = _reserve_redis(client, bucket, emission, burst)
+        except Exception as exc:
+            logger.debug('Redis SIMBAD rate limit failed (%s); using local bucket', exc)
+    if wait is None:
+        wait = _reserve_local(bucket, emission, burst)
+    if wait > 0:
+        time.sleep(wait)
+    return wait
+
+
+def wait_for_aux_simbad_query_slot() -> float:
+    """Wait for the auxiliary-objects bucket (AUX_OBJECTS_SIMBAD_MIN_INTERVAL_SECONDS)."""
+    return acquire_simbad_slot(BUCKET_AUX)
+
+
+def get_rate_limit_stats() -> dict[str, dict[str, Any]]:
+    """Per-bucket configuration and wait-time metrics (Redis when available, else this process)."""
+    client = get_shared_redis()
+    out: dict[str, dict[str, Any]] = {}
+    for bucket in BUCKETS:
+        rate, burst = _bucket_config(bucket)
+        raw = None
+        if client is not None:
+            try:
+                raw = client.hgetall(_REDIS_STATS_KEY.format(bucket=bucket))
+            except Exception:
+                raw = None
+        if raw is not None:
+            values = {
+                (k.decode('utf-8') if isinstance(k, bytes) else str(k)): float(v)
+                for k, v in raw.items()
+            }
+            source = 'redis'
+        else:
+            with _LOCAL_LOCK:
+                values = dict(_LOCAL_STATS.get(bucket, {}))
+            source = 'local'
+        acquired = int(values.get('acquired', 0))
+        waited = int(values.get('waited', 0))
+        total = float(values.get('wait_seconds_total', 0.0))
+        out[bucket] = {
+            'rate_per_second': rate,
+            'burst': burst,
+            'acquired': acquired,
+            'waited': waited,
+            'wait_seconds_total': round(total, 3),
+            'wait_seconds_max': round(float(values.get('wait_seconds_max', 0.0)), 3),
+            'wait_seconds_avg': round(total / acquired, 4) if acquired else 0.0,
+            'source': source,
+        }
+    return out
+
+
+def reset_rate_limit_stats() -> None:
+    client = get_shared_redis()
+    if client is not None:
+        try:
+            client.delete(*[_REDIS_STATS_KEY.format(bucket=b) for b in BUCKETS])
+        except Exception:
+            pass
+    with _LOCAL_LOCK:
+        _LOCAL_STATS.clear()
@@ -0,0 +1,161 @@
+"""Batched multi-cone SIMBAD lookups over TAP (one ADQL query for many cones)."""
+from __future__ import annotations
+
+import logging
+import warnings
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Sequence
+
+import numpy as np
+from django.conf import settings
+
+from obs_run.simbad_cache import cache_lookup, cache_store, region_query_key
+from obs_run.wcs_utils import angular_separation_deg
+from utilities import _REGION_QUERY_FIELDS, _simbad_rate_limit
+
+logger = logging.getLogger(__name__)
+
+# Same output columns (and names) as Simbad.query_region with _REGION_QUERY_FIELDS,
+# so batched and per-cone answers are interchangeable (and share cache entries).
+_SELECT_COLUMNS = (
+    'basic.main_id',
+    'basic.ra',
+    'basic.dec',
+    'basic.otype',
+    'alltypes.otypes AS "alltypes.otypes"',
+    'ids.ids',
+    'allfluxes.V',
+)
+_JOINS = (
+    'LEFT JOIN alltypes ON basic.oid = alltypes.oidref',
+    'LEFT JOIN ids ON basic.oid = ids.oidref',
+    'LEFT JOIN allfluxes ON basic.oid = allfluxes.oidref',
+)
+
+
+@dataclass(frozen=True)
+class SimbadCone:
+    """One cone of a batched lookup; ``key`` identifies it in the returned mapping."""
+
+    key: Hashable
+    ra: float
+    dec: float
+    radius_deg: float
+    radius_str: str
+
+
+def _tap_url() -> str:
+    return str(getattr(settings, 'SIMBAD_TAP_URL', '') or '').strip()
+
+
+def build_multi_cone_adql(cones: Sequence[SimbadCone], *, top: int) -> str:
+    """ADQL selecting SIMBAD objects inside the union of ``cones`` (at most ``top`` rows)."""
+    criteria = [
+        f"CONTAINS(POINT('ICRS', basic.ra, basic.dec), "
+        f"CIRCLE('ICRS', {float(c.ra)!r}, {float(c.dec)!r}, {float(c.radius_deg)!r})) = 1"
+        for c in cones
+    ]
+    return (
+        f"SELECT TOP {int(top)} {', '.join(_SELECT_COLUMNS)} FROM basic "
+        f"{' '.join(_JOINS)} WHERE ({' OR '.join(criteria)})"
+    )
+
+
+def run_tap_query(adql: str, *, maxrec: int):
+    """
+    Run a synchronous ADQL query against SIMBAD TAP.
+
+    Uses SIMBAD_TAP_URL when set (a mirror or a local stand-in), otherwise the
+    astroquery SIMBAD endpoint.
+    """
+    url = _tap_url()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        if url:
+            import pyvo
+            return pyvo.dal.TAPService(url).run_sync(adql, maxrec=maxrec).to_table()
+        from astroquery.simbad import Simbad
+        return Simbad.query_tap(adql, maxrec=maxrec)
+
+
+def _column_as_float(table, name: str) -> np.ndarray:
+    col = table[name]
+    if hasattr(col, 'filled'):
+        col = col.filled(np.nan)
+    return np.asarray(col, dtype=float)
+
+
+def split_rows_by_cone(table, cones: Sequence[SimbadCone], *, row_limit: int) -> dict[Hashable, Any]:
+    """
+    Split a multi-cone result into per-cone tables.
+
+    Rows inside several overlapping cones are returned for each of them. Each
+    cone keeps at most ``row_limit`` rows, nearest to its center first.
+    """
+    out: dict[Hashable, Any] = {}
+    if table is None or len(table) == 0:
+        return {cone.key: table[:0] if table is not None else None for cone in cones}
+    ras = _column_as_float(table, 'ra')
+    decs = _column_as_float(table, 'dec')
+    for cone in cones:
+        sep = angular_separation_deg(ras, decs, cone.ra, cone.dec)
+        inside = np.flatnonzero(sep <= cone.radius_deg * (1 + 1e-9))
+        order = inside[np.argsort(sep[inside], kind='stable')][:row_limit]
+        out[cone.key] = table[order]
+    return out
+
+
+def query_cones_batched(
+    cones: Sequence[SimbadCone],
+    *,
+    row_limit: int,
+    before_query: Callable[[], None] | None = None,
+    tap_query: Callable[..., Any] | None = None,
+) -> dict[Hashable, Any]:
+    """
+    Resolve many cone searches with a single SIMBAD TAP query.
+
+    Cones already in the shared SIMBAD cache are answered from it; the rest are
+    sent as one ADQL cone union and the rows split back per cone. Returns a
+    mapping cone.key -> table for every cone that could be answered completely.
+    Cones missing from the result (query failed, or the row cap truncated the
+    answer before the cone reached ``row_limit`` rows) should be looked up one
+    by one by the caller. ``before_query`` runs right before the network query
+    (e.g. a distributed rate-limit wait).
+    """
+    answered: dict[Hashable, Any] = {}
+    pending: list[tuple[SimbadCone, str, dict[str, Any]]] = []
+    for cone in cones:
+        cache_key, cache_query = region_query_key(
+            cone.ra, cone.dec, cone.radius_str, row_limit=row_limit, fields=_REGION_QUERY_FIELDS,
+        )
+        hit, cached = cache_lookup(cache_key)
+        if hit:
+            answered[cone.key] = cached
+        else:
+            pending.append((cone, cache_key, cache_query))
+    if not pending:
+        return answered
+
+    pending_cones = [cone for cone, _, _ in pending]
+    top = int(row_limit) * len(pending_cones)
+    adql = build_multi_cone_adql(pending_cones, top=top)
+    try:
+        if before_query is not None:
+            before_query()
+        _simbad_rate_limit()
+        table = (tap_query or run_tap_query)(adql, maxrec=top)
+    except Exception as exc:
+        logger.warning('Batched SIMBAD TAP query for %s cones failed: %s', len(pending_cones), exc)
+        return answered
+
+    truncated = table is not None and len(table) >= top
+    per_cone = split_rows_by_cone(table, pending_cones, row_limit=row_limit)
+    for cone, cache_key, cache_query in pending:
+        result = per_cone.get(cone.key)
+        count = len(result) if result is not None else 0
+        if truncated and count < row_limit:
+            continue
+        cache_store(cache_key, cache_query, result)
+        answered[cone.key] = result
+    return answered
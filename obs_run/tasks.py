@@ -4,8 +4,9 @@ import hashlib
 import json
 import logging
 import os
+import random
 import tempfile
-import zipfile
+import time
 from datetime import timedelta
 from pathlib import Path
 
@@ -13,15 +14,12 @@ from celery import shared_task
 from django.conf import settings
 from django.utils import timezone
 
-from obs_run.datafile_filters import apply_datafile_filters
 from obs_run.models import DataFile, DownloadJob, ObservationRun
 from obs_run.plate_solving import PlateSolvingService, solve_and_update_datafile
 from obs_run.utils import should_allow_auto_update
 from utilities import (
     add_new_data_file,
-    annotate_effective_exposure_type,
     evaluate_data_file,
-    get_effective_exposure_type_filter,
     update_object_photometry_spectroscopy,
     update_observation_run_photometry_spectroscopy,
 )
@@ -82,42 +80,15 @@ def _health_error(task_key: str, error: Exception):
     except Exception:
         pass
 
-def _get_redis_client():
-    """Return a Redis client based on CELERY_BROKER_URL if it's redis://, else None."""
-    try:
-        broker = getattr(settings, 'CELERY_BROKER_URL', '') or os.environ.get('CELERY_BROKER_URL', '')
-        if not broker.startswith('redis'):
-            return None
-        try:
-            import redis  # type: ignore
-        except Exception:
-            return None
-        from urllib.parse import urlparse
-        u = urlparse(broker)
-        host = u.hostname or '127.0.0.1'
-        port = int(u.port or 6379)
-        db = int((u.path or '/0').lstrip('/') or 0)
-        password = u.password
-        return redis.Redis(host=host, port=port, db=db, password=password, socket_timeout=1.0)
-    except Exception:
-        return None
-
-def _cancel_key(job_id: int) -> str:
-    return f'job_cancel:{job_id}'
-
 def _is_cancelled_flag(job_id: int) -> bool:
-    try:
-        client = _get_redis_client()
-        if not client:
-            return False
-        return bool(client.exists(_cancel_key(job_id)))
-    except Exception:
-        return False
+    """Cancel requested for a download job (Redis job hash; False without Redis)."""
+    from obs_run.services.job_progress import JobProgressPublisher
+    return bool(JobProgressPublisher(job_id).cancel_requested())
 
 
 @shared_task(bind=True)
 def build_zip_task(self, job_id: int):
-    """Build a ZIP for a DownloadJob and update its progress fields."""
+    """Build the ZIP (or uncompressed tar) for a DownloadJob and update its progress fields."""
     try:
         job = DownloadJob.objects.get(pk=job_id)
     except DownloadJob.DoesNotExist:
@@ -132,31 +103,24 @@ def build_zip_task(self, job_id: int):
     job.progress = 0
     job.save(update_fields=['status', 'started_at', 'progress'])
 
+    from obs_run.services.job_progress import JobProgressPublisher, checkpoint_seconds
+    publisher = JobProgressPublisher(job.pk)
+
     try:
-        qs = DataFile.objects.all().select_related('observation_run')
-        if job.run_id:
-            qs = qs.filter(observation_run_id=job.run_id)
-
-        from ostdata.custom_permissions import get_allowed_run_objects_to_view_for_user
-        user = job.user
-        qs = get_allowed_run_objects_to_view_for_user(qs, user)
-
-        # Limit to selected ids when provided
-        if job.selected_ids:
-            ids = []
-            for x in job.selected_ids:
-                try:
-                    ids.append(int(x))
-                except Exception:
-                    continue
-            if ids:
-                qs = qs.filter(pk__in=ids)
+        from rest_framework.exceptions import ValidationError
 
-        # Apply filters
-        f = job.filters or {}
-        qs = apply_datafile_filters(qs, f)
+        from obs_run.services.downloads import resolve_visible_datafiles
 
-        files = list(qs)
+        # Same resolution and ACL as at enqueue time; anonymous jobs (no user) only see public runs
+        try:
+            files = list(resolve_visible_datafiles(
+                job.user,
+                run=job.run,
+                selected_ids=job.selected_ids,
+                filters=job.filters,
+            ))
+        except ValidationError:
+            files = []
         if not files:
             job.status = 'failed'
             job.error = 'No files to include'
@@ -189,12 +153,26 @@ def build_zip_task(self, job_id: int):
             job.save(update_fields=['status', 'error', 'finished_at'])
             return
 
+        # An identical selection may have been archived meanwhile: reference that ZIP
+        from obs_run.services.archive_cache import (
+            archive_digest_for_files,
+            complete_job_from_archive,
+            find_reusable_archive,
+        )
+        archive_format = job.archive_format or 'zip'
+        digest = archive_digest_for_files(files, archive_format)
+        donor = find_reusable_archive(digest, exclude_pk=job.pk)
+        if donor is not None:
+            complete_job_from_archive(job, donor)
+            return
+
+        suffix = f'.{archive_format}'
         tmp_dir = getattr(settings, 'DOWNLOAD_JOB_TMP_DIR', None)
         if tmp_dir:
             Path(tmp_dir).mkdir(parents=True, exist_ok=True)
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.zip', dir=str(tmp_dir))
+            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=str(tmp_dir))
         else:
-            tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.zip')
+            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
         tmp_path = tmp.name
         tmp.close()
 
@@ -204,20 +182,10 @@ def build_zip_task(self, job_id: int):
         job.save(update_fields=['file_path', 'bytes_total', 'bytes_done'])
 
         # Compute total size and eligible paths
-        from obs_run.services.datafile_paths import PathOutsideDataRoot, safe_datafile_path
-        total = 0
-        paths: list[tuple[Path, int]] = []
-        for df in files:
-            try:
-                p = safe_datafile_path(df.datafile, must_exist=True)
-            except (PathOutsideDataRoot, FileNotFoundError, OSError):
-                continue
-            if p.is_file():
-                try:
-                    total += p.stat().st_size
-                    paths.append((p, df.pk))
-                except Exception:
-                    continue
+        from obs_run.services.zip_compression import parallel_min_bytes, write_zip_members, zip_workers
+        from obs_run.services.zip_stream import collect_zip_members
+        members = collect_zip_members(files)
+        total = sum(m.size for m in members)
         if total > max_bytes:
             try:
                 if tmp_path and os.path.exists(tmp_path):
@@ -232,68 +200,74 @@ def build_zip_task(self, job_id: int):
             return
         job.bytes_total = total
         job.save(update_fields=['bytes_total'])
+        publisher.publish(bytes_done=0, bytes_total=total, progress=0)
 
         done = 0
-        cancelled_midway = False
-        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
-            for p, dfpk in paths:
-                # Periodically check if job was cancelled
-                try:
-                    if _is_cancelled_flag(job.pk):
-                        cancelled_midway = True
-                        break
+        since_update = 0
+        CHUNK = 1024 * 1024  # 1 MiB
+        checkpoint_every = checkpoint_seconds()
+        last_checkpoint = time.monotonic()
+
+        def _percent() -> int:
+            return int(min(100, max(0, round(done * 100 / total)))) if total > 0 else 0
+
+        def _progress(nbytes: int) -> bool:
+            """
+            Record archived bytes; False cancels the archive.
+
+            Every 4 MiB progress goes to the Redis job hash (which also carries the
+            cancel flag). The row is only checkpointed every DOWNLOAD_JOB_DB_CHECKPOINT_SECONDS,
+            or every 4 MiB when Redis is unavailable.
+            """
+            nonlocal done, since_update, last_checkpoint
+            done += nbytes
+            since_update += nbytes
+            if since_update < (4 * CHUNK) and not (total > 0 and done == total):
+                return True
+            since_update = 0
+            try:
+                cancel = publisher.publish(bytes_done=done, bytes_total=total, progress=_percent())
+                if cancel:
+                    return False
+                now = time.monotonic()
+                if cancel is None or now - last_checkpoint >= checkpoint_every:
+                    last_checkpoint = now
                     current_status = DownloadJob.objects.filter(pk=job.pk).values_list('status', flat=True).first()
                     if current_status == 'cancelled':
-                        cancelled_midway = True
-                        break
-                except Exception:
-                    pass
-                arcname = f"{dfpk}_{p.name}"
-                # Stream file into zip to allow responsive cancellation and progress updates
-                try:
-                    _file_size = p.stat().st_size
-                except Exception:
-                    _file_size = None
-                try:
-                    with p.open('rb') as src, zf.open(arcname, 'w') as dst:
-                        CHUNK = 1024 * 1024  # 1 MiB
-                        since_update = 0
-                        while True:
-                            buf = src.read(CHUNK)
-                            if not buf:
-                                break
-                            dst.write(buf)
-                            lb = len(buf)
-                            done += lb
-                            since_update += lb
-                            # Periodic status check and progress update
-                            if since_update >= (4 * CHUNK) or (total > 0 and done == total):
-                                try:
-                                    if _is_cancelled_flag(job.pk):
-                                        cancelled_midway = True
-                                        break
-                                    current_status = DownloadJob.objects.filter(pk=job.pk).values_list('status', flat=True).first()
-                                    if current_status == 'cancelled':
-                                        cancelled_midway = True
-                                        break
-                                    if total > 0:
-                                        prog = int(min(100, max(0, round(done * 100 / total))))
-                                        DownloadJob.objects.filter(pk=job.pk).update(bytes_done=done, progress=prog)
-                                except Exception:
-                                    pass
-                                since_update = 0
-                    if cancelled_midway:
-                        break
-                    # Final progress update after finishing this file
-                    if total > 0:
-                        try:
-                            prog = int(min(100, max(0, round(done * 100 / total))))
-                            DownloadJob.objects.filter(pk=job.pk).update(bytes_done=done, progress=prog)
-                        except Exception:
-                            pass
-                except Exception:
-                    # Skip unreadable/failed file but continue others
-                    continue
+                        return False
+                    DownloadJob.objects.filter(pk=job.pk).update(bytes_done=done, progress=_percent())
+            except Exception:
+                pass
+            return True
+
+        # Deflate members in a thread pool for large archives (order is preserved)
+        workers = zip_workers() if total >= parallel_min_bytes() else 1
+        cancelled_midway = False
+        if _is_cancelled_flag(job.pk):
+            cancelled_midway = True
+        elif archive_format == 'tar':
+            from obs_run.services.tar_stream import write_tar_members
+
+            # Unbuffered, so member bodies can be sendfile()d straight into the archive
+            with open(tmp_path, 'wb', buffering=0) as fh:
+                written = write_tar_members(fh, members, progress=_progress, chunk_size=CHUNK)
+            cancelled_midway = written is None
+            if written != len(files):
+                digest = ''
+        else:
+            with open(tmp_path, 'wb') as fh:
+                written = write_zip_members(
+                    fh,
+                    members,
+                    workers=workers,
+                    progress=_progress,
+                    chunk_size=CHUNK,
+                    spool_dir=str(tmp_dir) if tmp_dir else None,
+                )
+            cancelled_midway = written is None
+            # Only archives with every selected file may be shared with later jobs
+            if written != len(files):
+                digest = ''
 
         # If cancelled during processing, cleanup and do not override cancelled status
         if cancelled_midway:
@@ -332,7 +306,8 @@ def build_zip_task(self, job_id: int):
         except Exception:
             ttl_hours = 72
         job.expires_at = job.finished_at + timedelta(hours=ttl_hours)
-        job.save(update_fields=['status', 'progress', 'bytes_done', 'finished_at', 'expires_at'])
+        job.archive_digest = digest
+        job.save(update_fields=['status', 'progress', 'bytes_done', 'finished_at', 'expires_at', 'archive_digest'])
         try:
             from adminops.audit_events import log_download_job_event
             log_download_job_event(
@@ -365,6 +340,9 @@ def build_zip_task(self, job_id: int):
                 )
         except Exception:
             pass
+    finally:
+        # The row now holds the final state; drop the live progress hash
+        publisher.clear()
 
 
 @shared_task(bind=True)
@@ -673,9 +651,12 @@ def cleanup_expired_downloads(self):
     """Delete ZIP files for expired DownloadJobs and mark them as expired.
 
     A job is eligible when `expires_at` is set and is in the past.
-    The task removes the file at `file_path` (if it exists), clears `file_path`,
-    and sets `status='expired'` when not already set.
+    The task removes the file at `file_path` (if it exists and no other live job
+    shares it, see services.archive_cache), clears `file_path`, and sets
+    `status='expired'` when not already set.
     """
+    from obs_run.services.archive_cache import release_job_archive
+
     now = timezone.now()
     qs = DownloadJob.objects.filter(expires_at__isnull=False, expires_at__lte=now)
     cleaned = 0
@@ -683,17 +664,7 @@ def cleanup_expired_downloads(self):
     freed_bytes = 0
     for job in qs.only('pk', 'file_path', 'status'):
         try:
-            if job.file_path:
-                p = Path(job.file_path)
-                try:
-                    if p.exists():
-                        try:
-                            freed_bytes += p.stat().st_size
-                        except Exception:
-                            pass
-                        p.unlink()
-                except Exception as e:
-                    logger.warning("Cleanup: failed to delete %s for job #%s: %s", job.file_path, job.pk, e)
+            freed_bytes += release_job_archive(job)
             job.file_path = ''
             if job.status != 'expired':
                 job.status = 'expired'
@@ -807,16 +778,13 @@ def unlink_non_light_datafiles_from_objects(self, dry_run: bool = True):
     through = Object.datafiles.through
     linked_df_ids = through.objects.values_list('datafile_id', flat=True).distinct()
     
-    qs = annotate_effective_exposure_type(DataFile.objects.filter(pk__in=linked_df_ids))
-    non_light = qs.exclude(annotated_effective_exposure_type='LI')
+    non_light = DataFile.objects.filter(pk__in=linked_df_ids).exclude(exposure_type_effective='LI')
     files_found = non_light.count()
     unlinks_done = 0
     objects_updated = set()
     runs_updated = set()
     
     if not dry_run:
-        # Iterate over PKs to avoid AttributeError: annotate adds annotated_effective_exposure_type
-        # which conflicts with DataFile's read-only property of the same name
         for df_pk in non_light.values_list('pk', flat=True):
             try:
                 datafile = DataFile.objects.get(pk=df_pk)
@@ -982,17 +950,15 @@ def refresh_dashboard_stats(self):
         aware_datetime = make_aware(dtime_naive)
         
         # === FILES: Single aggregated query ===
-        # Annotate with effective_exposure_type for spectra counting
-        datafiles_annotated = annotate_effective_exposure_type(DataFile.objects.all())
-        file_stats = datafiles_annotated.aggregate(
+        file_stats = DataFile.objects.aggregate(
             total=Count('pk'),
-            bias=Count('pk', filter=get_effective_exposure_type_filter('BI', '')),
-            darks=Count('pk', filter=get_effective_exposure_type_filter('DA', '')),
-            flats=Count('pk', filter=get_effective_exposure_type_filter('FL', '')),
-            lights=Count('pk', filter=get_effective_exposure_type_filter('LI', '')),
-            waves=Count('pk', filter=get_effective_exposure_type_filter('WA', '')),
+            bias=Count('pk', filter=Q(exposure_type_effective='BI')),
+            darks=Count('pk', filter=Q(exposure_type_effective='DA')),
+            flats=Count('pk', filter=Q(exposure_type_effective='FL')),
+            lights=Count('pk', filter=Q(exposure_type_effective='LI')),
+            waves=Count('pk', filter=Q(exposure_type_effective='WA')),
             # Spectra: Light frames with spectrograph != 'N' (NONE)
-            spectra=Count('pk', filter=Q(annotated_effective_exposure_type='LI') & ~Q(spectrograph='N')),
+            spectra=Count('pk', filter=Q(exposure_type_effective='LI') & ~Q(spectrograph='N')),
             fits=Count('pk', filter=Q(file_type='FITS')),
             jpeg=Count('pk', filter=Q(file_type='JPG')),
             cr2=Count('pk', filter=Q(file_type='CR2')),
@@ -1107,7 +1073,7 @@ def plate_solve_pending_files(self):
     
     Processes up to PLATE_SOLVING_BATCH_SIZE files per run (default: 10).
     """
-    from django.db.models import Case, CharField, F, Q, Value, When
+    from django.db.models import Q
     
     try:
         from adminops.redis_helpers import plate_solving_task_enabled_get
@@ -1129,33 +1095,8 @@ def plate_solve_pending_files(self):
             spectroscopy=False  # Exclude files marked as spectroscopy
         )
         
-        # Annotate with effective_exposure_type and filter for Light frames
-        # Use a different annotation name to avoid conflict with the property
-        queryset = queryset.annotate(
-            annotated_effective_exposure_type=Case(
-                # Priority 1: User-set type
-                When(
-                    Q(exposure_type_user__isnull=False) & ~Q(exposure_type_user=''),
-                    then='exposure_type_user'
-                ),
-                # Priority 2: ML type matches header type
-                When(
-                    Q(exposure_type_ml__isnull=False) & 
-                    ~Q(exposure_type_ml='') & 
-                    Q(exposure_type_ml=F('exposure_type')),
-                    then='exposure_type_ml'
-                ),
-                # Priority 3: ML type doesn't match header type -> Unknown
-                When(
-                    Q(exposure_type_ml__isnull=False) & ~Q(exposure_type_ml=''),
-                    then=Value('UK')
-                ),
-                # Priority 4: Header-based type
-                default='exposure_type',
-                output_field=CharField(max_length=2)
-            )
-        )
-        queryset = queryset.filter(annotated_effective_exposure_type='LI')
+        # Light frames only (stored effective exposure type)
+        queryset = queryset.filter(exposure_type_effective='LI')
         
         # Limit to batch size
         files_to_process = list(queryset[:batch_size])
@@ -1202,11 +1143,12 @@ def re_evaluate_plate_solved_files(self):
     2. WCS center coordinates differ from header (ra,dec) by more than threshold.
 
     Only processes files with re_evaluated_after_plate_solve=False (avoids double evaluation,
-    independent of Redis persistence).
+    independent of Redis persistence). Up to PLATE_SOLVING_RE_EVAL_BATCH_SIZE files are
+    screened in bulk; at most PLATE_SOLVING_RE_EVAL_MAX_EVALUATIONS of them are evaluated,
+    the remaining candidates stay unflagged for the next run.
     """
-    import astropy.units as u
-    from astropy.coordinates import SkyCoord
-    from django.db.models import Case, CharField, F, Q, Value, When
+
+    from obs_run.plate_solving import select_re_evaluation_candidates
 
     try:
         from adminops.redis_helpers import plate_solving_task_enabled_get
@@ -1221,7 +1163,8 @@ def re_evaluate_plate_solved_files(self):
             return {'skipped': True, 'reason': 'disabled'}
 
     threshold_arcmin = getattr(settings, 'PLATE_SOLVING_RE_EVAL_COORD_THRESHOLD_ARCMIN', 5.0)
-    batch_size = getattr(settings, 'PLATE_SOLVING_RE_EVAL_BATCH_SIZE', 50)
+    batch_size = int(getattr(settings, 'PLATE_SOLVING_RE_EVAL_BATCH_SIZE', 2000))
+    max_evaluations = int(getattr(settings, 'PLATE_SOLVING_RE_EVAL_MAX_EVALUATIONS', 50))
 
     # Only process files not yet re-evaluated (flag-based, avoids double evaluation, Redis-independent)
     queryset = DataFile.objects.filter(
@@ -1230,60 +1173,40 @@ def re_evaluate_plate_solved_files(self):
         wcs_override=False,
         spectrograph='N',
         spectroscopy=False,
-    ).select_related('observation_run')
-    queryset = queryset.annotate(
-        annotated_effective_exposure_type=Case(
-            When(Q(exposure_type_user__isnull=False) & ~Q(exposure_type_user=''), then='exposure_type_user'),
-            When(
-                Q(exposure_type_ml__isnull=False) & ~Q(exposure_type_ml='') & Q(exposure_type_ml=F('exposure_type')),
-                then='exposure_type_ml'
-            ),
-            When(Q(exposure_type_ml__isnull=False) & ~Q(exposure_type_ml=''), then=Value('UK')),
-            default='exposure_type',
-            output_field=CharField(max_length=2)
-        )
     )
-    queryset = queryset.filter(annotated_effective_exposure_type='LI')
+    queryset = queryset.filter(exposure_type_effective='LI').order_by('pk')
+
+    candidate_pks, skip_pks = select_re_evaluation_candidates(queryset[:batch_size], threshold_arcmin)
+    deferred = max(0, len(candidate_pks) - max_evaluations)
+    candidate_pks = candidate_pks[:max_evaluations]
+
+    # Files that need no evaluation are marked processed in one UPDATE
+    skipped = len(skip_pks)
+    if skip_pks:
+        DataFile.objects.filter(pk__in=skip_pks).update(re_evaluated_after_plate_solve=True)
 
     evaluated = 0
-    skipped = 0
     errors = 0
 
-    for datafile in queryset[:batch_size]:
+    for datafile in DataFile.objects.filter(pk__in=candidate_pks).select_related('observation_run').order_by('pk'):
         try:
-            condition1 = (datafile.ra in (-1, None) or datafile.dec in (-1, None))
-            condition2 = False
-            if not condition1 and datafile.wcs_ra is not None and datafile.wcs_dec is not None:
-                c_header = SkyCoord(ra=datafile.ra * u.deg, dec=datafile.dec * u.deg)
-                c_wcs = SkyCoord(ra=datafile.wcs_ra * u.deg, dec=datafile.wcs_dec * u.deg)
-                sep_arcmin = float(c_header.separation(c_wcs).arcmin)  # type: ignore[arg-type]
-                condition2 = sep_arcmin > float(threshold_arcmin)
-
-            if condition1 or condition2:
-                if datafile.observation_run and datafile.wcs_ra is not None and datafile.wcs_dec is not None:
-                    evaluate_data_file(
-                        datafile,
-                        datafile.observation_run,
-                        skip_if_object_has_overrides=True,
-                    )
-                    update_observation_run_photometry_spectroscopy(datafile.observation_run)
-                    for obj in datafile.object_set.all():
-                        update_object_photometry_spectroscopy(obj)
-                    evaluated += 1
-                    logger.debug(f"Re-evaluated plate-solved file {datafile.pk} (cond1={condition1}, cond2={condition2})")
-                else:
-                    skipped += 1
-            else:
-                skipped += 1
-            # Mark as processed to avoid double evaluation (independent of Redis persistence)
-            DataFile.objects.filter(pk=datafile.pk).update(re_evaluated_after_plate_solve=True)
+            evaluate_data_file(
+                datafile,
+                datafile.observation_run,
+                skip_if_object_has_overrides=True,
+            )
+            update_observation_run_photometry_spectroscopy(datafile.observation_run)
+            for obj in datafile.object_set.all():
+                update_object_photometry_spectroscopy(obj)
+            evaluated += 1
+            logger.debug(f"Re-evaluated plate-solved file {datafile.pk}")
         except Exception as e:
             errors += 1
             logger.warning(f"Re-evaluation failed for datafile {datafile.pk}: {e}")
-            # Still mark as processed to avoid retrying failed files indefinitely
-            DataFile.objects.filter(pk=datafile.pk).update(re_evaluated_after_plate_solve=True)
+        # Mark as processed (also on failure) to avoid retrying files indefinitely
+        DataFile.objects.filter(pk=datafile.pk).update(re_evaluated_after_plate_solve=True)
 
-    result = {'evaluated': evaluated, 'skipped': skipped, 'errors': errors}
+    result = {'evaluated': evaluated, 'skipped': skipped, 'errors': errors, 'deferred': deferred}
     _health_set('re_evaluate_plate_solved_files', result)
     if evaluated or errors:
         logger.info(f"Re-evaluation of plate-solved files: {result}")
@@ -1301,47 +1224,90 @@ def _aux_objects_task_enabled() -> bool:
     return bool(getattr(settings, 'AUX_OBJECTS_ENABLED', False))
 
 
-def _run_aux_objects_compute(run_id: int, *, force: bool = False) -> dict:
-    from obs_run.aux_objects import (
-        compute_aux_objects,
-        save_aux_objects_result,
+def _save_aux_objects_outcome(run: ObservationRun, outcome) -> dict:
+    from obs_run.aux_objects import save_aux_objects_result
+
+    if isinstance(outcome, Exception):
+        save_aux_objects_result(
+            run,
+            objects=[],
+            meta={},
+            status=ObservationRun.AUX_STATUS_ERROR,
+            error=str(outcome),
+        )
+        return {'run_id': run.pk, 'ok': False, 'error': str(outcome)}
+
+    save_aux_objects_result(
+        run,
+        objects=outcome['objects'],
+        meta=outcome['meta'],
+        status=ObservationRun.AUX_STATUS_READY,
     )
+    return {
+        'run_id': run.pk,
+        'ok': True,
+        'object_count': len(outcome.get('objects') or []),
+        'simbad_query_count': (outcome.get('meta') or {}).get('simbad_query_count', 0),
+    }
+
 
+def _load_aux_objects_run(run_id: int, *, force: bool = False):
+    """Return (run, None) when the run needs computing, else (None, skip result)."""
     try:
         run = ObservationRun.objects.get(pk=run_id)
     except ObservationRun.DoesNotExist:
-        return {'run_id': run_id, 'skipped': True, 'reason': 'not_found'}
+        return None, {'run_id': run_id, 'skipped': True, 'reason': 'not_found'}
 
     if not run.photometry:
-        return {'run_id': run_id, 'skipped': True, 'reason': 'not_photometry'}
+        return None, {'run_id': run_id, 'skipped': True, 'reason': 'not_photometry'}
 
     if not force and run.aux_objects_status == ObservationRun.AUX_STATUS_READY and run.aux_objects_computed_at:
-        return {'run_id': run_id, 'skipped': True, 'reason': 'already_ready'}
+        return None, {'run_id': run_id, 'skipped': True, 'reason': 'already_ready'}
+    return run, None
+
+
+def _run_aux_objects_compute(run_id: int, *, force: bool = False) -> dict:
+    from obs_run.aux_objects import compute_aux_objects
+
+    run, skipped = _load_aux_objects_run(run_id, force=force)
+    if run is None:
+        return skipped
 
     try:
-        result = compute_aux_objects(run)
-        save_aux_objects_result(
-            run,
-            objects=result['objects'],
-            meta=result['meta'],
-            status=ObservationRun.AUX_STATUS_READY,
-        )
-        return {
-            'run_id': run_id,
-            'ok': True,
-            'object_count': len(result.get('objects') or []),
-            'simbad_query_count': (result.get('meta') or {}).get('simbad_query_count', 0),
-        }
+        outcome = compute_aux_objects(run)
     except Exception as exc:
         logger.exception('aux objects compute failed for run %s: %s', run_id, exc)
-        save_aux_objects_result(
-            run,
-            objects=[],
-            meta={},
-            status=ObservationRun.AUX_STATUS_ERROR,
-            error=str(exc),
-        )
-        return {'run_id': run_id, 'ok': False, 'error': str(exc)}
+        outcome = exc
+    return _save_aux_objects_outcome(run, outcome)
+
+
+def _run_aux_objects_compute_many(run_ids: list[int], *, force_run_ids=()) -> list[dict]:
+    """Compute several runs together so their pointing clusters share SIMBAD queries."""
+    from obs_run.aux_objects import compute_aux_objects_many
+
+    force_set = set(force_run_ids or ())
+    results = []
+    runs = []
+    for run_id in run_ids:
+        run, skipped = _load_aux_objects_run(run_id, force=run_id in force_set)
+        if run is None:
+            results.append(skipped)
+        else:
+            runs.append(run)
+    if not runs:
+        return results
+
+    try:
+        outcomes = compute_aux_objects_many(runs)
+    except Exception as exc:
+        logger.exception('aux objects batch compute failed for runs %s: %s', [r.pk for r in runs], exc)
+        outcomes = {run.pk: exc for run in runs}
+    for run in runs:
+        outcome = outcomes[run.pk]
+        if isinstance(outcome, Exception):
+            logger.warning('aux objects compute failed for run %s: %s', run.pk, outcome)
+        results.append(_save_aux_objects_outcome(run, outcome))
+    return results
 
 
 @shared_task(bind=True, max_retries=1, default_retry_delay=120)
@@ -1358,15 +1324,30 @@ def compute_aux_objects_for_run(self, run_id: int, force: bool = False):
         raise
 
 
-def enqueue_aux_objects_for_run(run_id: int, *, force: bool = False) -> bool:
-    """Mark run pending and enqueue Celery task. Returns True when enqueued."""
+@shared_task(bind=True, max_retries=1, default_retry_delay=120)
+def compute_aux_objects_for_runs(self, run_ids: list[int], force_run_ids: list[int] | None = None):
+    """Compute SIMBAD auxiliary objects for a group of runs with shared batched SIMBAD queries."""
+    try:
+        results = _run_aux_objects_compute_many(list(run_ids), force_run_ids=force_run_ids or ())
+        summary = {
+            'runs': len(results),
+            'ok': sum(1 for r in results if r.get('ok')),
+            'skipped': sum(1 for r in results if r.get('skipped')),
+            'errors': sum(1 for r in results if not r.get('ok') and not r.get('skipped')),
+        }
+        _health_set('compute_aux_objects_for_runs', summary)
+        return {**summary, 'results': results}
+    except Exception as exc:
+        _health_error('compute_aux_objects_for_runs', exc)
+        raise
+
+
+def _claim_aux_objects_run(run_id: int, *, force: bool = False) -> bool:
+    """Mark a run pending when it needs an aux-objects computation. Returns True when claimed."""
     from django.db import transaction
 
     from obs_run.aux_objects import mark_aux_objects_pending, should_enqueue_aux_objects_for_run
 
-    if not getattr(settings, 'AUX_OBJECTS_ENABLED', False):
-        return False
-
     try:
         run = ObservationRun.objects.get(pk=run_id)
     except ObservationRun.DoesNotExist:
@@ -1380,18 +1361,52 @@ def enqueue_aux_objects_for_run(run_id: int, *, force: bool = False) -> bool:
         if not should_enqueue_aux_objects_for_run(run, force=force):
             return False
         mark_aux_objects_pending(run)
+    return True
 
+
+def _dispatch_aux_objects_task(task, *args, **kwargs) -> None:
     if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
-        compute_aux_objects_for_run(run_id, force=force)
+        task(*args, **kwargs)
+        return
+    delay = getattr(task, 'delay', None)
+    if callable(delay):
+        delay(*args, **kwargs)
     else:
-        delay = getattr(compute_aux_objects_for_run, 'delay', None)
-        if callable(delay):
-            delay(run_id, force=force)
-        else:
-            compute_aux_objects_for_run(run_id, force=force)
+        task(*args, **kwargs)
+
+
+def enqueue_aux_objects_for_run(run_id: int, *, force: bool = False) -> bool:
+    """Mark run pending and enqueue Celery task. Returns True when enqueued."""
+    if not getattr(settings, 'AUX_OBJECTS_ENABLED', False):
+        return False
+
+    if not _claim_aux_objects_run(run_id, force=force):
+        return False
+
+    _dispatch_aux_objects_task(compute_aux_objects_for_run, run_id, force=force)
     return True
 
 
+def enqueue_aux_objects_for_runs(run_ids: list[int], *, force_run_ids=()) -> list[int]:
+    """
+    Mark runs pending and enqueue them as one grouped task (shared SIMBAD queries).
+
+    Returns the ids of the runs that were enqueued.
+    """
+    if not getattr(settings, 'AUX_OBJECTS_ENABLED', False):
+        return []
+
+    force_set = set(force_run_ids or ())
+    claimed = [run_id for run_id in run_ids if _claim_aux_objects_run(run_id, force=run_id in force_set)]
+    if claimed:
+        _dispatch_aux_objects_task(
+            compute_aux_objects_for_runs,
+            claimed,
+            force_run_ids=[run_id for run_id in claimed if run_id in force_set],
+        )
+    return claimed
+
+
 @shared_task(bind=True, max_retries=2, default_retry_delay=60)
 def process_aux_objects_queue(self):
     """
@@ -1428,12 +1443,23 @@ def process_aux_objects_queue(self):
 
     enqueued = 0
     skipped = 0
-    for run_id in run_ids:
-        force = run_id in outdated_ids
-        if enqueue_aux_objects_for_run(run_id, force=force):
-            enqueued += 1
-        else:
-            skipped += 1
+    group_size = max(1, int(getattr(settings, 'AUX_OBJECTS_RUNS_PER_TASK', 1)))
+    if group_size > 1:
+        for start in range(0, len(run_ids), group_size):
+            group = run_ids[start:start + group_size]
+            claimed = enqueue_aux_objects_for_runs(
+                group,
+                force_run_ids=[run_id for run_id in group if run_id in outdated_ids],
+            )
+            enqueued += len(claimed)
+            skipped += len(group) - len(claimed)
+    else:
+        for run_id in run_ids:
+            force = run_id in outdated_ids
+            if enqueue_aux_objects_for_run(run_id, force=force):
+                enqueued += 1
+            else:
+                skipped += 1
 
     result = {
         'candidates': len(run_ids),
@@ -1447,3 +1473,109 @@ def process_aux_objects_queue(self):
         logger.info('Aux objects queue: %s', result)
     return result
 
+
+
+_PRERENDER_SLOT_KEY = 'ostdata:thumbnails:prerender:slot:{}'
+# A worker killed mid-render frees its slot when the lease runs out
+_PRERENDER_SLOT_TTL = 600
+# Marks a DataFile as queued; covers the retries of a task waiting for a slot
+_PRERENDER_QUEUED_KEY = 'ostdata:thumbnails:prerender:queued:{}'
+_PRERENDER_QUEUED_TTL = 300
+
+
+def _acquire_prerender_slot(client) -> tuple[bool, tuple[str, str] | None]:
+    """
+    Lease one of THUMBNAIL_PRERENDER_CONCURRENCY slots. Returns (may_run, lease).
+
+    Each slot is a Redis key set with NX and a TTL, so a slot leaked by a dead
+    worker expires on its own. Without Redis (or with a limit of 0)
+    pre-rendering is not bounded here and only the worker concurrency applies.
+    """
+    from adminops.redis_helpers import acquire_slot_lease
+
+    limit = int(getattr(settings, 'THUMBNAIL_PRERENDER_CONCURRENCY', 2))
+    if client is None or limit <= 0:
+        return True, None
+    try:
+        lease = acquire_slot_lease(client, _PRERENDER_SLOT_KEY, limit, _PRERENDER_SLOT_TTL)
+    except Exception:
+        return True, None
+    return lease is not None, lease
+
+
+def _release_prerender_slot(client, lease: tuple[str, str]) -> None:
+    from adminops.redis_helpers import release_slot_lease
+
+    release_slot_lease(client, lease)
+
+
+@shared_task(bind=True, max_retries=20, ignore_result=True)
+def prerender_datafile_thumbnails(self, datafile_id: int):
+    """Render the gallery thumbnail sizes of a DataFile into the thumbnail cache (queued at ingest)."""
+    try:
+        df = DataFile.objects.get(pk=datafile_id)
+    except DataFile.DoesNotExist:
+        return {'skipped': 'missing'}
+
+    from adminops.redis_helpers import get_shared_redis
+    client = get_shared_redis()
+    may_run, lease = _acquire_prerender_slot(client)
+    if not may_run:
+        if self.request.retries >= self.max_retries:
+            # The thumbnail is still rendered (and cached) on first request
+            return {'skipped': 'busy'}
+        # All slots busy: back off instead of competing with interactive thumbnail requests
+        raise self.retry(countdown=30 + random.randint(0, 30))
+    try:
+        from obs_run.thumbnails import prerender_thumbnails
+        return prerender_thumbnails(df)
+    except Exception as exc:
+        logger.warning('Thumbnail pre-rendering failed for DataFile %s: %s', datafile_id, exc)
+        return {'error': str(exc)}
+    finally:
+        if lease is not None:
+            _release_prerender_slot(client, lease)
+
+
+def enqueue_thumbnail_prerender(datafile_id: int, file_type: str | None = None, *, dedupe: bool = False) -> bool:
+    """
+    Queue thumbnail pre-rendering for a DataFile once the surrounding transaction commits.
+
+    Tasks go to THUMBNAIL_PRERENDER_QUEUE (default queue when empty) with the
+    lowest priority. With ``dedupe`` a DataFile is queued at most once per
+    _PRERENDER_QUEUED_TTL (tracked in Redis), for callers that poll. Returns
+    False when disabled, the file type has no preview or it was queued recently.
+    """
+    if not getattr(settings, 'THUMBNAIL_PRERENDER_ENABLED', True):
+        return False
+    from obs_run.thumbnails import PRERENDER_FILE_TYPES
+    if file_type is not None and file_type.upper() not in PRERENDER_FILE_TYPES:
+        return False
+    if dedupe:
+        from adminops.redis_helpers import get_shared_redis
+        client = get_shared_redis()
+        if client is not None:
+            try:
+                if not client.set(_PRERENDER_QUEUED_KEY.format(datafile_id), '1', nx=True, ex=_PRERENDER_QUEUED_TTL):
+                    return False
+            except Exception:
+                pass
+
+    from django.db import transaction
+
+    def _dispatch():
+        try:
+            if getattr(settings, 'CELERY_TASK_ALWAYS_EAGER', False):
+                prerender_datafile_thumbnails.apply(args=[datafile_id])
+                return
+            options = {'priority': int(getattr(settings, 'THUMBNAIL_PRERENDER_PRIORITY', 9)), 'retry': False}
+            queue = getattr(settings, 'THUMBNAIL_PRERENDER_QUEUE', '')
+            if queue:
+                options['queue'] = queue
+            prerender_datafile_thumbnails.apply_async(args=[datafile_id], **options)
+        except Exception as exc:
+            # Ingest must not fail because the broker is down; thumbnails render on demand
+            logger.warning('Could not queue thumbnail pre-rendering for DataFile %s: %s', datafile_id, exc)
+
+    transaction.on_commit(_dispatch)
+    return True
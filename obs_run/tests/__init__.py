@@ -0,0 +1,36 @@
+"""Shared fixtures of the obs_run tests."""
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.cache import cache
+from django.test import override_settings
+
+
+class ClearCacheMixin:
+    """Clears the Django cache after each test, which hands the anonymous API throttle budget back."""
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(cache.clear)
+
+
+class TempDirMixin(ClearCacheMixin):
+    """
+    Each test gets an empty directory ``self.tmp`` (a Path, removed afterwards).
+
+    Settings returned by tmp_settings() apply while the test runs. Celery uses an
+    in-memory broker, so tasks queued on commit never try to reach Redis.
+    """
+
+    def tmp_settings(self) -> dict:
+        """Settings pointing into ``self.tmp``."""
+        return {}
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        settings_ctx = override_settings(CELERY_BROKER_URL='memory://', **self.tmp_settings())
+        settings_ctx.enable()
+        self.addCleanup(settings_ctx.disable)
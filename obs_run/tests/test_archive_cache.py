@@ -0,0 +1,106 @@
+"""Tests for content-addressed reuse of download archives."""
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from obs_run.models import DataFile, DownloadJob, ObservationRun
+from obs_run.services.archive_cache import archive_digest, archive_digest_for_pks
+from obs_run.tasks import build_zip_task, cleanup_expired_downloads
+from obs_run.tests import TempDirMixin
+
+User = get_user_model()
+
+
+class ArchiveReuseTest(TempDirMixin, APITestCase):
+    def tmp_settings(self):
+        return {'DATA_DIRECTORY': self.tmp, 'DOWNLOAD_JOB_TMP_DIR': self.tmp / 'jobs'}
+
+    def setUp(self):
+        super().setUp()
+        self.run = ObservationRun.objects.create(name='Reuse run', is_public=True)
+        self.files = []
+        for i, name in enumerate(('light_1.fits', 'light_2.fits')):
+            path = self.tmp / name
+            path.write_bytes(b'SIMPLE  ' * 100)
+            self.files.append(DataFile.objects.create(
+                observation_run=self.run, datafile=str(path), file_type='FITS',
+                file_size=800, content_hash=f'{i:064x}',
+            ))
+        self.client.get('/api/users/auth/csrf/')
+
+    def _csrf(self):
+        token = self.client.cookies.get('csrftoken')
+        return {'HTTP_X_CSRFTOKEN': token.value} if token else {}
+
+    def _build_first(self, user):
+        job = DownloadJob.objects.create(user=user, run=self.run, selected_ids=[df.pk for df in self.files], filters={})
+        build_zip_task.run(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        return job
+
+    def test_digest_covers_content_and_policy(self):
+        pairs = [(df.pk, df.content_hash) for df in self.files]
+        digest = archive_digest(pairs)
+        self.assertEqual(digest, archive_digest(reversed(pairs)))
+        self.assertEqual(digest, archive_digest_for_pks([df.pk for df in self.files]))
+        self.assertNotEqual(digest, archive_digest([(self.files[0].pk, 'f' * 64), pairs[1]]))
+        with override_settings(DOWNLOAD_ZIP_FITS_LEVEL=9):
+            self.assertNotEqual(digest, archive_digest(pairs))
+        self.assertEqual(archive_digest([(self.files[0].pk, '')]), '')
+
+    @patch('obs_run.services.downloads.build_zip_task.delay')
+    def test_identical_request_completes_by_reference(self, delay):
+        owner = User.objects.create_user(username='first', password='pass')
+        first = self._build_first(owner)
+        self.assertTrue(first.archive_digest)
+
+        second_user = User.objects.create_user(username='second', password='pass')
+        self.client.force_login(second_user)
+        resp = self.client.post(
+            f'/api/runs/runs/{self.run.pk}/download-jobs/',
+            {'ids': [df.pk for df in self.files], 'filters': {}},
+            format='json',
+            **self._csrf(),
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        delay.assert_not_called()
+        second = DownloadJob.objects.get(pk=resp.data['job_id'])
+        self.assertEqual((second.status, second.file_path), ('done', first.file_path))
+        status_resp = self.client.get(f'/api/runs/jobs/{second.pk}/status')
+        self.assertEqual(status_resp.data['url'], f'/api/runs/jobs/{second.pk}/download')
+
+        # A different selection is built normally
+        self.client.post(
+            f'/api/runs/runs/{self.run.pk}/download-jobs/',
+            {'ids': [self.files[0].pk], 'filters': {}},
+            format='json',
+            **self._csrf(),
+        )
+        delay.assert_called_once()
+
+    def test_shared_archive_survives_until_last_reference_expires(self):
+        first = self._build_first(None)
+        queued = DownloadJob.objects.create(run=self.run, selected_ids=[df.pk for df in self.files], filters={})
+        build_zip_task.run(queued.pk)
+        queued.refresh_from_db()
+        self.assertEqual(queued.file_path, first.file_path)
+        archive = Path(first.file_path)
+
+        DownloadJob.objects.filter(pk=first.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        result = cleanup_expired_downloads.run()
+        self.assertEqual((result['cleaned'], result['freed_bytes']), (1, 0))
+        self.assertTrue(archive.exists())
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.file_path), ('expired', ''))
+
+        DownloadJob.objects.filter(pk=queued.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        result = cleanup_expired_downloads.run()
+        self.assertGreater(result['freed_bytes'], 0)
+        self.assertFalse(archive.exists())
@@ -33,6 +33,7 @@ def _make_simbad_table():
   })
 
 
+@override_settings(AUX_OBJECTS_SIMBAD_BATCH=False)
 class AuxObjectsComputeTest(APITestCase):
     def setUp(self):
         self.obs_run = ObservationRun.objects.create(name='2024-01-01_test', is_public=True, photometry=True)
@@ -137,6 +138,54 @@ class AuxObjectsComputeTest(APITestCase):
         clusters = cluster_light_fits_by_pointing([self.df, far])
         self.assertEqual(len(clusters), 2)
 
+    def test_cluster_chains_single_linkage(self):
+        # 0.2 deg steps chain into one pointing; the jump to 12 deg starts another.
+        files = [
+            DataFile(pk=i + 1, ra=10.0 + 0.2 * i, dec=20.0, fov_x=0.5, fov_y=0.5)
+            for i in range(5)
+        ]
+        files.append(DataFile(pk=99, ra=12.0, dec=20.0, fov_x=0.5, fov_y=0.5))
+        clusters = cluster_light_fits_by_pointing(files)
+        self.assertEqual(sorted(len(c) for c in clusters), [1, 5])
+
+    @override_settings(AUX_OBJECTS_CLUSTER_SEPARATION_DEG=0.3)
+    def test_cluster_matches_pairwise_reference(self):
+        from obs_run.wcs_utils import angular_separation_deg
+
+        rng = np.random.default_rng(7)
+        files = []
+        for i in range(120):
+            fov = None if i % 6 == 0 else float(rng.choice([0.2, 0.6, 1.5]))
+            files.append(DataFile(
+                pk=i + 1,
+                ra=float(rng.choice([10.0, 10.8, 359.9]) + rng.normal(0, 0.15)) % 360,
+                dec=float(rng.choice([20.0, 20.4]) + rng.normal(0, 0.15)),
+                fov_x=fov,
+                fov_y=fov,
+            ))
+
+        parent = list(range(len(files)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i in range(len(files)):
+            for j in range(i + 1, len(files)):
+                sep = float(angular_separation_deg(files[i].ra, files[i].dec, files[j].ra, files[j].dec))
+                if sep <= _pair_cluster_threshold_deg(files[i], files[j]):
+                    parent[find(i)] = find(j)
+        groups = {}
+        for i, df in enumerate(files):
+            groups.setdefault(find(i), []).append(df.pk)
+        expected = sorted(sorted(pks) for pks in groups.values())
+
+        clusters = cluster_light_fits_by_pointing(files)
+        self.assertEqual(sorted(sorted(df.pk for df in c) for c in clusters), expected)
+        self.assertGreater(len(clusters), 1)
+
     def test_fov_from_chip_and_telescope(self):
         chip_df = DataFile(
             naxis1=4096,
@@ -14,6 +14,7 @@ User = get_user_model()
 
 @override_settings(
     AUX_OBJECTS_ENABLED=True,
+    AUX_OBJECTS_SIMBAD_BATCH=False,
     CELERY_TASK_ALWAYS_EAGER=True,
     CELERY_TASK_EAGER_PROPAGATES=True,
 )
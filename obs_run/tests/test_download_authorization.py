@@ -1,9 +1,10 @@
-"""Authorization tests for sync ZIP (gone) and async download jobs."""
+"""Authorization tests for streamed ZIPs and async download jobs."""
 import tempfile
 from pathlib import Path
 from unittest.mock import patch
 
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from rest_framework import status
 from rest_framework.test import APITestCase
 
@@ -41,12 +42,25 @@ class RunDownloadAuthorizationTest(APITestCase):
         token = self.client.cookies.get('csrftoken')
         return {'HTTP_X_CSRFTOKEN': token.value} if token else {}
 
+    @override_settings(DOWNLOAD_STREAM_ENABLED=False)
     def test_sync_zip_is_gone(self):
         resp = self.client.get(self.private_url)
         self.assertEqual(resp.status_code, status.HTTP_410_GONE)
         resp2 = self.client.get(self.public_url)
         self.assertEqual(resp2.status_code, status.HTTP_410_GONE)
 
+    def test_streamed_zip_respects_run_visibility(self):
+        with override_settings(DATA_DIRECTORY=self.tmp):
+            self.assertEqual(self.client.get(self.private_url).status_code, status.HTTP_404_NOT_FOUND)
+            self._auth(self.other)
+            self.assertEqual(self.client.get(self.private_url).status_code, status.HTTP_404_NOT_FOUND)
+            bulk = self.client.get('/api/runs/datafiles/download/', {'ids': str(self.df.pk)})
+            self.assertEqual(bulk.status_code, status.HTTP_404_NOT_FOUND)
+            self._auth(self.authorized)
+            resp = self.client.get(self.private_url)
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            b''.join(resp.streaming_content)
+
     @patch('obs_run.services.downloads.build_zip_task.delay')
     def test_unauthorized_user_private_download_job_denied(self, _delay):
         self._auth(self.other)
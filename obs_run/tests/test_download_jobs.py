@@ -1,5 +1,7 @@
-"""Smoke and security tests for async download jobs."""
+"""Smoke and security tests for async download jobs and streamed ZIPs."""
+import io
 import tempfile
+import zipfile
 from pathlib import Path
 from unittest.mock import patch
 
@@ -14,6 +16,23 @@ from obs_run.services.downloads import hash_download_token
 User = get_user_model()
 
 
+class _SlotRedis:
+    def __init__(self):
+        self.store = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value.encode()
+        return True
+
+    def eval(self, script, numkeys, key, token):
+        if self.store.get(key) == token.encode():
+            del self.store[key]
+            return 1
+        return 0
+
+
 class DownloadJobFlowTest(APITestCase):
     def setUp(self):
         self.tmp = tempfile.mkdtemp()
@@ -107,12 +126,64 @@ class DownloadJobFlowTest(APITestCase):
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
         delay.assert_not_called()
 
-    def test_sync_zip_routes_gone(self):
+    @override_settings(DOWNLOAD_STREAM_ENABLED=False)
+    def test_sync_zip_routes_gone_when_streaming_disabled(self):
         resp = self.client.get(f'/api/runs/runs/{self.run.pk}/download/')
         self.assertEqual(resp.status_code, status.HTTP_410_GONE)
         resp2 = self.client.get('/api/runs/datafiles/download/')
         self.assertEqual(resp2.status_code, status.HTTP_410_GONE)
 
+    def test_small_selection_is_streamed(self):
+        with override_settings(DATA_DIRECTORY=self.tmp):
+            resp = self.client.get(f'/api/runs/runs/{self.run.pk}/download/')
+            self.assertEqual(resp.status_code, status.HTTP_200_OK)
+            self.assertEqual(resp['Content-Type'], 'application/zip')
+            self.assertIn(f'run_{self.run.pk}_datafiles.zip', resp['Content-Disposition'])
+            body = b''.join(resp.streaming_content)
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(zf.read(f'{self.df.pk}_a.fits'), b'SIMPLE  ')
+
+        with override_settings(DATA_DIRECTORY=self.tmp):
+            bulk = self.client.get('/api/runs/datafiles/download/', {'ids': str(self.df.pk)})
+            self.assertEqual(bulk.status_code, status.HTTP_200_OK)
+            b''.join(bulk.streaming_content)
+        self.assertEqual(
+            self.client.get('/api/runs/datafiles/download/').status_code,
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    def test_large_selection_is_sent_to_download_jobs(self):
+        with override_settings(DATA_DIRECTORY=self.tmp, DOWNLOAD_STREAM_MAX_BYTES=4):
+            resp = self.client.get(f'/api/runs/runs/{self.run.pk}/download/')
+        self.assertEqual(resp.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(resp.data['code'], 'use_download_job')
+        with override_settings(DATA_DIRECTORY=self.tmp, DOWNLOAD_STREAM_MAX_FILES=0):
+            resp = self.client.get(f'/api/runs/runs/{self.run.pk}/download/')
+        self.assertEqual(resp.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_concurrent_streams_per_client_are_capped(self):
+        url = f'/api/runs/runs/{self.run.pk}/download/'
+        redis = _SlotRedis()
+        with override_settings(DATA_DIRECTORY=self.tmp, DOWNLOAD_STREAM_MAX_CONCURRENT_ANON=1), \
+                patch('obs_run.services.downloads._redis_client', return_value=redis):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, status.HTTP_200_OK)
+            busy = self.client.get(url)
+            self.assertEqual(busy.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(busy.data['code'], 'stream_limit')
+            # Another client is not affected
+            other = self.client.get(url, REMOTE_ADDR='192.0.2.7')
+            self.assertEqual(other.status_code, status.HTTP_200_OK)
+            other.close()
+
+            # Closing the response frees the slot, even when nothing was streamed
+            first.close()
+            again = self.client.get(url)
+            self.assertEqual(again.status_code, status.HTTP_200_OK)
+            b''.join(again.streaming_content)
+            self.assertEqual(redis.store, {})
+
     @patch('obs_run.services.downloads.build_zip_task.delay')
     def test_other_user_cannot_access_owned_job(self, delay):
         owner = User.objects.create_user(username='owner', password='pass')
@@ -0,0 +1,62 @@
+"""Tests for the stored effective exposure type column."""
+from django.test import TestCase
+
+from obs_run.models import DataFile, ObservationRun
+from obs_run.tests import ClearCacheMixin
+
+# (header, ML, user) -> effective type
+CASES = [
+    (('LI', 'UK', None), 'UK'),
+    (('LI', 'LI', None), 'LI'),
+    (('FL', 'LI', None), 'UK'),
+    (('DA', '', None), 'DA'),
+    (('DA', '', ''), 'DA'),
+    (('DA', '', '  '), 'DA'),
+    (('FL', 'LI', 'LI'), 'LI'),
+    (('UK', 'UK', 'BI'), 'BI'),
+]
+
+
+class EffectiveExposureTypeTest(ClearCacheMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.run = ObservationRun.objects.create(name='Exposure types', is_public=True)
+        self.files = [
+            DataFile.objects.create(
+                observation_run=self.run, datafile=f'/tmp/{i}.fits', file_type='FITS',
+                exposure_type=header, exposure_type_ml=ml, exposure_type_user=user,
+            )
+            for i, ((header, ml, user), _) in enumerate(CASES)
+        ]
+
+    def _stored(self):
+        return dict(DataFile.objects.values_list('pk', 'exposure_type_effective'))
+
+    def test_column_matches_property(self):
+        stored = self._stored()
+        for df, (fields, expected) in zip(self.files, CASES):
+            with self.subTest(fields=fields):
+                self.assertEqual(df.effective_exposure_type, expected)
+                self.assertEqual(stored[df.pk], expected)
+
+    def test_column_follows_all_updates(self):
+        df = self.files[0]
+        df.exposure_type_user = 'DA'
+        df.save()
+        self.assertEqual(self._stored()[df.pk], 'DA')
+        DataFile.objects.filter(pk=df.pk).update(exposure_type_user=None, exposure_type_ml='LI')
+        self.assertEqual(self._stored()[df.pk], 'LI')
+        df.refresh_from_db()
+        df.exposure_type = 'FL'
+        DataFile.objects.bulk_update([df], ['exposure_type'])
+        df.refresh_from_db()
+        self.assertEqual((df.exposure_type_effective, df.effective_exposure_type), ('UK', 'UK'))
+
+    def test_api_filter_uses_column(self):
+        resp = self.client.get('/api/runs/datafiles/', {'effective_exposure_type': ['LI', 'BI']})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        rows = data.get('results', data)
+        self.assertEqual(
+            sorted(row['effective_exposure_type'] for row in rows), ['BI', 'LI', 'LI'],
+        )
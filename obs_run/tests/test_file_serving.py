@@ -0,0 +1,122 @@
+"""Tests for web-server offload and Range support of file downloads."""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from obs_run.models import DataFile, DownloadJob, ObservationRun
+from obs_run.services.file_serving import parse_range
+from obs_run.tests import TempDirMixin
+
+User = get_user_model()
+
+
+class ParseRangeTest(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=90-500', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-500', 100), (0, 99))
+
+    def test_ignored_and_unsatisfiable(self):
+        self.assertIsNone(parse_range('', 100))
+        self.assertIsNone(parse_range('items=0-9', 100))
+        self.assertIsNone(parse_range('bytes=0-9,20-29', 100))
+        self.assertFalse(parse_range('bytes=100-', 100))
+        self.assertFalse(parse_range('bytes=10-5', 100))
+        self.assertFalse(parse_range('bytes=-0', 100))
+
+
+@override_settings(FILE_SERVING_BACKEND='django')
+class FileServingTest(TempDirMixin, APITestCase):
+    def tmp_settings(self):
+        return {'DATA_DIRECTORY': self.tmp}
+
+    def setUp(self):
+        super().setUp()
+        self.payload = bytes(range(256)) * 40
+        path = self.tmp / 'light_1.fits'
+        path.write_bytes(self.payload)
+        self.run = ObservationRun.objects.create(name='Serving run', is_public=True)
+        self.df = DataFile.objects.create(
+            observation_run=self.run, datafile=str(path), file_type='FITS', file_size=len(self.payload),
+        )
+        self.url = f'/api/runs/datafiles/{self.df.pk}/download/'
+
+    def test_full_download_advertises_ranges(self):
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(resp.streaming_content), self.payload)
+        self.assertEqual(resp['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment', resp['Content-Disposition'])
+        self.assertTrue(resp['ETag'])
+
+    def test_range_resumes_download(self):
+        resp = self.client.get(self.url, HTTP_RANGE='bytes=1000-1999')
+        self.assertEqual(resp.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(resp.streaming_content), self.payload[1000:2000])
+        self.assertEqual(resp['Content-Range'], f'bytes 1000-1999/{len(self.payload)}')
+        self.assertEqual(resp['Content-Length'], '1000')
+
+        # Matching If-Range keeps the range, a stale validator gets the whole file
+        etag = resp['ETag']
+        resp = self.client.get(self.url, HTTP_RANGE='bytes=-16', HTTP_IF_RANGE=etag)
+        self.assertEqual(resp.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(resp.streaming_content), self.payload[-16:])
+        resp = self.client.get(self.url, HTTP_RANGE='bytes=-16', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(b''.join(resp.streaming_content)), len(self.payload))
+
+    def test_unsatisfiable_range(self):
+        resp = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.payload)}-')
+        self.assertEqual(resp.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(resp['Content-Range'], f'bytes */{len(self.payload)}')
+
+    def test_x_sendfile_offload(self):
+        with override_settings(FILE_SERVING_BACKEND='x-sendfile'):
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp['X-Sendfile'], str((self.tmp / 'light_1.fits').resolve()))
+        self.assertEqual(resp.content, b'')
+        self.assertIn('light_1.fits', resp['Content-Disposition'])
+
+    def test_x_accel_maps_roots_and_falls_back(self):
+        locations = {str(self.tmp): '/protected/archive/'}
+        with override_settings(FILE_SERVING_BACKEND='x-accel', FILE_SERVING_ACCEL_LOCATIONS=locations):
+            resp = self.client.get(self.url)
+        self.assertEqual(resp['X-Accel-Redirect'], '/protected/archive/light_1.fits')
+        self.assertEqual(resp.content, b'')
+
+        with override_settings(FILE_SERVING_BACKEND='x-accel', FILE_SERVING_ACCEL_LOCATIONS={'/elsewhere': '/p/'}):
+            resp = self.client.get(self.url)
+        self.assertNotIn('X-Accel-Redirect', resp)
+        self.assertEqual(b''.join(resp.streaming_content), self.payload)
+
+    def test_private_run_is_checked_before_offload(self):
+        self.run.is_public = False
+        self.run.save(update_fields=['is_public'])
+        with override_settings(FILE_SERVING_BACKEND='x-sendfile'):
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('X-Sendfile', resp)
+
+    def test_job_archive_supports_range(self):
+        user = User.objects.create_user(username='serving', password='pass')
+        jobs_dir = self.tmp / 'jobs'
+        jobs_dir.mkdir()
+        archive = jobs_dir / 'job_1.zip'
+        archive.write_bytes(self.payload)
+        job = DownloadJob.objects.create(
+            user=user, run=self.run, status='done', file_path=str(archive),
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+        self.client.force_login(user)
+        with override_settings(DOWNLOAD_JOB_TMP_DIR=jobs_dir):
+            resp = self.client.get(f'/api/runs/jobs/{job.pk}/download', HTTP_RANGE='bytes=10-19')
+        self.assertEqual(resp.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(resp.streaming_content), self.payload[10:20])
+        self.assertEqual(resp['Content-Type'], 'application/zip')
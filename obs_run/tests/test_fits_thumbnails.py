@@ -0,0 +1,113 @@
+"""Tests for decimated FITS reads and the shared pixel cache."""
+import gzip
+import shutil
+from io import BytesIO
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import numpy as np
+from astropy.io import fits
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from obs_run import thumbnail_cache
+from obs_run.pixel_cache import get_fits_pixels, read_reduced_fits, reduce_hdu
+from obs_run.tests import TempDirMixin
+from obs_run.thumbnails import ThumbnailError, get_thumbnail_png, render_fits_png
+
+
+class FitsThumbnailTest(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        # Smooth gradient stored as int16 with BZERO, like unsigned camera frames
+        yy, xx = np.mgrid[0:600, 0:900]
+        self.physical = (20000 + 30 * yy + 20 * xx).astype(np.uint16)
+        self.plain = self.tmp / 'light.fits'
+        fits.PrimaryHDU(self.physical).writeto(self.plain)
+        self.compressed = self.tmp / 'light_rice.fits'
+        fits.HDUList([fits.PrimaryHDU(), fits.CompImageHDU(self.physical)]).writeto(self.compressed)
+        self.gzipped = self.tmp / 'light.fits.gz'
+        with open(self.plain, 'rb') as src, gzip.open(self.gzipped, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+
+    def _pixels(self, path, min_dim):
+        with fits.open(str(path), memmap=True, do_not_scale_image_data=True) as hdul:
+            hdu = next(h for h in hdul if len(h.shape) >= 2)
+            return reduce_hdu(hdu, path, min_dim)
+
+    def test_frames_are_reduced_by_integer_steps(self):
+        strided = self._pixels(self.plain, 100)
+        # step 900 // 100 = 9: every 9th pixel, scaled back to physical values
+        self.assertEqual(strided.dtype, np.float32)
+        np.testing.assert_array_equal(strided, self.physical[::9, ::9])
+
+        expected = self.physical[:594, :900].reshape(66, 9, 100, 9).mean(axis=(1, 3))
+        for path in (self.compressed, self.gzipped):
+            reduced = self._pixels(path, 100)
+            self.assertEqual(reduced.shape, (66, 100))
+            np.testing.assert_allclose(reduced, expected, rtol=1e-6)
+
+    def test_small_frames_are_read_at_full_resolution(self):
+        np.testing.assert_array_equal(self._pixels(self.plain, 1024), self.physical)
+
+    def test_rendered_thumbnails_match_across_storage(self):
+        images = []
+        for path in (self.plain, self.compressed, self.gzipped):
+            img = Image.open(BytesIO(render_fits_png(path, 64)))
+            self.assertEqual(img.size, (64, 43))
+            images.append(np.asarray(img, dtype=np.int16))
+        self.assertLessEqual(np.abs(images[0] - images[1]).max(), 8)
+        np.testing.assert_array_equal(images[1], images[2])
+
+    def test_blank_pixels(self):
+        raw = np.full((40, 40), -32768, dtype=np.int16)
+        hdu = fits.PrimaryHDU(raw)
+        hdu.header['BLANK'] = -32768
+        path = self.tmp / 'blank.fits'
+        hdu.writeto(path)
+        with self.assertRaisesMessage(ThumbnailError, 'Invalid image data'):
+            render_fits_png(path, 32)
+
+        raw[10:30, 10:30] = np.arange(400, dtype=np.int16).reshape(20, 20)
+        fits.PrimaryHDU(raw, header=hdu.header).writeto(path, overwrite=True)
+        img = Image.open(BytesIO(render_fits_png(path, 32)))
+        self.assertEqual(img.size, (32, 32))
+
+
+@override_settings(PIXEL_CACHE_SIZES=[256])
+class PixelCacheTest(TempDirMixin, SimpleTestCase):
+    def tmp_settings(self):
+        return {'THUMBNAIL_CACHE_DIR': self.tmp / 'cache'}
+
+    def setUp(self):
+        super().setUp()
+        self.path = self.tmp / 'light.fits'
+        fits.PrimaryHDU(np.random.default_rng(3).normal(500, 20, (600, 900)).astype(np.float32)).writeto(self.path)
+        self.df = SimpleNamespace(pk=7, datafile=str(self.path), file_type='FITS', content_hash='a' * 64)
+
+    def _get(self, min_dim, content_hash='a' * 64):
+        return get_fits_pixels(datafile_id=7, content_hash=content_hash, file_path=self.path, min_dim=min_dim)
+
+    def test_product_is_decoded_once_and_memory_mapped(self):
+        with patch('obs_run.pixel_cache.read_reduced_fits', wraps=read_reduced_fits) as read:
+            first = self._get(64)
+            second = self._get(200)
+            self.assertEqual(read.call_count, 1)
+            # A changed file (new content hash) gets a new product
+            self._get(64, content_hash='b' * 64)
+            self.assertEqual(read.call_count, 2)
+            # Larger than every product: read directly, nothing stored
+            self.assertEqual(self._get(400).shape, (300, 450))
+            self.assertEqual(read.call_count, 3)
+        self.assertEqual(first.shape, (200, 300))
+        self.assertIsInstance(second, np.memmap)
+        self.assertFalse(second.flags.writeable)
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(len(list((self.tmp / 'cache').rglob('*.npy'))), 2)
+
+    def test_all_thumbnail_sizes_share_one_read(self):
+        with patch('obs_run.pixel_cache.read_reduced_fits', wraps=read_reduced_fits) as read:
+            for max_dim in (64, 128, 256):
+                get_thumbnail_png(self.df, self.path, max_dim)
+        self.assertEqual(read.call_count, 1)
+        self.assertEqual(thumbnail_cache.purge_cache(datafile_id=7), 4)
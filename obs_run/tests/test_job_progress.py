@@ -0,0 +1,158 @@
+"""Tests for Redis-backed download job progress and cancellation."""
+import shutil
+import tempfile
+from pathlib import Path
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from obs_run.models import DataFile, DownloadJob, ObservationRun
+from obs_run.services.job_progress import JobProgressPublisher, job_key
+from obs_run.tasks import build_zip_task
+
+User = get_user_model()
+
+
+class _FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class _FakeRedis:
+    """Just enough of redis.Redis (hashes, expire, delete, pipeline) for the job hash."""
+
+    def __init__(self):
+        self.hashes = {}
+        self.on_hset = None
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        data = self.hashes.setdefault(key, {})
+        if mapping:
+            data.update({k: str(v).encode() for k, v in mapping.items()})
+        if field is not None:
+            data[field] = str(value).encode()
+        if self.on_hset:
+            self.on_hset(key, data)
+        return 1
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field)
+
+    def hgetall(self, key):
+        return {k.encode(): v for k, v in self.hashes.get(key, {}).items()}
+
+    def expire(self, key, seconds):
+        return True
+
+    def delete(self, key):
+        return 1 if self.hashes.pop(key, None) is not None else 0
+
+    def pipeline(self):
+        return _FakePipeline(self)
+
+
+class JobProgressTest(APITestCase):
+    def setUp(self):
+        self.redis = _FakeRedis()
+        patcher = patch('obs_run.services.job_progress.get_shared_redis', return_value=self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(username='progress', password='pass')
+        self.run = ObservationRun.objects.create(name='Progress run', is_public=True)
+        self.client.force_login(self.user)
+        self.client.get('/api/users/auth/csrf/')
+
+    def _csrf(self):
+        token = self.client.cookies.get('csrftoken')
+        return {'HTTP_X_CSRFTOKEN': token.value} if token else {}
+
+    def test_status_reads_live_progress_and_cancel_reaches_worker(self):
+        job = DownloadJob.objects.create(user=self.user, run=self.run, status='running', bytes_total=100)
+        publisher = JobProgressPublisher(job.pk)
+        self.assertFalse(publisher.publish(bytes_done=40, bytes_total=100, progress=40))
+
+        resp = self.client.get(f'/api/runs/jobs/{job.pk}/status')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual((resp.data['bytes_done'], resp.data['progress']), (40, 40))
+        listing = self.client.get('/api/runs/jobs/')
+        self.assertEqual(listing.data['items'][0]['bytes_done'], 40)
+        job.refresh_from_db()
+        self.assertEqual(job.bytes_done, 0)
+
+        resp = self.client.post(f'/api/runs/jobs/{job.pk}/cancel', **self._csrf())
+        self.assertEqual(resp.data['status'], 'cancelled')
+        self.assertTrue(publisher.publish(bytes_done=50, bytes_total=100, progress=50))
+        # Terminal jobs report the row, not the stale live values
+        resp = self.client.get(f'/api/runs/jobs/{job.pk}/status')
+        self.assertEqual(resp.data['bytes_done'], 0)
+
+    def _zip_job(self, size_mb=9):
+        tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        for name in ('a.cr2', 'b.cr2'):
+            path = tmp / name
+            path.write_bytes(b'\0' * (size_mb * 1024 * 1024 // 2))
+            DataFile.objects.create(observation_run=self.run, datafile=str(path), file_type='CR2', file_size=1)
+        job = DownloadJob.objects.create(user=self.user, run=self.run, selected_ids=[], filters={})
+        return tmp, job
+
+    def _progress_updates(self, queries):
+        return [
+            q['sql'] for q in queries
+            if q['sql'].startswith('UPDATE "obs_run_downloadjob" SET "bytes_done"') and '"status"' not in q['sql']
+        ]
+
+    def test_worker_checkpoints_row_rarely(self):
+        tmp, job = self._zip_job()
+        with override_settings(DATA_DIRECTORY=tmp, DOWNLOAD_JOB_TMP_DIR=tmp / 'jobs'):
+            with CaptureQueriesContext(connection) as ctx:
+                build_zip_task.run(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual(job.bytes_done, 9 * 1024 * 1024)
+        self.assertEqual(self._progress_updates(ctx.captured_queries), [])
+        self.assertNotIn(job_key(job.pk), self.redis.hashes)
+
+        # Without Redis the row is the progress channel again
+        tmp, job = self._zip_job()
+        with patch('obs_run.services.job_progress.get_shared_redis', return_value=None):
+            with override_settings(DATA_DIRECTORY=tmp, DOWNLOAD_JOB_TMP_DIR=tmp / 'jobs'):
+                with CaptureQueriesContext(connection) as ctx:
+                    build_zip_task.run(job.pk)
+        self.assertGreaterEqual(len(self._progress_updates(ctx.captured_queries)), 2)
+
+    def test_cancel_flag_stops_running_job(self):
+        tmp, job = self._zip_job()
+
+        def cancel_after_first_chunk(key, data):
+            if int(data.get('bytes_done', b'0')) > 0 and 'cancel' not in data:
+                DownloadJob.objects.filter(pk=job.pk).update(status='cancelled')
+                data['cancel'] = b'1'
+
+        self.redis.on_hset = cancel_after_first_chunk
+        with override_settings(DATA_DIRECTORY=tmp, DOWNLOAD_JOB_TMP_DIR=tmp / 'jobs'):
+            build_zip_task.run(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'cancelled')
+        self.assertEqual(job.file_path, '')
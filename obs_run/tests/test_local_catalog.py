@@ -0,0 +1,130 @@
+"""Tests for the offline catalog consulted before SIMBAD."""
+import csv
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+from astropy.table import MaskedColumn, Table
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from objects.models import Object
+from obs_run.local_catalog import (
+    load_local_catalog_file,
+    normalize_catalog_name,
+    query_local_region,
+    resolve_local_name,
+    write_catalog_csv,
+)
+from obs_run.models import LocalCatalogAlias
+
+_ROWS = [
+    {
+        'main_id': 'M  31', 'ra': '10.684708', 'dec': '41.268750', 'otype': 'AGN',
+        'alltypes': 'AGN|G|GiG|IR|LIN', 'ids': 'M  31|NGC   224|UGC 454|PGC 2557', 'V': '3.44',
+    },
+    {
+        'main_id': 'M  45', 'ra': '56.601', 'dec': '24.114', 'otype': 'OpC',
+        'alltypes': 'Cl*|OpC', 'ids': 'M  45|Cl Melotte   22', 'V': '',
+    },
+    {
+        'main_id': '* alf Lyr', 'ra': '279.234735', 'dec': '38.783689', 'otype': 'dS*',
+        'alltypes': '*|dS*|IR', 'ids': '* alf Lyr|HD 172167|HR 7001|NAME Vega', 'V': '0.03',
+    },
+]
+
+
+class LocalCatalogTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.path = Path(self.tmp) / 'catalog.csv'
+        with open(self.path, 'w', newline='', encoding='utf-8') as handle:
+            writer = csv.DictWriter(handle, fieldnames=list(_ROWS[0]))
+            writer.writeheader()
+            writer.writerows(_ROWS)
+        self.assertEqual(load_local_catalog_file(self.path), 3)
+
+    def test_normalize_catalog_name(self):
+        for name in ('m31', 'M  31', 'Messier 031', ' m 31 '):
+            self.assertEqual(normalize_catalog_name(name), 'M 31')
+        self.assertEqual(normalize_catalog_name('ngc0224'), 'NGC 224')
+        self.assertEqual(normalize_catalog_name('NGC 5195A'), 'NGC 5195A')
+        self.assertEqual(normalize_catalog_name('name  vega'), 'NAME VEGA')
+
+    def test_names_resolve_through_aliases(self):
+        for name in ('M31', 'ngc 224', 'PGC 002557'):
+            table = resolve_local_name(name)
+            self.assertEqual(list(table['main_id']), ['M 31'])
+        vega = resolve_local_name('HD 172167')
+        self.assertAlmostEqual(float(vega['V'][0]), 0.03)
+        self.assertTrue(bool(resolve_local_name('M 45')['V'].mask[0]))
+        self.assertIsNone(resolve_local_name('NGC 7000'))
+
+        # Reloading updates entries in place
+        self.assertEqual(load_local_catalog_file(self.path), 3)
+        self.assertEqual(LocalCatalogAlias.objects.filter(name='M 31').count(), 1)
+
+    def test_region_lookup_orders_by_distance(self):
+        table = query_local_region(10.7, 41.3, 1.0)
+        self.assertEqual(list(table['main_id']), ['M 31'])
+        self.assertIsNone(query_local_region(200.0, 41.3, 1.0))
+
+    @override_settings(SIMBAD_CACHE_ENABLED=False)
+    @patch('utilities.Simbad')
+    def test_name_resolution_needs_no_network(self, simbad_cls):
+        from utilities import _query_object_variants
+
+        table = _query_object_variants('m31')
+        self.assertEqual(str(table[0]['main_id']), 'M 31')
+        self.assertIn('G', str(table[0]['alltypes.otypes']).split('|'))
+        simbad_cls.assert_not_called()
+
+    @patch('utilities._query_region_safe')
+    def test_star_verification_uses_local_catalog_first(self, query_mock):
+        from utilities import verify_star_classification
+
+        star = Object.objects.create(name='TYC 2801-1', object_type='ST', ra=10.69, dec=41.27)
+        result = verify_star_classification(star, fixed_radius_arcmin=10)
+        query_mock.assert_not_called()
+        self.assertTrue(result['updated'])
+        star.refresh_from_db()
+        self.assertEqual(star.object_type, 'GA')
+
+        # Nothing local in the cone: SIMBAD decides, unless the catalog is authoritative
+        query_mock.return_value = None
+        lonely = Object.objects.create(name='TYC 1-1', object_type='ST', ra=150.0, dec=-10.0)
+        verify_star_classification(lonely, fixed_radius_arcmin=10)
+        query_mock.assert_called_once()
+        with override_settings(LOCAL_CATALOG_REGION_AUTHORITATIVE=True):
+            verify_star_classification(lonely, fixed_radius_arcmin=10)
+        query_mock.assert_called_once()
+
+    @override_settings(LOCAL_CATALOG_ENABLED=False)
+    def test_disabled_catalog_is_bypassed(self):
+        self.assertIsNone(resolve_local_name('M 31'))
+        self.assertIsNone(query_local_region(10.7, 41.3, 1.0))
+
+    def test_write_catalog_csv_and_command(self):
+        table = Table({
+            'main_id': np.array(['NGC  7000', 'NGC  7000', 'IC 5070'], dtype=object),
+            'ra': [314.75, 314.75, 312.75],
+            'dec': [44.37, 44.37, 44.37],
+            'otype': np.array(['HII', 'HII', 'HII'], dtype=object),
+            'alltypes.otypes': np.array(['HII|ISM', 'HII|ISM', 'HII'], dtype=object),
+            'ids': np.array(['NGC  7000|NAME North America Nebula'] * 2 + ['IC 5070'], dtype=object),
+            'V': MaskedColumn([4.0, 4.0, np.nan], mask=[False, False, True]),
+        })
+        out_path = Path(self.tmp) / 'fetched.csv'
+        self.assertEqual(write_catalog_csv(table, out_path), 2)
+
+        out = StringIO()
+        call_command('local_catalog', 'load', file=str(out_path), stdout=out)
+        self.assertIn('Loaded 2 catalog entries', out.getvalue())
+        out = StringIO()
+        call_command('local_catalog', 'lookup', 'ngc7000', stdout=out)
+        self.assertIn('NGC 7000: ra=314.750000', out.getvalue())
+        self.assertTrue(bool(resolve_local_name('IC 5070')['V'].mask[0]))
@@ -0,0 +1,88 @@
+"""Tests for ingest-time pixel statistics and their range filters."""
+from io import StringIO
+
+import numpy as np
+from astropy.io import fits
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from obs_run.models import DataFile, ObservationRun
+from obs_run.pixel_stats import compute_pixel_stats, saturation_level, update_pixel_stats
+from obs_run.tests import TempDirMixin
+
+
+class PixelStatisticsTest(SimpleTestCase):
+    def test_background_ignores_stars(self):
+        pixels = np.random.default_rng(1).normal(1000, 10, (200, 200)).astype(np.float32)
+        pixels[::20, ::20] = 60000
+        stats = compute_pixel_stats(pixels, saturation=60000)
+        self.assertAlmostEqual(stats['pixel_background'], 1000, delta=2)
+        self.assertGreater(stats['pixel_mean'], 1050)
+        self.assertAlmostEqual(stats['saturated_fraction'], 0.0025)
+
+    def test_nan_pixels_and_unknown_saturation(self):
+        pixels = np.full((10, 10), np.nan, dtype=np.float32)
+        self.assertIsNone(compute_pixel_stats(pixels))
+        pixels[:5] = 3.0
+        stats = compute_pixel_stats(pixels)
+        self.assertEqual((stats['pixel_median'], stats['pixel_std']), (3.0, 0.0))
+        self.assertIsNone(stats['saturated_fraction'])
+
+    def test_saturation_level(self):
+        header = fits.Header({'BITPIX': 16, 'BZERO': 32768})
+        self.assertEqual(saturation_level(header), 65535)
+        header['SATURATE'] = 50000
+        self.assertEqual(saturation_level(header), 50000)
+        self.assertIsNone(saturation_level(fits.Header({'BITPIX': -32})))
+
+
+@override_settings(PIXEL_CACHE_SIZES=[256])
+class PixelStatisticsIngestTest(TempDirMixin, TestCase):
+    def tmp_settings(self):
+        return {'DATA_DIRECTORY': self.tmp, 'THUMBNAIL_CACHE_DIR': self.tmp / 'cache'}
+
+    def setUp(self):
+        super().setUp()
+        self.run = ObservationRun.objects.create(name='QA run', is_public=True)
+        # A dark with light leaking in, and a flat with a blown-out half
+        self.dark = self._datafile('dark.fits', np.full((300, 400), 5000, dtype=np.uint16))
+        flat = np.full((300, 400), 30000, dtype=np.uint16)
+        flat[:, :200] = 65535
+        self.flat = self._datafile('flat.fits', flat)
+
+    def _datafile(self, name, data):
+        path = self.tmp / name
+        fits.PrimaryHDU(data).writeto(path)
+        return DataFile.objects.create(
+            observation_run=self.run, datafile=str(path), file_type='FITS', content_hash=name[0] * 64,
+        )
+
+    def _filter(self, **params):
+        resp = self.client.get('/api/runs/datafiles/', params)
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        return {row['pk'] for row in data.get('results', data)}
+
+    def test_statistics_are_stored_and_filterable(self):
+        stats = update_pixel_stats(self.flat)
+        self.assertAlmostEqual(stats['saturated_fraction'], 0.5)
+        self.assertEqual(len(list((self.tmp / 'cache').rglob('*.npy'))), 1)
+        call_command('compute_pixel_stats', stdout=StringIO())
+
+        self.dark.refresh_from_db()
+        self.assertEqual(self.dark.pixel_median, 5000)
+        self.assertEqual(self.dark.saturated_fraction, 0)
+        self.assertIsNotNone(self.dark.pixel_stats_at)
+        self.assertEqual(self._filter(saturated_fraction_min=0.01), {self.flat.pk})
+        self.assertEqual(self._filter(pixel_median_min=1000, pixel_median_max=10000), {self.dark.pk})
+
+    def test_backfill_command(self):
+        out = StringIO()
+        call_command('compute_pixel_stats', '--run', str(self.run.pk), stdout=out)
+        self.assertIn('2 files: 2 computed, 0 skipped, 0 failed', out.getvalue())
+        out = StringIO()
+        call_command('compute_pixel_stats', stdout=out)
+        self.assertIn('0 files', out.getvalue())
+        out = StringIO()
+        call_command('compute_pixel_stats', '--force', '--limit', '1', stdout=out)
+        self.assertIn('1 files: 1 computed', out.getvalue())
@@ -0,0 +1,71 @@
+"""Tests for bulk re-evaluation of plate-solved files."""
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+
+from obs_run.models import DataFile, ObservationRun
+from obs_run.plate_solving import select_re_evaluation_candidates
+from obs_run.tasks import re_evaluate_plate_solved_files
+
+
+def _make_df(run, name, **kwargs):
+    defaults = {
+        'observation_run': run,
+        'datafile': f'/tmp/{name}.fits',
+        'file_type': 'FITS',
+        'exposure_type': 'LI',
+        'exposure_type_ml': None,
+        'plate_solved': True,
+        'wcs_ra': 10.0,
+        'wcs_dec': 20.0,
+    }
+    defaults.update(kwargs)
+    return DataFile.objects.create(**defaults)
+
+
+class SelectReEvaluationCandidatesTest(TestCase):
+    def setUp(self):
+        self.run = ObservationRun.objects.create(name='2024_reeval', photometry=True)
+
+    def test_split_by_header_and_separation(self):
+        same = _make_df(self.run, 'same', ra=10.0, dec=20.0)
+        moved = _make_df(self.run, 'moved', ra=10.5, dec=20.0)
+        no_header = _make_df(self.run, 'no_header', ra=-1, dec=-1)
+        no_wcs = _make_df(self.run, 'no_wcs', ra=-1, dec=-1, wcs_ra=None, wcs_dec=None)
+        no_run = _make_df(None, 'no_run', ra=-1, dec=-1)
+
+        candidates, skipped = select_re_evaluation_candidates(
+            DataFile.objects.order_by('pk'), threshold_arcmin=5.0,
+        )
+        self.assertEqual(candidates, [moved.pk, no_header.pk])
+        self.assertEqual(skipped, [same.pk, no_wcs.pk, no_run.pk])
+
+    def test_empty_queryset(self):
+        self.assertEqual(select_re_evaluation_candidates(DataFile.objects.none(), 5.0), ([], []))
+
+
+@override_settings(
+    PLATE_SOLVING_ENABLED=True,
+    PLATE_SOLVING_RE_EVAL_BATCH_SIZE=100,
+    PLATE_SOLVING_RE_EVAL_MAX_EVALUATIONS=1,
+)
+class ReEvaluatePlateSolvedTaskTest(TestCase):
+    def setUp(self):
+        self.run = ObservationRun.objects.create(name='2024_reeval_task', photometry=True)
+
+    @patch('adminops.redis_helpers.plate_solving_task_enabled_get', return_value=None)
+    @patch('obs_run.tasks.evaluate_data_file')
+    def test_only_candidates_are_evaluated_and_rest_deferred(self, evaluate_mock, _enabled_mock):
+        same = _make_df(self.run, 'same', ra=10.0, dec=20.0)
+        first = _make_df(self.run, 'first', ra=-1, dec=-1)
+        second = _make_df(self.run, 'second', ra=12.0, dec=20.0)
+
+        result = re_evaluate_plate_solved_files()
+
+        self.assertEqual(result, {'evaluated': 1, 'skipped': 1, 'errors': 0, 'deferred': 1})
+        evaluate_mock.assert_called_once()
+        self.assertEqual(evaluate_mock.call_args.args[0].pk, first.pk)
+        flags = dict(DataFile.objects.values_list('pk', 're_evaluated_after_plate_solve'))
+        self.assertTrue(flags[same.pk])
+        self.assertTrue(flags[first.pk])
+        self.assertFalse(flags[second.pk])
@@ -1,7 +1,16 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from obs_run.models import ObservationRun
+from obs_run import change_counters
+from obs_run.models import DataFile, ObservationRun, RunStats
+from obs_run.tests import ClearCacheMixin
+from tags.models import Tag
 
 
 class RunsApiETagTest(APITestCase):
@@ -20,3 +29,160 @@ class RunsApiETagTest(APITestCase):
         self.assertEqual(resp2.status_code, status.HTTP_304_NOT_MODIFIED)
 
 
+
+
+class RunsApiChangeCounterTest(ClearCacheMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        # Counters are bumped when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run = ObservationRun.objects.create(name='Counter Run', is_public=True, mid_observation_jd=2451546.0)
+            self.other = ObservationRun.objects.create(name='Other Run', is_public=True, mid_observation_jd=2451547.0)
+
+    def _etag(self, url):
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return resp['ETag']
+
+    def test_etags_follow_changes(self):
+        list_url = '/api/runs/runs/'
+        detail_url = f'/api/runs/runs/{self.run.pk}/'
+        list_etag, detail_etag = self._etag(list_url), self._etag(detail_url)
+        # The digest does not depend on the process (no built-in hash())
+        self.assertEqual(list_etag, self._etag(list_url))
+        self.assertRegex(detail_etag, r'^W/"[0-9a-f]{40}"$')
+
+        # Files of another run only change the list
+        with self.captureOnCommitCallbacks(execute=True):
+            DataFile.objects.create(observation_run=self.other, datafile='/tmp/other.fits', file_type='FITS')
+        self.assertNotEqual(self._etag(list_url), list_etag)
+        self.assertEqual(self._etag(detail_url), detail_etag)
+        resp = self.client.get(detail_url, HTTP_IF_NONE_MATCH=f'"x", {detail_etag}')
+        self.assertEqual(resp.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(resp['ETag'], detail_etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DataFile.objects.create(observation_run=self.run, datafile='/tmp/light.fits', file_type='FITS')
+        changed = self._etag(detail_url)
+        self.assertNotEqual(changed, detail_etag)
+
+        tag = Tag.objects.create(name='Tag A')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.run.tags.add(tag)
+        self.assertNotEqual(self._etag(detail_url), changed)
+        changed = self._etag(detail_url)
+        tag.name = 'Tag B'
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.save()
+        self.assertNotEqual(self._etag(detail_url), changed)
+
+    def test_bumped_once_after_commit(self):
+        before, _ = change_counters.read(change_counters.RUNS)
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ('a', 'b', 'c'):
+                DataFile.objects.create(observation_run=self.run, datafile=f'/tmp/{name}.fits')
+            # The counter rows are not written (nor locked) inside the transaction
+            self.assertEqual(change_counters.read(change_counters.RUNS)[0], before)
+        # Once for the DataFile changes, once after the RunStats refresh (not once per save)
+        self.assertEqual(change_counters.read(change_counters.RUNS)[0], [before[0] + 2])
+
+    def test_counters(self):
+        values, changed_at = change_counters.read('unused')
+        self.assertEqual((values, changed_at), ([0], None))
+        change_counters.bump('a', 'b')
+        change_counters.bump('a')
+        values, changed_at = change_counters.read('a', 'b', 'unused')
+        self.assertEqual(values, [2, 1, 0])
+        self.assertIsNotNone(changed_at)
+
+
+class RunStatsTest(ClearCacheMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.run = ObservationRun.objects.create(name='Stats Run', is_public=True, mid_observation_jd=2451546.0)
+        # RunStats rows are refreshed when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.light = DataFile.objects.create(
+                observation_run=self.run, datafile='/tmp/l1.fits', file_type='FITS', exposure_type='LI',
+                exposure_type_ml='LI', exptime=60, hjd=2460000.6, obs_date='2023-02-24T02:24:00',
+            )
+            DataFile.objects.create(
+                observation_run=self.run, datafile='/tmp/l2.fits', file_type='FITS', exposure_type='FL',
+                exposure_type_user='LI', exptime=30, hjd=2460000.5, obs_date='2023-02-24T00:00:00',
+            )
+            DataFile.objects.create(
+                observation_run=self.run, datafile='/tmp/f.fits', file_type='FITS', exposure_type='FL',
+                exposure_type_ml='FL', exptime=2,
+            )
+            DataFile.objects.create(observation_run=self.run, datafile='/tmp/p.jpg', file_type='JPG')
+
+    def _row(self):
+        resp = self.client.get('/api/runs/runs/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        return next(row for row in resp.json()['results'] if row['pk'] == self.run.pk)
+
+    def test_list_reads_materialized_stats(self):
+        with CaptureQueriesContext(connection) as ctx:
+            row = self._row()
+        # No join over the DataFile table
+        self.assertFalse([q for q in ctx.captured_queries if 'obs_run_datafile' in q['sql']])
+        self.assertEqual(
+            {key: row[key] for key in ('n_datafiles', 'n_fits', 'n_img', 'n_ser', 'n_light', 'n_flat', 'n_dark')},
+            {'n_datafiles': 4, 'n_fits': 3, 'n_img': 1, 'n_ser': 0, 'n_light': 2, 'n_flat': 1, 'n_dark': 0},
+        )
+        self.assertEqual((row['expo_time'], row['light_expo_time']), (92.0, 90.0))
+        self.assertEqual((row['start_time'], row['end_time']), ('2023-02-24T00:00:00', '2023-02-24T02:24:00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.light.delete()
+        row = self._row()
+        self.assertEqual((row['n_light'], row['light_expo_time']), (1, 30.0))
+        self.assertEqual(self.client.get('/api/runs/runs/', {'n_datafiles_min': 4}).json()['count'], 0)
+
+    def test_refreshed_once_per_transaction(self):
+        other = ObservationRun.objects.create(name='Other Run', is_public=True)
+        with mock.patch('obs_run.run_stats.refresh_run_stats') as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                for name in ('a', 'b', 'c'):
+                    df = DataFile.objects.create(observation_run=self.run, datafile=f'/tmp/{name}.fits')
+                    df.exptime = 5
+                    df.save()
+        self.assertEqual([c.args for c in refresh.call_args_list], [(self.run.pk,)])
+
+        # Moving a file refreshes the run it left as well
+        moved = DataFile.objects.get(pk=self.light.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.observation_run = other
+            moved.save()
+        self.assertEqual(RunStats.objects.get(run=self.run).n_datafiles, 6)
+        self.assertEqual(RunStats.objects.get(run=other).n_datafiles, 1)
+
+    def test_etag_never_covers_stale_stats(self):
+        url = f'/api/runs/runs/{self.run.pk}/'
+        with self.captureOnCommitCallbacks() as callbacks:
+            DataFile.objects.create(observation_run=self.run, datafile='/tmp/l3.fits', file_type='FITS')
+        # What a client sees after each on-commit step, in registration order
+        seen = []
+        for callback in callbacks:
+            callback()
+            resp = self.client.get(url)
+            seen.append((resp['ETag'], resp.json()['n_datafiles']))
+        final_etag, final_count = seen[-1]
+        self.assertEqual(final_count, 5)
+        self.assertEqual({count for etag, count in seen if etag == final_etag}, {final_count})
+
+    def test_rebuild_command(self):
+        # Queryset updates bypass the signals
+        DataFile.objects.filter(file_type='JPG').update(file_type='SER')
+        self.assertEqual(RunStats.objects.get(run=self.run).n_ser, 0)
+        etag = self.client.get(f'/api/runs/runs/{self.run.pk}/')['ETag']
+        out = StringIO()
+        call_command('rebuild_run_stats', '--run', str(self.run.pk), stdout=out)
+        # Rebuilt rows are not hidden behind 304s
+        resp = self.client.get(f'/api/runs/runs/{self.run.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertIn('Rebuilt statistics of 1 runs', out.getvalue())
+        self.assertEqual(RunStats.objects.get(run=self.run).n_ser, 1)
+
+        self.run.delete()
+        self.assertFalse(RunStats.objects.exists())
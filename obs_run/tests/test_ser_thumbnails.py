@@ -34,7 +34,7 @@ class SerThumbnailHelpersTest(APITestCase):
         parser.read_frame.assert_called_once_with(5)
         parser.release.assert_called_once()
 
-    @override_settings(SER_THUMBNAIL_CACHE_DIR=tempfile.mkdtemp())
+    @override_settings(THUMBNAIL_CACHE_DIR=tempfile.mkdtemp())
     @patch('obs_run.ser_thumbnails.render_ser_frame_png')
     def test_get_ser_thumbnail_png_uses_cache(self, render_mock):
         render_mock.return_value = b'\x89PNGcached'
@@ -78,7 +78,7 @@ class SerThumbnailApiTest(APITestCase):
         )
         self.url = f'/api/runs/datafiles/{self.df.pk}/thumbnail/'
 
-    @override_settings(SER_THUMBNAIL_CACHE_DIR=tempfile.mkdtemp())
+    @override_settings(THUMBNAIL_CACHE_DIR=tempfile.mkdtemp())
     @patch('obs_run.api.views.get_ser_thumbnail_png')
     def test_public_ser_thumbnail_returns_png(self, thumb_mock):
         thumb_mock.return_value = b'\x89PNGtest'
@@ -90,13 +90,13 @@ class SerThumbnailApiTest(APITestCase):
         self.assertEqual(resp.content, b'\x89PNGtest')
         thumb_mock.assert_called_once()
 
-    @override_settings(SER_THUMBNAIL_CACHE_DIR=tempfile.mkdtemp())
+    @override_settings(THUMBNAIL_CACHE_DIR=tempfile.mkdtemp())
     @patch('obs_run.api.views.get_ser_thumbnail_png', side_effect=ValueError('bad ser'))
     def test_ser_thumbnail_generation_error(self, _thumb_mock):
         resp = self.client.get(self.url)
         self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
 
-    @override_settings(SER_THUMBNAIL_CACHE_DIR=tempfile.mkdtemp())
+    @override_settings(THUMBNAIL_CACHE_DIR=tempfile.mkdtemp())
     @patch('obs_run.api.views.get_ser_thumbnail_png')
     def test_private_ser_thumbnail_requires_auth(self, thumb_mock):
         thumb_mock.return_value = b'\x89PNGtest'
@@ -0,0 +1,183 @@
+"""Tests for the shared SIMBAD response cache."""
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from astropy.table import MaskedColumn, Table
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from obs_run.models import SimbadQueryCache
+from obs_run.simbad_cache import (
+    cache_lookup,
+    cache_store,
+    get_cache_stats,
+    lookup_containing_cone,
+    object_query_key,
+    purge_cache,
+    region_query_key,
+    reset_cache_stats,
+)
+
+
+def _make_table():
+    return Table({
+        'main_id': np.array(['M 31', 'HD 1'], dtype=object),
+        'ra': [10.68, 10.7],
+        'dec': [41.27, 41.3],
+        'V': MaskedColumn([3.4, np.nan], mask=[False, True]),
+    })
+
+
+@override_settings(CELERY_BROKER_URL='memory://', SIMBAD_CACHE_GRID_ARCSEC=2.0)
+class SimbadCacheTest(TestCase):
+    def setUp(self):
+        from utilities import _reset_simbad_clients
+        reset_cache_stats()
+        _reset_simbad_clients()
+
+    def test_store_and_lookup_round_trip(self):
+        key, query = object_query_key('M 31', row_limit=1, fields=('otype',))
+        self.assertEqual(cache_lookup(key), (False, None))
+        cache_store(key, query, _make_table())
+
+        hit, table = cache_lookup(key)
+        self.assertTrue(hit)
+        self.assertEqual(list(table['main_id']), ['M 31', 'HD 1'])
+        self.assertTrue(bool(table['V'].mask[1]))
+        entry = SimbadQueryCache.objects.get(key=key)
+        self.assertEqual(entry.hit_count, 1)
+        self.assertEqual(entry.row_count, 2)
+
+        stats = get_cache_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_negative_entries_and_expiry(self):
+        key, query = object_query_key('nothing here', row_limit=1, fields=('otype',))
+        cache_store(key, query, None)
+        self.assertEqual(cache_lookup(key), (True, None))
+
+        SimbadQueryCache.objects.filter(key=key).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(cache_lookup(key), (False, None))
+        self.assertEqual(purge_cache(expired_only=True), 1)
+
+    def test_object_key_normalizes_name(self):
+        key_a, _ = object_query_key('  m   31 ', row_limit=1, fields=('otype', 'ids'))
+        key_b, _ = object_query_key('M 31', row_limit=1, fields=('ids', 'otype'))
+        self.assertEqual(key_a, key_b)
+
+    def test_region_key_rounds_center_to_grid(self):
+        fields = ('otype',)
+        key_a, _ = region_query_key(10.0, 20.0, '0d5m0s', row_limit=10, fields=fields)
+        key_b, _ = region_query_key(10.0002, 20.0002, '0d5m0s', row_limit=10, fields=fields)
+        key_c, _ = region_query_key(10.01, 20.0, '0d5m0s', row_limit=10, fields=fields)
+        key_d, _ = region_query_key(10.0, 20.0, '0d5m0s', row_limit=50, fields=fields)
+        self.assertEqual(key_a, key_b)
+        self.assertNotEqual(key_a, key_c)
+        self.assertNotEqual(key_a, key_d)
+
+    def test_contained_cone_is_answered_from_larger_cached_cone(self):
+        fields = ('otype', 'V')
+        key, query = region_query_key(10.68, 41.27, '0d30m0s', row_limit=10, fields=fields)
+        cache_store(key, query, _make_table())
+        entry = SimbadQueryCache.objects.get(key=key)
+        self.assertAlmostEqual(entry.cone_radius_deg, 0.5)
+
+        hit, table = lookup_containing_cone(10.69, 41.28, 0.05, row_limit=10, fields=fields)
+        self.assertTrue(hit)
+        self.assertEqual(list(table['main_id']), ['M 31', 'HD 1'])
+        hit, table = lookup_containing_cone(10.68, 41.27, 0.005, row_limit=10, fields=fields)
+        self.assertTrue(hit)
+        self.assertEqual(list(table['main_id']), ['M 31'])
+        self.assertEqual(get_cache_stats()['field_hits'], 2)
+
+        # Sticking out of the cached cone, other fields, or a smaller row limit: no reuse
+        self.assertFalse(lookup_containing_cone(10.68, 41.27, 0.6, row_limit=10, fields=fields)[0])
+        self.assertFalse(lookup_containing_cone(11.3, 41.27, 0.1, row_limit=10, fields=fields)[0])
+        self.assertFalse(lookup_containing_cone(10.68, 41.27, 0.1, row_limit=10, fields=('otype',))[0])
+
+        # A cached answer that hit its row limit may be incomplete
+        SimbadQueryCache.objects.filter(key=key).update(row_count=10)
+        self.assertFalse(lookup_containing_cone(10.68, 41.27, 0.1, row_limit=10, fields=fields)[0])
+
+    @override_settings(SIMBAD_CACHE_FIELD_REUSE_TTL_SECONDS=3600)
+    def test_contained_cone_respects_field_reuse_ttl(self):
+        fields = ('otype',)
+        key, query = region_query_key(100.0, -20.0, '1d0m0s', row_limit=10, fields=fields)
+        cache_store(key, query, None)
+        self.assertEqual(lookup_containing_cone(100.1, -20.0, 0.2, row_limit=10, fields=fields), (True, None))
+
+        SimbadQueryCache.objects.filter(key=key).update(created_at=timezone.now() - timedelta(hours=2))
+        self.assertEqual(lookup_containing_cone(100.1, -20.0, 0.2, row_limit=10, fields=fields), (False, None))
+
+    @override_settings(SIMBAD_CACHE_ENABLED=False)
+    def test_disabled_cache_is_bypassed(self):
+        key, query = object_query_key('M 31', row_limit=1, fields=('otype',))
+        cache_store(key, query, _make_table())
+        self.assertFalse(SimbadQueryCache.objects.exists())
+        self.assertEqual(cache_lookup(key), (False, None))
+
+    @patch('utilities._simbad_rate_limit')
+    @patch('utilities.Simbad')
+    def test_query_region_safe_uses_cache(self, simbad_cls, _rate_mock):
+        from utilities import _query_region_safe
+
+        client = MagicMock()
+        client.query_region.return_value = _make_table()
+        simbad_cls.return_value = client
+
+        first = _query_region_safe(10.0, 41.0, '0d5m0s', row_limit=10)
+        second = _query_region_safe(10.0, 41.0, '0d5m0s', row_limit=10)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 2)
+        client.query_region.assert_called_once()
+
+    @patch('utilities._simbad_rate_limit')
+    @patch('utilities.Simbad')
+    def test_query_object_errors_are_not_cached(self, simbad_cls, _rate_mock):
+        from utilities import _SIMBAD_NEGATIVE_CACHE, _query_object_variants
+
+        client = MagicMock()
+        client.query_object.side_effect = RuntimeError('timeout')
+        simbad_cls.return_value = client
+
+        self.assertIsNone(_query_object_variants('Flaky Target'))
+        _SIMBAD_NEGATIVE_CACHE.discard('flaky target')
+        self.assertFalse(SimbadQueryCache.objects.exists())
+
+    @override_settings(SIMBAD_CACHE_ENABLED=False)
+    @patch('utilities._simbad_rate_limit')
+    @patch('utilities.Simbad')
+    def test_configured_clients_are_reused(self, simbad_cls, rate_mock):
+        from utilities import _query_region_safe
+
+        client = MagicMock()
+        client.query_region.return_value = _make_table()
+        simbad_cls.return_value = client
+
+        for ra in (10.0, 20.0, 30.0):
+            _query_region_safe(ra, 41.0, '0d5m0s', row_limit=10)
+        simbad_cls.assert_called_once()
+        client.add_votable_fields.assert_called_once_with('otype', 'alltypes', 'ids', 'V')
+        self.assertEqual(client.query_region.call_count, 3)
+        # One limiter call for building the client, one per network query
+        self.assertEqual(rate_mock.call_count, 4)
+
+        _query_region_safe(10.0, 41.0, '0d5m0s', row_limit=50)
+        self.assertEqual(simbad_cls.call_count, 2)
+
+    def test_management_command_stats_and_purge(self):
+        key, query = region_query_key(1.0, 2.0, '0d5m0s', row_limit=10, fields=('otype',))
+        cache_store(key, query, None)
+        out = StringIO()
+        call_command('simbad_cache', 'stats', stdout=out)
+        self.assertIn('Entries: 1 (negative: 1)', out.getvalue())
+
+        out = StringIO()
+        call_command('simbad_cache', 'purge', '--kind', 'region', stdout=out)
+        self.assertIn('Deleted 1', out.getvalue())
+        self.assertFalse(SimbadQueryCache.objects.exists())
@@ -0,0 +1,124 @@
+"""Tests for the concurrent SIMBAD pipeline and the bulk re-check commands."""
+import shutil
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+from astropy.table import MaskedColumn, Table
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from objects.models import Object
+from obs_run.simbad_pipeline import PipelineCheckpoint, run_simbad_pipeline
+
+
+def _galaxy_table(ra, dec, name='NGC 7000'):
+    return Table({
+        'main_id': np.array([name], dtype=object),
+        'ra': [ra + 0.001],
+        'dec': [dec],
+        'alltypes.otypes': np.array(['|G|GiG'], dtype=object),
+        'ids': np.array([f'{name}|LEDA 1'], dtype=object),
+        'V': MaskedColumn([11.0], mask=[False]),
+    })
+
+
+class SimbadPipelineTest(TestCase):
+    def test_results_are_applied_in_order_in_batches(self):
+        main_thread = threading.get_ident()
+        fetch_threads = set()
+
+        def fetch(job):
+            fetch_threads.add(threading.get_ident())
+            time.sleep(0.01 * (5 - job))  # later jobs finish first
+            return job * 10
+
+        applied, committed = [], []
+
+        def apply(job, result):
+            self.assertEqual(threading.get_ident(), main_thread)
+            applied.append((job, result))
+
+        stats = run_simbad_pipeline(
+            range(6), fetch, apply, workers=3, batch_size=4,
+            on_batch_committed=lambda job, _s: committed.append(job),
+        )
+        self.assertEqual(applied, [(i, i * 10) for i in range(6)])
+        self.assertEqual(committed, [3, 5])
+        self.assertNotIn(main_thread, fetch_threads)
+        self.assertEqual(stats, {'submitted': 6, 'applied': 6, 'errors': 0, 'batches': 2})
+
+    def test_failures_are_isolated(self):
+        def fetch(job):
+            if job == 1:
+                raise RuntimeError('timeout')
+            return job
+
+        seen = {}
+
+        def apply(job, result):
+            seen[job] = result
+            Object.objects.create(name=f'obj {job}', object_type='ST')
+            if job == 2:
+                raise ValueError('bad row')
+
+        stats = run_simbad_pipeline(range(4), fetch, apply, workers=2, batch_size=10)
+        self.assertIsInstance(seen[1], RuntimeError)
+        self.assertEqual(stats['errors'], 1)
+        # The failing apply is rolled back alone
+        self.assertEqual(
+            sorted(Object.objects.values_list('name', flat=True)), ['obj 0', 'obj 1', 'obj 3'],
+        )
+
+
+class BulkRecheckCommandTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+        self.stars = [
+            Object.objects.create(name=f'TYC {i}', object_type='ST', ra=10.0 + i, dec=20.0)
+            for i in range(4)
+        ]
+
+    def test_reevaluate_stars_resumes_after_interruption(self):
+        calls = []
+
+        def query(ra, dec, radius_str, row_limit=10):
+            calls.append(round(ra))
+            if len(calls) == 3:
+                raise KeyboardInterrupt
+            return _galaxy_table(ra, dec, name=f'NGC {round(ra)}')
+
+        target = 'obs_run.management.commands.reevaluate_stars._query_region_safe'
+        with override_settings(SIMBAD_PIPELINE_CHECKPOINT_DIR=self.tmp):
+            with patch(target, side_effect=query), self.assertRaises(KeyboardInterrupt):
+                call_command('reevaluate_stars', workers=1, batch_size=1, stdout=StringIO())
+            state = PipelineCheckpoint('reevaluate_stars').load()
+            self.assertEqual(state['last_pk'], self.stars[1].pk)
+            self.assertEqual(state['stats']['updated'], 2)
+
+            out = StringIO()
+            with patch(target, side_effect=lambda ra, dec, r, row_limit=10: _galaxy_table(ra, dec, f'NGC {round(ra)}')):
+                call_command('reevaluate_stars', resume=True, workers=2, stdout=out)
+            self.assertIn(f'Resuming after star #{self.stars[1].pk}', out.getvalue())
+            self.assertIn('Updated: 4', out.getvalue())
+            self.assertIsNone(PipelineCheckpoint('reevaluate_stars').load())
+
+        for star in self.stars:
+            star.refresh_from_db()
+            self.assertEqual(star.object_type, 'GA')
+        self.assertEqual([s.name for s in self.stars], ['NGC 10', 'NGC 11', 'NGC 12', 'NGC 13'])
+
+    @override_settings(SIMBAD_CACHE_ENABLED=False)
+    @patch('utilities._query_region_safe')
+    def test_reanalyse_objects_uses_prefetched_tables(self, query_mock):
+        query_mock.side_effect = lambda ra, dec, radius_str, row_limit=10: _galaxy_table(ra, dec)
+        out = StringIO()
+        call_command('reanalyse_objects', limit=2, workers=2, dry_run=True, stdout=out)
+        self.assertIn('Processed: 2, updated: 2', out.getvalue())
+        # One region query per object; a galaxy needs no star-verification search
+        self.assertEqual(query_mock.call_count, 2)
+        self.assertEqual(Object.objects.filter(object_type='ST').count(), 4)
@@ -0,0 +1,100 @@
+"""Tests for the shared SIMBAD token-bucket rate limiter."""
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, override_settings
+
+from obs_run import simbad_rate_limit
+from obs_run.simbad_rate_limit import (
+    BUCKET_AUX,
+    BUCKET_SIMBAD,
+    acquire_simbad_slot,
+    get_rate_limit_stats,
+    reset_rate_limit_stats,
+    wait_for_aux_simbad_query_slot,
+)
+
+
+@override_settings(
+    CELERY_BROKER_URL='memory://',
+    SIMBAD_RATE_LIMIT_PER_SECOND=10.0,
+    SIMBAD_RATE_LIMIT_BURST=3,
+)
+class SimbadRateLimitTest(SimpleTestCase):
+    def setUp(self):
+        simbad_rate_limit._LOCAL_TAT.clear()
+        reset_rate_limit_stats()
+
+    @patch('obs_run.simbad_rate_limit.time.monotonic', return_value=1000.0)
+    @patch('obs_run.simbad_rate_limit.time.sleep')
+    def test_burst_then_sustained_rate(self, sleep_mock, _clock):
+        waits = [acquire_simbad_slot() for _ in range(5)]
+        self.assertEqual(waits[:3], [0.0, 0.0, 0.0])
+        self.assertAlmostEqual(waits[3], 0.1)
+        self.assertAlmostEqual(waits[4], 0.2)
+        self.assertEqual(sleep_mock.call_count, 2)
+
+        stats = get_rate_limit_stats()[BUCKET_SIMBAD]
+        self.assertEqual(stats['source'], 'local')
+        self.assertEqual(stats['acquired'], 5)
+        self.assertEqual(stats['waited'], 2)
+        self.assertAlmostEqual(stats['wait_seconds_max'], 0.2)
+        self.assertAlmostEqual(stats['wait_seconds_total'], 0.3)
+
+    @patch('obs_run.simbad_rate_limit.time.sleep')
+    def test_bucket_refills_over_time(self, sleep_mock):
+        with patch('obs_run.simbad_rate_limit.time.monotonic', return_value=1000.0):
+            for _ in range(3):
+                acquire_simbad_slot()
+        with patch('obs_run.simbad_rate_limit.time.monotonic', return_value=1000.3):
+            self.assertEqual(acquire_simbad_slot(), 0.0)
+        sleep_mock.assert_not_called()
+
+    @override_settings(AUX_OBJECTS_SIMBAD_MIN_INTERVAL_SECONDS=0)
+    @patch('obs_run.simbad_rate_limit.time.sleep')
+    def test_zero_interval_disables_aux_bucket(self, sleep_mock):
+        for _ in range(5):
+            self.assertEqual(wait_for_aux_simbad_query_slot(), 0.0)
+        sleep_mock.assert_not_called()
+        self.assertEqual(get_rate_limit_stats()[BUCKET_AUX]['acquired'], 0)
+
+    @override_settings(AUX_OBJECTS_SIMBAD_MIN_INTERVAL_SECONDS=10.0, AUX_OBJECTS_SIMBAD_BURST=1)
+    @patch('obs_run.simbad_rate_limit.time.monotonic', return_value=50.0)
+    @patch('obs_run.simbad_rate_limit.time.sleep')
+    def test_aux_bucket_is_independent(self, sleep_mock, _clock):
+        self.assertEqual(wait_for_aux_simbad_query_slot(), 0.0)
+        self.assertAlmostEqual(wait_for_aux_simbad_query_slot(), 10.0)
+        self.assertEqual(acquire_simbad_slot(), 0.0)
+
+    @patch('obs_run.simbad_rate_limit.time.sleep')
+    @patch('obs_run.simbad_rate_limit.get_shared_redis')
+    def test_redis_reservation_is_used_when_available(self, client_mock, sleep_mock):
+        client = MagicMock()
+        client.eval.return_value = b'0.250000'
+        client_mock.return_value = client
+
+        self.assertAlmostEqual(acquire_simbad_slot(), 0.25)
+        sleep_mock.assert_called_once_with(0.25)
+        args = client.eval.call_args.args
+        self.assertEqual(args[1:4], (2, 'ostdata:simbad:ratelimit:simbad:tat', 'ostdata:simbad:ratelimit:simbad:stats'))
+        self.assertAlmostEqual(float(args[4]), 0.1)
+        self.assertEqual(float(args[5]), 3.0)
+
+    @patch('obs_run.simbad_rate_limit.time.sleep')
+    @patch('obs_run.simbad_rate_limit.get_shared_redis')
+    def test_redis_errors_fall_back_to_local_bucket(self, client_mock, _sleep_mock):
+        client = MagicMock()
+        client.eval.side_effect = ConnectionError('down')
+        client.hgetall.side_effect = ConnectionError('down')
+        client_mock.return_value = client
+
+        self.assertEqual(acquire_simbad_slot(), 0.0)
+        stats = get_rate_limit_stats()[BUCKET_SIMBAD]
+        self.assertEqual(stats['source'], 'local')
+        self.assertEqual(stats['acquired'], 1)
+
+    @patch('utilities.acquire_simbad_slot')
+    def test_utilities_queries_use_shared_limiter(self, acquire_mock):
+        from utilities import _simbad_rate_limit
+
+        _simbad_rate_limit()
+        acquire_mock.assert_called_once_with()
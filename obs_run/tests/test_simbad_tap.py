@@ -0,0 +1,203 @@
+"""Tests for batched multi-cone SIMBAD lookups against a local TAP stand-in."""
+import io
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs
+
+import numpy as np
+from astropy.io.votable import from_table
+from astropy.table import Table
+from django.test import TestCase, override_settings
+
+from obs_run.aux_objects import compute_aux_objects, compute_aux_objects_many
+from obs_run.models import DataFile, ObservationRun
+from obs_run.simbad_tap import SimbadCone, build_multi_cone_adql, query_cones_batched
+from obs_run.wcs_utils import angular_separation_deg
+
+_CIRCLE_RE = re.compile(r"CIRCLE\('ICRS', ([-0-9.e]+), ([-0-9.e]+), ([-0-9.e]+)\)")
+_TOP_RE = re.compile(r'SELECT TOP (\d+)')
+
+
+def _catalog():
+    return Table({
+        'main_id': ['HD 1', 'HD 2', 'HD 3', 'NGC 7000', 'HD 4'],
+        'ra': [10.0, 10.05, 10.1, 50.0, 120.0],
+        'dec': [20.0, 20.02, 20.1, 30.0, -5.0],
+        'otype': ['*', '*', 'V*', 'HII', '*'],
+        'alltypes.otypes': ['*', '*', 'V*|*', 'HII|ISM', '*'],
+        'ids': ['HD 1', 'HD 2', 'HD 3', 'NGC 7000', 'HD 4'],
+        'V': [8.5, 9.0, 10.5, np.nan, 7.0],
+    })
+
+
+class _TapStandIn(BaseHTTPRequestHandler):
+    """Answers /sync ADQL cone unions from an in-memory catalog."""
+
+    catalog = None
+    queries: list[str] = []
+    fail = False
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        adql = parse_qs(body)['QUERY'][0]
+        type(self).queries.append(adql)
+        if type(self).fail:
+            self.send_response(500)
+            self.end_headers()
+            return
+        cat = type(self).catalog
+        inside = np.zeros(len(cat), dtype=bool)
+        for ra, dec, radius in _CIRCLE_RE.findall(adql):
+            sep = angular_separation_deg(cat['ra'], cat['dec'], float(ra), float(dec))
+            inside |= sep <= float(radius)
+        top = int(_TOP_RE.search(adql).group(1))
+        buf = io.BytesIO()
+        from_table(cat[inside][:top]).to_xml(buf)
+        data = buf.getvalue()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-votable+xml')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@patch('obs_run.simbad_tap._simbad_rate_limit')
+@override_settings(
+    CELERY_BROKER_URL='memory://',
+    AUX_OBJECTS_SIMBAD_BATCH=True,
+    AUX_OBJECTS_SIMBAD_MIN_INTERVAL_SECONDS=0,
+)
+class SimbadTapBatchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = HTTPServer(('127.0.0.1', 0), _TapStandIn)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.tap_url = f'http://127.0.0.1:{cls.server.server_port}/tap'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        _TapStandIn.catalog = _catalog()
+        _TapStandIn.queries = []
+        _TapStandIn.fail = False
+        tap_settings = override_settings(SIMBAD_TAP_URL=self.tap_url)
+        tap_settings.enable()
+        self.addCleanup(tap_settings.disable)
+
+    def _light(self, run, name, ra, dec):
+        return DataFile.objects.create(
+            observation_run=run,
+            datafile=name,
+            file_type='FITS',
+            exposure_type='LI',
+            exposure_type_ml=None,
+            plate_solved=True,
+            wcs_ra=ra,
+            wcs_dec=dec,
+            ra=ra,
+            dec=dec,
+            fov_x=0.3,
+            fov_y=0.3,
+        )
+
+    def test_build_multi_cone_adql(self, _rate_mock):
+        adql = build_multi_cone_adql(
+            [SimbadCone('a', 10.0, 20.0, 0.2, '0d12m0s'), SimbadCone('b', 50.0, 30.0, 0.1, '0d6m0s')],
+            top=200,
+        )
+        self.assertTrue(adql.startswith('SELECT TOP 200 '))
+        self.assertIn('"alltypes.otypes"', adql)
+        self.assertEqual(len(_CIRCLE_RE.findall(adql)), 2)
+        self.assertIn(' OR ', adql)
+
+    def test_query_cones_batched_splits_rows_per_cone(self, _rate_mock):
+        cones = [
+            SimbadCone('a', 10.0, 20.0, 0.1, '0d6m0s'),
+            SimbadCone('b', 10.1, 20.1, 0.1, '0d6m0s'),
+            SimbadCone('c', 200.0, 0.0, 0.1, '0d6m0s'),
+        ]
+        answered = query_cones_batched(cones, row_limit=10)
+        self.assertEqual(len(_TapStandIn.queries), 1)
+        self.assertEqual(sorted(answered['a']['main_id']), ['HD 1', 'HD 2'])
+        self.assertEqual(list(answered['b']['main_id']), ['HD 3', 'HD 2'])
+        self.assertEqual(len(answered['c']), 0)
+
+        # Second call is served from the shared SIMBAD cache.
+        again = query_cones_batched(cones, row_limit=10)
+        self.assertEqual(len(_TapStandIn.queries), 1)
+        self.assertEqual(sorted(again['a']['main_id']), ['HD 1', 'HD 2'])
+        self.assertIsNone(again['c'])
+
+    def test_truncated_answer_leaves_incomplete_cones_unanswered(self, _rate_mock):
+        cones = [
+            SimbadCone('dense', 10.05, 20.05, 0.2, '0d12m0s'),
+            SimbadCone('sparse', 50.0, 30.0, 0.1, '0d6m0s'),
+        ]
+        answered = query_cones_batched(cones, row_limit=1)
+        self.assertEqual(len(answered['dense']), 1)
+        self.assertNotIn('sparse', answered)
+
+    @patch('obs_run.aux_objects._query_region_safe')
+    def test_compute_aux_objects_uses_one_query_for_all_clusters(self, query_mock, _rate_mock):
+        run = ObservationRun.objects.create(name='2024_tap_batch', is_public=True, photometry=True)
+        self._light(run, 'a.fits', 10.0, 20.0)
+        self._light(run, 'b.fits', 50.0, 30.0)
+
+        result = compute_aux_objects(run)
+        self.assertEqual(len(_TapStandIn.queries), 1)
+        query_mock.assert_not_called()
+        self.assertEqual(result['meta']['cluster_count'], 2)
+        self.assertEqual(result['meta']['simbad_query_count'], 1)
+        self.assertEqual({f['simbad_lookup'] for f in result['meta']['fields']}, {'batch'})
+        names = {obj['name'] for obj in result['objects']}
+        self.assertIn('NGC 7000', names)
+        self.assertIn('HD 2', names)
+
+    @patch('obs_run.aux_objects._query_region_safe', return_value=None)
+    def test_failed_batch_falls_back_to_cone_searches(self, query_mock, _rate_mock):
+        _TapStandIn.fail = True
+        run = ObservationRun.objects.create(name='2024_tap_fail', is_public=True, photometry=True)
+        self._light(run, 'a.fits', 10.0, 20.0)
+        self._light(run, 'b.fits', 50.0, 30.0)
+
+        result = compute_aux_objects(run)
+        self.assertEqual(query_mock.call_count, 2)
+        self.assertEqual(result['meta']['simbad_query_count'], 2)
+        self.assertEqual({f['simbad_lookup'] for f in result['meta']['fields']}, {'cone'})
+
+    @patch('obs_run.aux_objects._query_region_safe')
+    def test_field_inside_cached_cone_needs_no_query(self, query_mock, _rate_mock):
+        query_cones_batched([SimbadCone('wide', 10.05, 20.05, 1.0, '1d0m0s')], row_limit=100)
+        self.assertEqual(len(_TapStandIn.queries), 1)
+
+        run = ObservationRun.objects.create(name='2024_tap_field', is_public=True, photometry=True)
+        self._light(run, 'a.fits', 10.0, 20.0)
+        result = compute_aux_objects(run)
+        self.assertEqual(len(_TapStandIn.queries), 1)
+        query_mock.assert_not_called()
+        self.assertEqual(result['meta']['simbad_lookup'], 'field')
+        self.assertEqual(result['meta']['simbad_query_count'], 0)
+        self.assertEqual({obj['name'] for obj in result['objects']}, {'HD 1', 'HD 2', 'HD 3'})
+
+    def test_compute_aux_objects_many_shares_query_between_runs(self, _rate_mock):
+        run_a = ObservationRun.objects.create(name='2024_tap_a', is_public=True, photometry=True)
+        run_b = ObservationRun.objects.create(name='2024_tap_b', is_public=True, photometry=True)
+        run_c = ObservationRun.objects.create(name='2024_tap_c', is_public=True, photometry=True)
+        self._light(run_a, 'a.fits', 10.0, 20.0)
+        self._light(run_b, 'b.fits', 50.0, 30.0)
+
+        results = compute_aux_objects_many([run_a, run_b, run_c])
+        self.assertEqual(len(_TapStandIn.queries), 1)
+        self.assertEqual(results[run_a.pk]['meta']['cluster_count'], 1)
+        self.assertEqual([o['name'] for o in results[run_b.pk]['objects']], ['NGC 7000'])
+        self.assertIsInstance(results[run_c.pk], ValueError)
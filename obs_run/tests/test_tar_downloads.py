@@ -0,0 +1,122 @@
+"""Tests for uncompressed tar downloads (streamed and download jobs)."""
+import errno
+import io
+import tarfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from obs_run.models import DataFile, DownloadJob, ObservationRun
+from obs_run.services.archive_cache import archive_digest
+from obs_run.services.tar_stream import iter_tar_stream, tar_size, write_tar_members
+from obs_run.services.zip_stream import ZipMember
+from obs_run.tasks import build_zip_task
+from obs_run.tests import TempDirMixin
+
+User = get_user_model()
+
+
+class TarStreamTest(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.members = []
+        for pk, (name, payload) in enumerate([('a.fits', b'SIMPLE  ' * 100), ('b' * 120 + '.cr2', b'\1' * 513)], 1):
+            path = self.tmp / name
+            path.write_bytes(payload)
+            self.members.append(ZipMember(datafile_id=pk, path=path, arcname=f'{pk}_{name}', size=len(payload)))
+
+    def _check(self, body):
+        self.assertEqual(len(body), tar_size(self.members))
+        with tarfile.open(fileobj=io.BytesIO(body)) as tf:
+            self.assertEqual(tf.getnames(), [m.arcname for m in self.members])
+            for member in self.members:
+                self.assertEqual(tf.extractfile(member.arcname).read(), member.path.read_bytes())
+
+    def test_stream_matches_precomputed_size(self):
+        self._check(b''.join(iter_tar_stream(self.members, chunk_size=64)))
+
+    def test_file_writer_with_and_without_sendfile(self):
+        out = self.tmp / 'out.tar'
+        with open(out, 'wb', buffering=0) as fh:
+            self.assertEqual(write_tar_members(fh, self.members, chunk_size=100), 2)
+        self._check(out.read_bytes())
+
+        with patch('obs_run.services.tar_stream.os.sendfile', side_effect=OSError(errno.EINVAL, 'no')):
+            with open(out, 'wb', buffering=0) as fh:
+                write_tar_members(fh, self.members, chunk_size=100)
+        self._check(out.read_bytes())
+
+    def test_progress_can_cancel(self):
+        with open(self.tmp / 'out.tar', 'wb', buffering=0) as fh:
+            self.assertIsNone(write_tar_members(fh, self.members, progress=lambda n: False))
+
+
+class TarDownloadApiTest(TempDirMixin, APITestCase):
+    def tmp_settings(self):
+        return {'DATA_DIRECTORY': self.tmp, 'DOWNLOAD_JOB_TMP_DIR': self.tmp / 'jobs'}
+
+    def setUp(self):
+        super().setUp()
+        self.run = ObservationRun.objects.create(name='Tar run', is_public=True)
+        path = self.tmp / 'a.fits'
+        path.write_bytes(b'SIMPLE  ' * 10)
+        self.df = DataFile.objects.create(
+            observation_run=self.run, datafile=str(path), file_type='FITS', file_size=80, content_hash='a' * 64,
+        )
+        self.client.get('/api/users/auth/csrf/')
+
+    def _csrf(self):
+        token = self.client.cookies.get('csrftoken')
+        return {'HTTP_X_CSRFTOKEN': token.value} if token else {}
+
+    def test_streamed_tar(self):
+        resp = self.client.get(f'/api/runs/runs/{self.run.pk}/download/', {'format': 'tar'})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp['Content-Type'], 'application/x-tar')
+        self.assertIn(f'run_{self.run.pk}_datafiles.tar', resp['Content-Disposition'])
+        body = b''.join(resp.streaming_content)
+        self.assertEqual(int(resp['Content-Length']), len(body))
+        with tarfile.open(fileobj=io.BytesIO(body)) as tf:
+            self.assertEqual(tf.extractfile(f'{self.df.pk}_a.fits').read(), b'SIMPLE  ' * 10)
+
+        # Errors are still JSON with the format override
+        resp = self.client.get('/api/runs/datafiles/download/', {'format': 'tar'})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('detail', resp.json())
+
+    @patch('obs_run.services.downloads.build_zip_task.delay')
+    def test_tar_download_job(self, delay):
+        user = User.objects.create_user(username='tar', password='pass')
+        self.client.force_login(user)
+        resp = self.client.post(
+            f'/api/runs/runs/{self.run.pk}/download-jobs/',
+            {'ids': [self.df.pk], 'format': 'tar'},
+            format='json',
+            **self._csrf(),
+        )
+        self.assertEqual(resp.status_code, status.HTTP_201_CREATED)
+        job = DownloadJob.objects.get(pk=resp.data['job_id'])
+        self.assertEqual(job.archive_format, 'tar')
+        build_zip_task.run(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertTrue(job.file_path.endswith('.tar'))
+        self.assertEqual(job.archive_digest, archive_digest([(self.df.pk, 'a' * 64)], 'tar'))
+        self.assertNotEqual(job.archive_digest, archive_digest([(self.df.pk, 'a' * 64)]))
+
+        download = self.client.get(f'/api/runs/jobs/{job.pk}/download')
+        self.assertEqual(download['Content-Type'], 'application/x-tar')
+        with tarfile.open(fileobj=io.BytesIO(b''.join(download.streaming_content))) as tf:
+            self.assertEqual(tf.getnames(), [f'{self.df.pk}_a.fits'])
+
+        resp = self.client.post(
+            '/api/runs/datafiles/download-jobs/',
+            {'ids': [self.df.pk], 'format': 'rar'},
+            format='json',
+            **self._csrf(),
+        )
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('format', resp.data)
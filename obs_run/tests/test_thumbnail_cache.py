@@ -0,0 +1,194 @@
+"""Tests for the on-disk thumbnail cache and cached FITS/image thumbnails."""
+import os
+import time
+from unittest.mock import patch
+
+import numpy as np
+from astropy.io import fits
+from django.test import SimpleTestCase, override_settings
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from obs_run import thumbnail_cache
+from obs_run.api.views import get_datafile_thumbnail
+from obs_run.models import DataFile, ObservationRun
+from obs_run.tests import TempDirMixin
+from obs_run.thumbnails import render_fits_png
+from users.models import User
+
+
+class ThumbnailCacheApiTest(TempDirMixin, APITestCase):
+    def tmp_settings(self):
+        return {'DATA_DIRECTORY': self.tmp, 'THUMBNAIL_CACHE_DIR': self.tmp / 'cache'}
+
+    def setUp(self):
+        super().setUp()
+        thumbnail_cache.reset_cache_stats()
+
+        self.fits_path = self.tmp / 'light.fits'
+        fits.PrimaryHDU(np.arange(64 * 64, dtype=np.int16).reshape(64, 64)).writeto(self.fits_path)
+        run = ObservationRun.objects.create(name='Thumb run', is_public=True)
+        self.df = DataFile.objects.create(
+            observation_run=run, datafile=str(self.fits_path), file_type='FITS', content_hash='c' * 64,
+        )
+        self.url = f'/api/runs/datafiles/{self.df.pk}/thumbnail/'
+
+    def test_fits_thumbnail_is_rendered_once(self):
+        with patch('obs_run.thumbnails.render_fits_png', wraps=render_fits_png) as render:
+            first = self.client.get(self.url, {'w': 32})
+            second = self.client.get(self.url, {'w': 32})
+            self.assertEqual(render.call_count, 1)
+            # Size and content hash are part of the key
+            self.client.get(self.url, {'w': 48})
+            DataFile.objects.filter(pk=self.df.pk).update(content_hash='d' * 64)
+            self.client.get(self.url, {'w': 32})
+            self.assertEqual(render.call_count, 3)
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first['Content-Type'], 'image/png')
+        self.assertEqual(first.content, second.content)
+        stats = thumbnail_cache.get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['stores']), (1, 3, 3))
+
+    def test_newer_source_invalidates_entry(self):
+        with patch('obs_run.thumbnails.render_fits_png', wraps=render_fits_png) as render:
+            self.client.get(self.url)
+            # The file changed after its thumbnail was rendered
+            now = time.time()
+            for entry in (self.tmp / 'cache').rglob('*.png'):
+                os.utime(entry, (now - 120, now - 120))
+            os.utime(self.fits_path, (now - 60, now - 60))
+            self.client.get(self.url)
+            self.client.get(self.url)
+        self.assertEqual(render.call_count, 2)
+        self.assertEqual(thumbnail_cache.get_cache_stats()['stale'], 1)
+
+    def test_counters_share_one_redis_client(self):
+        hashes = {}
+
+        class HashRedis:
+            def __init__(self, **kwargs):
+                pass
+
+            def hincrby(self, key, field, amount):
+                counters = hashes.setdefault(key, {})
+                counters[field] = counters.get(field, 0) + amount
+
+            def hgetall(self, key):
+                return {k.encode(): str(v).encode() for k, v in hashes.get(key, {}).items()}
+
+        with override_settings(CELERY_BROKER_URL='redis://127.0.0.1:6379/9'), \
+                patch('adminops.redis_helpers._redis.Redis', side_effect=HashRedis) as connect:
+            for _ in range(3):
+                self.client.get(self.url, {'w': 32})
+            stats = thumbnail_cache.get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['source']), (2, 1, 'redis'))
+        self.assertEqual(connect.call_count, 1)
+
+    def test_unsupported_files_report_reason(self):
+        video = self.tmp / 'clip.avi'
+        video.write_bytes(b'RIFF')
+        df = DataFile.objects.create(observation_run=self.df.observation_run, datafile=str(video), file_type='AVI')
+        resp = self.client.get(f'/api/runs/datafiles/{df.pk}/thumbnail/')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.data['detail'], 'Preview not supported for video files')
+
+
+@override_settings(THUMBNAIL_CACHE_MAX_BYTES=10 ** 9)
+class ThumbnailCachePruneTest(TempDirMixin, SimpleTestCase):
+    def tmp_settings(self):
+        return {'THUMBNAIL_CACHE_DIR': self.tmp}
+
+    def _entry(self, pk, age):
+        path = thumbnail_cache.cache_path(datafile_id=pk, content_hash='h', max_dim=64, kind='fits')
+        thumbnail_cache.write_cached(path, b'x' * 100)
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+        return path
+
+    def test_least_recently_used_entries_are_evicted(self):
+        paths = [self._entry(pk, age=7200 * (5 - pk)) for pk in range(5)]
+        # Reading the oldest entry makes it the most recently used one
+        self.assertEqual(thumbnail_cache.read_cached(paths[0], 0), b'x' * 100)
+
+        deleted, freed = thumbnail_cache.prune_cache(max_bytes=350)
+        self.assertEqual((deleted, freed), (2, 200))
+        self.assertEqual([p.exists() for p in paths], [True, False, False, True, True])
+        self.assertEqual(thumbnail_cache.cache_usage(), (3, 300))
+        self.assertEqual(thumbnail_cache.purge_cache(datafile_id=3), 1)
+
+
+class ThumbnailHttpCachingTest(TempDirMixin, APITestCase):
+    def tmp_settings(self):
+        return {'DATA_DIRECTORY': self.tmp, 'THUMBNAIL_CACHE_DIR': self.tmp / 'cache'}
+
+    def setUp(self):
+        super().setUp()
+        path = self.tmp / 'noise.fits'
+        rng = np.random.default_rng(1)
+        fits.PrimaryHDU(rng.normal(1000, 30, (256, 256)).astype(np.float32)).writeto(path)
+        self.run = ObservationRun.objects.create(name='Cached run', is_public=True)
+        self.df = DataFile.objects.create(
+            observation_run=self.run, datafile=str(path), file_type='FITS', content_hash='f' * 64,
+        )
+        self.url = f'/api/runs/datafiles/{self.df.pk}/thumbnail/'
+
+    def test_format_negotiation(self):
+        # Production renders JSON only, so DRF adds no Vary header of its own
+        with patch.object(get_datafile_thumbnail.cls, 'renderer_classes', [JSONRenderer]):
+            png = self.client.get(self.url)
+            self.assertEqual(png['Content-Type'], 'image/png')
+            self.assertIn('Accept', png['Vary'])
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=png['ETag'])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertIn('Accept', not_modified['Vary'])
+
+        webp = self.client.get(self.url, HTTP_ACCEPT='image/avif,image/webp,*/*;q=0.8')
+        self.assertEqual(webp['Content-Type'], 'image/webp')
+        self.assertEqual(webp.content[8:12], b'WEBP')
+        self.assertLess(len(webp.content), len(png.content))
+
+        jpeg = self.client.get(self.url, {'fmt': 'jpg'}, HTTP_ACCEPT='image/webp')
+        self.assertEqual(jpeg['Content-Type'], 'image/jpeg')
+        self.assertTrue(jpeg.content.startswith(b'\xff\xd8'))
+
+        bad = self.client.get(self.url, {'fmt': 'gif'})
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_etag_and_not_modified(self):
+        with patch('obs_run.thumbnails.render_fits_png', wraps=render_fits_png) as render:
+            first = self.client.get(self.url, {'fmt': 'webp'})
+            etag = first['ETag']
+            self.assertRegex(etag, r'^"[0-9a-f]{40}"$')
+            self.assertEqual(first['Cache-Control'], 'public, max-age=604800')
+
+            again = self.client.get(self.url, {'fmt': 'webp'}, HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+            self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(again['ETag'], etag)
+            self.assertEqual(again.content, b'')
+            self.assertEqual(render.call_count, 1)
+
+        # Size, format and content are part of the tag
+        self.assertNotEqual(self.client.get(self.url, {'fmt': 'webp', 'w': 64})['ETag'], etag)
+        self.assertNotEqual(self.client.get(self.url, {'fmt': 'png'})['ETag'], etag)
+        DataFile.objects.filter(pk=self.df.pk).update(content_hash='0' * 64)
+        changed = self.client.get(self.url, {'fmt': 'webp'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_private_runs_are_revalidated(self):
+        self.run.is_public = False
+        self.run.save()
+        anon = self.client.get(self.url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(anon.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_login(User.objects.create_user(username='stranger', password='pass'))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+        user = User.objects.create_user(username='viewer', password='pass')
+        self.run.readonly_users.add(user)
+        self.client.force_login(user)
+        resp = self.client.get(self.url)
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp['Cache-Control'], 'private, no-cache')
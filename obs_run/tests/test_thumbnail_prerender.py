@@ -0,0 +1,125 @@
+"""Tests for ingest-time thumbnail pre-rendering and its backfill command."""
+from io import StringIO
+from unittest.mock import patch
+
+import numpy as np
+from astropy.io import fits
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from obs_run import thumbnail_cache
+from obs_run.models import DataFile, ObservationRun
+from obs_run.tasks import _acquire_prerender_slot, _release_prerender_slot, enqueue_thumbnail_prerender
+from obs_run.tests import TempDirMixin
+from obs_run.thumbnails import prerender_thumbnails, render_fits_png
+
+
+class _LeaseRedis:
+    def __init__(self):
+        self.store = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value.encode()
+        return True
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def eval(self, script, numkeys, key, token):
+        # The compare-and-delete release script
+        if self.store.get(key) == token.encode():
+            del self.store[key]
+            return 1
+        return 0
+
+    def expire_all(self):
+        self.store.clear()
+
+
+@override_settings(THUMBNAIL_PRERENDER_SIZES=[64, 32])
+class ThumbnailPrerenderTest(TempDirMixin, TestCase):
+    def tmp_settings(self):
+        return {'DATA_DIRECTORY': self.tmp, 'THUMBNAIL_CACHE_DIR': self.tmp / 'cache'}
+
+    def setUp(self):
+        super().setUp()
+        thumbnail_cache.reset_cache_stats()
+
+        path = self.tmp / 'light.fits'
+        fits.PrimaryHDU(np.arange(100 * 100, dtype=np.float32).reshape(100, 100)).writeto(path)
+        self.run = ObservationRun.objects.create(name='Prerender run', is_public=True)
+        self.df = DataFile.objects.create(
+            observation_run=self.run, datafile=str(path), file_type='FITS', content_hash='e' * 64,
+        )
+
+    def test_prerendered_sizes_are_served_from_cache(self):
+        self.assertEqual(prerender_thumbnails(self.df), {'rendered': 2, 'cached': 0, 'skipped': None})
+        self.assertEqual(prerender_thumbnails(self.df), {'rendered': 0, 'cached': 2, 'skipped': None})
+
+        with patch('obs_run.thumbnails.render_fits_png', wraps=render_fits_png) as render:
+            resp = self.client.get(f'/api/runs/datafiles/{self.df.pk}/thumbnail/', {'w': 64})
+        self.assertEqual(resp.status_code, 200)
+        render.assert_not_called()
+        self.assertEqual(thumbnail_cache.get_cache_stats()['hits'], 1)
+
+    def test_skips_large_and_unsupported_files(self):
+        with override_settings(THUMBNAIL_MAX_SOURCE_BYTES=10):
+            self.assertEqual(prerender_thumbnails(self.df)['skipped'], 'too large')
+        raw = self.tmp / 'raw.cr2'
+        raw.write_bytes(b'II*')
+        cr2 = DataFile.objects.create(observation_run=self.run, datafile=str(raw), file_type='CR2')
+        self.assertEqual(prerender_thumbnails(cr2)['skipped'], 'file type')
+        self.assertFalse(enqueue_thumbnail_prerender(cr2.pk, 'CR2'))
+
+    @override_settings(CELERY_TASK_ALWAYS_EAGER=True)
+    def test_ingest_hook_renders_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.assertTrue(enqueue_thumbnail_prerender(self.df.pk, 'FITS'))
+        self.assertEqual(thumbnail_cache.cache_usage()[0], 0)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(list((self.tmp / 'cache').rglob('*.png'))), 2)
+
+        with override_settings(THUMBNAIL_PRERENDER_ENABLED=False):
+            self.assertFalse(enqueue_thumbnail_prerender(self.df.pk, 'FITS'))
+
+    def test_dedupe_queues_once(self):
+        redis = _LeaseRedis()
+        with patch('adminops.redis_helpers.get_shared_redis', return_value=redis), \
+                self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.assertTrue(enqueue_thumbnail_prerender(self.df.pk, 'FITS', dedupe=True))
+            self.assertFalse(enqueue_thumbnail_prerender(self.df.pk, 'FITS', dedupe=True))
+            # Ingest does not dedupe
+            self.assertTrue(enqueue_thumbnail_prerender(self.df.pk, 'FITS'))
+            redis.expire_all()
+            self.assertTrue(enqueue_thumbnail_prerender(self.df.pk, 'FITS', dedupe=True))
+        self.assertEqual(len(callbacks), 3)
+
+    def test_concurrency_slots(self):
+        redis = _LeaseRedis()
+        with override_settings(THUMBNAIL_PRERENDER_CONCURRENCY=2):
+            (ok1, lease1), (ok2, lease2) = _acquire_prerender_slot(redis), _acquire_prerender_slot(redis)
+            self.assertTrue(ok1 and ok2)
+            self.assertNotEqual(lease1[0], lease2[0])
+            self.assertEqual(_acquire_prerender_slot(redis), (False, None))
+            _release_prerender_slot(redis, lease1)
+            ok, lease3 = _acquire_prerender_slot(redis)
+            self.assertEqual((ok, lease3[0]), (True, lease1[0]))
+
+            # Slots leaked by dead workers expire; the stale lease no longer frees the new holder's slot
+            redis.expire_all()
+            ok, lease4 = _acquire_prerender_slot(redis)
+            self.assertEqual((ok, lease4[0]), (True, lease3[0]))
+            _release_prerender_slot(redis, lease3)
+            self.assertIn(lease4[0], redis.store)
+            self.assertEqual(_acquire_prerender_slot(None), (True, None))
+
+    def test_backfill_command(self):
+        out = StringIO()
+        call_command('prerender_thumbnails', '--run', str(self.run.pk), stdout=out)
+        self.assertIn('1 files (sizes 32, 64): 2 rendered', out.getvalue())
+        out = StringIO()
+        call_command('prerender_thumbnails', '--sizes', '64', stdout=out)
+        self.assertIn('0 rendered, 1 already cached', out.getvalue())
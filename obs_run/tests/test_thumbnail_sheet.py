@@ -0,0 +1,123 @@
+"""Tests for the run thumbnail contact sheet."""
+import base64
+from io import BytesIO
+from unittest.mock import patch
+
+import numpy as np
+from astropy.io import fits
+from django.test import override_settings
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from obs_run.models import DataFile, ObservationRun
+from obs_run.tests import TempDirMixin
+from obs_run.thumbnails import prerender_thumbnails, render_fits_png
+from users.models import User
+
+
+@override_settings(THUMBNAIL_PRERENDER_SIZES=[64])
+class ThumbnailSheetTest(TempDirMixin, APITestCase):
+    def tmp_settings(self):
+        return {'DATA_DIRECTORY': self.tmp, 'THUMBNAIL_CACHE_DIR': self.tmp / 'cache'}
+
+    def setUp(self):
+        super().setUp()
+        self.run = ObservationRun.objects.create(name='Gallery run', is_public=True)
+        self.files = []
+        for index, shape in enumerate([(40, 80), (80, 40), (60, 60)]):
+            path = self.tmp / f'frame{index}.fits'
+            fits.PrimaryHDU(np.random.default_rng(index).normal(100, 10, shape).astype(np.float32)).writeto(path)
+            self.files.append(DataFile.objects.create(
+                observation_run=self.run, datafile=str(path), file_type='FITS', content_hash=f'{index}' * 64,
+            ))
+        self.url = f'/api/runs/runs/{self.run.pk}/thumbnails/'
+
+    def _ids(self, *pks):
+        return ','.join(str(pk) for pk in pks)
+
+    def test_sheet_and_tile_map(self):
+        missing_file = DataFile.objects.create(
+            observation_run=self.run, datafile=str(self.tmp / 'gone.fits'), file_type='FITS',
+        )
+        other_run = ObservationRun.objects.create(name='Other run', is_public=True)
+        foreign = DataFile.objects.create(observation_run=other_run, datafile=self.files[0].datafile, file_type='FITS')
+        a, b, c = (df.pk for df in self.files)
+
+        resp = self.client.get(self.url, {'ids': self._ids(c, missing_file.pk, a, foreign.pk, b), 'w': 32, 'cols': 2})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        data = resp.json()
+        self.assertEqual((data['format'], data['tile_size'], data['columns']), ('webp', 32, 2))
+        self.assertEqual((data['width'], data['height']), (64, 64))
+        self.assertEqual(data['tiles'], [
+            {'id': c, 'x': 0, 'y': 0, 'width': 32, 'height': 32},
+            {'id': a, 'x': 32, 'y': 8, 'width': 32, 'height': 16},
+            {'id': b, 'x': 8, 'y': 32, 'width': 16, 'height': 32},
+        ])
+        self.assertEqual(data['missing'], [
+            {'id': missing_file.pk, 'detail': 'File not found'},
+            {'id': foreign.pk, 'detail': 'Not found'},
+        ])
+        header, encoded = data['image'].split(',', 1)
+        self.assertEqual(header, 'data:image/webp;base64')
+        sheet = Image.open(BytesIO(base64.b64decode(encoded)))
+        self.assertEqual(sheet.size, (64, 64))
+
+    def test_tiles_come_from_prerendered_thumbnails(self):
+        for df in self.files:
+            prerender_thumbnails(df)
+        ids = self._ids(*(df.pk for df in self.files))
+        with patch('obs_run.thumbnails.render_fits_png', wraps=render_fits_png) as render:
+            first = self.client.get(self.url, {'ids': ids, 'w': 48, 'fmt': 'png'})
+            render.assert_not_called()
+            again = self.client.get(self.url, {'ids': ids, 'w': 48, 'fmt': 'png'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertTrue(first.json()['image'].startswith('data:image/png;base64,'))
+        self.assertEqual(first['Cache-Control'], 'public, max-age=604800')
+        self.assertEqual(again.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        reversed_ids = self._ids(*(df.pk for df in reversed(self.files)))
+        reordered = self.client.get(self.url, {'ids': reversed_ids, 'w': 48, 'fmt': 'png'}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(reordered.status_code, status.HTTP_200_OK)
+
+    def test_cold_tiles_are_queued_beyond_render_budget(self):
+        a, b, c = self.files
+        ids = self._ids(a.pk, b.pk, c.pk)
+        with override_settings(THUMBNAIL_SHEET_MAX_RENDERS=1), \
+                patch('obs_run.tasks.enqueue_thumbnail_prerender') as enqueue:
+            first = self.client.get(self.url, {'ids': ids, 'w': 32})
+            self.assertEqual([tile['id'] for tile in first.json()['tiles']], [a.pk])
+            self.assertEqual(first.json()['missing'], [
+                {'id': b.pk, 'detail': 'Thumbnail not rendered yet'},
+                {'id': c.pk, 'detail': 'Thumbnail not rendered yet'},
+            ])
+            self.assertEqual([call.args for call in enqueue.call_args_list], [(b.pk, 'FITS'), (c.pk, 'FITS')])
+            self.assertTrue(all(call.kwargs == {'dedupe': True} for call in enqueue.call_args_list))
+
+            # The queued tiles show up once rendered, under a new ETag
+            prerender_thumbnails(b)
+            second = self.client.get(self.url, {'ids': ids, 'w': 32}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual([tile['id'] for tile in second.json()['tiles']], [a.pk, b.pk, c.pk])
+        self.assertEqual(second.json()['missing'], [])
+
+    def test_private_run_checked_once(self):
+        self.run.is_public = False
+        self.run.save()
+        ids = self._ids(*(df.pk for df in self.files))
+        self.assertEqual(self.client.get(self.url, {'ids': ids}).status_code, status.HTTP_404_NOT_FOUND)
+
+        user = User.objects.create_user(username='gallery', password='pass')
+        self.run.readonly_users.add(user)
+        self.client.force_login(user)
+        resp = self.client.get(self.url, {'ids': ids})
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(resp.json()['tiles']), 3)
+        self.assertEqual(resp['Cache-Control'], 'private, no-cache')
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {'ids': '1,x'}).status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(THUMBNAIL_SHEET_MAX_TILES=2):
+            resp = self.client.get(self.url, {'ids': self._ids(*(df.pk for df in self.files))})
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(resp.json()['detail'], 'At most 2 ids per sheet')
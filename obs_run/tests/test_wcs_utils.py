@@ -1,9 +1,13 @@
 """Tests for DataFile WCS footprint helpers."""
+import astropy.units as u
+import numpy as np
+from astropy.coordinates import SkyCoord
 from astropy.table import Table
 from django.test import SimpleTestCase
 
 from obs_run.models import DataFile
 from obs_run.wcs_utils import (
+    angular_separation_deg,
     build_wcs_from_datafile,
     coords_inside_footprint,
     filter_table_to_footprint,
@@ -98,3 +102,16 @@ class WcsUtilsTest(SimpleTestCase):
         filtered = filter_table_to_footprint(table, df)
         self.assertEqual(len(filtered), 1)
         self.assertEqual(filtered['main_id'][0], 'on')
+
+    def test_angular_separation_matches_skycoord(self):
+        ra1 = np.array([0.0, 83.0, 359.9, 10.0])
+        dec1 = np.array([0.0, -5.0, 89.0, -60.0])
+        ra2 = np.array([1.0, 83.1, 0.1, 200.0])
+        dec2 = np.array([1.0, -5.2, 89.5, 30.0])
+        expected = SkyCoord(ra1 * u.deg, dec1 * u.deg).separation(SkyCoord(ra2 * u.deg, dec2 * u.deg)).degree
+        np.testing.assert_allclose(angular_separation_deg(ra1, dec1, ra2, dec2), expected, atol=1e-9)
+
+    def test_angular_separation_missing_values_are_nan(self):
+        sep = angular_separation_deg([10.0, None], [20.0, 20.0], [10.0, 10.0], [20.0, 20.0])
+        self.assertEqual(float(sep[0]), 0.0)
+        self.assertTrue(np.isnan(sep[1]))
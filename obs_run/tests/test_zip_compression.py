@@ -0,0 +1,131 @@
+"""Tests for the per-file-type ZIP compression policy and parallel deflate."""
+import os
+import zipfile
+import zlib
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from obs_run.models import DataFile, DownloadJob, ObservationRun
+from obs_run.services.zip_compression import compression_for_path, write_zip_members
+from obs_run.services.zip_stream import ZipMember, zip_arcname
+from obs_run.tasks import build_zip_task
+from obs_run.tests import TempDirMixin
+
+
+def _fits_bytes(n_values, seed, *, tile_compressed=False):
+    cards = ['SIMPLE  =                    T', 'BITPIX  =                   16']
+    if tile_compressed:
+        cards += ['XTENSION= \'BINTABLE\'', 'ZIMAGE  =                    T']
+    header = ''.join(c.ljust(80) for c in cards + ['END']).encode('ascii').ljust(2880, b' ')
+    data = np.random.default_rng(seed).normal(1000, 30, n_values).astype('>i2').tobytes()
+    return header + data
+
+
+class ZipCompressionTest(TempDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.files = {
+            'light.fits': _fits_bytes(200_000, 1),
+            'packed.fits': _fits_bytes(50_000, 2, tile_compressed=True),
+            'IMG_0001.CR2': os.urandom(100_000),
+            'log.txt': b'exposure done\n' * 5000,
+            'dark.fit': _fits_bytes(300_000, 3),
+        }
+        for name, data in self.files.items():
+            (self.tmp / name).write_bytes(data)
+        self.members = [
+            ZipMember(datafile_id=i, path=self.tmp / name, arcname=zip_arcname(i, self.tmp / name), size=len(data))
+            for i, (name, data) in enumerate(self.files.items(), start=1)
+        ]
+
+    def test_policy_by_file_type(self):
+        self.assertEqual(compression_for_path(self.tmp / 'light.fits').compresslevel, 1)
+        self.assertEqual(compression_for_path(self.tmp / 'light.fits').compress_type, zipfile.ZIP_DEFLATED)
+        for name in ('packed.fits', 'IMG_0001.CR2', 'frame.ser', 'frame.fits.fz'):
+            self.assertEqual(compression_for_path(self.tmp / name).compress_type, zipfile.ZIP_STORED, name)
+        self.assertEqual(compression_for_path(self.tmp / 'log.txt').compresslevel, 6)
+        with override_settings(DOWNLOAD_ZIP_FITS_LEVEL=0, DOWNLOAD_ZIP_STORED_EXTENSIONS=['txt']):
+            self.assertEqual(compression_for_path(self.tmp / 'light.fits').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(compression_for_path(self.tmp / 'log.txt').compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(compression_for_path(self.tmp / 'IMG_0001.CR2').compress_type, zipfile.ZIP_DEFLATED)
+
+    def _archive(self, workers, chunk_size=64 * 1024):
+        path = self.tmp / f'out_{workers}.zip'
+        seen = []
+        with open(path, 'wb') as fh:
+            written = write_zip_members(
+                fh, self.members, workers=workers, chunk_size=chunk_size, progress=lambda n: seen.append(n) or True,
+            )
+        self.assertEqual(written, len(self.members))
+        self.assertEqual(sum(seen), sum(m.size for m in self.members))
+        return path
+
+    def test_parallel_archive_matches_serial(self):
+        for workers in (1, 3):
+            with zipfile.ZipFile(self._archive(workers)) as zf:
+                self.assertIsNone(zf.testzip())
+                self.assertEqual(zf.namelist(), [m.arcname for m in self.members])
+                for member, (name, data) in zip(self.members, self.files.items()):
+                    self.assertEqual(zf.read(member.arcname), data)
+                info = {i.filename: i for i in zf.infolist()}
+                self.assertEqual(info['3_IMG_0001.CR2'].compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(info['2_packed.fits'].compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(info['1_light.fits'].compress_type, zipfile.ZIP_DEFLATED)
+                self.assertLess(info['1_light.fits'].compress_size, info['1_light.fits'].file_size)
+
+    def test_progress_can_cancel_and_missing_files_are_skipped(self):
+        members = [ZipMember(99, self.tmp / 'gone.fits', '99_gone.fits', 10)] + self.members
+        for workers in (1, 2):
+            with open(self.tmp / 'cancel.zip', 'wb') as fh:
+                self.assertIsNone(write_zip_members(fh, members, workers=workers, progress=lambda n: False))
+            with open(self.tmp / 'skip.zip', 'wb') as fh:
+                self.assertEqual(write_zip_members(fh, members, workers=workers), len(self.members))
+            with zipfile.ZipFile(self.tmp / 'skip.zip') as zf:
+                self.assertEqual(zf.namelist(), [m.arcname for m in self.members])
+
+    def test_build_zip_task_uses_worker_pool(self):
+        run = ObservationRun.objects.create(name='Zip run', is_public=True)
+        for name, data in self.files.items():
+            DataFile.objects.create(
+                observation_run=run, datafile=str(self.tmp / name), file_type='FITS', file_size=len(data),
+            )
+        job = DownloadJob.objects.create(run=run, selected_ids=[], filters={})
+        out_dir = self.tmp / 'jobs'
+        with override_settings(
+            DATA_DIRECTORY=self.tmp, DOWNLOAD_JOB_TMP_DIR=out_dir,
+            DOWNLOAD_ZIP_WORKERS=2, DOWNLOAD_ZIP_PARALLEL_MIN_BYTES=0,
+        ):
+            build_zip_task.run(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done', job.error)
+        self.assertEqual(job.bytes_done, sum(len(d) for d in self.files.values()))
+        with zipfile.ZipFile(job.file_path) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(len(zf.namelist()), len(self.files))
+
+    def test_zip_writer_archives_read_back(self):
+        import io
+        from unittest import mock
+
+        from obs_run.services.zip_writer import ZipWriter
+
+        data = self.files['light.fits']
+        deflater = zlib.compressobj(1, zlib.DEFLATED, -15)
+        raw = deflater.compress(data) + deflater.flush()
+        # A tiny ZIP64 limit exercises the ZIP64 extra fields on small members
+        for limit in (zipfile.ZIP64_LIMIT, 1024):
+            fh = io.BytesIO()
+            with mock.patch('zipfile.ZIP64_LIMIT', limit), (self.tmp / 'log.txt').open('rb') as src:
+                writer = ZipWriter(fh)
+                writer.write_compressed(
+                    'Mond_Ü.fits', io.BytesIO(raw), crc=zlib.crc32(data), file_size=len(data),
+                    compress_size=len(raw), chunk_size=4096,
+                )
+                self.assertTrue(writer.write_stored('log.txt', src, chunk_size=4096))
+                writer.close()
+            with zipfile.ZipFile(fh) as zf:
+                self.assertIsNone(zf.testzip())
+                self.assertEqual(zf.namelist(), ['Mond_Ü.fits', 'log.txt'])
+                self.assertEqual(zf.read('Mond_Ü.fits'), data)
+                self.assertEqual(zf.read('log.txt'), self.files['log.txt'])
@@ -0,0 +1,270 @@
+"""On-disk cache for rendered DataFile thumbnails (FITS, images, SER) and pixel products.
+
+Entries are keyed by DataFile id, content_hash, size and render parameters, so a
+changed file (new hash) or a changed renderer (RENDER_VERSION, parameters) never
+serves a stale image. An entry older than its source file (mtime) is re-rendered
+as well. Reads refresh the entry mtime, which doubles as the LRU clock: when the
+cache grows beyond THUMBNAIL_CACHE_MAX_BYTES the least recently used entries are
+deleted. Writes are atomic (temp file + rename), so web and Celery workers can
+share the directory.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from django.conf import settings
+
+from adminops.redis_helpers import RedisHashCounters
+
+logger = logging.getLogger(__name__)
+
+# Bump when rendering output changes for the same parameters
+RENDER_VERSION = 3
+
+_STATS_KEY = 'ostdata:thumbnails:cache:stats'
+_STAT_FIELDS = ('hits', 'misses', 'stale', 'stores', 'evictions')
+# Refresh the LRU clock of an entry at most this often (saves a utime per hit)
+_TOUCH_INTERVAL_SECONDS = 3600
+
+_STATS = RedisHashCounters(_STATS_KEY, _STAT_FIELDS)
+_PRUNE_LOCK = threading.Lock()
+_written_since_prune = 0
+_pruned_once = False
+
+
+def cache_enabled() -> bool:
+    return bool(getattr(settings, 'THUMBNAIL_CACHE_ENABLED', True))
+
+
+def cache_dir() -> Path:
+    base = getattr(settings, 'THUMBNAIL_CACHE_DIR', None)
+    if base:
+        return Path(base)
+    return Path(settings.BASE_DIR) / 'data' / 'thumbnails'
+
+
+def max_cache_bytes() -> int:
+    return int(getattr(settings, 'THUMBNAIL_CACHE_MAX_BYTES', 1024 ** 3))
+
+
+def _count(field: str, amount: int = 1) -> None:
+    _STATS.incr(field, amount)
+
+
+def get_cache_stats() -> dict[str, Any]:
+    """Return hit/miss counters (Redis when available, else this process) and hit rate."""
+    stats, source = _STATS.snapshot()
+    lookups = stats['hits'] + stats['misses'] + stats['stale']
+    stats['lookups'] = lookups
+    stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+    stats['source'] = source
+    return stats
+
+
+def reset_cache_stats() -> None:
+    _STATS.reset()
+
+
+def cache_path(
+    *,
+    datafile_id: int,
+    content_hash: str,
+    max_dim: int,
+    kind: str,
+    fmt: str = 'png',
+    params: dict[str, Any] | None = None,
+) -> Path:
+    """Cache file for one rendering of a DataFile (sharded by id to keep directories small)."""
+    digest = (content_hash or '').strip()[:16] or 'nohash'
+    variant = json.dumps(
+        {'v': RENDER_VERSION, 'kind': kind, 'fmt': fmt, **(params or {})},
+        sort_keys=True,
+        default=str,
+    )
+    variant_digest = hashlib.sha1(variant.encode('utf-8')).hexdigest()[:10]
+    name = f'df{datafile_id}_{digest}_w{max_dim}_{variant_digest}.{fmt}'
+    return cache_dir() / f'{datafile_id % 256:02x}' / name
+
+
+def is_fresh(path: Path, source_mtime: float) -> bool:
+    """True when ``path`` exists and is not older than the source (no counters, no LRU touch)."""
+    try:
+        return path.stat().st_mtime >= source_mtime
+    except OSError:
+        return False
+
+
+def read_cached(path: Path, source_mtime: float) -> bytes | None:
+    """Cached bytes when ``path`` exists and is not older than the source file, else None."""
+    try:
+        st = path.stat()
+    except OSError:
+        _count('misses')
+        return None
+    if st.st_mtime < source_mtime:
+        _count('stale')
+        return None
+    try:
+        data = path.read_bytes()
+    except OSError:
+        _count('misses')
+        return None
+    _count('hits')
+    touch_cached(path, st.st_mtime)
+    return data
+
+
+def touch_cached(path: Path, mtime: float | None = None) -> None:
+    """Refresh the LRU clock of an entry that was just used (at most once per interval)."""
+    now = time.time()
+    try:
+        if mtime is None:
+            mtime = path.stat().st_mtime
+        if now - mtime > _TOUCH_INTERVAL_SECONDS:
+            os.utime(path, (now, now))
+    except OSError:
+        pass
+
+
+def write_cached(path: Path, data: bytes, *, stats: bool = True) -> None:
+    """
+    Atomically store ``data`` at ``path``; prune the cache when enough was written.
+
+    ``stats=False`` keeps entries that are not thumbnails (pixel products) out of the counters.
+    """
+    global _written_since_prune
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix='.tmp-', suffix=path.suffix)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    except OSError:
+        logger.warning('Could not write thumbnail cache %s', path, exc_info=True)
+        return
+    if stats:
+        _count('stores')
+    with _PRUNE_LOCK:
+        _written_since_prune += len(data)
+        # Scan at the first write of a process and then every ~5% of the cap
+        due = not _pruned_once or _written_since_prune >= max(1, max_cache_bytes() // 20)
+    if due:
+        prune_cache()
+
+
+def get_or_render(
+    *,
+    datafile_id: int,
+    content_hash: str,
+    source_path: Path,
+    max_dim: int,
+    kind: str,
+    render: Callable[[], bytes],
+    fmt: str = 'png',
+    params: dict[str, Any] | None = None,
+) -> bytes:
+    """Cached rendering of ``source_path``; calls ``render()`` and stores the result on a miss."""
+    try:
+        source_mtime = Path(source_path).stat().st_mtime
+    except OSError as exc:
+        raise FileNotFoundError(str(source_path)) from exc
+    if not cache_enabled():
+        return render()
+    path = cache_path(
+        datafile_id=datafile_id, content_hash=content_hash, max_dim=max_dim, kind=kind, fmt=fmt, params=params,
+    )
+    data = read_cached(path, source_mtime)
+    if data is not None:
+        return data
+    data = render()
+    write_cached(path, data)
+    return data
+
+
+def _entries() -> list[tuple[float, int, Path]]:
+    """(mtime, size, path) of every cache entry."""
+    entries = []
+    root = cache_dir()
+    if not root.is_dir():
+        return entries
+    for shard in os.scandir(root):
+        if not shard.is_dir():
+            continue
+        for entry in os.scandir(shard.path):
+            if not entry.is_file() or entry.name.startswith('.tmp-'):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, Path(entry.path)))
+    return entries
+
+
+def cache_usage() -> tuple[int, int]:
+    """(entries, bytes) currently on disk."""
+    entries = _entries()
+    return len(entries), sum(size for _mtime, size, _path in entries)
+
+
+def prune_cache(max_bytes: int | None = None) -> tuple[int, int]:
+    """
+    Delete least recently used entries until the cache is below 90% of ``max_bytes``.
+
+    Only runs when the cache exceeds ``max_bytes`` (THUMBNAIL_CACHE_MAX_BYTES by
+    default). Returns (entries deleted, bytes freed).
+    """
+    global _written_since_prune, _pruned_once
+    limit = max_cache_bytes() if max_bytes is None else int(max_bytes)
+    with _PRUNE_LOCK:
+        _written_since_prune = 0
+        _pruned_once = True
+    entries = _entries()
+    total = sum(size for _mtime, size, _path in entries)
+    if total <= limit:
+        return 0, 0
+    target = int(limit * 0.9)
+    deleted = freed = 0
+    for _mtime, size, path in sorted(entries, key=lambda e: e[0]):
+        if total <= target:
+            break
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        freed += size
+        deleted += 1
+    if deleted:
+        _count('evictions', deleted)
+        logger.info('Thumbnail cache pruned: %d entries, %d bytes', deleted, freed)
+    return deleted, freed
+
+
+def purge_cache(datafile_id: int | None = None) -> int:
+    """Delete all entries (or those of one DataFile). Returns the number deleted."""
+    deleted = 0
+    for _mtime, _size, path in _entries():
+        if datafile_id is not None and not path.name.startswith(f'df{datafile_id}_'):
+            continue
+        try:
+            path.unlink()
+            deleted += 1
+        except OSError:
+            continue
+    return deleted
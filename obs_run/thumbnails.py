@@ -0,0 +1,349 @@
+"""Thumbnails of DataFiles (FITS, JPG/TIFF, SER) as PNG, WebP or JPEG, cached via obs_run.thumbnail_cache."""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Iterable
+
+import numpy as np
+from astropy.visualization import AsinhStretch, ImageNormalize, ZScaleInterval
+from django.conf import settings
+
+from obs_run.pixel_cache import PixelDataError, get_fits_pixels, read_reduced_fits
+from obs_run.ser_thumbnails import is_ser_path, render_ser_frame_png
+from obs_run.thumbnail_cache import cache_enabled, cache_path, get_or_render, is_fresh, write_cached
+
+try:
+    from PIL import Image
+except Exception:  # pragma: no cover
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+FITS_SUFFIXES = ('.fits', '.fit', '.fts')
+VIDEO_SUFFIXES = ('.avi', '.mov')
+# Largest ?w= the thumbnail endpoint accepts
+MAX_THUMBNAIL_DIM = 2048
+# File types rendered ahead of the first request (CR2 and videos have no preview)
+PRERENDER_FILE_TYPES = ('FITS', 'JPG', 'TIFF', 'SER')
+# Response formats and their content types; PNG is rendered first, the others are encoded from it
+THUMBNAIL_FORMATS = {'png': 'image/png', 'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+_FORMAT_ALIASES = {'jpg': 'jpeg'}
+# FITS frames read without a pixel product are reduced to this many times the thumbnail size
+_FITS_OVERSAMPLE = 2
+# Pixels ZScale fits its line to, whatever the frame size
+ZSCALE_SAMPLES = 10_000
+
+
+class ThumbnailError(ValueError):
+    """A thumbnail cannot be produced for this file; ``status`` is the HTTP status to report."""
+
+    def __init__(self, detail: str, status: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+def thumbnail_kind(file_type: str | None, file_path: Path) -> str:
+    """'ser', 'fits', 'video' (unsupported) or 'image'."""
+    ft = (file_type or '').upper()
+    suffix = file_path.suffix.lower()
+    if is_ser_path(ft, file_path):
+        return 'ser'
+    if ft == 'FITS' or suffix in FITS_SUFFIXES:
+        return 'fits'
+    if ft in ('AVI', 'MOV') or suffix in VIDEO_SUFFIXES:
+        return 'video'
+    return 'image'
+
+
+def _encode_png(img, max_dim: int) -> bytes:
+    img.thumbnail((max_dim, max_dim))
+    buf = BytesIO()
+    img.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def render_fits_png(file_path: Path, max_dim: int = 512, pixels: np.ndarray | None = None) -> bytes:
+    """
+    First 2D image HDU with ZScale limits and an asinh stretch.
+
+    ``pixels`` are the reduced frame when the caller already has it (a
+    pixel-cache product); otherwise the file is read at twice ``max_dim``.
+    """
+    if Image is None:
+        raise ThumbnailError('PIL not available', status=500)
+    if pixels is None:
+        try:
+            pixels = read_reduced_fits(file_path, max_dim * _FITS_OVERSAMPLE)
+        except PixelDataError as e:
+            raise ThumbnailError(str(e)) from e
+    finite = pixels[np.isfinite(pixels)]
+    if not finite.size:
+        raise ThumbnailError('Invalid image data')
+    # Fixed-size sample: the cost of the limits does not grow with the frame
+    vmin, vmax = ZScaleInterval(n_samples=ZSCALE_SAMPLES).get_limits(finite)
+    norm = ImageNormalize(vmin=vmin, vmax=vmax, stretch=AsinhStretch())
+    scaled = np.clip(np.nan_to_num(norm(pixels), nan=0.0), 0.0, 1.0)
+    img8 = (scaled * 255.0).astype(np.uint8)
+    return _encode_png(Image.fromarray(img8, mode='L'), max_dim)
+
+
+def _fits_pixels(df, file_path: Path, max_dim: int) -> np.ndarray:
+    try:
+        return get_fits_pixels(
+            datafile_id=df.pk, content_hash=df.content_hash or '', file_path=file_path, min_dim=max_dim,
+        )
+    except PixelDataError as e:
+        raise ThumbnailError(str(e)) from e
+
+
+def render_image_png(file_path: Path, max_dim: int = 512) -> bytes:
+    """JPG/TIFF/PNG and other formats PIL can read."""
+    if Image is None:
+        raise ThumbnailError('Preview not supported')
+    with Image.open(str(file_path)) as img:
+        return _encode_png(img, max_dim)
+
+
+def _renderer(df, kind: str, file_path: Path, max_dim: int) -> Callable[[], bytes]:
+    if kind == 'ser':
+        return lambda: render_ser_frame_png(file_path, max_dim=max_dim)
+    if kind == 'fits':
+        return lambda: render_fits_png(file_path, max_dim, pixels=_fits_pixels(df, file_path, max_dim))
+    return lambda: render_image_png(file_path, max_dim)
+
+
+def get_thumbnail_png(df, file_path: Path, max_dim: int = 512) -> bytes:
+    """
+    PNG thumbnail of DataFile ``df`` (file at ``file_path``), from the cache when possible.
+
+    Raises ThumbnailError for unsupported or unusable files.
+    """
+    kind = thumbnail_kind(df.file_type, file_path)
+    if kind == 'video':
+        raise ThumbnailError('Preview not supported for video files')
+    return get_or_render(
+        datafile_id=df.pk,
+        content_hash=df.content_hash or '',
+        source_path=file_path,
+        max_dim=max_dim,
+        kind=kind,
+        render=_renderer(df, kind, file_path, max_dim),
+    )
+
+
+def thumbnail_needs_render(df, file_path: Path, max_dim: int, source_mtime: float) -> bool:
+    """True when get_thumbnail_png() would render instead of reading a fresh cache entry."""
+    kind = thumbnail_kind(df.file_type, file_path)
+    if kind == 'video' or not cache_enabled():
+        return False
+    path = cache_path(datafile_id=df.pk, content_hash=df.content_hash or '', max_dim=max_dim, kind=kind)
+    return not is_fresh(path, source_mtime)
+
+
+def thumbnail_format(fmt: str | None, accept: str | None = None) -> str:
+    """
+    Response format: the ``fmt`` query parameter when given, else WebP when the
+    ``Accept`` header lists it (as browsers do for images), else PNG.
+
+    Raises ThumbnailError for an unknown ``fmt``.
+    """
+    if fmt:
+        name = _FORMAT_ALIASES.get(fmt.strip().lower(), fmt.strip().lower())
+        if name not in THUMBNAIL_FORMATS:
+            raise ThumbnailError(f"Unsupported format '{fmt}' (use png, webp or jpeg)")
+        return name
+    if 'image/webp' in (accept or '').lower():
+        return 'webp'
+    return 'png'
+
+
+def _format_params(fmt: str) -> dict:
+    """Encoder settings that change the output, part of cache keys and ETags."""
+    if fmt == 'webp':
+        return {'q': int(getattr(settings, 'THUMBNAIL_WEBP_QUALITY', 80))}
+    if fmt == 'jpeg':
+        return {'q': int(getattr(settings, 'THUMBNAIL_JPEG_QUALITY', 85))}
+    return {}
+
+
+def _encode_image(img, fmt: str) -> bytes:
+    """Encode a PIL image as ``fmt`` (lossy formats use the configured quality)."""
+    buf = BytesIO()
+    if fmt == 'png':
+        img.save(buf, format='PNG')
+        return buf.getvalue()
+    quality = _format_params(fmt)['q']
+    if fmt == 'jpeg':
+        img = img if img.mode in ('L', 'RGB') else img.convert('RGB')
+        img.save(buf, format='JPEG', quality=quality, optimize=True)
+    else:
+        has_alpha = 'A' in img.getbands() or 'transparency' in img.info
+        img = img if img.mode in ('RGB', 'RGBA') else img.convert('RGBA' if has_alpha else 'RGB')
+        img.save(buf, format='WEBP', quality=quality, method=4)
+    return buf.getvalue()
+
+
+def encode_thumbnail(png: bytes, fmt: str) -> bytes:
+    """Re-encode a rendered PNG thumbnail as ``fmt``."""
+    if fmt == 'png':
+        return png
+    if Image is None:
+        raise ThumbnailError('PIL not available', status=500)
+    with Image.open(BytesIO(png)) as img:
+        return _encode_image(img, fmt)
+
+
+def get_thumbnail(
+    df,
+    file_path: Path,
+    max_dim: int = 512,
+    fmt: str = 'png',
+    render_png: Callable[[], bytes] | None = None,
+) -> bytes:
+    """
+    Thumbnail of DataFile ``df`` in ``fmt``, from the cache when possible.
+
+    WebP/JPEG are encoded from the (cached) PNG returned by ``render_png``
+    (default: get_thumbnail_png) and cached under their own key.
+    """
+    render_png = render_png or (lambda: get_thumbnail_png(df, file_path, max_dim))
+    if fmt == 'png':
+        return render_png()
+    kind = thumbnail_kind(df.file_type, file_path)
+    if kind == 'video':
+        raise ThumbnailError('Preview not supported for video files')
+    return get_or_render(
+        datafile_id=df.pk,
+        content_hash=df.content_hash or '',
+        source_path=file_path,
+        max_dim=max_dim,
+        kind=kind,
+        render=lambda: encode_thumbnail(render_png(), fmt),
+        fmt=fmt,
+        params=_format_params(fmt),
+    )
+
+
+def thumbnail_etag(df, file_path: Path, max_dim: int, fmt: str, source_stat=None) -> str:
+    """
+    Strong ETag of a thumbnail, known before rendering.
+
+    Derived from the file's content_hash (size and mtime when it has none) and
+    the render parameters, i.e. the same inputs as the cache key.
+    """
+    source = df.content_hash
+    if not source:
+        st = source_stat or file_path.stat()
+        source = f'{st.st_size}-{st.st_mtime_ns}'
+    key = cache_path(
+        datafile_id=df.pk,
+        content_hash=source,
+        max_dim=max_dim,
+        kind=thumbnail_kind(df.file_type, file_path),
+        fmt=fmt,
+        params=_format_params(fmt),
+    ).name
+    return '"%s"' % hashlib.sha1(f'{source}:{key}'.encode('utf-8')).hexdigest()
+
+
+def sheet_source_dim(tile_size: int) -> int:
+    """Thumbnail size contact-sheet tiles are cut from: the smallest pre-rendered size that covers ``tile_size``."""
+    return min((size for size in prerender_sizes() if size >= tile_size), default=tile_size)
+
+
+def build_contact_sheet(thumbnails: list[tuple[int, bytes]], tile_size: int, columns: int, fmt: str) -> tuple[bytes, dict]:
+    """
+    Compose PNG thumbnails (``(datafile_id, png)`` in display order) into one image.
+
+    Each thumbnail is scaled into a ``tile_size`` square cell, ``columns`` cells
+    per row, centred on a black background. Returns the encoded image and the
+    layout: its ``width``/``height`` and per-tile ``id``, ``x``, ``y``,
+    ``width``, ``height`` of the pixels that belong to the DataFile.
+    """
+    if Image is None:
+        raise ThumbnailError('PIL not available', status=500)
+    columns = max(1, min(columns, len(thumbnails) or 1))
+    rows = max(1, -(-len(thumbnails) // columns))
+    sheet = Image.new('RGB', (columns * tile_size, rows * tile_size))
+    tiles = []
+    for index, (datafile_id, png) in enumerate(thumbnails):
+        with Image.open(BytesIO(png)) as img:
+            img.thumbnail((tile_size, tile_size))
+            tile = img.convert('RGB')
+        row, col = divmod(index, columns)
+        x = col * tile_size + (tile_size - tile.width) // 2
+        y = row * tile_size + (tile_size - tile.height) // 2
+        sheet.paste(tile, (x, y))
+        tiles.append({'id': datafile_id, 'x': x, 'y': y, 'width': tile.width, 'height': tile.height})
+    layout = {'width': sheet.width, 'height': sheet.height, 'columns': columns, 'tiles': tiles}
+    return _encode_image(sheet, fmt), layout
+
+
+def contact_sheet_etag(
+    tile_etags: list[str],
+    *,
+    tile_size: int,
+    columns: int,
+    fmt: str,
+    missing_ids: Iterable[int] = (),
+    pending_ids: Iterable[int] = (),
+) -> str:
+    """
+    Strong ETag of a contact sheet: it changes exactly when a tile, the layout or the encoding does.
+
+    ``pending_ids`` are tiles left out until they are rendered, so the complete sheet gets a new tag.
+    """
+    parts = [f'{tile_size}:{columns}:{fmt}:{json.dumps(_format_params(fmt), sort_keys=True)}', *tile_etags]
+    parts += [f'missing:{pk}' for pk in missing_ids]
+    parts += [f'pending:{pk}' for pk in pending_ids]
+    return '"%s"' % hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def prerender_sizes() -> list[int]:
+    """Thumbnail widths the frontend requests (THUMBNAIL_PRERENDER_SIZES), clamped like the API."""
+    sizes = getattr(settings, 'THUMBNAIL_PRERENDER_SIZES', None) or [512, 800]
+    return sorted({min(max(1, int(w)), MAX_THUMBNAIL_DIM) for w in sizes})
+
+
+def prerender_thumbnails(df, sizes: Iterable[int] | None = None) -> dict:
+    """
+    Render the missing cached thumbnails of DataFile ``df`` ahead of the first request.
+
+    Returns counts of ``rendered`` and already ``cached`` sizes, and ``skipped``
+    with a reason when the file type, location or size rules it out.
+    """
+    from obs_run.services.datafile_paths import PathOutsideDataRoot, safe_datafile_path
+
+    result = {'rendered': 0, 'cached': 0, 'skipped': None}
+    if not cache_enabled():
+        result['skipped'] = 'cache disabled'
+        return result
+    if (df.file_type or '').upper() not in PRERENDER_FILE_TYPES:
+        result['skipped'] = 'file type'
+        return result
+    try:
+        file_path = safe_datafile_path(df.datafile, must_exist=True)
+        st = file_path.stat()
+    except (PathOutsideDataRoot, FileNotFoundError, OSError):
+        result['skipped'] = 'missing'
+        return result
+    max_source = int(getattr(settings, 'THUMBNAIL_MAX_SOURCE_BYTES', 500 * 1024 * 1024))
+    if st.st_size > max_source:
+        result['skipped'] = 'too large'
+        return result
+    kind = thumbnail_kind(df.file_type, file_path)
+    for max_dim in (prerender_sizes() if sizes is None else sizes):
+        path = cache_path(
+            datafile_id=df.pk, content_hash=df.content_hash or '', max_dim=max_dim, kind=kind,
+        )
+        if is_fresh(path, st.st_mtime):
+            result['cached'] += 1
+            continue
+        write_cached(path, _renderer(df, kind, file_path, max_dim)())
+        result['rendered'] += 1
+    return result
@@ -204,6 +204,22 @@ def build_wcs_from_datafile(data_file: DataFile) -> tuple[WCS, int, int] | None:
     return _build_synthetic_wcs(data_file, naxis1, naxis2)
 
 
+def angular_separation_deg(ra1_deg, dec1_deg, ra2_deg, dec2_deg) -> np.ndarray:
+    """
+    Great-circle separation (deg) between two sets of positions (haversine).
+
+    Inputs broadcast like NumPy arrays; missing values (None/NaN) yield NaN.
+    """
+    ra1 = np.radians(np.asarray(ra1_deg, dtype=float))
+    dec1 = np.radians(np.asarray(dec1_deg, dtype=float))
+    ra2 = np.radians(np.asarray(ra2_deg, dtype=float))
+    dec2 = np.radians(np.asarray(dec2_deg, dtype=float))
+    sin_ddec = np.sin((dec2 - dec1) / 2.0)
+    sin_dra = np.sin((ra2 - ra1) / 2.0)
+    hav = sin_ddec ** 2 + np.cos(dec1) * np.cos(dec2) * sin_dra ** 2
+    return np.degrees(2.0 * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0))))
+
+
 def coords_inside_footprint(
     ra_deg,
     dec_deg,
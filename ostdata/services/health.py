@@ -284,11 +284,20 @@ def gather_admin_health() -> Dict[str, Any]:
             'WATCH_CREATED_DELAY_SECONDS': os.environ.get('WATCH_CREATED_DELAY_SECONDS', None),
             'WATCH_STABILITY_SECONDS': os.environ.get('WATCH_STABILITY_SECONDS', None),
             'SIMBAD_MIN_INTERVAL': os.environ.get('SIMBAD_MIN_INTERVAL', None),
+            'SIMBAD_RATE_LIMIT_PER_SECOND': getattr(settings, 'SIMBAD_RATE_LIMIT_PER_SECOND', None),
+            'SIMBAD_RATE_LIMIT_BURST': getattr(settings, 'SIMBAD_RATE_LIMIT_BURST', None),
         }
         data['settings'] = s
     except Exception:
         data['settings'] = {}
 
+    # SIMBAD rate limiter wait-time metrics
+    try:
+        from obs_run.simbad_rate_limit import get_rate_limit_stats
+        data['simbad_rate_limit'] = get_rate_limit_stats()
+    except Exception as e:
+        data['simbad_rate_limit'] = {'error': str(e)}
+
     # Storage summary
     storage: dict[str, Any] = {'ok': None}
     try:
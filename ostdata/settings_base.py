@@ -162,6 +162,37 @@ DOWNLOAD_JOB_TMP_DIR = env.path(
     'DOWNLOAD_JOB_TMP_DIR',
     default=BASE_DIR / 'data' / 'download_jobs',
 )
+# Live job progress/cancel state lives in a Redis hash per job; the DownloadJob row is only
+# checkpointed this often while the ZIP is built (every 4 MiB when Redis is unavailable)
+DOWNLOAD_JOB_DB_CHECKPOINT_SECONDS = env.int('DOWNLOAD_JOB_DB_CHECKPOINT_SECONDS', default=30)
+DOWNLOAD_JOB_PROGRESS_TTL_SECONDS = env.int('DOWNLOAD_JOB_PROGRESS_TTL_SECONDS', default=24 * 3600)
+# Jobs for the same files (pk + content hash) and compression policy share a live archive
+DOWNLOAD_ARCHIVE_REUSE_ENABLED = env.bool('DOWNLOAD_ARCHIVE_REUSE_ENABLED', default=True)
+DOWNLOAD_ARCHIVE_REUSE_MIN_REMAINING_SECONDS = env.int('DOWNLOAD_ARCHIVE_REUSE_MIN_REMAINING_SECONDS', default=600)
+# File downloads (raw data files, job ZIPs): 'django' streams with Range support; 'x-sendfile'
+# (Apache mod_xsendfile) or 'x-accel' (nginx, roots mapped to internal URIs) offload the transfer
+FILE_SERVING_BACKEND = env.str('FILE_SERVING_BACKEND', default='django')
+FILE_SERVING_ACCEL_LOCATIONS = env.dict('FILE_SERVING_ACCEL_LOCATIONS', default={})
+# Streamed ZIP responses (GET .../download/) for selections up to these limits; larger ones use download jobs
+DOWNLOAD_STREAM_ENABLED = env.bool('DOWNLOAD_STREAM_ENABLED', default=True)
+DOWNLOAD_STREAM_MAX_FILES = env.int('DOWNLOAD_STREAM_MAX_FILES', default=100)
+DOWNLOAD_STREAM_MAX_BYTES = env.int('DOWNLOAD_STREAM_MAX_BYTES', default=512 * 1024 * 1024)  # 512 MiB
+# Concurrent streamed archives per user / per anonymous IP bucket (enforced via Redis; 0 = no cap)
+DOWNLOAD_STREAM_MAX_CONCURRENT_USER = env.int('DOWNLOAD_STREAM_MAX_CONCURRENT_USER', default=2)
+DOWNLOAD_STREAM_MAX_CONCURRENT_ANON = env.int('DOWNLOAD_STREAM_MAX_CONCURRENT_ANON', default=1)
+# ZIP compression policy (download jobs and streamed ZIPs): listed suffixes (raws, JPEG, SER,
+# compressed FITS) are stored; raw FITS and other files are deflated at the given levels (0 = store)
+DOWNLOAD_ZIP_STORED_EXTENSIONS = env.list('DOWNLOAD_ZIP_STORED_EXTENSIONS', default=[
+    '.cr2', '.cr3', '.nef', '.arw', '.dng', '.orf', '.raf', '.rw2',
+    '.jpg', '.jpeg', '.png', '.gif', '.webp',
+    '.ser', '.avi', '.mp4', '.mov', '.mkv',
+    '.fz', '.gz', '.bz2', '.xz', '.zip', '.7z',
+])
+DOWNLOAD_ZIP_FITS_LEVEL = env.int('DOWNLOAD_ZIP_FITS_LEVEL', default=1)
+DOWNLOAD_ZIP_DEFAULT_LEVEL = env.int('DOWNLOAD_ZIP_DEFAULT_LEVEL', default=6)
+# Download jobs with at least DOWNLOAD_ZIP_PARALLEL_MIN_BYTES of input deflate members in a thread pool
+DOWNLOAD_ZIP_WORKERS = env.int('DOWNLOAD_ZIP_WORKERS', default=4)
+DOWNLOAD_ZIP_PARALLEL_MIN_BYTES = env.int('DOWNLOAD_ZIP_PARALLEL_MIN_BYTES', default=256 * 1024 * 1024)  # 256 MiB
 
 # Thumbnail / image processing limits
 THUMBNAIL_MAX_SOURCE_BYTES = env.int('THUMBNAIL_MAX_SOURCE_BYTES', default=500 * 1024 * 1024)  # 500 MiB
@@ -207,10 +238,65 @@ SOLAR_SYSTEM_OBJECT_IMAGES_DIR = env.path(
     default=BASE_DIR / 'data' / 'solar_system_images',
 )
 
-# Cached PNG thumbnails for SER data files (see obs_run.ser_thumbnails)
-SER_THUMBNAIL_CACHE_DIR = env.path(
-    'SER_THUMBNAIL_CACHE_DIR',
-    default=BASE_DIR / 'data' / 'ser_thumbnails',
+# Rendered FITS/image/SER thumbnails, LRU-pruned above THUMBNAIL_CACHE_MAX_BYTES (see obs_run.thumbnail_cache).
+# The former SER_THUMBNAIL_CACHE_DIR is still honoured when THUMBNAIL_CACHE_DIR is not set.
+THUMBNAIL_CACHE_ENABLED = env.bool('THUMBNAIL_CACHE_ENABLED', default=True)
+THUMBNAIL_CACHE_DIR = env.path(
+    'THUMBNAIL_CACHE_DIR',
+    default=env.str('SER_THUMBNAIL_CACHE_DIR', default=str(BASE_DIR / 'data' / 'thumbnails')),
+)
+THUMBNAIL_CACHE_MAX_BYTES = env.int('THUMBNAIL_CACHE_MAX_BYTES', default=1024 * 1024 * 1024)  # 1 GiB
+# Reduced float32 FITS pixels (.npy, see obs_run.pixel_cache) stored in the thumbnail cache; long-side sizes
+PIXEL_CACHE_SIZES = env.list('PIXEL_CACHE_SIZES', cast=int, default=[1024])
+# Per-frame pixel statistics (mean/median/std/background/saturation) of FITS files at ingest
+PIXEL_STATS_ENABLED = env.bool('PIXEL_STATS_ENABLED', default=True)
+# WebP/JPEG thumbnails (negotiated via Accept or ?fmt=) and browser caching of public-run thumbnails
+THUMBNAIL_WEBP_QUALITY = env.int('THUMBNAIL_WEBP_QUALITY', default=80)
+THUMBNAIL_JPEG_QUALITY = env.int('THUMBNAIL_JPEG_QUALITY', default=85)
+THUMBNAIL_HTTP_MAX_AGE = env.int('THUMBNAIL_HTTP_MAX_AGE', default=7 * 24 * 3600)  # seconds
+# Contact sheets (/api/runs/runs/<id>/thumbnails/): DataFiles per request, and uncached
+# tiles rendered synchronously per request (the rest are queued for pre-rendering)
+THUMBNAIL_SHEET_MAX_TILES = env.int('THUMBNAIL_SHEET_MAX_TILES', default=100)
+THUMBNAIL_SHEET_MAX_RENDERS = env.int('THUMBNAIL_SHEET_MAX_RENDERS', default=10)
+# Pre-render new FITS/JPG/TIFF/SER files at ingest (Celery, lowest priority, at most
+# THUMBNAIL_PRERENDER_CONCURRENCY at once when Redis is available); sizes match the frontend
+THUMBNAIL_PRERENDER_ENABLED = env.bool('THUMBNAIL_PRERENDER_ENABLED', default=True)
+THUMBNAIL_PRERENDER_SIZES = env.list('THUMBNAIL_PRERENDER_SIZES', cast=int, default=[512, 800])
+THUMBNAIL_PRERENDER_QUEUE = env.str('THUMBNAIL_PRERENDER_QUEUE', default='')
+THUMBNAIL_PRERENDER_PRIORITY = env.int('THUMBNAIL_PRERENDER_PRIORITY', default=9)  # Redis: 9 = lowest
+THUMBNAIL_PRERENDER_CONCURRENCY = env.int('THUMBNAIL_PRERENDER_CONCURRENCY', default=2)
+
+# Shared SIMBAD token-bucket rate limit for all processes (see obs_run.simbad_rate_limit).
+# The legacy SIMBAD_MIN_INTERVAL (seconds between queries) still sets the default rate.
+SIMBAD_RATE_LIMIT_PER_SECOND = env.float(
+    'SIMBAD_RATE_LIMIT_PER_SECOND',
+    default=1.0 / max(env.float('SIMBAD_MIN_INTERVAL', default=0.3), 1e-3),
+)
+SIMBAD_RATE_LIMIT_BURST = env.int('SIMBAD_RATE_LIMIT_BURST', default=5)
+
+# Persistent SIMBAD response cache shared by all processes (see obs_run.simbad_cache)
+SIMBAD_CACHE_ENABLED = env.bool('SIMBAD_CACHE_ENABLED', default=True)
+SIMBAD_CACHE_TTL_SECONDS = env.int('SIMBAD_CACHE_TTL_SECONDS', default=30 * 24 * 3600)  # 30 days
+SIMBAD_CACHE_NEGATIVE_TTL_SECONDS = env.int('SIMBAD_CACHE_NEGATIVE_TTL_SECONDS', default=24 * 3600)  # 1 day
+SIMBAD_CACHE_GRID_ARCSEC = env.float('SIMBAD_CACHE_GRID_ARCSEC', default=2.0)  # cone-center rounding for keys
+# Max age of cached cones used to answer smaller cones they contain (0 disables field reuse)
+SIMBAD_CACHE_FIELD_REUSE_TTL_SECONDS = env.int('SIMBAD_CACHE_FIELD_REUSE_TTL_SECONDS', default=7 * 24 * 3600)
+# Optional SIMBAD TAP endpoint for batched ADQL queries (mirror or local stand-in); empty = astroquery default
+SIMBAD_TAP_URL = env.str('SIMBAD_TAP_URL', default='')
+# Offline catalog of common targets consulted before SIMBAD (see obs_run.local_catalog)
+LOCAL_CATALOG_ENABLED = env.bool('LOCAL_CATALOG_ENABLED', default=True)
+LOCAL_CATALOG_FILE = env.path(
+    'LOCAL_CATALOG_FILE',
+    default=BASE_DIR / 'obs_run' / 'data' / 'local_catalog.csv',
+)
+# True: a local miss in star verification is final (catalog covers all NGC/M/ACO objects)
+LOCAL_CATALOG_REGION_AUTHORITATIVE = env.bool('LOCAL_CATALOG_REGION_AUTHORITATIVE', default=False)
+# Concurrent SIMBAD driver for reevaluate_stars / reanalyse_objects (see obs_run.simbad_pipeline)
+SIMBAD_PIPELINE_WORKERS = env.int('SIMBAD_PIPELINE_WORKERS', default=4)  # queries in flight (still rate limited)
+SIMBAD_PIPELINE_BATCH_SIZE = env.int('SIMBAD_PIPELINE_BATCH_SIZE', default=50)  # objects per transaction/checkpoint
+SIMBAD_PIPELINE_CHECKPOINT_DIR = env.path(
+    'SIMBAD_PIPELINE_CHECKPOINT_DIR',
+    default=BASE_DIR / 'data' / 'simbad_checkpoints',
 )
 
 # SIMBAD auxiliary objects for observation runs (see obs_run.aux_objects)
@@ -221,8 +307,12 @@ AUX_OBJECTS_CLUSTER_FOV_FRACTION = env.float('AUX_OBJECTS_CLUSTER_FOV_FRACTION',
 AUX_OBJECTS_CLUSTER_MIN_ARCMIN = env.float('AUX_OBJECTS_CLUSTER_MIN_ARCMIN', default=2.0)
 AUX_OBJECTS_ENABLED = env.bool('AUX_OBJECTS_ENABLED', default=False)
 AUX_OBJECTS_SIMBAD_MIN_INTERVAL_SECONDS = env.float('AUX_OBJECTS_SIMBAD_MIN_INTERVAL_SECONDS', default=10.0)
+AUX_OBJECTS_SIMBAD_BURST = env.int('AUX_OBJECTS_SIMBAD_BURST', default=1)
 AUX_OBJECTS_BATCH_SIZE = env.int('AUX_OBJECTS_BATCH_SIZE', default=5)
 AUX_OBJECTS_AUTO_ON_WCS = env.bool('AUX_OBJECTS_AUTO_ON_WCS', default=True)
+AUX_OBJECTS_SIMBAD_BATCH = env.bool('AUX_OBJECTS_SIMBAD_BATCH', default=True)  # one multi-cone TAP query per run
+AUX_OBJECTS_SIMBAD_BATCH_MAX_CONES = env.int('AUX_OBJECTS_SIMBAD_BATCH_MAX_CONES', default=50)
+AUX_OBJECTS_RUNS_PER_TASK = env.int('AUX_OBJECTS_RUNS_PER_TASK', default=1)  # >1: queue groups runs into one task
 
 # Celery
 CELERY_TASK_ALWAYS_EAGER = env.bool('CELERY_TASK_ALWAYS_EAGER', default=False)
@@ -279,7 +369,9 @@ PLATE_SOLVING_NEARBY_SEARCH_RADIUS = env.float('PLATE_SOLVING_NEARBY_SEARCH_RADI
 PLATE_SOLVING_RE_EVAL_COORD_THRESHOLD_ARCMIN = env.float(
     'PLATE_SOLVING_RE_EVAL_COORD_THRESHOLD_ARCMIN', default=5.0
 )
-PLATE_SOLVING_RE_EVAL_BATCH_SIZE = env.int('PLATE_SOLVING_RE_EVAL_BATCH_SIZE', default=50)
+# Files screened per run (bulk separation check) and max evaluate_data_file calls per run
+PLATE_SOLVING_RE_EVAL_BATCH_SIZE = env.int('PLATE_SOLVING_RE_EVAL_BATCH_SIZE', default=2000)
+PLATE_SOLVING_RE_EVAL_MAX_EVALUATIONS = env.int('PLATE_SOLVING_RE_EVAL_MAX_EVALUATIONS', default=50)
 
 # Watney-specific settings
 WATNEY_SOLVE_PATH = env.str('WATNEY_SOLVE_PATH', default='watney-solve')
@@ -4,7 +4,7 @@ import hashlib
 import logging
 import os
 import re
-import time
+import threading
 import warnings
 from pathlib import Path
 
@@ -18,27 +18,23 @@ from astropy.time import Time
 from astropy.visualization import simple_norm
 from astroquery.simbad import Simbad
 from django.conf import settings
-from django.db.models import Case, CharField, ExpressionWrapper, F, FloatField, Q, Value, When
+from django.db.models import ExpressionWrapper, F, FloatField, Q
 from scipy import ndimage, signal
 
 from objects.models import Object
+from obs_run.local_catalog import local_region_authoritative, query_local_region, resolve_local_name
 from obs_run.models import DataFile, ObservationRun
+from obs_run.simbad_cache import cache_lookup, cache_store, object_query_key, region_query_key
+from obs_run.simbad_rate_limit import acquire_simbad_slot
 from obs_run.utils import object_has_any_override, should_allow_auto_update
 
 logger = logging.getLogger(__name__)
 
-# Simple in-process SIMBAD safeguards: rate limit and negative cache
+# In-process SIMBAD negative cache; rate limiting is shared (obs_run.simbad_rate_limit)
 _SIMBAD_NEGATIVE_CACHE = set()
-_LAST_SIMBAD_TS = 0.0
-_SIMBAD_MIN_INTERVAL = float(os.environ.get('SIMBAD_MIN_INTERVAL', '0.3'))
 
 def _simbad_rate_limit():
-    global _LAST_SIMBAD_TS
-    now = time.time()
-    wait = _SIMBAD_MIN_INTERVAL - (now - _LAST_SIMBAD_TS)
-    if wait > 0:
-        time.sleep(wait)
-    _LAST_SIMBAD_TS = time.time()
+    acquire_simbad_slot()
 
 def _in_neg_cache(name: str) -> bool:
     return bool(name) and (str(name).strip().lower() in _SIMBAD_NEGATIVE_CACHE)
@@ -49,28 +45,79 @@ def _add_neg_cache(name: str):
 
 def _try_add_fields(simbad: Simbad, fields: tuple[str, ...]) -> bool:
     try:
-        _simbad_rate_limit()
         simbad.add_votable_fields(*fields)
         return True
     except Exception as e:
         logger.warning("SIMBAD add_votable_fields failed: %s", e)
         return False
 
+# Pre-configured Simbad clients, keyed by (votable fields, row limit). Clients are
+# kept per thread because astroquery clients hold a requests session.
+_SIMBAD_CLIENTS = threading.local()
+_SIMBAD_CLIENT_POOL_SIZE = 8
+
+def _get_simbad_client(fields: tuple[str, ...], row_limit: int):
+    """
+    Return a Simbad client configured with ``fields`` and ``row_limit``.
+
+    Clients are built once per thread and reused; building one may fetch the
+    votable field list from SIMBAD, so only that first build is rate limited.
+    Returns None when the fields cannot be added (nothing is pooled then).
+    """
+    pool = getattr(_SIMBAD_CLIENTS, 'pool', None)
+    if pool is None:
+        pool = _SIMBAD_CLIENTS.pool = {}
+    key = (tuple(fields), int(row_limit))
+    client = pool.get(key)
+    if client is not None:
+        return client
+    client = Simbad()
+    try:
+        client.ROW_LIMIT = row_limit
+    except Exception:
+        pass
+    _simbad_rate_limit()
+    if not _try_add_fields(client, fields):
+        return None
+    if len(pool) >= _SIMBAD_CLIENT_POOL_SIZE:
+        pool.pop(next(iter(pool)))
+    pool[key] = client
+    return client
+
+def _reset_simbad_clients():
+    """Drop this thread's pooled Simbad clients (e.g. after changing settings in tests)."""
+    _SIMBAD_CLIENTS.pool = {}
+
+_OBJECT_QUERY_FIELDS = ('otype', 'alltypes', 'ids')
+_REGION_QUERY_FIELDS = ('otype', 'alltypes', 'ids', 'V')
+
 def _query_object_variants(name: str):
+    # Routine targets (Messier/NGC/IC, bright stars, ...) resolve offline
+    local = resolve_local_name(name)
+    if local is not None:
+        return local
     if _in_neg_cache(name):
         return None
+    cache_key, cache_query = object_query_key(name, row_limit=1, fields=_OBJECT_QUERY_FIELDS)
+    hit, cached = cache_lookup(cache_key)
+    if hit:
+        if cached is None:
+            _add_neg_cache(name)
+        return cached
     base = " ".join(str(name).strip().split())
     variants = {base}
     m = re.match(r"^(M|NGC|IC|UGC|PGC)\s*0*([0-9]+)$", base, re.IGNORECASE)
     if m:
         variants.add(f"{m.group(1).upper()} {int(m.group(2))}")
         variants.add(f"{m.group(1).upper()}{int(m.group(2))}")
-    custom = Simbad()
-    try:
-        custom.ROW_LIMIT = 1
-    except Exception:
-        pass
-    _try_add_fields(custom, ('otype','alltypes','ids'))
+    custom = _get_simbad_client(_OBJECT_QUERY_FIELDS, 1)
+    if custom is None:
+        custom = Simbad()
+        try:
+            custom.ROW_LIMIT = 1
+        except Exception:
+            pass
+    failed = False
     for v in variants:
         try:
             _simbad_rate_limit()
@@ -78,25 +125,37 @@ def _query_object_variants(name: str):
                 warnings.simplefilter('ignore')
                 tbl = custom.query_object(v)
             if tbl is not None and len(tbl) > 0:
+                cache_store(cache_key, cache_query, tbl)
                 return tbl
         except Exception as e:
             logger.warning("SIMBAD query_object error for %s: %s", v, e)
+            failed = True
             break
+    # Only persist "not found" when SIMBAD actually answered for every variant
+    if not failed:
+        cache_store(cache_key, cache_query, None)
     _add_neg_cache(name)
     return None
 
-def _radius_str_from_arcmin(radius_arcmin: float) -> str:
-    """Convert radius in arcminutes to SIMBAD format (e.g. '0d10m0s')."""
+def _radius_str_from_arcmin(radius_arcmin: float, round_arcsec: bool = True) -> str:
+    """
+    Convert radius in arcminutes to SIMBAD format (e.g. '0d10m0s').
+
+    round_arcsec=False truncates the seconds (the star verification and reanalysis searches).
+    """
     degrees = int(radius_arcmin // 60)
     remaining_arcmin = radius_arcmin - (degrees * 60)
     arcmin = int(remaining_arcmin)
-    arcsec = int(round((remaining_arcmin - arcmin) * 60))
+    arcsec = (remaining_arcmin - arcmin) * 60
+    arcsec = int(round(arcsec)) if round_arcsec else int(arcsec)
     return f"{degrees}d{arcmin}m{arcsec}s"
 
 
 def _query_region_safe(ra_deg: float, dec_deg: float, radius_str: str = '0d5m0s', row_limit: int = 10):
     """
     Query SIMBAD region search safely with rate limiting.
+
+    Answers are served from / stored in the shared SIMBAD cache (obs_run.simbad_cache).
     
     Parameters
     ----------
@@ -114,21 +173,25 @@ def _query_region_safe(ra_deg: float, dec_deg: float, radius_str: str = '0d5m0s'
     astropy.table.Table or None
         SIMBAD query results or None on error
     """
+    cache_key, cache_query = region_query_key(
+        ra_deg, dec_deg, radius_str, row_limit=row_limit, fields=_REGION_QUERY_FIELDS,
+    )
+    hit, cached = cache_lookup(cache_key)
+    if hit:
+        return cached
     try:
-        sim = Simbad()
-        try:
-            sim.ROW_LIMIT = row_limit
-        except Exception:
-            pass
-        if not _try_add_fields(sim, ('otype','alltypes','ids','V')):
+        sim = _get_simbad_client(_REGION_QUERY_FIELDS, row_limit)
+        if sim is None:
             return None
         _simbad_rate_limit()
         with warnings.catch_warnings():
             warnings.simplefilter('ignore')
-            return sim.query_region(
+            result = sim.query_region(
                 SkyCoord(ra_deg * u.deg, dec_deg * u.deg, frame='icrs'),
                 radius=radius_str,
             )
+        cache_store(cache_key, cache_query, result)
+        return result
     except Exception as e:
         logger.warning("SIMBAD query_region failed: %s", e)
         return None
@@ -187,11 +250,9 @@ def annotate_effective_exposure_type(queryset):
     """
     Annotate a DataFile queryset with annotated_effective_exposure_type field.
     
-    This implements the priority logic:
-    1. exposure_type_user (if set, not None, not empty string)
-    2. exposure_type_ml (if set AND matches exposure_type header value)
-    3. 'UK' (Unknown) if exposure_type_ml is set but doesn't match exposure_type
-    4. exposure_type (header-based, fallback)
+    The value is the stored ``exposure_type_effective`` column (same priority
+    logic as ``DataFile.effective_exposure_type``). Kept for callers that read
+    the annotation; new queries should filter on the column directly.
     
     Parameters
     ----------
@@ -203,30 +264,7 @@ def annotate_effective_exposure_type(queryset):
     QuerySet
         Annotated queryset with annotated_effective_exposure_type field
     """
-    return queryset.annotate(
-        annotated_effective_exposure_type=Case(
-            # Priority 1: User-set type
-            When(
-                Q(exposure_type_user__isnull=False) & ~Q(exposure_type_user=''),
-                then='exposure_type_user'
-            ),
-            # Priority 2: ML type matches header type
-            When(
-                Q(exposure_type_ml__isnull=False) & 
-                ~Q(exposure_type_ml='') & 
-                Q(exposure_type_ml=F('exposure_type')),
-                then='exposure_type_ml'
-            ),
-            # Priority 3: ML type doesn't match header type -> Unknown
-            When(
-                Q(exposure_type_ml__isnull=False) & ~Q(exposure_type_ml=''),
-                then=Value('UK')
-            ),
-            # Priority 4: Header-based type
-            default='exposure_type',
-            output_field=CharField(max_length=2)
-        )
-    )
+    return queryset.annotate(annotated_effective_exposure_type=F('exposure_type_effective'))
 
 
 def get_effective_exposure_type_filter(exposure_type_code, field_prefix=''):
@@ -244,51 +282,9 @@ def get_effective_exposure_type_filter(exposure_type_code, field_prefix=''):
     Returns
     -------
     Q
-        Django Q object for filtering by effective exposure type
+        Django Q object on the indexed ``exposure_type_effective`` column
     """
-    # This creates a filter that matches the effective_exposure_type logic
-    # Priority 1: exposure_type_user matches
-    # Priority 2: exposure_type_ml matches AND equals exposure_type
-    # Priority 3: exposure_type_ml doesn't match exposure_type -> 'UK' (only if code is 'UK')
-    # Priority 4: exposure_type matches
-    
-    # Build field names with prefix
-    user_field = f'{field_prefix}exposure_type_user' if field_prefix else 'exposure_type_user'
-    ml_field = f'{field_prefix}exposure_type_ml' if field_prefix else 'exposure_type_ml'
-    type_field = f'{field_prefix}exposure_type' if field_prefix else 'exposure_type'
-    
-    if exposure_type_code == 'UK':
-        # For Unknown: exposure_type_ml is set but doesn't match exposure_type
-        return Q(
-            Q(**{f'{ml_field}__isnull': False}) & 
-            ~Q(**{ml_field: ''}) & 
-            ~Q(**{ml_field: F(type_field)})
-        )
-    else:
-        # For other types: check all priority levels
-        return (
-            # Priority 1: exposure_type_user matches
-            Q(**{user_field: exposure_type_code}) & 
-            Q(**{f'{user_field}__isnull': False}) & 
-            ~Q(**{user_field: ''})
-        ) | (
-            # Priority 2: exposure_type_ml matches AND equals exposure_type
-            Q(**{ml_field: exposure_type_code}) & 
-            Q(**{f'{ml_field}__isnull': False}) & 
-            ~Q(**{ml_field: ''}) & 
-            Q(**{ml_field: F(type_field)})
-        ) | (
-            # Priority 4: exposure_type matches AND (no user type OR no ML type OR ML matches)
-            Q(**{type_field: exposure_type_code}) & 
-            (
-                Q(**{f'{user_field}__isnull': True}) | Q(**{user_field: ''})
-            ) & 
-            (
-                Q(**{f'{ml_field}__isnull': True}) | 
-                Q(**{ml_field: ''}) | 
-                Q(**{ml_field: F(type_field)})
-            )
-        )
+    return Q(**{f'{field_prefix}exposure_type_effective': exposure_type_code})
 
 
 def get_object_fov_radius(obj, fallback_arcmin=10.0, min_arcmin=1.0, max_arcmin=60.0):
@@ -319,8 +315,7 @@ def get_object_fov_radius(obj, fallback_arcmin=10.0, min_arcmin=1.0, max_arcmin=
     )
     
     # Prefer Light frames (using effective exposure type)
-    datafiles = annotate_effective_exposure_type(datafiles)
-    light_frames = datafiles.filter(annotated_effective_exposure_type='LI')
+    light_frames = datafiles.filter(exposure_type_effective='LI')
     
     if light_frames.exists():
         datafiles = light_frames
@@ -419,9 +414,7 @@ def update_object_photometry_spectroscopy(obj):
     
     # Get all Light frames associated with this object
     # Use effective exposure type for filtering
-    light_files = annotate_effective_exposure_type(
-        obj.datafiles.all()
-    ).filter(annotated_effective_exposure_type='LI')
+    light_files = obj.datafiles.filter(exposure_type_effective='LI')
     
     # Check for spectroscopy: Light files with spectrograph != 'N' (NONE)
     has_spectroscopy = light_files.exclude(spectrograph='N').exists()
@@ -691,7 +684,188 @@ def check_solar_system_objects_in_fov(data_file, observatory_location):
         return {'found': False, 'objects': [], 'closest': None}
 
 
-def verify_star_classification(obj, data_file=None, enable_extended_search=True, fixed_radius_arcmin=None, bypass_override_flags=False):
+# Sentinel for "no pre-fetched SIMBAD table given" (None is a valid empty answer)
+_NOT_FETCHED = object()
+
+_STAR_VERIFICATION_PRIORITY_TYPES = ['NE', 'SC', 'GA']
+
+
+def _star_verification_radius_str(obj, data_file=None, fixed_radius_arcmin=None):
+    """
+    Search radius used by verify_star_classification().
+
+    fixed_radius_arcmin wins; else the FOV of data_file; else the FOV of the
+    object's DataFiles (5 arcmin fallback). Clamped to 1-30 arcmin.
+    """
+    radius_arcmin = 5.0  # Default fallback
+    min_radius = 1.0
+    max_radius = 30.0
+    
+    if fixed_radius_arcmin is not None:
+        radius_arcmin = max(min_radius, min(max_radius, float(fixed_radius_arcmin)))
+    elif data_file and data_file.fov_x > 0 and data_file.fov_y > 0:
+        # Use FOV from the current data file
+        fov_x_deg = float(data_file.fov_x)
+        fov_y_deg = float(data_file.fov_y)
+        half_diagonal_deg = np.sqrt(fov_x_deg**2 + fov_y_deg**2) / 2.0
+        radius_arcmin = half_diagonal_deg * 60.0
+        radius_arcmin = max(min_radius, min(max_radius, radius_arcmin))
+    else:
+        # Use FOV from associated DataFiles
+        radius_str = get_object_fov_radius(
+            obj,
+            fallback_arcmin=radius_arcmin,
+            min_arcmin=min_radius,
+            max_arcmin=max_radius
+        )
+        # Parse radius string to get arcmin
+        match = re.match(r'(\d+)d(\d+)m(\d+)s', radius_str)
+        if match:
+            degrees = int(match.group(1))
+            arcmin = int(match.group(2))
+            arcsec = int(match.group(3))
+            radius_arcmin = degrees * 60 + arcmin + arcsec / 60.0
+        else:
+            radius_arcmin = 5.0
+    
+    return _radius_str_from_arcmin(radius_arcmin, round_arcsec=False)
+
+
+def _query_star_verification_region(ra, dec, radius_str):
+    """
+    Extended region search used for star verification.
+
+    The local catalog answers first when it has a cluster, nebula or galaxy in
+    the cone; SIMBAD is only queried on a local miss (unless
+    LOCAL_CATALOG_REGION_AUTHORITATIVE).
+    """
+    local = query_local_region(ra, dec, Angle(radius_str).degree)
+    if local is not None:
+        for raw_types in local['alltypes.otypes']:
+            if detect_object_type_from_simbad_types(str(raw_types)) in _STAR_VERIFICATION_PRIORITY_TYPES:
+                return local
+    if local_region_authoritative():
+        return local
+    return _query_region_safe(ra, dec, radius_str, row_limit=1000)
+
+
+def find_star_classification_candidates(obj, result_table, priority_types=None):
+    """
+    SC/NE/GA objects with NGC/M/ACO identifiers in a SIMBAD region result.
+    
+    Parameters
+    ----------
+    obj : Object
+        Object the region search was centred on (for distances)
+    result_table : astropy.table.Table or None
+        Result of the extended SIMBAD region search
+    priority_types : list, optional
+        Accepted types in priority order (default: NE > SC > GA)
+    
+    Returns
+    -------
+    list
+        Candidate dicts ('row', 'type', 'magnitude', 'name', 'identifier',
+        'distance_deg'), best first: by type priority, then brightness.
+    """
+    if priority_types is None:
+        priority_types = _STAR_VERIFICATION_PRIORITY_TYPES
+    if result_table is None or len(result_table) == 0:
+        return []
+    priority_order = {t: i for i, t in enumerate(priority_types)}
+    
+    # Filter results for SC, NE, GA types with NGC/M/ACO identifiers
+    candidates = []
+    for row in result_table:
+        raw_types = row.get('alltypes.otypes', None)
+        types_str = '' if raw_types is None else str(raw_types)
+        detected_type = detect_object_type_from_simbad_types(types_str)
+        
+        if detected_type in priority_types:
+            # Check for NGC, Messier (M), or ACO identifiers
+            main_id = str(row.get('main_id', '')).upper()
+            
+            # Get all identifiers from IDS field
+            ids_field = None
+            try:
+                ids_field = row.get('IDS', None)
+            except Exception:
+                try:
+                    ids_field = row.get('ids', None)
+                except Exception:
+                    ids_field = None
+            
+            all_ids = []
+            if ids_field is not None:
+                all_ids = [str(id_str).strip().upper() for id_str in str(ids_field).split('|')]
+            if main_id:
+                all_ids.append(main_id)
+            
+            # Check if any identifier contains NGC, M, or ACO
+            has_valid_identifier = False
+            identifier_match = None
+            for id_str in all_ids:
+                # Check for NGC
+                if id_str.startswith('NGC') or ' NGC ' in id_str:
+                    has_valid_identifier = True
+                    identifier_match = id_str
+                    break
+                # Check for Messier
+                if (id_str.startswith('M ') or (id_str.startswith('M') and len(id_str) > 1 and id_str[1].isdigit())) or \
+                   id_str.startswith('MESSIER'):
+                    has_valid_identifier = True
+                    identifier_match = id_str
+                    break
+                # Check for ACO
+                if id_str.startswith('ACO') or ' ACO ' in id_str:
+                    has_valid_identifier = True
+                    identifier_match = id_str
+                    break
+            
+            if not has_valid_identifier:
+                continue  # Skip objects without NGC/M/ACO identifiers
+            
+            # Extract magnitude (V-band) if available
+            magnitude = None
+            try:
+                v_mag = row.get('V', None)
+                if v_mag is not None and str(v_mag) != '--' and str(v_mag) != '':
+                    try:
+                        magnitude = float(v_mag)
+                    except (ValueError, TypeError):
+                        magnitude = None
+            except Exception:
+                magnitude = None
+            
+            # Simple angular distance, for reference
+            distance_deg = None
+            try:
+                ra_diff = (float(row['ra']) - obj.ra) * np.cos(np.radians(obj.dec))
+                dec_diff = float(row['dec']) - obj.dec
+                distance_deg = float(np.sqrt(ra_diff**2 + dec_diff**2))
+            except (KeyError, TypeError, ValueError):
+                pass
+            
+            candidates.append({
+                'row': row,
+                'type': detected_type,
+                'magnitude': magnitude,
+                'name': str(row.get('main_id', 'Unknown')),
+                'identifier': identifier_match,
+                'distance_deg': distance_deg,
+            })
+    
+    # Sort by priority (NE > SC > GA) and then by magnitude (brighter = better)
+    def sort_key(x):
+        priority = priority_order.get(x['type'], 999)
+        mag_value = x['magnitude'] if x['magnitude'] is not None else 999.0
+        return (priority, mag_value)
+    
+    candidates.sort(key=sort_key)
+    return candidates
+
+
+def verify_star_classification(obj, data_file=None, enable_extended_search=True, fixed_radius_arcmin=None, bypass_override_flags=False, simbad_table=_NOT_FETCHED):
     """
     Verify if an object classified as 'ST' (star) should actually be a cluster, nebula, or galaxy.
     Performs an extended SIMBAD region search to find nearby SC/NE/GA objects with NGC/M/ACO identifiers.
@@ -709,6 +883,9 @@ def verify_star_classification(obj, data_file=None, enable_extended_search=True,
         computing from FOV. Takes precedence when no data_file FOV is available.
     bypass_override_flags : bool
         If True, ignore override flags when updating (for user-initiated actions).
+    simbad_table : astropy.table.Table or None, optional
+        Pre-fetched result of the extended region search (see obs_run.simbad_pipeline);
+        queried when omitted.
     
     Returns
     -------
@@ -728,150 +905,20 @@ def verify_star_classification(obj, data_file=None, enable_extended_search=True,
         return {'updated': False, 'best_match': None, 'candidates': []}
     
     try:
-        # Calculate FOV radius for search
-        # If fixed_radius_arcmin provided, use it; else if data_file has FOV use it; else use object's DataFiles
-        radius_arcmin = 5.0  # Default fallback
-        min_radius = 1.0
-        max_radius = 30.0
-        
-        if fixed_radius_arcmin is not None:
-            radius_arcmin = max(min_radius, min(max_radius, float(fixed_radius_arcmin)))
-        elif data_file and data_file.fov_x > 0 and data_file.fov_y > 0:
-            # Use FOV from the current data file
-            fov_x_deg = float(data_file.fov_x)
-            fov_y_deg = float(data_file.fov_y)
-            half_diagonal_deg = np.sqrt(fov_x_deg**2 + fov_y_deg**2) / 2.0
-            radius_arcmin = half_diagonal_deg * 60.0
-            radius_arcmin = max(min_radius, min(max_radius, radius_arcmin))
-        else:
-            # Use FOV from associated DataFiles
-            radius_str = get_object_fov_radius(
-                obj,
-                fallback_arcmin=radius_arcmin,
-                min_arcmin=min_radius,
-                max_arcmin=max_radius
-            )
-            # Parse radius string to get arcmin
-            import re
-            match = re.match(r'(\d+)d(\d+)m(\d+)s', radius_str)
-            if match:
-                degrees = int(match.group(1))
-                arcmin = int(match.group(2))
-                arcsec = int(match.group(3))
-                radius_arcmin = degrees * 60 + arcmin + arcsec / 60.0
-            else:
-                radius_arcmin = 5.0
-        
-        # Convert to SIMBAD format
-        degrees = int(radius_arcmin // 60)
-        remaining_arcmin = radius_arcmin - (degrees * 60)
-        arcmin = int(remaining_arcmin)
-        arcsec = int((remaining_arcmin - arcmin) * 60)
-        radius_str = f"{degrees}d{arcmin}m{arcsec}s"
-        
-        # Query SIMBAD with extended radius
-        result_table = _query_region_safe(
-            obj.ra,
-            obj.dec,
-            radius_str,
-            row_limit=1000  
-        )
-        
-        if result_table is None or len(result_table) == 0:
-            return {'updated': False, 'best_match': None, 'candidates': []}
-        
-        # Priority order: NE > SC > GA
-        priority_types = ['NE', 'SC', 'GA']
-        priority_order = {t: i for i, t in enumerate(priority_types)}
-        
-        # Filter results for SC, NE, GA types with NGC/M/ACO identifiers
-        candidates = []
-        for row in result_table:
-            raw_types = row.get('alltypes.otypes', None)
-            types_str = '' if raw_types is None else str(raw_types)
-            detected_type = detect_object_type_from_simbad_types(types_str)
-            
-            if detected_type in priority_types:
-                # Check for NGC, Messier (M), or ACO identifiers
-                main_id = str(row.get('main_id', '')).upper()
-                
-                # Get all identifiers from IDS field
-                ids_field = None
-                try:
-                    ids_field = row.get('IDS', None)
-                except Exception:
-                    try:
-                        ids_field = row.get('ids', None)
-                    except Exception:
-                        ids_field = None
-                
-                all_ids = []
-                if ids_field is not None:
-                    all_ids = [str(id_str).strip().upper() for id_str in str(ids_field).split('|')]
-                if main_id:
-                    all_ids.append(main_id)
-                
-                # Check if any identifier contains NGC, M, or ACO
-                has_valid_identifier = False
-                identifier_match = None
-                for id_str in all_ids:
-                    # Check for NGC
-                    if id_str.startswith('NGC') or ' NGC ' in id_str:
-                        has_valid_identifier = True
-                        identifier_match = id_str
-                        break
-                    # Check for Messier
-                    if (id_str.startswith('M ') or (id_str.startswith('M') and len(id_str) > 1 and id_str[1].isdigit())) or \
-                       id_str.startswith('MESSIER'):
-                        has_valid_identifier = True
-                        identifier_match = id_str
-                        break
-                    # Check for ACO
-                    if id_str.startswith('ACO') or ' ACO ' in id_str:
-                        has_valid_identifier = True
-                        identifier_match = id_str
-                        break
-                
-                if not has_valid_identifier:
-                    continue  # Skip objects without NGC/M/ACO identifiers
-                
-                # Extract magnitude (V-band) if available
-                magnitude = None
-                try:
-                    v_mag = row.get('V', None)
-                    if v_mag is not None and str(v_mag) != '--' and str(v_mag) != '':
-                        try:
-                            magnitude = float(v_mag)
-                        except (ValueError, TypeError):
-                            magnitude = None
-                except Exception:
-                    magnitude = None
-                
-                candidates.append({
-                    'row': row,
-                    'type': detected_type,
-                    'magnitude': magnitude,
-                    'name': str(row.get('main_id', 'Unknown')),
-                    'identifier': identifier_match,
-                })
+        if simbad_table is _NOT_FETCHED:
+            radius_str = _star_verification_radius_str(obj, data_file, fixed_radius_arcmin)
+            simbad_table = _query_star_verification_region(obj.ra, obj.dec, radius_str)
         
+        candidates = find_star_classification_candidates(obj, simbad_table)
         if not candidates:
             return {'updated': False, 'best_match': None, 'candidates': []}
-        
-        # Sort by priority (NE > SC > GA) and then by magnitude (brighter = better)
-        def sort_key(x):
-            priority = priority_order.get(x['type'], 999)
-            mag_value = x['magnitude'] if x['magnitude'] is not None else 999.0
-            return (priority, mag_value)
-        
-        candidates.sort(key=sort_key)
         best_match = candidates[0]
         
         # Update object if a better match was found
         update_result = update_object_from_simbad_result(
             obj,
             best_match['row'],
-            priority_types=priority_types,
+            priority_types=_STAR_VERIFICATION_PRIORITY_TYPES,
             dry_run=False,
             bypass_override_flags=bypass_override_flags,
         )
@@ -888,7 +935,48 @@ def verify_star_classification(obj, data_file=None, enable_extended_search=True,
         return {'updated': False, 'best_match': None, 'candidates': []}
 
 
-def reanalyse_object_from_simbad(obj, fixed_radius_arcmin=10.0, dry_run=False, bypass_override_flags=True):
+def _reanalyse_radius_str(fixed_radius_arcmin):
+    """Region search radius used by reanalyse_object_from_simbad()."""
+    if fixed_radius_arcmin > 0:
+        return _radius_str_from_arcmin(fixed_radius_arcmin, round_arcsec=False)
+    return '0d10m0s'
+
+
+def _reanalyse_row_index(result_table):
+    """Brightest object if V magnitudes are available, else the first (closest) row."""
+    if not np.all(result_table['V'].mask):
+        return int(np.argmin(result_table['V'].data))
+    return 0
+
+
+def fetch_reanalyse_tables(ra, dec, object_type, fixed_radius_arcmin=10.0):
+    """
+    Run the SIMBAD queries of reanalyse_object_from_simbad() without touching the database.
+    
+    The star-verification search is only fetched when the object is, or is about
+    to become, a star; otherwise it is left _NOT_FETCHED (queried on demand).
+    
+    Returns
+    -------
+    tuple
+        (region table or None, verification table / None / _NOT_FETCHED)
+    """
+    result_table = _query_region_safe(ra, dec, _reanalyse_radius_str(fixed_radius_arcmin), row_limit=500)
+    verification_table = _NOT_FETCHED
+    if result_table is not None and len(result_table) > 0:
+        row = result_table[_reanalyse_row_index(result_table)]
+        raw_types = row.get('alltypes.otypes', None)
+        types_str = '' if raw_types is None else str(raw_types)
+        detected_type = detect_object_type_from_simbad_types(types_str)
+        becomes_star = detected_type == 'ST' or (detected_type is None and '*' in types_str)
+        if becomes_star or (detected_type is None and object_type == 'ST'):
+            verification_table = _query_star_verification_region(
+                ra, dec, _star_verification_radius_str(None, fixed_radius_arcmin=fixed_radius_arcmin),
+            )
+    return result_table, verification_table
+
+
+def reanalyse_object_from_simbad(obj, fixed_radius_arcmin=10.0, dry_run=False, bypass_override_flags=True, simbad_tables=None):
     """
     Re-analyse an object using SIMBAD coordinates query. Updates name, object_type,
     and identifiers. If object_type is ST, verifies star classification with
@@ -905,6 +993,9 @@ def reanalyse_object_from_simbad(obj, fixed_radius_arcmin=10.0, dry_run=False, b
     bypass_override_flags : bool
         If True, ignore override flags and apply all updates (default: True for
         this user-initiated action).
+    simbad_tables : tuple, optional
+        Pre-fetched result of fetch_reanalyse_tables() (see obs_run.simbad_pipeline);
+        queried when omitted.
     
     Returns
     -------
@@ -916,23 +1007,15 @@ def reanalyse_object_from_simbad(obj, fixed_radius_arcmin=10.0, dry_run=False, b
         return {'success': False, 'error': 'Invalid coordinates for SIMBAD query'}
     
     try:
-        radius_str = '0d10m0s'
-        if fixed_radius_arcmin > 0:
-            deg = int(fixed_radius_arcmin // 60)
-            rem = fixed_radius_arcmin - deg * 60
-            am = int(rem)
-            asec = int((rem - am) * 60)
-            radius_str = f"{deg}d{am}m{asec}s"
-        
-        result_table = _query_region_safe(obj.ra, obj.dec, radius_str, row_limit=500)
+        if simbad_tables is None:
+            result_table = _query_region_safe(obj.ra, obj.dec, _reanalyse_radius_str(fixed_radius_arcmin), row_limit=500)
+            verification_table = _NOT_FETCHED
+        else:
+            result_table, verification_table = simbad_tables
         if result_table is None or len(result_table) == 0:
             return {'success': False, 'error': 'No SIMBAD result found for coordinates'}
         
-        # Use brightest object if V magnitude available, else first (closest)
-        index = 0
-        if not np.all(result_table['V'].mask):
-            index = int(np.argmin(result_table['V'].data))
-        row = result_table[index]
+        row = result_table[_reanalyse_row_index(result_table)]
         
         update_result = update_object_from_simbad_result(
             obj,
@@ -951,6 +1034,7 @@ def reanalyse_object_from_simbad(obj, fixed_radius_arcmin=10.0, dry_run=False, b
                 enable_extended_search=True,
                 fixed_radius_arcmin=fixed_radius_arcmin,
                 bypass_override_flags=bypass_override_flags,
+                simbad_table=verification_table,
             )
             star_verification_updated = verification_result.get('updated', False)
         
@@ -1352,6 +1436,21 @@ def add_new_data_file(path_to_file, observation_run, print_to_terminal=False):
     except Exception as e:
         logger.warning(f'Error updating photometry/spectroscopy flags: {e}')
 
+    #   Pixel statistics for QA filters (also stores the pixel product the thumbnails render from)
+    if file_type == 'FITS' and getattr(settings, 'PIXEL_STATS_ENABLED', True):
+        try:
+            from obs_run.pixel_stats import update_pixel_stats
+            update_pixel_stats(data_file)
+        except Exception as e:
+            logger.warning(f'Pixel statistics failed for {path_to_file}: {e}')
+
+    #   Pre-render gallery thumbnails in the background so a fresh run opens without render waits
+    try:
+        from obs_run.tasks import enqueue_thumbnail_prerender
+        enqueue_thumbnail_prerender(data_file.pk, file_type)
+    except Exception as e:
+        logger.warning(f'Could not queue thumbnail pre-rendering for {path_to_file}: {e}')
+
     return True
 
 
@@ -0,0 +1,128 @@
+"""Benchmark aux-objects pointing clustering on synthetic runs (no database needed).
+
+Usage: python utility_scripts/benchmark_pointing_clustering.py [--sizes 100 1000 10000] [--legacy-max 300]
+
+Each synthetic run has a few dithered target fields, a slow drift chain, and some
+frames without field size. The pairwise reference implementation (SkyCoord
+separations, O(n²)) is timed and compared only up to --legacy-max frames.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+
+def _synthetic_files(n: int, seed: int):
+    import numpy as np
+
+    from obs_run.models import DataFile
+
+    rng = np.random.default_rng(seed)
+    n_fields = max(1, n // 200)
+    field_ra = rng.uniform(0, 360, n_fields)
+    field_dec = rng.uniform(-60, 80, n_fields)
+    files = []
+    for i in range(n):
+        kind = i % 10
+        if kind == 9:
+            # Drift chain: consecutive frames 3 arcmin apart
+            ra = (field_ra[0] + 0.05 * (i // 10)) % 360
+            dec = field_dec[0] + 1.0
+        else:
+            f = rng.integers(n_fields)
+            ra = (field_ra[f] + rng.normal(0, 0.02)) % 360
+            dec = float(np.clip(field_dec[f] + rng.normal(0, 0.02), -90, 90))
+        fov = None if kind == 7 else float(rng.choice([0.3, 0.5, 1.2]))
+        files.append(DataFile(
+            pk=i + 1,
+            plate_solved=True,
+            wcs_ra=float(ra),
+            wcs_dec=float(dec),
+            ra=float(ra),
+            dec=float(dec),
+            fov_x=fov,
+            fov_y=fov,
+        ))
+    return files
+
+
+def _legacy_cluster(files):
+    """Previous pairwise implementation, kept here as reference."""
+    import astropy.units as u
+    from astropy.coordinates import SkyCoord
+
+    from obs_run.aux_objects import _pair_cluster_threshold_deg, get_file_center
+
+    indexed = []
+    for data_file in files:
+        try:
+            ra, dec = get_file_center(data_file)
+        except ValueError:
+            continue
+        indexed.append((data_file, ra, dec))
+    assigned = [False] * len(indexed)
+    clusters = []
+    for i in range(len(indexed)):
+        if assigned[i]:
+            continue
+        cluster_indices = [i]
+        assigned[i] = True
+        queue = [i]
+        while queue:
+            ci = queue.pop()
+            file_a, ra_a, dec_a = indexed[ci]
+            coord_a = SkyCoord(ra_a * u.deg, dec_a * u.deg, frame='icrs')
+            for j in range(len(indexed)):
+                if assigned[j]:
+                    continue
+                file_b, ra_b, dec_b = indexed[j]
+                coord_b = SkyCoord(ra_b * u.deg, dec_b * u.deg, frame='icrs')
+                if float(coord_a.separation(coord_b).degree) <= _pair_cluster_threshold_deg(file_a, file_b):
+                    assigned[j] = True
+                    cluster_indices.append(j)
+                    queue.append(j)
+        clusters.append([indexed[k][0] for k in cluster_indices])
+    return clusters
+
+
+def _partition(clusters):
+    return sorted(tuple(sorted(df.pk for df in cluster)) for cluster in clusters)
+
+
+def main():
+    root = Path(__file__).resolve().parent.parent
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ostdata.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    django.setup()
+
+    from obs_run.aux_objects import cluster_light_fits_by_pointing
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--legacy-max', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'frames':>8} {'clusters':>9} {'kd-tree [s]':>12} {'pairwise [s]':>13} {'same':>5}")
+    for n in args.sizes:
+        files = _synthetic_files(n, args.seed)
+        t0 = time.perf_counter()
+        clusters = cluster_light_fits_by_pointing(files)
+        fast = time.perf_counter() - t0
+        legacy = '-'
+        same = '-'
+        if n <= args.legacy_max:
+            t0 = time.perf_counter()
+            reference = _legacy_cluster(files)
+            legacy = f'{time.perf_counter() - t0:.3f}'
+            same = 'yes' if _partition(reference) == _partition(clusters) else 'NO'
+        print(f'{n:>8} {len(clusters):>9} {fast:>12.3f} {legacy:>13} {same:>5}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark streamed ZIP responses against the download-job path (no database needed).
+
+Usage: python utility_scripts/benchmark_zip_streaming.py [--files 20] [--size-mb 16] [--repeat 3] [--workers 1]
+
+Synthetic FITS-like files (16-bit noise around a sky level) are archived twice:
+- job: ZIP written to a temporary file (as build_zip_task does, with --workers
+  deflate threads), then read back
+  in 1 MiB chunks (as the download endpoint sends it)
+- stream: iter_zip_stream() chunks consumed directly (as the streamed response sends them)
+Reported: wall time, throughput, time to first byte, bytes written to disk and
+peak Python heap (tracemalloc) of the archiving itself.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import django
+
+CHUNK = 1024 * 1024
+
+
+def _make_files(directory: Path, count: int, size_mb: float, seed: int):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    n_values = int(size_mb * 1024 * 1024 // 2)
+    paths = []
+    for i in range(count):
+        data = rng.normal(1000, 30, n_values).astype('>i2')
+        path = directory / f'frame_{i:04d}.fits'
+        path.write_bytes(data.tobytes())
+        paths.append(path)
+    return paths
+
+
+def _job_path(members, tmp_dir: Path, workers: int):
+    from obs_run.services.zip_compression import write_zip_members
+
+    start = time.perf_counter()
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix='.zip', dir=str(tmp_dir))
+    tmp.close()
+    with open(tmp.name, 'wb') as fh:
+        write_zip_members(fh, members, workers=workers, spool_dir=str(tmp_dir))
+    disk = os.path.getsize(tmp.name)
+    first = None
+    sent = 0
+    with open(tmp.name, 'rb') as fh:
+        while True:
+            buf = fh.read(CHUNK)
+            if not buf:
+                break
+            if first is None:
+                first = time.perf_counter() - start
+            sent += len(buf)
+    os.remove(tmp.name)
+    return time.perf_counter() - start, first, sent, disk
+
+
+def _stream_path(members):
+    from obs_run.services.zip_stream import iter_zip_stream
+
+    start = time.perf_counter()
+    first = None
+    sent = 0
+    for chunk in iter_zip_stream(members):
+        if first is None:
+            first = time.perf_counter() - start
+        sent += len(chunk)
+    return time.perf_counter() - start, first, sent, 0
+
+
+def _measure(fn, *args):
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (*result, peak)
+
+
+def main():
+    root = Path(__file__).resolve().parent.parent
+    if str(root) not in sys.path:
+        sys.path.insert(0, str(root))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ostdata.settings')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    django.setup()
+
+    from obs_run.services.zip_stream import ZipMember, zip_arcname
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=20)
+    parser.add_argument('--size-mb', type=float, default=16.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=1, help='deflate threads for the job path')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        paths = _make_files(tmp_dir, args.files, args.size_mb, args.seed)
+        members = [
+            ZipMember(datafile_id=i + 1, path=p, arcname=zip_arcname(i + 1, p), size=p.stat().st_size)
+            for i, p in enumerate(paths)
+        ]
+        total_mb = sum(m.size for m in members) / 1024 ** 2
+        print(f'{args.files} files, {total_mb:.1f} MiB input')
+        print(f"{'path':>7} {'time [s]':>9} {'MiB/s':>7} {'first byte [s]':>15} {'sent [MiB]':>11} {'disk [MiB]':>11} {'peak heap [MiB]':>16}")
+        for name, fn, fn_args in (('job', _job_path, (members, tmp_dir, args.workers)), ('stream', _stream_path, (members,))):
+            best = None
+            for _ in range(args.repeat):
+                run = _measure(fn, *fn_args)
+                if best is None or run[0] < best[0]:
+                    best = run
+            elapsed, first, sent, disk, peak = best
+            print(
+                f'{name:>7} {elapsed:>9.3f} {total_mb / elapsed:>7.1f} {first:>15.3f} '
+                f'{sent / 1024 ** 2:>11.1f} {disk / 1024 ** 2:>11.1f} {peak / 1024 ** 2:>16.1f}'
+            )
+
+
+if __name__ == '__main__':
+    main()